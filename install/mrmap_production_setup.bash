@@ -7,7 +7,7 @@ proxy="" # format: proxy = "http://192.168.56.1:8080"
 
 # install required packages
 apt-get update
-apt-get install -y postgresql postgresql-client postgresql-server-dev-11 postgis redis-server libcurl4-openssl-dev libssl-dev virtualenv build-essential git python3-pip fcgiwrap cgi-mapserver apache2-utils curl gnupg2 ca-certificates lsb-release gettext
+apt-get install -y postgresql postgresql-client postgresql-server-dev-11 postgis redis-server libcurl4-openssl-dev libssl-dev virtualenv build-essential git python3-pip fcgiwrap cgi-mapserver apache2-utils curl gnupg2 ca-certificates lsb-release gettext proj-data
 
 # add nginx official mainline repo
 echo "deb http://nginx.org/packages/mainline/debian `lsb_release -cs` nginx" \
@@ -37,6 +37,8 @@ python -m pip install uwsgi flower
 python -m pip install -r /opt/MrMap/requirements.txt
 python /opt/mrmap/mrmap/manage.py migrate
 python /opt/mrmap/mrmap/manage.py collectstatic
+# axis orders of the spatial reference systems, taken from the EPSG database of the installed PROJ
+python /opt/mrmap/mrmap/manage.py generate_epsg_axis_order /usr/share/proj/proj.db
 
 # changes to settings.py, set Django debug to false, set hostname, enable ssl
 sed -i s/"DEBUG = True"/"DEBUG = False"/g /opt/mrmap/mrmap/MrMap/sub_settings/django_settings.py
@@ -99,6 +99,7 @@ python manage.py collectstatic
 python manage.py compilemessages
 python manage.py makemigrations
 python manage.py migrate
+python manage.py generate_epsg_axis_order /usr/share/proj/proj.db
 
 # uncomment this if you have dropped the db
 #python manage.py makemigrations service structure editor monitoring users csw
@@ -5,9 +5,9 @@ Contact: michel.peltriaux@vermkv.rlp.de
 Created on: 25.02.20
 
 """
-import json
-
 from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import QuerySet
 
 from service.helper.crypto_handler import CryptoHandler
 
@@ -78,6 +78,17 @@ class SimpleCacher:
         """
         return cache.delete("{}{}".format(self.key_prefix if use_internal_key_prefix else "", key))
 
+    def remove_many(self, keys: list, use_internal_key_prefix: bool = True):
+        """ Removes multiple records from the cache in one call.
+
+        Args:
+            keys (list): A list of key strings
+        Returns:
+            nothing
+        """
+        prefix = self.key_prefix if use_internal_key_prefix else ""
+        cache.delete_many(["{}{}".format(prefix, key) for key in keys])
+
 
 class DocumentCacher(SimpleCacher):
     def __init__(self, title: str, version: str, ttl: int = None):
@@ -86,6 +97,145 @@ class DocumentCacher(SimpleCacher):
         super().__init__(ttl, prefix)
 
 
+class RecordFragmentCacher(SimpleCacher):
+    def __init__(self, ttl: int = None):
+        ttl = ttl or 24 * 60 * 60  # 1 day
+        prefix = "csw_record_"
+        super().__init__(ttl, prefix)
+
+    def get_many(self, keys: list):
+        """ Get multiple stored values in one call
+
+        Args:
+            keys (list): The keys which are used for finding the results
+        Returns:
+             results (dict): The found key-value pairs, without the internal key prefix
+        """
+        results = cache.get_many(["{}{}".format(self.key_prefix, key) for key in keys])
+        prefix_len = len(self.key_prefix)
+        return {key[prefix_len:]: val for key, val in results.items()}
+
+    def set_many(self, data: dict):
+        """ Set multiple key-value pairs in one call
+
+        Args:
+            data (dict): The key-value pairs
+        Returns:
+
+        """
+        cache.set_many(
+            {"{}{}".format(self.key_prefix, key): val for key, val in data.items()},
+            timeout=self.ttl
+        )
+
+
+class OperationResponseCacher(SimpleCacher):
+    def __init__(self, ttl: int = None):
+        ttl = ttl or 60 * 30  # 30 minutes
+        prefix = "operation_response_"
+        super().__init__(ttl, prefix)
+
+    def reserve(self, budget_key: str, size: int, budget: int, ttl: int):
+        """ Reserves size bytes of a storage budget, which is reset after ttl seconds
+
+        The ttl should match the cache time of the stored entries, so the budget is reset when the entries, which
+        used it, expire.
+
+        Args:
+            budget_key (str): The key of the budget, e.g. a service id and cache time
+            size (int): The number of bytes which shall be stored
+            budget (int): The maximum number of bytes
+            ttl (int): The time after which the budget is reset
+        Returns:
+             True if the bytes could be reserved, False if the budget is exhausted
+        """
+        key = "{}budget_{}".format(self.key_prefix, budget_key)
+        # add() is a noop if the key already exists, so the budget is only reset after it expired
+        cache.add(key, 0, timeout=ttl)
+        try:
+            used = cache.incr(key, size)
+        except ValueError:
+            # The budget expired in between
+            return False
+        if used > budget:
+            # Rejected entries are not stored, so they must not use up the budget
+            try:
+                cache.decr(key, size)
+            except ValueError:
+                pass
+            return False
+        return True
+
+
+class HitCacher(SimpleCacher):
+    def __init__(self):
+        # Counters never expire, they are reset by flushing them to the database
+        prefix = "hits_"
+        super().__init__(None, prefix)
+
+    def increase(self, metadata_id, amount: int = 1):
+        """ Increases the hit counter of a metadata record
+
+        Args:
+            metadata_id: The id of the requested metadata
+            amount (int): The number of hits
+        Returns:
+             nothing
+        """
+        key = "{}{}".format(self.key_prefix, metadata_id)
+        # add() is a noop if the counter already exists
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, amount)
+
+    def get_all(self):
+        """ Returns all counted hits, which have not been flushed yet
+
+        Returns:
+             hits (dict): The number of hits per metadata id
+        """
+        prefix_len = len(self.key_prefix)
+        # iter_keys() uses SCAN, so redis is not blocked by a KEYS call on each flush
+        keys = list(cache.iter_keys("{}*".format(self.key_prefix)))
+        return {
+            key[prefix_len:]: val for key, val in cache.get_many(keys).items() if val
+        }
+
+    def decrease_many(self, hits: dict):
+        """ Decreases the hit counters by already flushed hits
+
+        Hits, which were counted in between, are kept.
+
+        Args:
+            hits (dict): The number of flushed hits per metadata id
+        Returns:
+             nothing
+        """
+        for metadata_id, amount in hits.items():
+            cache.decr("{}{}".format(self.key_prefix, metadata_id), amount)
+
+    def acquire_flush_lock(self, ttl: int):
+        """ Makes sure only one flush runs at a time
+
+        Args:
+            ttl (int): The time after which the lock is released anyway
+        Returns:
+             True if the lock has been acquired, False otherwise
+        """
+        return cache.add(self._get_flush_lock_key(), 1, timeout=ttl)
+
+    def release_flush_lock(self):
+        """ Releases the flush lock
+
+        Returns:
+             nothing
+        """
+        cache.delete(self._get_flush_lock_key())
+
+    def _get_flush_lock_key(self):
+        # The lock must not match the pattern of the counter keys
+        return "lock_{}flush".format(self.key_prefix)
+
+
 class EPSGCacher(SimpleCacher):
     def __init__(self, ttl: int = None):
         ttl = ttl or 7 * 24 * 60 * 60  # 7 days
@@ -94,56 +244,96 @@ class EPSGCacher(SimpleCacher):
 
 
 class PreviewImageCacher(SimpleCacher):
-    def __init__(self, ttl: int = None, metadata=None):
-        ttl = ttl or 60 * 30  # 30 minutes
-        prefix = "preview_{}_".format(metadata.id)
-        self.crypto_handler = CryptoHandler()
+    def __init__(self, ttl: int = None):
+        ttl = ttl or 24 * 60 * 60  # 1 day
+        prefix = "preview_"
         super().__init__(ttl, prefix)
 
-    def set(self, params_dict: dict, img: dict, use_ttl: bool = True):
-        """ Special setter for preview images.
-
-        Takes a dict of parameter key-value pairs and an image as bytes and stores the image, using the hashed
-        dict as key
+    def set(self, metadata_id, preview: dict, use_ttl: bool = True):
+        """ Special setter for rendered preview images.
 
         Args:
-            params_dict (dict): The parameters
-            img (dict): The preview image as bytes in a dict {"response": img(bytes), "content_type": img_mime_type}
+            metadata_id: The id of the metadata, the preview belongs to
+            preview (dict): The encoded preview image and its etag {"content": img(bytes), "etag": etag(str)}
             use_ttl:
         Returns:
              nothing
         """
-        query_data_str = json.dumps(params_dict)
-        _hash = self.crypto_handler.sha256(query_data_str)
-        super().set(key=_hash, val=img, use_ttl=use_ttl)
-
-    def get(self, params_dict: dict):
-        """ Special getter for cached preview images.
+        super().set(key=str(metadata_id), val=preview, use_ttl=use_ttl)
 
-        Takes a dict of parameter key-value pairs looks for the cached entry, using the hashed dict as key
+    def get(self, metadata_id):
+        """ Special getter for rendered preview images.
 
         Args:
-            params_dict (dict): The parameters
+            metadata_id: The id of the metadata, the preview belongs to
         Returns:
-             nothing
+             preview (dict): The encoded preview image and its etag or None
         """
-        query_data_str = json.dumps(params_dict)
-        _hash = self.crypto_handler.sha256(query_data_str)
-        return super().get(_hash)
+        return super().get(str(metadata_id))
 
 
 class PageCacher(SimpleCacher):
     def __init__(self):
         super().__init__(-1, None)
 
-    def remove_pages(self, key_like: str):
-        """ Removes cached pages from the memory.
+    def get_namespace_prefix(self, namespace: str):
+        """ Returns the current key prefix for pages of a namespace
 
         Args:
-            key_like (str): A string that occurs in the searched key
+            namespace (str): The namespace, e.g. API_CACHE_KEY_PREFIX
         Returns:
+             key_prefix (str): The namespace and its current version
+        """
+        version = cache.get(self._get_namespace_version_key(namespace)) or 0
+        return "{}_{}".format(namespace, version)
+
+    def invalidate_namespace(self, namespace: str):
+        """ Invalidates all cached pages of a namespace at once by increasing its version
 
+        No key scan is needed. The outdated pages are never read again and expire on their own.
+
+        Args:
+            namespace (str): The namespace, e.g. API_CACHE_KEY_PREFIX
+        Returns:
+             nothing
+        """
+        key = self._get_namespace_version_key(namespace)
+        # add() is a noop if the version already exists
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+    @staticmethod
+    def _get_namespace_version_key(namespace: str):
+        return "page_namespace_version_{}".format(namespace)
+
+
+class CountCacher(SimpleCacher):
+    def __init__(self, ttl: int = None, key_prefix: str = None):
+        ttl = ttl or 60 * 5  # 5 minutes
+        prefix = "count_{}_".format(key_prefix or "")
+        self.crypto_handler = CryptoHandler()
+        super().__init__(ttl, prefix)
+
+    def get_count(self, queryset):
+        """ Returns the number of records for a queryset.
+
+        The count is cached using the hashed sql query as key, so paging through a large result set does not run a
+        full COUNT on every page. The returned number might therefore be outdated for ttl seconds.
+
+        Args:
+            queryset (QuerySet): The queryset which shall be counted
+        Returns:
+             count (int): The (cached) number of records
         """
-        keys = self.get_keys("*" + key_like + "*")
-        for key in keys:
-            self.remove(key, False)
+        if not isinstance(queryset, QuerySet):
+            return len(queryset)
+        try:
+            _hash = self.crypto_handler.sha256(str(queryset.query))
+        except EmptyResultSet:
+            # Happens for querysets which can never return results, e.g. filter(id__in=[])
+            return 0
+        count = super().get(_hash)
+        if count is None:
+            count = queryset.count()
+            super().set(_hash, count)
+        return count
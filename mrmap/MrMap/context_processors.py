@@ -1,5 +1,5 @@
 from celery import states
-from django.db.models import Q
+from django.db.models import Q, Count
 from django.http import HttpRequest
 from django_celery_results.models import TaskResult
 
@@ -41,19 +41,20 @@ def default_context(request: HttpRequest):
                                                         Q(status=states.STARTED)|
                                                         Q(status=states.RECEIVED)).count()
 
-        wms_count = Metadata.objects.filter(service__service_type__name=OGCServiceEnum.WMS.value,
-                                            service__is_root=True,
-                                            created_by__in=request.user.groups.all(),
-                                            is_deleted=False,
-                                            service__is_update_candidate_for=None,).count()
-        wfs_count = Metadata.objects.filter(service__service_type__name=OGCServiceEnum.WFS.value,
-                                            created_by__in=request.user.groups.all(),
-                                            is_deleted=False,
-                                            service__is_update_candidate_for=None, ).count()
-        csw_count = Metadata.objects.filter(service__service_type__name=OGCServiceEnum.CSW.value,
-                                            created_by__in=request.user.groups.all(),
-                                            is_deleted=False,
-                                            service__is_update_candidate_for=None, ).count()
+        # Count all service types in one query instead of three
+        service_counts = Metadata.objects.filter(
+            created_by__in=request.user.groups.all(),
+            is_deleted=False,
+            service__is_update_candidate_for=None,
+        ).aggregate(
+            wms_count=Count("id", filter=Q(service__service_type__name=OGCServiceEnum.WMS.value,
+                                           service__is_root=True)),
+            wfs_count=Count("id", filter=Q(service__service_type__name=OGCServiceEnum.WFS.value)),
+            csw_count=Count("id", filter=Q(service__service_type__name=OGCServiceEnum.CSW.value)),
+        )
+        wms_count = service_counts["wms_count"]
+        wfs_count = service_counts["wfs_count"]
+        csw_count = service_counts["csw_count"]
         dataset_count = request.user.get_datasets_as_qs(user_groups=request.user.groups.all()).count()
 
     return {
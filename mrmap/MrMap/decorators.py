@@ -5,54 +5,109 @@ Contact: michel.peltriaux@vermkv.rlp.de
 Created on: 08.05.19
 
 """
+import asyncio
 import json
+from functools import wraps
+
+from asgiref.sync import sync_to_async
 from django.core.exceptions import ObjectDoesNotExist
 from django.http import HttpResponse
+from django.views.decorators.cache import cache_page
+
+from MrMap.cacher import PageCacher
 from MrMap.messages import SERVICE_NOT_FOUND
 from MrMap.utils import get_dict_value_insensitive
 from service.models import Metadata, ProxyLog
 from users.helper import user_helper
 
 
+def _create_proxy_log(request, metadata_id):
+    """ Adds a log record for a proxied request, if the metadata has a logging proxy configuration
+
+    Args:
+        request (HttpRequest): The incoming request
+        metadata_id: The id of the requested metadata
+    Returns:
+         error_response (HttpResponse): A 404 response if the metadata does not exist, None otherwise
+         proxy_log (ProxyLog): The log record or None
+    """
+    user = user_helper.get_user(request=request)
+    try:
+        md = Metadata.objects.proxy_view().get(id=metadata_id)
+    except ObjectDoesNotExist:
+        return HttpResponse(status=404, content=SERVICE_NOT_FOUND), None
+
+    logged_user = None
+    if user.is_authenticated:
+        logged_user = user
+
+    uri = request.path
+    post_body = {}
+    if request.method.lower() == "post":
+        post_body = request.POST.dict()
+    elif request.method.lower() == "get":
+        uri += "?" + request.META.get("QUERY_STRING", "")
+    post_body = json.dumps(post_body)
+
+    proxy_log = None
+    if md.use_proxy_uri and md.log_proxy_access:
+        proxy_log = ProxyLog(
+            metadata=md,
+            uri=uri,
+            operation=get_dict_value_insensitive(request.GET.dict(), "request"),
+            post_body=post_body,
+            user=logged_user
+        )
+        proxy_log.save()
+    return None, proxy_log
+
+
 def log_proxy(function):
     """ Checks whether the metadata has a logging proxy configuration and adds another log record
 
+    Coroutine views are wrapped by a coroutine, which creates the log record in the database thread.
+
     Args:
         function (Function): The wrapped function
     Returns:
         The function
     """
-    def wrap(request, *args, **kwargs):
-        user = user_helper.get_user(request=request)
-        try:
-            md = Metadata.objects.get(id=kwargs["metadata_id"])
-        except ObjectDoesNotExist:
-            return HttpResponse(status=404, content=SERVICE_NOT_FOUND)
-
-        logged_user = None
-        if user.is_authenticated:
-            logged_user = user
-
-        uri = request.path
-        post_body = {}
-        if request.method.lower() == "post":
-            post_body = request.POST.dict()
-        elif request.method.lower() == "get":
-            uri += "?" + request.environ.get("QUERY_STRING")
-        post_body = json.dumps(post_body)
-
-        proxy_log = None
-        if md.use_proxy_uri and md.log_proxy_access:
-            proxy_log = ProxyLog(
-                metadata=md,
-                uri=uri,
-                operation=get_dict_value_insensitive(request.GET.dict(), "request"),
-                post_body=post_body,
-                user=logged_user
+    if asyncio.iscoroutinefunction(function):
+        async def wrap(request, *args, **kwargs):
+            error_response, proxy_log = await sync_to_async(_create_proxy_log, thread_sensitive=True)(
+                request,
+                kwargs["metadata_id"]
             )
-            proxy_log.save()
-        return function(request=request, proxy_log=proxy_log, *args, **kwargs)
+            if error_response is not None:
+                return error_response
+            return await function(request=request, proxy_log=proxy_log, *args, **kwargs)
+    else:
+        def wrap(request, *args, **kwargs):
+            error_response, proxy_log = _create_proxy_log(request, kwargs["metadata_id"])
+            if error_response is not None:
+                return error_response
+            return function(request=request, proxy_log=proxy_log, *args, **kwargs)
 
     wrap.__doc__ = function.__doc__
     wrap.__name__ = function.__name__
     return wrap
+
+
+def namespaced_cache_page(timeout: int, namespace: str):
+    """ Like django's cache_page, but the pages of a namespace can be invalidated at once
+
+    The key prefix is resolved on each request, so PageCacher().invalidate_namespace() takes effect immediately.
+
+    Args:
+        timeout (int): The cache time in seconds
+        namespace (str): The namespace of the cached pages
+    Returns:
+        The decorator
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrap(request, *args, **kwargs):
+            key_prefix = PageCacher().get_namespace_prefix(namespace)
+            return cache_page(timeout, key_prefix=key_prefix)(function)(request, *args, **kwargs)
+        return wrap
+    return decorator
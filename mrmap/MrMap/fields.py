@@ -0,0 +1,84 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import gzip
+import io
+
+from django.db import models
+
+GZIP_MAGIC_NUMBER = b"\x1f\x8b"
+
+
+def compress_text(value, compresslevel: int = 6):
+    """ Compresses a text using gzip
+
+    Args:
+        value (str|bytes): The text or its UTF-8 encoded bytes
+        compresslevel (int): The gzip compression level
+    Returns:
+         compressed (bytes): The compressed text
+    """
+    if isinstance(value, str):
+        value = value.encode("UTF-8")
+    out = io.BytesIO()
+    # A fixed mtime keeps the output of equal texts equal
+    with gzip.GzipFile(fileobj=out, mode="wb", compresslevel=compresslevel, mtime=0) as gzip_file:
+        gzip_file.write(value)
+    return out.getvalue()
+
+
+def decompress_text(value):
+    """ Decompresses a text, which has been compressed by compress_text()
+
+    Uncompressed values are returned as they are, so records written before the compression are still readable.
+
+    Args:
+        value (bytes|memoryview): The compressed text
+    Returns:
+         text (str): The decompressed text
+    """
+    value = bytes(value)
+    if value.startswith(GZIP_MAGIC_NUMBER):
+        value = gzip.decompress(value)
+    return value.decode("UTF-8")
+
+
+class CompressedTextField(models.BinaryField):
+    """ Stores a text gzip compressed as bytes
+
+    In python the value stays a str, so the field can replace a TextField without any changes to the code which uses
+    it. Lookups on the content, except isnull, are not supported.
+
+    """
+    def __init__(self, *args, compresslevel: int = 6, **kwargs):
+        self.compresslevel = compresslevel
+        kwargs.setdefault("editable", True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.compresslevel != 6:
+            kwargs["compresslevel"] = self.compresslevel
+        return name, path, args, kwargs
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return decompress_text(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            return decompress_text(value)
+        return value
+
+    def get_prep_value(self, value):
+        if value is None or isinstance(value, memoryview):
+            return value
+        return compress_text(value, compresslevel=self.compresslevel)
+
+    def value_to_string(self, obj):
+        return self.value_from_object(obj)
@@ -0,0 +1,93 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import timeit
+
+from django.core.management import BaseCommand
+
+from MrMap.settings import XML_NAMESPACES, GENERIC_NAMESPACE_TEMPLATE
+from service.helper import xml_helper
+
+
+def _create_capabilities(number_of_layers: int):
+    """ Creates a capabilities like document with a root layer and the given number of sublayers
+
+    Args:
+        number_of_layers (int): The number of sublayers
+    Returns:
+         xml_obj: The parsed document
+    """
+    layers = "".join(
+        "<Layer queryable='1'><Name>layer_{0}</Name><Title>Layer {0}</Title><Abstract>Abstract {0}</Abstract>"
+        "<KeywordList><Keyword>a</Keyword><Keyword>b</Keyword></KeywordList><SRS>EPSG:4326</SRS>"
+        "<LatLonBoundingBox minx='6' miny='48' maxx='9' maxy='51'/></Layer>".format(i)
+        for i in range(number_of_layers)
+    )
+    return xml_helper.parse_xml(
+        "<WMT_MS_Capabilities><Service><Title>Benchmark</Title></Service><Capability>"
+        "<Layer><Title>Root</Title>{}</Layer></Capability></WMT_MS_Capabilities>".format(layers)
+    )
+
+
+class Command(BaseCommand):
+    help = "(DEV COMMAND) Compares the evaluation of runtime built xpath expressions with the compiled expressions of " \
+           "xml_helper."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--layers", type=int, default=1000, help="Number of layers of the test document")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of runs per expression")
+
+    def handle(self, *args, **options):
+        xml_obj = _create_capabilities(options["layers"])
+        layers = xml_obj.xpath("//Layer/Layer")
+        namespaces = dict(XML_NAMESPACES)
+
+        # Expressions like the ones used per layer and per document during the parsing of a capabilities document
+        per_layer_expressions = [
+            "./" + GENERIC_NAMESPACE_TEMPLATE.format("Name"),
+            "./" + GENERIC_NAMESPACE_TEMPLATE.format("Title"),
+            "./" + GENERIC_NAMESPACE_TEMPLATE.format("KeywordList") + "/" + GENERIC_NAMESPACE_TEMPLATE.format("Keyword"),
+            "./" + GENERIC_NAMESPACE_TEMPLATE.format("LatLonBoundingBox"),
+            "./" + GENERIC_NAMESPACE_TEMPLATE.format("Style"),
+        ]
+        per_document_expressions = [
+            "//" + GENERIC_NAMESPACE_TEMPLATE.format("Layer"),
+            "//" + GENERIC_NAMESPACE_TEMPLATE.format("Capability") + "/" + GENERIC_NAMESPACE_TEMPLATE.format("Layer"),
+            "//" + GENERIC_NAMESPACE_TEMPLATE.format("Service") + "/" + GENERIC_NAMESPACE_TEMPLATE.format("Title"),
+        ]
+
+        def run_uncompiled():
+            for layer in layers:
+                for expression in per_layer_expressions:
+                    layer.xpath(expression, namespaces=namespaces)
+            for expression in per_document_expressions:
+                xml_obj.xpath(expression, namespaces=namespaces)
+
+        def run_compiled():
+            for layer in layers:
+                for expression in per_layer_expressions:
+                    xml_helper.try_get_element_from_xml(expression, layer)
+            for expression in per_document_expressions:
+                xml_helper.try_get_element_from_xml(expression, xml_obj)
+
+        # Make sure both ways find the same elements
+        for expression in per_document_expressions:
+            if xml_obj.xpath(expression, namespaces=namespaces) != xml_helper.try_get_element_from_xml(expression, xml_obj):
+                self.stdout.write(self.style.ERROR("Different results for {}".format(expression)))
+                return
+
+        uncompiled = min(timeit.repeat(run_uncompiled, number=1, repeat=options["repeat"]))
+        compiled = min(timeit.repeat(run_compiled, number=1, repeat=options["repeat"]))
+
+        self.stdout.write(self.style.NOTICE(
+            "{} layers, {} expressions per layer, {} per document".format(
+                len(layers), len(per_layer_expressions), len(per_document_expressions)
+            )
+        ))
+        self.stdout.write(self.style.NOTICE("    -- Runtime built expressions: {:.4f}s".format(uncompiled)))
+        self.stdout.write(self.style.NOTICE("    -- Compiled expressions: {:.4f}s".format(compiled)))
+        self.stdout.write(self.style.SUCCESS("Speedup: {:.1f}x".format(uncompiled / compiled)))
@@ -10,6 +10,7 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 
 import os
 import sys
+from types import MappingProxyType
 from django.utils.translation import gettext_lazy as _
 from django.contrib import messages
 import logging
@@ -257,6 +258,16 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERYBEAT_SCHEDULE = {
+    'flush_hits': {
+        'task': 'async_flush_hits',
+        'schedule': 60.0,  # seconds
+    },
+    'remove_deleted_services': {
+        'task': 'async_remove_deleted_services',
+        'schedule': 60.0 * 60,  # seconds
+    },
+}
 RESPONSE_CACHE_TIME = 60 * 30  # 30 minutes
 CELERY_DEFAULT_COUNTDOWN = 5  # custom setting
 
@@ -366,8 +377,9 @@ INTERNAL_IPS = [
     "127.0.0.1"
 ]
 
-# Defines xml namespaces used for xml parsing and creating
-XML_NAMESPACES = {
+# Defines xml namespaces used for xml parsing and creating. The maps are immutable, since compiled xpath expressions
+# are cached per map (see xml_helper.compile_xpath). Use a version specific map instead of changing a prefix.
+XML_NAMESPACES = MappingProxyType({
     "ogc": "http://www.opengis.net/ogc",
     "ows": "http://www.opengis.net/ows",
     "wfs": "http://www.opengis.net/wfs",
@@ -390,7 +402,21 @@ XML_NAMESPACES = {
     "xsd": "http://www.w3.org/2001/XMLSchema",
     "sld": "http://www.opengis.net/sld",
     "fes": "http://www.opengis.net/fes/2.0",
-}
+})
+# WFS 2.0.x uses newer versions of the wfs and ows namespaces
+XML_NAMESPACES_WFS_2_0 = MappingProxyType(dict(
+    XML_NAMESPACES,
+    wfs="http://www.opengis.net/wfs/2.0",
+    ows="http://www.opengis.net/ows/1.1",
+    fes="http://www.opengis.net/fes/2.0",
+))
+# The epsg-registry.org returns gml 3.2 documents
+XML_NAMESPACES_GML_3_2 = MappingProxyType(dict(
+    XML_NAMESPACES,
+    gml="http://www.opengis.net/gml/3.2",
+))
+# Maximum number of compiled xpath expressions, which are held per namespace map
+XPATH_CACHE_SIZE = 2048
 
 # Defines a generic template for xml element fetching without caring about the correct namespace
 GENERIC_NAMESPACE_TEMPLATE = "*[local-name()='{}']"
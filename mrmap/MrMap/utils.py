@@ -5,6 +5,7 @@ Contact: michel.peltriaux@vermkv.rlp.de
 Created on: 17.04.19
 
 """
+import re
 import urllib
 from django.utils.html import format_html
 from typing import Iterable, Any, Tuple
@@ -23,6 +24,18 @@ def execute_threads(thread_list):
         thread.join()
 
 
+def get_max_area_geometry(geometries: Iterable, default=None):
+    """ Returns the geometry with the largest area
+
+    Args:
+        geometries (Iterable): The geometries
+        default: The value, which is returned if no geometries are given
+    Returns:
+         The geometry with the largest area
+    """
+    return max(geometries, key=lambda geometry: geometry.area, default=default)
+
+
 def resolve_none_string(val: str):
     """ To avoid 'none' or 'NONE' as strings, we need to resolve this to the NoneType
 
@@ -139,6 +152,17 @@ def get_dict_value_insensitive(d: dict, k: str):
     return {key.lower(): val for key, val in d.items()}.get(k.lower(), None)
 
 
+def accepts_gzip(request):
+    """ Returns whether the client of a request accepts gzip encoded responses
+
+    Args:
+        request (HttpRequest): The incoming request
+    Returns:
+        True|False
+    """
+    return re.search(r"\bgzip\b", request.headers.get("Accept-Encoding", "")) is not None
+
+
 def signal_last(it: Iterable[Any]) -> Iterable[Tuple[bool, Any]]:
     iterable = iter(it)
     ret_var = next(iterable)
@@ -23,6 +23,7 @@ REST_FRAMEWORK = {
 
 API_CACHE_KEY_PREFIX = "REST_API_CACHE"
 API_CACHE_TIME = 60 * 60  # 60 minutes
+API_COUNT_CACHE_TIME = 60 * 5  # 5 minutes, how long the total number of results is kept for paginated responses
 API_ALLOWED_HTTP_METHODS = [
     "get",
     "post",
@@ -49,6 +50,12 @@ ORGANIZATION_DEFAULT_ORDER = "organization_name"
 
 SUGGESTIONS_MAX_RESULTS = 10
 
+# Cursor (keyset) pagination is used instead of page number pagination if the request contains the cursor parameter
+# or 'paging=cursor'. Deep pages are as fast as the first one, since no OFFSET query is needed.
+API_CURSOR_QUERY_PARAM = "cursor"
+API_PAGING_QUERY_PARAM = "paging"
+API_PAGING_CURSOR = "cursor"
+
 # Defines a filter to exclude some MetadataRelations, which shall not appear in the API
 API_EXCLUDE_METADATA_RELATIONS = {
     "relation_type__in": [
@@ -7,12 +7,12 @@ Created on: 10.09.19
 """
 from dateutil.parser import parse
 from django.contrib.gis.geos import GEOSGeometry, Polygon
-from django.db.models import Q
+from django.db.models import Q, Exists, OuterRef
 
 from MrMap.messages import PARAMETER_ERROR
 from api.settings import API_QUERY_ON_TITLE, API_QUERY_ON_KEYWORDS, API_QUERY_ON_ABSTRACT
-from service.models import Keyword
-from service.settings import DEFAULT_SRS
+from service.models import Keyword, Metadata, Dimension
+from service.settings import DEFAULT_SRS, DIMENSION_TYPE_TIME, DIMENSION_TYPE_ELEVATION
 
 
 def filter_queryset_service_pid(queryset, pid):
@@ -184,6 +184,28 @@ def filter_queryset_metadata_category(queryset, category, category_strict):
     return queryset
 
 
+def _filter_queryset_metadata_dimension(queryset, dimension_filter: Q):
+    """ Filters a given REST framework queryset by related dimensions.
+
+    All conditions are evaluated on the same dimension record using one EXISTS subquery, which can be resolved using
+    the typed and indexed min/max extents of the Dimension table. Multiple matching dimensions do not lead to
+    duplicated results.
+
+    Args:
+        queryset: A queryset containing elements
+        dimension_filter (Q): The filter which is applied on the related Dimension records
+    Returns:
+        queryset: The given queryset which only contains matching elements
+    """
+    dimension_relations = Metadata.dimensions.through.objects.filter(
+        metadata_id=OuterRef("pk"),
+        dimension__in=Dimension.objects.filter(dimension_filter),
+    )
+    return queryset.filter(
+        Exists(dimension_relations)
+    )
+
+
 def filter_queryset_metadata_dimension_time(queryset, time_min: str, time_max: str):
     """ Filters a given REST framework queryset by a time_min and time_max boundary.
 
@@ -196,17 +218,19 @@ def filter_queryset_metadata_dimension_time(queryset, time_min: str, time_max: s
     Returns:
         queryset: The given queryset which only contains matching elements
     """
+    dimension_filter = Q()
     if time_min is not None and len(time_min) > 0:
         time_min = parse(timestr=time_min)
-        queryset = queryset.filter(
-            dimensions__time_extent_min__gte=time_min
-        )
+        dimension_filter &= Q(time_extent_min__gte=time_min)
     if time_max is not None and len(time_max) > 0:
         time_max = parse(timestr=time_max)
-        queryset = queryset.filter(
-            dimensions__time_extent_max__lte=time_max
-        )
+        dimension_filter &= Q(time_extent_max__lte=time_max)
 
+    if dimension_filter:
+        queryset = _filter_queryset_metadata_dimension(
+            queryset,
+            Q(type=DIMENSION_TYPE_TIME) & dimension_filter
+        )
     return queryset
 
 
@@ -223,25 +247,28 @@ def filter_queryset_metadata_dimension_elevation(queryset, elev_min: str, elev_m
     Returns:
         queryset: The given queryset which only contains matching elements
     """
-    if not elevation_unit:
-        elevation_unit = ""
+    dimension_filter = Q()
     if elev_min is not None and len(elev_min) > 0:
-        queryset = queryset.filter(
-            dimensions__units__icontains=elevation_unit,
-            dimensions__elev_extent_min__lte=elev_min,
-        )
+        dimension_filter &= Q(elev_extent_min__lte=elev_min)
     if elev_max is not None and len(elev_max) > 0:
-        queryset = queryset.filter(
-            dimensions__units__icontains=elevation_unit,
-            dimensions__elev_extent_max__gte=elev_max,
+        dimension_filter &= Q(elev_extent_max__gte=elev_max)
+
+    if dimension_filter:
+        if elevation_unit:
+            dimension_filter &= Q(units__icontains=elevation_unit)
+        queryset = _filter_queryset_metadata_dimension(
+            queryset,
+            Q(type=DIMENSION_TYPE_ELEVATION) & dimension_filter
         )
-
     return queryset
 
 
 def filter_queryset_metadata_bbox(queryset, bbox: str, bbox_srs: str, bbox_strict: bool):
     """ Filters a given REST framework queryset by a given bbox.
 
+    The bounding geometries are persisted in DEFAULT_SRS, which is indexed (GiST). Therefore the bbox is only
+    transformed if it is given in another reference system.
+
     Args:
         queryset: A queryset containing elements
         bbox: A bbox string (four coordinates)
@@ -261,7 +288,8 @@ def filter_queryset_metadata_bbox(queryset, bbox: str, bbox_srs: str, bbox_stric
             bbox = bbox.split(",")
 
         bbox = GEOSGeometry(Polygon.from_bbox(bbox), srid=srs)
-        bbox.transform(DEFAULT_SRS)
+        if srs != DEFAULT_SRS:
+            bbox.transform(DEFAULT_SRS)
 
         if bbox_strict:
             filter_identifier = "bounding_geometry__contained"
@@ -5,21 +5,24 @@ from django.utils import timezone
 from collections import OrderedDict
 
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import Paginator
 from django.db.models import Count
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render, redirect
 from django.urls import reverse
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
+from django.utils.functional import cached_property
 from django_celery_results.models import TaskResult
 from rest_framework import viewsets
 from rest_framework.authtoken.models import Token
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import PageNumberPagination, CursorPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from MrMap import utils
+from MrMap.cacher import CountCacher, PageCacher
+from MrMap.decorators import namespaced_cache_page
 from MrMap.settings import HOST_NAME, HTTP_OR_SSL
 from MrMap.messages import SERVICE_NOT_FOUND, PARAMETER_ERROR, \
     RESOURCE_NOT_FOUND, SERVICE_REMOVED
@@ -34,7 +37,8 @@ from api.serializers import ServiceSerializer, LayerSerializer, OrganizationSeri
     MonitoringSerializer, MonitoringSummarySerializer, serialize_catalogue_metadata, TaskSerializer
 from api.settings import API_CACHE_TIME, API_ALLOWED_HTTP_METHODS, CATALOGUE_DEFAULT_ORDER, SERVICE_DEFAULT_ORDER, \
     LAYER_DEFAULT_ORDER, ORGANIZATION_DEFAULT_ORDER, METADATA_DEFAULT_ORDER, GROUP_DEFAULT_ORDER, \
-    SUGGESTIONS_MAX_RESULTS, API_CACHE_KEY_PREFIX
+    SUGGESTIONS_MAX_RESULTS, API_CACHE_KEY_PREFIX, API_COUNT_CACHE_TIME, API_CURSOR_QUERY_PARAM, \
+    API_PAGING_QUERY_PARAM, API_PAGING_CURSOR
 from service.models import Service, Layer, Metadata, Keyword, Category
 from service.settings import DEFAULT_SRS_STRING
 from structure.models import Organization, MrMapGroup
@@ -121,6 +125,18 @@ def generate_token(request: HttpRequest):
     return redirect("api:menu")
 
 
+class CachedCountPaginator(Paginator):
+    """ Paginator which does not run a full COUNT on every requested page
+
+    The number of results is cached for API_COUNT_CACHE_TIME, using the sql query as key.
+
+    """
+    @cached_property
+    def count(self):
+        return CountCacher(ttl=API_COUNT_CACHE_TIME,
+                           key_prefix=PageCacher().get_namespace_prefix(API_CACHE_KEY_PREFIX)).get_count(self.object_list)
+
+
 class APIPagination(PageNumberPagination):
     """ Pagination class for this API
 
@@ -131,9 +147,72 @@ class APIPagination(PageNumberPagination):
 
     """
     page_size_query_param = "rpp"
+    django_paginator_class = CachedCountPaginator
+
 
+class APICursorPagination(CursorPagination):
+    """ Keyset pagination class for this API
 
-class ServiceViewSet(viewsets.GenericViewSet):
+    Instead of an OFFSET query, the position of the last returned element is encoded into an opaque cursor. Therefore
+    deep pages can be fetched as fast as the first one. The following GET parameters can be used:
+
+        cursor (str): The opaque cursor, as returned in 'next' or 'previous'
+        rpp (int): Number of results per page
+
+    The ordering is taken from the (already ordered) queryset of the viewset, so the 'order' parameter still works.
+    The 'id' is always added as last ordering, which makes the ordering stable for duplicated values.
+
+    """
+    page_size_query_param = "rpp"
+    cursor_query_param = API_CURSOR_QUERY_PARAM
+    ordering = "id"
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(queryset.query.order_by)
+        if not ordering:
+            return (self.ordering, )
+        if "id" not in ordering and "-id" not in ordering:
+            ordering.append("-id" if ordering[0].startswith("-") else "id")
+        return tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = CountCacher(ttl=API_COUNT_CACHE_TIME,
+                                 key_prefix=PageCacher().get_namespace_prefix(API_CACHE_KEY_PREFIX)).get_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class APIPaginationMixin:
+    """ Switches to the APICursorPagination if the request asks for it
+
+    Cursor pagination will be used if the request contains a cursor or if 'paging=cursor' is given.
+
+    """
+    cursor_pagination_class = APICursorPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            query_params = getattr(self.request, "query_params", {})
+            use_cursor = API_CURSOR_QUERY_PARAM in query_params \
+                or query_params.get(API_PAGING_QUERY_PARAM, None) == API_PAGING_CURSOR
+            if self.pagination_class is None:
+                self._paginator = None
+            elif use_cursor:
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+
+class ServiceViewSet(APIPaginationMixin, viewsets.GenericViewSet):
     """ Overview of all services matching the given parameters
 
         Query parameters:
@@ -143,6 +222,7 @@ class ServiceViewSet(viewsets.GenericViewSet):
             orgid:  optional, search for layers which are published by this organization (id)
             order:  optional, orders by an attribute (e.g. id, uuid, ..., default is id)
             rpp:    optional, Number of results per page
+            paging: optional, 'cursor' switches to cursor pagination, which is fast for deep pages as well
 
     """
     serializer_class = ServiceSerializer
@@ -208,7 +288,7 @@ class ServiceViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def list(self, request):
         tmp = self.paginate_queryset(self.get_queryset())
         serializer = ServiceSerializer(tmp, many=True)
@@ -242,7 +322,7 @@ class ServiceViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def retrieve(self, request, pk=None):
         try:
             tmp = Layer.objects.get(metadata__id=pk)
@@ -324,7 +404,7 @@ class ServiceViewSet(viewsets.GenericViewSet):
         return Response(data=response.data)
 
 
-class LayerViewSet(viewsets.GenericViewSet):
+class LayerViewSet(APIPaginationMixin, viewsets.GenericViewSet):
     """ Overview of all layers matching the given parameters
 
         Query parameters:
@@ -333,6 +413,7 @@ class LayerViewSet(viewsets.GenericViewSet):
             orgid:  optional, search for layers which are published by this organization (id)
             order:  optional, orders by an attribute (e.g. id, identifier, ..., default is id)
             rpp:    optional, Number of results per page
+            paging: optional, 'cursor' switches to cursor pagination, which is fast for deep pages as well
     """
 
     serializer_class = LayerSerializer
@@ -381,7 +462,7 @@ class LayerViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def list(self, request):
         tmp = self.paginate_queryset(self.get_queryset())
         serializer = LayerSerializer(tmp, many=True)
@@ -392,7 +473,7 @@ class LayerViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def retrieve(self, request, pk=None):
         try:
             tmp = Layer.objects.get(metadata__id=pk)
@@ -414,7 +495,7 @@ class LayerViewSet(viewsets.GenericViewSet):
         # Not supported
         pass
 
-class OrganizationViewSet(viewsets.ModelViewSet):
+class OrganizationViewSet(APIPaginationMixin, viewsets.ModelViewSet):
     """ Overview of all organizations matching the given parameters
 
         Query parameters:
@@ -422,6 +503,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
             ag:     optional, filter for auto_generated organizations vs. real organizations
             order:  optional, orders by an attribute (e.g. id, email, default is organization_name)
             rpp:    optional, Number of results per page
+            paging: optional, 'cursor' switches to cursor pagination, which is fast for deep pages as well
     """
     serializer_class = OrganizationSerializer
     http_method_names = API_ALLOWED_HTTP_METHODS
@@ -455,7 +537,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         return self.queryset
 
 
-class MetadataViewSet(viewsets.GenericViewSet):
+class MetadataViewSet(APIPaginationMixin, viewsets.GenericViewSet):
     """ Overview of all metadata matching the given parameters
 
         Query parameters:
@@ -464,6 +546,7 @@ class MetadataViewSet(viewsets.GenericViewSet):
             uuid:   optional, filters for the given uuid and returns only the matching element
             order:  optional, orders by an attribute (e.g. title, abstract, ..., default is hits)
             rpp:    optional, Number of results per page
+            paging: optional, 'cursor' switches to cursor pagination, which is fast for deep pages as well
     """
     serializer_class = MetadataSerializer
     http_method_names = API_ALLOWED_HTTP_METHODS
@@ -503,7 +586,7 @@ class MetadataViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def list(self, request):
         tmp = self.paginate_queryset(self.get_queryset())
         serializer = MetadataSerializer(tmp, many=True)
@@ -514,7 +597,7 @@ class MetadataViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def retrieve(self, request, pk=None):
         try:
             tmp = Metadata.objects.get(id=pk)
@@ -537,7 +620,7 @@ class MetadataViewSet(viewsets.GenericViewSet):
         pass
 
 
-class GroupViewSet(viewsets.GenericViewSet):
+class GroupViewSet(APIPaginationMixin, viewsets.GenericViewSet):
     """ Overview of all groups matching the given parameters
 
         Query parameters:
@@ -545,6 +628,7 @@ class GroupViewSet(viewsets.GenericViewSet):
             orgid:  optional, filter for organizations
             order:  optional, orders by an attribute (e.g. id, organization, default is name)
             rpp:    optional, Number of results per page
+            paging: optional, 'cursor' switches to cursor pagination, which is fast for deep pages as well
     """
     serializer_class = GroupSerializer
     http_method_names = API_ALLOWED_HTTP_METHODS
@@ -578,7 +662,7 @@ class GroupViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def list(self, request):
         tmp = self.paginate_queryset(self.get_queryset())
         serializer = GroupSerializer(tmp, many=True)
@@ -589,7 +673,7 @@ class GroupViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def retrieve(self, request, pk=None):
         try:
             tmp = MrMapGroup.objects.get(id=pk)
@@ -610,7 +694,7 @@ class GroupViewSet(viewsets.GenericViewSet):
         pass
 
 
-class CatalogueViewSet(viewsets.GenericViewSet):
+class CatalogueViewSet(APIPaginationMixin, viewsets.GenericViewSet):
     """ Combines the serializers for a 'usual' catalogue api which provides most of the important information
 
         Query parameters:
@@ -634,6 +718,10 @@ class CatalogueViewSet(viewsets.GenericViewSet):
                                     * e.g. 'title', 'identifier', ..., default is 'hits'
             rpp:                optional, number of results per page
                                     * Type: int
+            paging:             optional, specifies the pagination style
+                                    * Type: str
+                                    * 'cursor' returns opaque cursors in 'next' and 'previous' instead of page numbers
+                                    * recommended for harvesting, since deep pages are as fast as the first one
 
             -----   SPATIAL    -----
             bbox:               optional, specifies four coordinates which create a bounding box
@@ -777,7 +865,7 @@ class CatalogueViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def list(self, request):
         qs = self.get_queryset()
         qs = self.filter_queryset(qs)
@@ -788,7 +876,7 @@ class CatalogueViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def retrieve(self, request, pk=None):
         try:
             tmp = Metadata.objects.get(id=pk)
@@ -885,7 +973,7 @@ class SuggestionViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def list(self, request):
         tmp = self.paginate_queryset(self.get_queryset())
         data = {
@@ -934,7 +1022,7 @@ class CategoryViewSet(viewsets.GenericViewSet):
 
     # https://docs.djangoproject.com/en/dev/topics/cache/#the-per-view-cache
     # Cache requested url for time t
-    @method_decorator(cache_page(API_CACHE_TIME, key_prefix=API_CACHE_KEY_PREFIX))
+    @method_decorator(namespaced_cache_page(API_CACHE_TIME, API_CACHE_KEY_PREFIX))
     def list(self, request):
         tmp = self.paginate_queryset(self.get_queryset())
         serializer = CategorySerializer(tmp, many=True)
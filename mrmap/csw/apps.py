@@ -10,3 +10,6 @@ from django.apps import AppConfig
 
 class CswConfig(AppConfig):
     name = 'csw'
+
+    def ready(self):  # method just to import the signals
+        import csw.signals  # noqa
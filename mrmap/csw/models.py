@@ -9,7 +9,7 @@ import uuid
 
 from django.conf import settings
 from django.db import models, transaction
-from service.models import Metadata
+from service.models import Metadata, MetadataStatus
 
 
 class HarvestResult(models.Model):
@@ -28,3 +28,4 @@ class HarvestResult(models.Model):
             from csw.tasks import async_harvest
             transaction.on_commit(lambda: async_harvest.apply_async(args=(self.pk, ), countdown=settings.CELERY_DEFAULT_COUNTDOWN))
         super().save(*args, **kwargs)
+        MetadataStatus.set_harvest_result(self)
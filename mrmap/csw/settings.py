@@ -47,6 +47,8 @@ HARVEST_GET_REQUEST_OUTPUT_SCHEMA = "http://www.isotc211.org/2005/gmd"
 
 CSW_CACHE_TIME = 60 * 60  # 60 minutes (min * sec)
 CSW_CACHE_PREFIX = "csw"
+CSW_COUNT_CACHE_TIME = 60 * 5  # 5 minutes, how long numberOfRecordsMatched is kept for paging through a result set
+CSW_RECORD_CACHE_TIME = 60 * 60 * 24  # 1 day, how long serialized records are kept, if their metadata does not change
 
 csw_url = "{}/csw".format(ROOT_URL)
 CSW_CAPABILITIES_CONF = {
@@ -0,0 +1,84 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from csw.utils.converter import remove_record_fragments
+from service.helper.enums import DocumentEnum, MetadataEnum
+from service.models import Metadata, Document, Layer, Service, FeatureType
+
+
+def get_ancestor_metadata_ids(md: Metadata):
+    """ Returns the ids of the metadata records, whose csw records depend on the given metadata
+
+    The records of services and layers contain the largest bounding box of their children, so they change with the
+    metadata of their child layers and feature types.
+
+    Args:
+        md (Metadata): The metadata
+    Returns:
+         ids (list): The ids of the parent layer, service and root service metadata
+    """
+    if md.metadata_type == MetadataEnum.LAYER.value:
+        layer = Layer.objects.filter(metadata_id=md.id).first()
+        if layer is None:
+            return []
+        return [
+            *layer.get_ancestors().values_list("metadata_id", flat=True),
+            *Service.objects.filter(id=layer.parent_service_id).values_list("metadata_id", flat=True),
+        ]
+    elif md.metadata_type == MetadataEnum.FEATURETYPE.value:
+        return list(FeatureType.objects.filter(metadata_id=md.id).values_list("parent_service__metadata_id", flat=True))
+    return []
+
+
+@receiver(pre_delete, sender=Metadata)
+def collect_ancestor_metadata_ids(sender, instance, **kwargs):
+    """ Collects the ancestors of a deleted metadata, as long as its layer or feature type still exists
+
+    """
+    instance._record_ancestor_ids = get_ancestor_metadata_ids(instance)
+
+
+@receiver(post_save, sender=Metadata)
+@receiver(post_delete, sender=Metadata)
+def remove_metadata_record_fragments(sender, instance, **kwargs):
+    """ Removes the serialized csw records of a changed or deleted metadata and of its ancestors
+
+    """
+    if "created" in kwargs:
+        ancestor_ids = get_ancestor_metadata_ids(instance)
+    else:
+        ancestor_ids = getattr(instance, "_record_ancestor_ids", [])
+    remove_record_fragments([instance.id, *ancestor_ids])
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def remove_document_record_fragments(sender, instance, **kwargs):
+    """ Removes the serialized csw records of a metadata, whose metadata document changed
+
+    The ISO records are created from the metadata document.
+
+    """
+    if instance.document_type == DocumentEnum.METADATA.value and instance.metadata_id is not None:
+        remove_record_fragments([instance.metadata_id])
+
+
+@receiver(m2m_changed, sender=Metadata.keywords.through)
+@receiver(m2m_changed, sender=Metadata.formats.through)
+def remove_relation_record_fragments(sender, instance, action, reverse, pk_set, **kwargs):
+    """ Removes the serialized csw records of metadata, whose keywords or formats changed
+
+    """
+    if action not in ["post_add", "post_remove", "post_clear"]:
+        return
+    if not reverse:
+        remove_record_fragments([instance.id])
+    elif pk_set:
+        remove_record_fragments(list(pk_set))
@@ -0,0 +1,114 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from dateutil.parser import parse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import QuerySet, Q
+
+from service.models import Metadata
+
+CURSOR_LOCATOR = "cursor"
+INVALID_CURSOR_MSG = "The given cursor is invalid or does not belong to the given constraint and sortBy parameters."
+
+
+class ContinuationTokenEncoder(DjangoJSONEncoder):
+    """ Encodes datetimes with their full precision
+
+    DjangoJSONEncoder cuts datetimes to milliseconds. The filter of the next page would then return or skip records,
+    which differ from the last returned record only in their microseconds.
+
+    """
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class ContinuationToken:
+    """ Opaque token, which marks the last returned record of a GetRecords response
+
+    Instead of skipping startPosition-1 records using an OFFSET query, the next page can be fetched directly by filtering
+    for records behind the last returned one (keyset pagination). The costs of a deep page are therefore the same as
+    for the first page.
+
+    The token is bound to the constraint and sortBy parameters of the request it was created for.
+
+    """
+    def __init__(self, query_hash: str, position: int, last_value, last_id: str):
+        self.query_hash = query_hash
+        self.position = position
+        self.last_value = last_value
+        self.last_id = last_id
+
+    def encode(self):
+        """ Encodes the token into an url safe string
+
+        Returns:
+             token (str): The encoded token
+        """
+        content = json.dumps(
+            [self.query_hash, self.position, self.last_value, self.last_id],
+            cls=ContinuationTokenEncoder
+        )
+        return base64.urlsafe_b64encode(content.encode("UTF-8")).decode("UTF-8")
+
+    @classmethod
+    def decode(cls, token: str, query_hash: str):
+        """ Decodes an encoded token
+
+        Args:
+            token (str): The encoded token
+            query_hash (str): The hash of the current request, which has to match the hash of the token
+        Returns:
+             token (ContinuationToken): The decoded token
+        """
+        try:
+            content = base64.urlsafe_b64decode(token.encode("UTF-8"))
+            _hash, position, last_value, last_id = json.loads(content)
+            position = int(position)
+        except (binascii.Error, ValueError, TypeError, AttributeError):
+            raise ValueError(INVALID_CURSOR_MSG, CURSOR_LOCATOR)
+        if _hash != query_hash:
+            raise ValueError(INVALID_CURSOR_MSG, CURSOR_LOCATOR)
+        return cls(_hash, position, last_value, last_id)
+
+    def filter_queryset(self, queryset: QuerySet, attrib: str, desc: bool):
+        """ Returns all records behind the record, which is referenced by this token
+
+        The queryset has to be ordered by (attrib, id), both descending if desc is True. PostgreSQL sorts NULL values
+        as if they were larger than any other value, which is respected here.
+
+        Args:
+            queryset (QuerySet): The ordered queryset
+            attrib (str): The ordering attribute
+            desc (bool): Whether the ordering is descending
+        Returns:
+             queryset (QuerySet): The filtered queryset
+        """
+        last_value = self.last_value
+        if last_value is not None and Metadata._meta.get_field(attrib).get_internal_type() == "DateTimeField":
+            last_value = parse(timestr=last_value)
+
+        if desc:
+            # NULL values come first
+            if last_value is None:
+                _filter = Q(**{attrib + "__isnull": True, "id__lt": self.last_id}) | Q(**{attrib + "__isnull": False})
+            else:
+                _filter = Q(**{attrib + "__lt": last_value}) | Q(**{attrib: last_value, "id__lt": self.last_id})
+        else:
+            # NULL values come last
+            if last_value is None:
+                _filter = Q(**{attrib + "__isnull": True, "id__gt": self.last_id})
+            else:
+                _filter = Q(**{attrib + "__gt": last_value}) | Q(**{attrib: last_value, "id__gt": self.last_id}) \
+                          | Q(**{attrib + "__isnull": True})
+        return queryset.filter(_filter)
@@ -7,12 +7,14 @@ Created on: 20.05.20
 """
 from abc import abstractmethod
 from collections import OrderedDict
-from lxml.etree import Element, QName
+from lxml.etree import Element, QName, Comment, tostring
 from django.utils import timezone
 from django.db.models import QuerySet
 
+from MrMap.cacher import RecordFragmentCacher
 from MrMap.settings import XML_NAMESPACES, GENERIC_NAMESPACE_TEMPLATE
-from csw.utils.parameter import ParameterResolver
+from csw.settings import CSW_RECORD_CACHE_TIME
+from csw.utils.parameter import ParameterResolver, ELEMENT_SET_CHOICES
 from service.helper import xml_helper
 from service.helper.enums import MetadataEnum, DocumentEnum
 from service.models import Metadata, Document
@@ -23,6 +25,31 @@ TITLE_TEMPLATE = "{}title"
 TYPE_TEMPLATE = "{}type"
 DATE_STRF = "%Y-%m-%d"
 
+RECORD_FRAGMENT_KEY_TEMPLATE = "{}_{}_{}"
+RECORDS_PLACEHOLDER = "records"
+ISO_RECORD_SCHEMA = "iso"
+DC_RECORD_SCHEMA = "dc"
+
+
+def remove_record_fragments(metadata_ids: list):
+    """ Removes the serialized records of the given metadata from the cache
+
+    Has to be called whenever the information of a metadata record changes, so the records are serialized again on the
+    next request.
+
+    Args:
+        metadata_ids (list): The metadata ids
+    Returns:
+
+    """
+    keys = [
+        RECORD_FRAGMENT_KEY_TEMPLATE.format(md_id, schema, element_set)
+        for md_id in metadata_ids
+        for schema in [ISO_RECORD_SCHEMA, DC_RECORD_SCHEMA]
+        for element_set in ELEMENT_SET_CHOICES
+    ]
+    RecordFragmentCacher().remove_many(keys)
+
 
 class MetadataConverter:
     """ Creates xml representations from given metadata
@@ -31,10 +58,12 @@ class MetadataConverter:
 
     """
 
-    def __init__(self, param: ParameterResolver, all_md: QuerySet, returned_md: list):
+    def __init__(self, param: ParameterResolver, all_md: QuerySet, returned_md: list, number_of_records: int = None, next_cursor: str = None):
         self.param = param
         self.all_md = all_md
         self.returned_md = returned_md
+        self.number_of_records = number_of_records
+        self.next_cursor = next_cursor
 
         self.ns_map = {
             "csw": "http://www.opengis.net/cat/csw/2.0.2",
@@ -54,7 +83,7 @@ class MetadataConverter:
         Args:
             with_content (bool): Whether only the outer xml should be returned or the results as well
         Returns:
-             response (str): The response
+             response (bytes|generator|str): The response
         """
         request = self.param.request
         if request == "GetRecords" or request == "GetRecordById":
@@ -65,10 +94,13 @@ class MetadataConverter:
     def _create_get_records_response(self, with_content: bool):
         """ Creates a GetRecords response
 
+        The records are not part of the xml tree. Their serialized fragments are put between the serialized opening and
+        closing parts of the response instead.
+
         Args:
             with_content (bool): Wether to return content or only the outer xml
         Returns:
-             response (str): The response
+             response (bytes|generator): The response, streamed in UTF-8 encoded chunks if records are returned
         """
         # Create root element
         root = self._create_root_elem("GetRecordsResponse")
@@ -83,7 +115,7 @@ class MetadataConverter:
 
         # If the content is not requested, we can directly return the xml document in this state
         if not with_content:
-            return root
+            return tostring(root, encoding="UTF-8", xml_declaration=True)
 
         # Create metadata converter object
         if self.param.type_names == "gmd:MD_Metadata" and self.param.output_schema == GMD_SCHEMA:
@@ -93,11 +125,30 @@ class MetadataConverter:
             # Fallback
             md_converter = DublinCoreMetadataConverter(self.param, self.all_md, self.returned_md)
 
-        for md in self.returned_md:
-            returned_metadata_element = md_converter.create_metadata_elem(md)
-            xml_helper.add_subelement(search_result_element, returned_metadata_element)
+        fragments = md_converter.get_metadata_fragments(self.returned_md)
 
-        return root
+        # Split the response at the position where the records belong to
+        search_result_element.append(Comment(RECORDS_PLACEHOLDER))
+        head, tail = tostring(root, encoding="UTF-8", xml_declaration=True).split(
+            "<!--{}-->".format(RECORDS_PLACEHOLDER).encode("UTF-8")
+        )
+        return self._stream_response(head, fragments, tail)
+
+    @staticmethod
+    def _stream_response(head: bytes, fragments: list, tail: bytes):
+        """ Yields the parts of a response one after another
+
+        Args:
+            head (bytes): The opening part of the response
+            fragments (list): The serialized records
+            tail (bytes): The closing part of the response
+        Returns:
+             chunks (generator): The response chunks
+        """
+        yield head
+        for fragment in fragments:
+            yield fragment
+        yield tail
 
     def _create_root_elem(self, operation_name: str):
         """ Creates the root element, e.g. <csw:GetRecordsResponse>
@@ -138,12 +189,15 @@ class MetadataConverter:
         Returns:
              search_status_elem (_Element): The lxml element
         """
-        number_of_records = all_md.count()
+        number_of_records = self.number_of_records if self.number_of_records is not None else all_md.count()
         number_of_records_returned = len(returned_md)
         next_record = self.param.start_position + number_of_records_returned
         next_record = next_record if next_record < number_of_records else 0
 
         attribs = OrderedDict()
+        if self.next_cursor is not None:
+            # The opaque continuation token can be passed as 'cursor' parameter to fetch the next records
+            attribs["resultSetId"] = self.next_cursor
         attribs["numberOfRecordsMatched"] = str(number_of_records)
         attribs["numberOfRecordsReturned"] = str(number_of_records_returned)
         attribs["elementSet"] = str(self.param.element_set_name or ",".join(self.param.element_name))
@@ -182,6 +236,47 @@ class MetadataConverter:
                 )
                 elem.text = val
 
+    def _get_element_set(self):
+        """ Returns the requested element set
+
+        Requests which use elementName instead of elementSetName are answered with full records.
+
+        Returns:
+             element_set (str): brief, summary or full
+        """
+        element_set_name = self.param.element_set_name
+        return element_set_name if element_set_name in ELEMENT_SET_CHOICES else "full"
+
+    def get_metadata_fragments(self, returned_md: list):
+        """ Returns the serialized records of the given metadata
+
+        A record is serialized only once per metadata, element set and output schema. Afterwards it is taken from the
+        cache, until the metadata changes.
+
+        Args:
+            returned_md (list): The metadata
+        Returns:
+             fragments (list): The records as UTF-8 encoded bytes
+        """
+        cacher = RecordFragmentCacher(ttl=CSW_RECORD_CACHE_TIME)
+        element_set = self._get_element_set()
+        keys = [
+            RECORD_FRAGMENT_KEY_TEMPLATE.format(md.id, self.record_schema, element_set) for md in returned_md
+        ]
+        fragments = cacher.get_many(keys)
+
+        new_fragments = {}
+        for key, md in zip(keys, returned_md):
+            if key in fragments:
+                continue
+            elem = self.create_metadata_elem(md)
+            fragment = tostring(elem, encoding="UTF-8", xml_declaration=False) if elem is not None else b""
+            fragments[key] = new_fragments[key] = fragment
+
+        if new_fragments:
+            cacher.set_many(new_fragments)
+        return [fragments[key] for key in keys]
+
     @abstractmethod
     def create_metadata_elem(self, returned_md: Metadata):
         pass
@@ -191,8 +286,10 @@ class Iso19115MetadataConverter(MetadataConverter):
     """ Creates a response based on the MD_Metadata from ISO19115
 
     """
-    def __init__(self, param: ParameterResolver, all_md: QuerySet, returned_md: list):
-        super().__init__(param, all_md, returned_md)
+    record_schema = ISO_RECORD_SCHEMA
+
+    def __init__(self, param: ParameterResolver, all_md: QuerySet, returned_md: list, number_of_records: int = None, next_cursor: str = None):
+        super().__init__(param, all_md, returned_md, number_of_records, next_cursor)
 
     def create_metadata_elem(self, returned_md: Metadata):
         """ Returns existing service/dataset metadata as xml elements
@@ -279,12 +376,14 @@ class Iso19115MetadataConverter(MetadataConverter):
 
 
 class DublinCoreMetadataConverter(MetadataConverter):
+    record_schema = DC_RECORD_SCHEMA
 
-    def __init__(self, param: ParameterResolver, all_md: QuerySet, returned_md: list):
-        super().__init__(param, all_md, returned_md)
+    def __init__(self, param: ParameterResolver, all_md: QuerySet, returned_md: list, number_of_records: int = None, next_cursor: str = None):
+        super().__init__(param, all_md, returned_md, number_of_records, next_cursor)
 
         # Dublin Core namespaces
         self.dc_ns_map = {
+            "csw": self.ns_map["csw"],
             "dc": "http://purl.org/dc/elements/1.1/",
             "dct": "http://purl.org/dc/terms/",
             "ows": XML_NAMESPACES["ows"],
@@ -426,7 +525,7 @@ class DublinCoreMetadataConverter(MetadataConverter):
         Returns:
              elem (_Element): The lxml element
         """
-        typename = self.param.element_set_name or self.param.element_name
+        typename = self._get_element_set()
         if typename == "brief":
             return self._create_dublin_core_brief_elem(returned_md)
         elif typename == "summary":
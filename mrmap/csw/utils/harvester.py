@@ -30,6 +30,7 @@ from csw.settings import csw_logger, CSW_ERROR_LOG_TEMPLATE, CSW_EXTENT_WARNING_
     CSW_CACHE_PREFIX, HARVEST_GET_REQUEST_OUTPUT_SCHEMA
 from service.helper import xml_helper
 from service.helper.enums import OGCOperationEnum, ResourceOriginEnum, MetadataRelationEnum
+from service.helper.unit_of_work import deferred_side_effects
 from service.models import Metadata, Dataset, Keyword, Category, MimeType, \
     GenericUrl
 from service.settings import DEFAULT_SRS, DEFAULT_SERVICE_BOUNDING_BOX_EMPTY
@@ -190,8 +191,8 @@ class Harvester:
             self.harvest_result.save()
 
             # Remove cached pages of API and CSW
-            page_cacher.remove_pages(API_CACHE_KEY_PREFIX)
-            page_cacher.remove_pages(CSW_CACHE_PREFIX)
+            page_cacher.invalidate_namespace(API_CACHE_KEY_PREFIX)
+            page_cacher.invalidate_namespace(CSW_CACHE_PREFIX)
             if self.start_position == 0 or self.start_position in processed_start_positions:
                 # We are done!
                 break
@@ -212,8 +213,8 @@ class Harvester:
         deleted_metadatas.delete()
 
         # Remove cached pages of API and CSW
-        page_cacher.remove_pages(API_CACHE_KEY_PREFIX)
-        page_cacher.remove_pages(CSW_CACHE_PREFIX)
+        page_cacher.invalidate_namespace(API_CACHE_KEY_PREFIX)
+        page_cacher.invalidate_namespace(CSW_CACHE_PREFIX)
 
     def _generate_request_POST_body(self, start_position: int, result_type: str = "results"):
         """ Creates a CSW POST body xml document for GetRecords
@@ -397,8 +398,9 @@ class Harvester:
             md_metadata_entries = self.resource_list[start_index:end_index]
         md_data = self._md_metadata_parse_to_dict(md_metadata_entries)
 
-        for md_data_entry in md_data:
-            self._persist_metadata(md_data_entry)
+        with deferred_side_effects():
+            for md_data_entry in md_data:
+                self._persist_metadata(md_data_entry)
 
         self._persist_metadata_parent_relation()
 
@@ -418,7 +420,7 @@ class Harvester:
             pass
 
         try:
-            md = Metadata.objects.get(
+            md = Metadata.objects.lookup_view().get(
                 identifier=_id,
             )
             if current_task:
@@ -539,7 +541,7 @@ class Harvester:
 
         for parent_id, children in self.parent_child_map.items():
             try:
-                parent_md = Metadata.objects.get(
+                parent_md = Metadata.objects.lookup_view().get(
                     identifier=parent_id
                 )
             except ObjectDoesNotExist:
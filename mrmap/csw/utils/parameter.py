@@ -57,6 +57,7 @@ class ParameterResolver:
         self.hop_count = None               # optional, multiplicity: 0|1
         self.response_handler = None        # optional, multiplicity: 0|1
         self.section = None                 # optional, multiplicity: 0|1, only for GetCapabilities
+        self.cursor = None                  # optional, multiplicity: 0|1, vendor specific continuation token
 
         # Fill default values, according to CSW specification
         self.output_schema = "http://www.opengis.net/cat/csw/2.0.2"
@@ -88,6 +89,7 @@ class ParameterResolver:
             "hopcount": "hop_count",
             "responsehandler": "response_handler",
             "section": "section",
+            "cursor": "cursor",
         }
         self._parse_parameters(param_dict)
 
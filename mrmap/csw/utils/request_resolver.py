@@ -10,9 +10,10 @@ from hashlib import md5
 
 from django.db.models import QuerySet
 
-from MrMap.cacher import DocumentCacher
+from MrMap.cacher import DocumentCacher, CountCacher, PageCacher
 from MrMap.settings import XML_NAMESPACES
-from csw.settings import CSW_CAPABILITIES_CONF
+from csw.settings import CSW_CAPABILITIES_CONF, CSW_CACHE_PREFIX, CSW_COUNT_CACHE_TIME
+from csw.utils.continuation import ContinuationToken
 from csw.utils.converter import MetadataConverter
 from csw.utils.csw_filter import *
 from csw.utils.parameter import ParameterResolver, VERSION_CHOICES
@@ -114,8 +115,22 @@ class RequestResolver:
         Returns:
              all_md (QuerySet): The sorted metadata queryset
         """
+        md_attrib, desc = self._get_sort_attribute()
+        # The id is always used as last ordering, so the order is stable for records with identical values
+        if desc:
+            return all_md.order_by("-" + md_attrib, "-id")
+        return all_md.order_by(md_attrib, "id")
+
+    def _get_sort_attribute(self):
+        """ Resolves the sortBy parameter into the metadata attribute and the ordering direction
+
+        If no sortBy parameter was given, the default ordering of the Metadata model is used.
+
+        Returns:
+             md_attrib (str), desc (bool): The attribute name and whether the ordering is descending
+        """
         if self.param.sort_by is None:
-            return all_md
+            return "created", True
         sort_by_components = self.param.sort_by.split(":")
         attrib = ":".join(sort_by_components[:-1])
         md_attrib = self.attribute_map.get(attrib, None)
@@ -125,9 +140,27 @@ class RequestResolver:
                 "sortBy"
             )
         desc = sort_by_components[-1] == "D"
-        if desc:
-            md_attrib = "-" + md_attrib
-        return all_md.order_by(md_attrib)
+        return md_attrib, desc
+
+    def _get_query_hash(self):
+        """ Creates a hash of all parameters which affect the resulting set of metadata and its order
+
+        Returns:
+             hash (str): The hash
+        """
+        query = json.dumps([self.param.constraint, self.param.constraint_language, self.param.sort_by])
+        return md5(query.encode("UTF-8")).hexdigest()
+
+    def _count_metadata(self, all_md: QuerySet):
+        """ Returns the (cached) number of matching records
+
+        Args:
+            all_md (QuerySet): The metadata queryset
+        Returns:
+             count (int): The number of records
+        """
+        return CountCacher(ttl=CSW_COUNT_CACHE_TIME,
+                           key_prefix=PageCacher().get_namespace_prefix(CSW_CACHE_PREFIX)).get_count(all_md)
 
 
 class GetRecordsResolver(RequestResolver):
@@ -138,24 +171,50 @@ class GetRecordsResolver(RequestResolver):
         """ Creates the xml response
 
         Returns:
-             xml_str (str): The response as string
+             response (bytes|generator): The response, streamed if records are returned
         """
         metadata = self.get_metadata(
             filtered=True,
             sorted=True
         )
-        i_from = self.param.start_position - 1
-        i_to = i_from + self.param.max_records
-        returned_metadata = metadata[i_from:i_to]
-        if i_from > metadata.count():
-            raise ValueError("Start position ({}) can't be greater than number of matching records ({})".format(self.param.start_position, metadata.count()), "startPosition")
+        number_of_records = self._count_metadata(metadata)
+        query_hash = self._get_query_hash()
+        md_attrib, desc = self._get_sort_attribute()
+
+        if self.param.cursor is not None:
+            # Keyset pagination: Fetch the records behind the last returned one, without an OFFSET query
+            token = ContinuationToken.decode(self.param.cursor, query_hash)
+            self.param.start_position = token.position
+            returned_metadata = token.filter_queryset(metadata, md_attrib, desc)[:self.param.max_records]
+        else:
+            i_from = self.param.start_position - 1
+            i_to = i_from + self.param.max_records
+            returned_metadata = metadata[i_from:i_to]
+            if i_from > number_of_records:
+                raise ValueError("Start position ({}) can't be greater than number of matching records ({})".format(self.param.start_position, number_of_records), "startPosition")
+        returned_metadata = list(returned_metadata)
+
+        # Create the continuation token for the next page, if there is one
+        next_cursor = None
+        next_position = self.param.start_position + len(returned_metadata)
+        if returned_metadata and next_position <= number_of_records:
+            last_md = returned_metadata[-1]
+            next_cursor = ContinuationToken(
+                query_hash=query_hash,
+                position=next_position,
+                last_value=getattr(last_md, md_attrib),
+                last_id=str(last_md.id),
+            ).encode()
 
         # Only return results content if this was requested
-        md_converter = MetadataConverter(self.param, metadata, returned_metadata)
-        response = md_converter.create_xml_response(with_content=self.param.result_type == "results")
-
-        xml_str = xml_helper.xml_to_string(response, pretty_print=True)
-        return xml_str
+        md_converter = MetadataConverter(
+            self.param,
+            metadata,
+            returned_metadata,
+            number_of_records=number_of_records,
+            next_cursor=next_cursor
+        )
+        return md_converter.create_xml_response(with_content=self.param.result_type == "results")
 
 
 class GetRecordsByIdResolver(RequestResolver):
@@ -166,7 +225,7 @@ class GetRecordsByIdResolver(RequestResolver):
         """ Creates the xml response
 
         Returns:
-             xml_str (str): The response as string
+             response (bytes|generator): The response, streamed if records are returned
         """
         metadata = self.get_metadata(
             filtered=True,
@@ -174,17 +233,15 @@ class GetRecordsByIdResolver(RequestResolver):
         ).filter(
             identifier__in=self.param.request_id.split(","),
         )
+        number_of_records = self._count_metadata(metadata)
         i_from = self.param.start_position - 1
         i_to = i_from + self.param.max_records
         returned_metadata = metadata[i_from:i_to]
-        if i_from > metadata.count():
-            raise ValueError("Start position ({}) can't be greater than number of matching records ({})".format(self.param.start_position, metadata.count()), "startPosition")
-
-        md_converter = MetadataConverter(self.param, metadata, returned_metadata)
-        response = md_converter.create_xml_response(with_content=True)
+        if i_from > number_of_records:
+            raise ValueError("Start position ({}) can't be greater than number of matching records ({})".format(self.param.start_position, number_of_records), "startPosition")
 
-        xml_str = xml_helper.xml_to_string(response, pretty_print=True)
-        return xml_str
+        md_converter = MetadataConverter(self.param, metadata, returned_metadata, number_of_records=number_of_records)
+        return md_converter.create_xml_response(with_content=True)
 
 
 class GetCapabilitiesResolver(RequestResolver):
@@ -9,13 +9,13 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
-from django.http import HttpRequest, HttpResponse
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
 from django.utils.translation import gettext_lazy as _
-from django.views.decorators.cache import cache_page
 from django.views.generic import CreateView
 
+from MrMap.decorators import namespaced_cache_page
 from MrMap.messages import HARVEST_RUN_SCHEDULED, NO_PERMISSION
 from MrMap.views import GenericViewContextMixin, InitFormMixin
 from csw.forms import HarvestRunForm
@@ -27,7 +27,7 @@ from service.helper.ogc.ows import OWSException
 from structure.permissionEnums import PermissionEnum
 
 
-@cache_page(CSW_CACHE_TIME, key_prefix=CSW_CACHE_PREFIX)
+@namespaced_cache_page(CSW_CACHE_TIME, CSW_CACHE_PREFIX)
 def get_csw_results(request: HttpRequest):
     """ Wraps incoming csw request
 
@@ -47,6 +47,9 @@ def get_csw_results(request: HttpRequest):
         content = ows_exception.get_exception_report()
         content_type = "application/xml"
 
+    if not isinstance(content, (str, bytes)):
+        # GetRecords responses are assembled from serialized records while being sent
+        return StreamingHttpResponse(content, content_type=content_type)
     return HttpResponse(content, content_type=content_type)
 
 
@@ -110,7 +110,7 @@ class MetadataEditorForm(ModelForm):
 
         # Clear page cache for API, so the changes will be visible on the next cache
         p_cacher = PageCacher()
-        p_cacher.remove_pages(API_CACHE_KEY_PREFIX)
+        p_cacher.invalidate_namespace(API_CACHE_KEY_PREFIX)
 
         # todo: add last_changed_by_user field to Metadata model
         """
@@ -13,7 +13,7 @@ from requests.exceptions import MissingSchema
 from editor.settings import editor_logger
 from service.helper.iso.iso19115.md_data_identification import _create_gmd_descriptive_keywords, _create_gmd_language
 from MrMap.messages import EDITOR_INVALID_ISO_LINK
-from MrMap.settings import XML_NAMESPACES, GENERIC_NAMESPACE_TEMPLATE
+from MrMap.settings import XML_NAMESPACES, XML_NAMESPACES_WFS_2_0, GENERIC_NAMESPACE_TEMPLATE
 
 from service.helper.enums import OGCServiceVersionEnum, OGCServiceEnum, MetadataEnum, DocumentEnum, ResourceOriginEnum, \
     MetadataRelationEnum
@@ -22,13 +22,14 @@ from service.models import Metadata, Keyword, FeatureType, Document
 from service.helper import xml_helper
 
 
-def _overwrite_capabilities_keywords(xml_obj: _Element, metadata: Metadata, _type: str):
+def _overwrite_capabilities_keywords(xml_obj: _Element, metadata: Metadata, _type: str, namespaces=XML_NAMESPACES):
     """ Overwrites existing capabilities keywords with metadata editor input
 
     Args:
         xml_obj (_Element): The parent xml object which holds the KeywordList element
         metadata (Metadata): The metadata object which holds the edited keyword data
         _type (str): Defines if this is a wms or wfs
+        namespaces: The namespace map of the service version
     Returns:
          nothing
     """
@@ -44,8 +45,8 @@ def _overwrite_capabilities_keywords(xml_obj: _Element, metadata: Metadata, _typ
             # for the <ows:ServiceIdentification> element we need the prefix "ows:"
             ns_prefix = "ows:"
         keyword_container_tag = "Keywords"
-        keyword_prefix = "{" + XML_NAMESPACES[ns_keyword_prefix_s] + "}"
-        keyword_ns_map[ns_keyword_prefix_s] = XML_NAMESPACES[ns_keyword_prefix_s]
+        keyword_prefix = "{" + namespaces[ns_keyword_prefix_s] + "}"
+        keyword_ns_map[ns_keyword_prefix_s] = namespaces[ns_keyword_prefix_s]
 
     xml_keywords_list_obj = xml_helper.try_get_single_element_from_xml(
         "./" + GENERIC_NAMESPACE_TEMPLATE.format(keyword_container_tag), xml_obj)
@@ -57,16 +58,19 @@ def _overwrite_capabilities_keywords(xml_obj: _Element, metadata: Metadata, _typ
             xml_keywords_list_obj = xml_helper.create_subelement(xml_obj,
                                                                  "{}{}".format(keyword_prefix, keyword_container_tag),
                                                                  after="{}Abstract".format(ns_prefix),
-                                                                 nsmap=keyword_ns_map)
+                                                                 nsmap=keyword_ns_map,
+                                                                 namespaces=namespaces)
         except (TypeError, ValueError) as e:
             # there seems to be no <Abstract> element. We add simply after <Title> and also create a new Abstract element
             xml_keywords_list_obj = xml_helper.create_subelement(xml_obj,
                                                                  "{}{}".format(keyword_prefix, keyword_container_tag),
-                                                                 after="{}Title".format(ns_prefix))
+                                                                 after="{}Title".format(ns_prefix),
+                                                                 namespaces=namespaces)
             xml_helper.create_subelement(
                 xml_obj,
                 "{}".format("Abstract"),
-                after="{}Title".format(ns_prefix)
+                after="{}Title".format(ns_prefix),
+                namespaces=namespaces
             )
 
     xml_keywords_objs = xml_helper.try_get_element_from_xml(
@@ -271,14 +275,14 @@ def overwrite_capabilities_document(metadata: Metadata):
     _type = metadata.service_type.value
     _version = metadata.get_service_version()
 
+    namespaces = XML_NAMESPACES
+    if metadata.is_service_type(OGCServiceEnum.WFS) and _version in [OGCServiceVersionEnum.V_2_0_0,
+                                                                      OGCServiceVersionEnum.V_2_0_2]:
+        namespaces = XML_NAMESPACES_WFS_2_0
+
     identifier = metadata.identifier
     if is_root:
         if metadata.is_service_type(OGCServiceEnum.WFS):
-            if _version is OGCServiceVersionEnum.V_2_0_0 or _version is OGCServiceVersionEnum.V_2_0_2:
-                XML_NAMESPACES["wfs"] = "http://www.opengis.net/wfs/2.0"
-                XML_NAMESPACES["ows"] = "http://www.opengis.net/ows/1.1"
-                XML_NAMESPACES["fes"] = "http://www.opengis.net/fes/2.0"
-                XML_NAMESPACES["default"] = XML_NAMESPACES["wfs"]
             identifier = metadata.title
 
     xml_obj = xml_helper.find_element_where_text(xml_obj_root, txt=identifier)
@@ -286,7 +290,7 @@ def overwrite_capabilities_document(metadata: Metadata):
         xml_obj = xml_obj[0]
 
     # handle keywords
-    _overwrite_capabilities_keywords(xml_obj, metadata, _type)
+    _overwrite_capabilities_keywords(xml_obj, metadata, _type, namespaces)
 
     # handle iso metadata links
     _overwrite_capabilities_iso_metadata_links(xml_obj, metadata)
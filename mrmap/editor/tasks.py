@@ -6,8 +6,7 @@ Created on: 29.07.20
 
 """
 from celery import shared_task, current_task, states
-from celery.result import AsyncResult
-from service.models import Metadata
+from service.models import Metadata, AllowedOperation
 
 
 @shared_task(name="async_process_securing_access")
@@ -27,7 +26,6 @@ def async_process_securing_access(md_id, use_proxy: bool, log_proxy: bool, restr
                         'featuretype',
                         'service__parent_service',
                         'service__parent_service__metadata')\
-        .prefetch_related('documents')\
         .get(id=md_id)
     if current_task:
         current_task.update_state(
@@ -35,32 +33,19 @@ def async_process_securing_access(md_id, use_proxy: bool, log_proxy: bool, restr
             meta={
                 "current": 0,
                 "service": metadata.__str__(),
-                "phase": "collecting sub elements of the service",
-            }
-        )
-
-    # Create list of main and sub metadatas for later use
-    subelements = metadata.get_described_element()\
-                          .get_subelements()\
-                          .select_related('metadata')\
-                          .prefetch_related('metadata__documents')  # could be list of layers or featuretypes
-    all_elements_count = len(subelements) + 1
-    if current_task:
-        current_task.update_state(
-            state=states.STARTED,
-            meta={
-                "current": 0,
                 "phase": "update use proxy setting of service elements",
             }
         )
 
+    # All settings are applied on the whole subtree of the service using set-based updates, so there is no need to
+    # iterate over the subelements here.
     if metadata.use_proxy_uri != use_proxy:
         metadata.set_proxy(use_proxy)
     if current_task:
         current_task.update_state(
             state=states.STARTED,
             meta={
-                "current": 0,
+                "current": 25,
                 "phase": "update log proxy access setting of service elements",
             }
         )
@@ -71,6 +56,7 @@ def async_process_securing_access(md_id, use_proxy: bool, log_proxy: bool, restr
         current_task.update_state(
             state=states.STARTED,
             meta={
+                "current": 50,
                 "phase": "update secure flag of service elements",
             }
         )
@@ -78,20 +64,24 @@ def async_process_securing_access(md_id, use_proxy: bool, log_proxy: bool, restr
     if metadata.is_secured != restrict_access:
         metadata.set_secured(restrict_access)
 
+    subelement_mds = metadata.get_subtree_metadatas(include_self=True)
     if restrict_access is False:
         if current_task:
             current_task.update_state(
                 state=states.STARTED,
                 meta={
+                    "current": 75,
                     "phase": "remove all allowed operations",
                 }
             )
-        metadata.allowed_operations.all().delete()
+        AllowedOperation.objects.filter(
+            id__in=AllowedOperation.objects.filter(secured_metadata__in=subelement_mds).values("id")
+        ).delete()
     if current_task:
         current_task.update_state(
             state=states.STARTED,
             meta={
-                "current": AsyncResult(current_task.request.id).info.get("current", 0) + all_elements_count / 100,
+                "current": 90,
                 "phase": "clearing cached documents",
             }
         )
@@ -100,42 +90,9 @@ def async_process_securing_access(md_id, use_proxy: bool, log_proxy: bool, restr
     ## There might be the case, that a user requests a subelements capability document just before the securing is finished
     ## In this case we would have a cached document with non-secured links and stuff - therefore we clear again in the end
     ## just to make sure!
-    metadata.clear_cached_documents()
-
-    for subelement in subelements:
-        md = subelement.metadata
-        if current_task:
-            current_task.update_state(
-                state=states.STARTED,
-                meta={
-                    "current": AsyncResult(current_task.request.id).info.get("current", 0) + all_elements_count / 100,
-                    "phase": "clearing cached documents",
-                }
-            )
-
-        if restrict_access is False:
-            if current_task:
-                current_task.update_state(
-                    state=states.STARTED,
-                    meta={
-                        "phase": f"removing all allowed operations for {md.__str__()}",
-                    }
-                )
-            md.allowed_operations.all().delete()
-        # Clear cached documents
-        ## There might be the case, that a user requests a subelements capability document just before the securing is finished
-        ## In this case we would have a cached document with non-secured links and stuff - therefore we clear again in the end
-        ## just to make sure!
-        if current_task:
-            current_task.update_state(
-                state=states.STARTED,
-                meta={
-                    "phase": f"clearing cached documents for {md.__str__()}",
-                }
-            )
-        md.clear_cached_documents()
+    Metadata.clear_cached_documents_of(subelement_mds.values_list("id", flat=True))
 
-        return {'msg': 'Done. Service secured.',
-                'id': str(md.pk),
-                'absolute_url': md.get_absolute_url(),
-                'absolute_url_html': f'<a href={md.get_absolute_url()}>{md.title}</a>'}
+    return {'msg': 'Done. Service secured.',
+            'id': str(metadata.pk),
+            'absolute_url': metadata.get_absolute_url(),
+            'absolute_url_html': f'<a href={metadata.get_absolute_url()}>{metadata.title}</a>'}
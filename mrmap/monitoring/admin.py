@@ -40,7 +40,7 @@ class MonitoringAdmin(admin.ModelAdmin):
 
 
 class MonitoringCapabilityAdmin(admin.ModelAdmin):
-    list_display = ('uuid', 'metadata', 'needs_update', 'diff')
+    list_display = ('uuid', 'metadata', 'needs_update', 'changes')
 
 
 admin.site.register(HealthStateReason, HealthStateReasonAdmin)
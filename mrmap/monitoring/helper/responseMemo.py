@@ -0,0 +1,81 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+from monitoring.settings import MONITORING_RESPONSE_MEMO_SIZE
+
+
+class ResponseMemo:
+    """ Memo for the responses of a single monitoring run.
+
+    Every key is loaded only once. If the same key is requested while it is still loading (single flight), the caller
+    waits for the running load and receives its result instead of starting another request. Only the last
+    max_size entries are kept.
+
+    """
+
+    class Entry:
+        def __init__(self):
+            self.loaded = threading.Event()
+            self.value = None
+            self.exception = None
+
+    def __init__(self, max_size: int = MONITORING_RESPONSE_MEMO_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key: Hashable, load: Callable, is_memoizable: Callable = None):
+        """ Returns the memoized value of a key or loads it.
+
+        Callers, which waited for the running load, always receive its result. Values which are rejected by
+        is_memoizable are loaded again on the next call.
+
+        Args:
+            key (Hashable): The key, e.g. a normalized url.
+            load (Callable): Loads the value, if it is not memoized yet.
+            is_memoizable (Callable): Decides whether a loaded value is kept. All values are kept if it is None.
+        Returns:
+            The value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            is_loader = entry is None
+            if is_loader:
+                self.misses += 1
+                entry = ResponseMemo.Entry()
+                self._entries[key] = entry
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+        if is_loader:
+            try:
+                try:
+                    entry.value = load()
+                except Exception as e:
+                    entry.exception = e
+                if entry.exception is not None or (is_memoizable is not None and not is_memoizable(entry.value)):
+                    with self._lock:
+                        # Failed loads are not memoized
+                        if self._entries.get(key) is entry:
+                            del self._entries[key]
+            finally:
+                entry.loaded.set()
+        else:
+            entry.loaded.wait()
+
+        if entry.exception is not None:
+            raise entry.exception
+        return entry.value
@@ -39,3 +39,23 @@ class UrlHelper:
 
         build = parse.urlunparse((_url.scheme, _url.netloc, _url.path, _url.params, query_string, _url.fragment))
         return build
+
+    @staticmethod
+    def normalize(url: str) -> str:
+        """ Normalizes an url for comparison.
+
+        Scheme and host are lower cased, query parameter names are lower cased (OGC parameter names are case
+        insensitive) and the query parameters are sorted. The fragment is dropped.
+
+        Args:
+            url (str): The url to normalize.
+        Returns:
+            str: The normalized url.
+        """
+        _url = parse.urlsplit(url)
+        queries = sorted(
+            (key.lower(), val) for key, val in parse.parse_qsl(_url.query, keep_blank_values=True)
+        )
+        return parse.urlunsplit(
+            (_url.scheme.lower(), _url.netloc.lower(), _url.path, parse.urlencode(queries), '')
+        )
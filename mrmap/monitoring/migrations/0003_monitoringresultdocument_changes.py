@@ -0,0 +1,18 @@
+# Generated by Django 3.1.8 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0002_auto_20210413_0935'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monitoringresultdocument',
+            name='changes',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
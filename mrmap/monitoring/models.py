@@ -162,6 +162,9 @@ class MonitoringResult(models.Model):
 class MonitoringResultDocument(MonitoringResult):
     """Model used to signal if a given document differs from the remote document and needs an update"""
     needs_update = models.BooleanField(null=True, blank=True)
+    # The added, removed and changed sections (service, layers, feature types, ...) of the document
+    changes = models.JSONField(null=True, blank=True)
+    # Full text diff, only stored if MONITORING_STORE_TEXT_DIFF is enabled
     diff = models.TextField(null=True, blank=True)
 
 
@@ -15,25 +15,46 @@ from io import BytesIO
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
 
-from monitoring.settings import MONITORING_REQUEST_TIMEOUT
+from monitoring.settings import MONITORING_REQUEST_TIMEOUT, MONITORING_STORE_TEXT_DIFF
 from monitoring.models import MonitoringResult as MonitoringResult, MonitoringResultDocument, MonitoringRun, MonitoringSetting, \
     HealthState
+from monitoring.helper.responseMemo import ResponseMemo
+from monitoring.helper.urlHelper import UrlHelper
 from monitoring.helper.wmsHelper import WmsHelper
 from monitoring.helper.wfsHelper import WfsHelper
+from service.helper.capabilities_digest import get_section_digests, get_change_set, DOCUMENT_SECTION
 from service.helper.crypto_handler import CryptoHandler
 from service.helper.common_connector import CommonConnector
 from service.helper.xml_helper import parse_xml
-from service.models import Metadata, Document, Service, FeatureType
+from service.models import Metadata, Document, Service, FeatureType, MetadataStatus
 from service.helper.enums import OGCServiceEnum, OGCServiceVersionEnum, DocumentEnum
 
 
 class Monitoring:
 
-    def __init__(self, metadata: Metadata, monitoring_run: MonitoringRun, monitoring_setting: MonitoringSetting = None, ):
+    def __init__(self, metadata: Metadata, monitoring_run: MonitoringRun, monitoring_setting: MonitoringSetting = None,
+                 response_memo: ResponseMemo = None, ):
         self.metadata = metadata
         self.linked_metadata = None
         self.monitoring_run = monitoring_run
         self.monitoring_settings = monitoring_setting
+        # Shared between all Monitoring objects of a run, so every url is requested only once per run
+        self.response_memo = response_memo if response_memo is not None else ResponseMemo()
+
+    class FetchedResponse:
+        """ Holds the outcome of a single request, which can be shared between multiple checks.
+
+        Attributes:
+            status (int): The response status.
+            content (bytes): The response content.
+            run_time (float): The duration of the request in seconds.
+            error_msg (str): The error message, if the request failed without a response.
+        """
+        def __init__(self, status: int = None, content: bytes = None, run_time: float = None, error_msg: str = None):
+            self.status = status
+            self.content = content
+            self.run_time = run_time
+            self.error_msg = error_msg
 
     class ServiceStatus:
         """ Holds all required information about the service status.
@@ -81,6 +102,7 @@ class Monitoring:
         # all checks are done. Calculate the health state for all monitoring results
         health_state = HealthState.objects.create(monitoring_run=self.monitoring_run, metadata=self.metadata)
         health_state.run_health_state()
+        MetadataStatus.set_health_state(health_state)
 
     def check_wfs(self, service: Service):
         """ Check the availability of wfs operations.
@@ -210,19 +232,14 @@ class Monitoring:
         """
         success = False
         duration = None
-        connector = CommonConnector(url=url, timeout=self.monitoring_settings.timeout if self.monitoring_settings is not None else MONITORING_REQUEST_TIMEOUT)
-        if self.metadata.has_external_authentication:
-            connector.external_auth = self.metadata.external_authentication
-        try:
-            connector.load()
-        except Exception as e:
+        response = self.fetch(url)
+        if response.error_msg is not None:
             # handler if server sends no response (e.g. outdated uri)
-            response_text = str(e)
-            return Monitoring.ServiceStatus(url, success, response_text, connector.status_code, duration)
+            return Monitoring.ServiceStatus(url, success, response.error_msg, response.status, duration)
 
-        duration = timezone.timedelta(seconds=connector.run_time)
-        response_text = connector.content
-        if connector.status_code == 200:
+        duration = timezone.timedelta(seconds=response.run_time)
+        response_text = response.content
+        if response.status == 200:
             success = True
             try:
                 xml = parse_xml(response_text)
@@ -236,13 +253,50 @@ class Monitoring:
                 response_text = None
             if check_image:
                 try:
-                    Image.open(BytesIO(connector.content))
+                    Image.open(BytesIO(response.content))
                     success = True
                 except UnidentifiedImageError:
                     success = False
-        service_status = Monitoring.ServiceStatus(url, success, response_text, connector.status_code, duration)
+        service_status = Monitoring.ServiceStatus(url, success, response_text, response.status, duration)
         return service_status
 
+    def fetch(self, url: str) -> FetchedResponse:
+        """ Requests an url once per monitoring run.
+
+        Urls which only differ in the order or case of their parameter names are requested only once as well.
+
+        Args:
+            url (str): The url to request.
+        Returns:
+            FetchedResponse: The shared response.
+        """
+        external_auth = self.metadata.external_authentication if self.metadata.has_external_authentication else None
+        key = (UrlHelper.normalize(url), external_auth.pk if external_auth is not None else None)
+        # Failed requests are not shared, so each check gets its own attempt
+        return self.response_memo.get_or_load(
+            key,
+            lambda: self._load(url, external_auth),
+            is_memoizable=lambda response: response.error_msg is None
+        )
+
+    def _load(self, url: str, external_auth) -> FetchedResponse:
+        """ Requests an url.
+
+        Args:
+            url (str): The url to request.
+            external_auth (ExternalAuthentication): The authentication for the request or None.
+        Returns:
+            FetchedResponse: The response.
+        """
+        connector = CommonConnector(url=url, timeout=self.monitoring_settings.timeout if self.monitoring_settings is not None else MONITORING_REQUEST_TIMEOUT)
+        if external_auth is not None:
+            connector.external_auth = external_auth
+        try:
+            connector.load()
+        except Exception as e:
+            return Monitoring.FetchedResponse(status=connector.status_code, error_msg=str(e))
+        return Monitoring.FetchedResponse(status=connector.status_code, content=connector.content, run_time=connector.run_time)
+
     def has_wfs_member(self, xml):
         """Checks the existence of a (feature)Member for a wfs feature.
 
@@ -310,26 +364,49 @@ class Monitoring:
     def check_document(self, url, original_document):
         service_status = self.check_status(url)
         if service_status.success:
-            diff_obj = self.get_document_diff(service_status.message, original_document)
-            if diff_obj is not None:
-                needs_update = True
-                diff = ''.join(diff_obj)
-                monitoring_document = MonitoringResultDocument(
-                    available=service_status.success, metadata=self.metadata, status_code=service_status.status,
-                    duration=service_status.duration, monitored_uri=service_status.monitored_uri, diff=diff,
-                    needs_update=needs_update, monitoring_run=self.monitoring_run,
-                )
-            else:
-                needs_update = False
-                monitoring_document = MonitoringResultDocument(
-                    available=service_status.success, metadata=self.metadata, status_code=service_status.status,
-                    duration=service_status.duration, monitored_uri=service_status.monitored_uri,
-                    needs_update=needs_update, monitoring_run=self.monitoring_run,
-                )
+            # The same document may be compared against the same original multiple times during a run
+            crypto_handler = CryptoHandler()
+            changes, diff = self.response_memo.get_or_load(
+                ('changes', UrlHelper.normalize(url), crypto_handler.sha256(original_document)),
+                lambda: self._get_document_changes(service_status.message, original_document)
+            )
+            monitoring_document = MonitoringResultDocument(
+                available=service_status.success, metadata=self.metadata, status_code=service_status.status,
+                duration=service_status.duration, monitored_uri=service_status.monitored_uri, changes=changes,
+                diff=diff, needs_update=changes is not None, monitoring_run=self.monitoring_run,
+            )
             monitoring_document.save()
         else:
             self.handle_service_error(service_status)
 
+    def _get_document_changes(self, new_document: str, original_document: str) -> tuple:
+        """ Computes the structural changes between two documents.
+
+        The documents are compared by the canonical digests of their sections, so differences in whitespace or
+        attribute order are ignored. A text diff is only computed if MONITORING_STORE_TEXT_DIFF is enabled.
+
+        Args:
+            new_document (str): Document of last request.
+            original_document (str): Original document.
+        Returns:
+            tuple: The change set and the text diff, both None if the documents are equal
+        """
+        new_digests = get_section_digests(new_document)
+        original_digests = get_section_digests(original_document)
+        if new_digests is not None and original_digests is not None:
+            changes = get_change_set(original_digests, new_digests)
+        elif self.get_document_diff(new_document, original_document) is not None:
+            # At least one of the documents is no xml document, so only the hashes can be compared
+            changes = {"changed": [DOCUMENT_SECTION]}
+        else:
+            changes = None
+
+        diff = None
+        if changes is not None and MONITORING_STORE_TEXT_DIFF:
+            diff_obj = self.get_document_diff(new_document, original_document)
+            diff = ''.join(diff_obj) if diff_obj is not None else None
+        return changes, diff
+
     def get_document_diff(self, new_document: str, original_document: str) -> Union[str, None]:
         """Computes the diff between two documents.
 
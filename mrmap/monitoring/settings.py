@@ -6,6 +6,10 @@ monitoring_logger = logging.getLogger('MrMap.monitoring')
 # Defines monitoring constants
 MONITORING_TIME = "23:59:00"
 MONITORING_REQUEST_TIMEOUT = 30  # seconds
+# Number of responses, which are shared between the checks of one monitoring run
+MONITORING_RESPONSE_MEMO_SIZE = 100
+# Whether a full text diff shall be stored in addition to the changed sections of a monitored document
+MONITORING_STORE_TEXT_DIFF = False
 
 # Define some thresholds for monitoring health check
 WARNING_RESPONSE_TIME = 300     # time in ms (milliseconds)
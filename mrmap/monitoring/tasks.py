@@ -10,10 +10,12 @@ from celery.signals import beat_init
 from django.core.exceptions import ObjectDoesNotExist, MultipleObjectsReturned
 from django.db import transaction
 from django.utils import timezone
+from monitoring.helper.responseMemo import ResponseMemo
 from monitoring.models import MonitoringSetting, MonitoringRun
 from monitoring.monitoring import Monitoring as Monitor
 from monitoring.settings import monitoring_logger
 from service.models import Metadata
+from service.tasks import async_update_previews
 from django.utils.translation import gettext_lazy as _
 
 
@@ -43,6 +45,8 @@ def run_monitoring(setting_id, *args, **kwargs):
         print(f'Could not retrieve setting with id {setting_id}')
         return
     metadatas = setting.metadatas.all()
+    # Responses are shared between all checks of this run
+    response_memo = ResponseMemo()
     for metadata in metadatas:
         if current_task:
             current_task.update_state(
@@ -54,7 +58,7 @@ def run_monitoring(setting_id, *args, **kwargs):
                 }
             )
         try:
-            monitor = Monitor(metadata=metadata, monitoring_run=monitoring_run, )
+            monitor = Monitor(metadata=metadata, monitoring_run=monitoring_run, response_memo=response_memo, )
             monitor.run_checks()
             monitoring_logger.debug(f'Health checks completed for {metadata}')
         except Exception as e:
@@ -65,6 +69,8 @@ def run_monitoring(setting_id, *args, **kwargs):
     monitoring_run.end = end_time
     monitoring_run.duration = duration
     monitoring_run.save()
+    # Refresh the previews of the monitored resources
+    async_update_previews.delay([str(md_id) for md_id in metadatas.values_list("id", flat=True)])
 
     return {'msg': 'Done. Service(s) successfully monitored.',
             'id': str(monitoring_run.pk),
@@ -76,6 +82,8 @@ def run_monitoring(setting_id, *args, **kwargs):
 def run_manual_service_monitoring(monitoring_run, *args, **kwargs):
     monitoring_run = MonitoringRun.objects.get(pk=monitoring_run)
     monitoring_run.start = timezone.now()
+    # Responses are shared between all checks of this run
+    response_memo = ResponseMemo()
     for metadata in monitoring_run.metadatas.all():
         if current_task:
             current_task.update_state(
@@ -87,7 +95,7 @@ def run_manual_service_monitoring(monitoring_run, *args, **kwargs):
                 }
             )
         try:
-            monitor = Monitor(metadata=metadata, monitoring_run=monitoring_run, )
+            monitor = Monitor(metadata=metadata, monitoring_run=monitoring_run, response_memo=response_memo, )
             monitor.run_checks()
             monitoring_logger.debug(f'Health checks completed for {metadata}')
         except Exception as e:
@@ -99,6 +107,8 @@ def run_manual_service_monitoring(monitoring_run, *args, **kwargs):
     monitoring_run.end = end_time
     monitoring_run.duration = duration
     monitoring_run.save()
+    # Refresh the previews of the monitored resources
+    async_update_previews.delay([str(md_id) for md_id in monitoring_run.metadatas.values_list("id", flat=True)])
 
     return {'msg': 'Done. Service(s) successfully monitored.',
             'id': str(monitoring_run.pk),
@@ -18,7 +18,7 @@ from quality.models import ConformityCheckConfigurationExternal, \
     ConformityCheckRun
 from quality.settings import quality_logger
 from service.helper.common_connector import CommonConnector
-from service.models import Metadata
+from service.models import Metadata, MetadataStatus
 from structure.celery_helper import runs_as_async_task
 
 
@@ -179,6 +179,7 @@ class QualityEtf:
         """
         self.check_run = ConformityCheckRun.objects.create(
             metadata=self.metadata, conformity_check_configuration=self.config)
+        MetadataStatus.set_conformity_check_runs([self.check_run])
         quality_logger.info(f"Created new check run id {self.check_run.pk}")
         document = self.document_provider.fetch_validation_document()
         test_object_id = self.client.upload_test_object(document)
@@ -222,6 +223,7 @@ class QualityEtf:
         self.check_run.passed = self.client.is_test_report_passed(test_report)
         self.check_run.time_stop = str(timezone.now())
         self.check_run.save()
+        MetadataStatus.set_conformity_check_runs([self.check_run])
 
     def update_progress(self):
         """Update the progress of the pending task."""
@@ -6,17 +6,53 @@ Created on: 02.11.20
 
 """
 import json
+import operator
+
 from celery import states, current_task
 from celery.result import AsyncResult
+from django.db.models import QuerySet, OuterRef, Subquery, Count, IntegerField
+from django.db.models.functions import Coalesce, Length
 from django.utils import timezone
 
-from quality.enums import RulePropertyEnum
+from quality.enums import RulePropertyEnum, RuleOperatorEnum
 from quality.models import RuleSet, Rule, \
     ConformityCheckConfiguration, ConformityCheckConfigurationInternal, \
     ConformityCheckRun
-from service.models import Metadata
+from quality.settings import QUALITY_CHECK_BATCH_SIZE
+from service.models import Metadata, MetadataStatus
 from structure.celery_helper import runs_as_async_task
 
+RULE_OPERATORS = {
+    RuleOperatorEnum.GT.value: operator.gt,
+    RuleOperatorEnum.GTE.value: operator.ge,
+    RuleOperatorEnum.LT.value: operator.lt,
+    RuleOperatorEnum.LTE.value: operator.le,
+    RuleOperatorEnum.EQ.value: operator.eq,
+    RuleOperatorEnum.NEQ.value: operator.ne,
+}
+
+
+def evaluate_rule(rule: Rule, real_value: int):
+    """ Compares the value of a metadata property with the threshold of a rule.
+
+    Args:
+        rule (Rule): The rule to evaluate.
+        real_value (int): The length or count of the rule's field.
+    Returns:
+        {"success": bool, "condition": str}: The result of the check.
+    """
+    threshold = rule.threshold
+    condition = str(real_value) + rule.operator + str(threshold)
+    try:
+        threshold = int(threshold)
+    except (TypeError, ValueError):
+        threshold = float(threshold)
+
+    return {
+        "success": RULE_OPERATORS[rule.operator](real_value, threshold),
+        "condition": condition
+    }
+
 
 class QualityInternal:
 
@@ -46,6 +82,7 @@ class QualityInternal:
         """
         run = ConformityCheckRun.objects.create(
             metadata=self.metadata, conformity_check_configuration=self.config)
+        MetadataStatus.set_conformity_check_runs([run])
 
         config = run.conformity_check_configuration
 
@@ -84,6 +121,7 @@ class QualityInternal:
         run.time_stop = time_stop
         run.result = json.dumps(results)
         run.save()
+        MetadataStatus.set_conformity_check_runs([run])
         return run
 
     def check_ruleset(self, ruleset: RuleSet):
@@ -121,9 +159,7 @@ class QualityInternal:
             {"success": bool, "condition": str}: The result of the check.
         """
         prop = rule.property
-        operator = rule.operator
         field = rule.field_name
-        threshold = rule.threshold
         real_value = None
 
         if prop == RulePropertyEnum.LEN.value:
@@ -135,12 +171,7 @@ class QualityInternal:
             elements = manager.all()
             real_value = elements.count()
 
-        condition = str(real_value) + operator + str(threshold)
-
-        return {
-            "success": eval(condition, {'__builtins__': None}),
-            "condition": condition
-        }
+        return evaluate_rule(rule, real_value)
 
     def update_progress(self):
         """Update the progress of the pending task."""
@@ -156,3 +187,160 @@ class QualityInternal:
                 }
             )
 
+
+class QualityInternalBatch:
+    """ Runs an internal check for many metadata objects at once.
+
+    The rules of all rule sets are compiled into annotations of a single
+    queryset, so the values of all rules are fetched with one query per
+    batch of metadata objects. The resulting ConformityCheckRuns are
+    created in bulk.
+    """
+
+    def __init__(self, metadatas: QuerySet,
+                 base_config: ConformityCheckConfiguration,
+                 batch_size: int = QUALITY_CHECK_BATCH_SIZE):
+        self.metadatas = metadatas
+        self.config = ConformityCheckConfigurationInternal.objects.get(
+            pk=base_config.pk)
+        self.batch_size = batch_size
+
+        self.rule_sets = [
+            (rule_set, True) for rule_set in
+            self.config.mandatory_rule_sets.prefetch_related("rules")
+        ] + [
+            (rule_set, False) for rule_set in
+            self.config.optional_rule_sets.prefetch_related("rules")
+        ]
+
+    @staticmethod
+    def get_annotation_name(rule: Rule):
+        """ Returns the name of the annotation, which holds the rule's value.
+        """
+        return f"{rule.property}_{rule.field_name}"
+
+    @staticmethod
+    def get_annotation(rule: Rule):
+        """ Creates the annotation, which computes the rule's value.
+
+        Counts are computed as subqueries on the m2m tables, so multiple
+        count rules do not multiply the joined rows.
+
+        Args:
+            rule (Rule): The rule.
+        Returns:
+            The annotation expression
+        """
+        field = rule.field_name
+        if rule.property == RulePropertyEnum.LEN.value:
+            return Coalesce(Length(field), 0)
+
+        elif rule.property == RulePropertyEnum.COUNT.value:
+            through = Metadata._meta.get_field(field).remote_field.through
+            count = through.objects.filter(
+                metadata=OuterRef("pk")
+            ).values("metadata").annotate(
+                count=Count("*")
+            ).values("count")
+            return Coalesce(Subquery(count, output_field=IntegerField()), 0)
+
+        raise ValueError(f"Invalid rule property: {rule.property}")
+
+    def get_annotated_queryset(self):
+        """ Annotates the metadata objects with the values of all rules.
+
+        Returns:
+            The queryset of dicts, holding the metadata id and the values
+        """
+        annotations = {}
+        for rule_set, mandatory in self.rule_sets:
+            for rule in rule_set.rules.all():
+                annotations.setdefault(self.get_annotation_name(rule),
+                                       self.get_annotation(rule))
+        return self.metadatas.annotate(**annotations).values(
+            "id", *annotations.keys()).order_by()
+
+    def check_values(self, values: dict):
+        """ Evaluates all rule sets for the values of a single metadata.
+
+        Args:
+            values (dict): The annotated values of the metadata object.
+        Returns:
+            The results in the format of QualityInternal.run()
+        """
+        results = {
+            "success": True,
+            "rule_sets": []
+        }
+        for rule_set, mandatory in self.rule_sets:
+            result = {
+                "success": True,
+                "rules": []
+            }
+            for rule in rule_set.rules.all():
+                rule_result = evaluate_rule(
+                    rule, values[self.get_annotation_name(rule)])
+                rule_result.update(rule.as_dict())
+                result["rules"].append(rule_result)
+                if not rule_result["success"]:
+                    result["success"] = False
+
+            result["name"] = str(rule_set)
+            result["id"] = rule_set.id
+            result["mandatory"] = mandatory
+            if mandatory and not result["success"]:
+                results["success"] = False
+            results["rule_sets"].append(result)
+        return results
+
+    def run(self) -> int:
+        """ Runs the internal check for all metadata objects.
+
+        Returns:
+            The number of created ConformityCheckRuns
+        """
+        queryset = self.get_annotated_queryset()
+        total = queryset.count() or 1
+        num_runs = 0
+        runs = []
+
+        for values in queryset.iterator(chunk_size=self.batch_size):
+            time_start = timezone.now()
+            results = self.check_values(values)
+            time_stop = timezone.now()
+            results["time_start"] = str(time_start)
+            results["time_stop"] = str(time_stop)
+
+            runs.append(ConformityCheckRun(
+                metadata_id=values["id"],
+                conformity_check_configuration=self.config,
+                time_stop=time_stop,
+                passed=results["success"],
+                result=json.dumps(results)
+            ))
+            if len(runs) >= self.batch_size:
+                num_runs += self._create_runs(runs)
+                runs = []
+                if runs_as_async_task():
+                    self.update_progress(num_runs / total * 90)
+
+        num_runs += self._create_runs(runs)
+        return num_runs
+
+    def _create_runs(self, runs: list) -> int:
+        """ Creates the given ConformityCheckRuns in bulk. """
+        ConformityCheckRun.objects.bulk_create(runs,
+                                               batch_size=self.batch_size)
+        MetadataStatus.set_conformity_check_runs(runs)
+        return len(runs)
+
+    @staticmethod
+    def update_progress(progress: float):
+        """Update the progress of the pending task."""
+        if current_task:
+            current_task.update_state(
+                state=states.STARTED,
+                meta={
+                    "current": progress,
+                }
+            )
@@ -14,3 +14,6 @@ quality_logger = logging.getLogger('MrMap.quality')
 DEFAULT_UNKNOWN_MESSAGE = _(f'The validation state is unknown.')
 DEFAULT_SUCCESS_MESSAGE = _(f'The resource is valid.')
 DEFAULT_FAIL_MESSAGE = _(f'The resource is invalid.')
+
+# Number of metadata objects, which are checked by one query of a batch check
+QUALITY_CHECK_BATCH_SIZE = 1000
@@ -16,7 +16,7 @@ from quality.models import ConformityCheckConfiguration, ConformityCheckRun, \
     ConformityCheckConfigurationExternal
 from quality.plugins.etf import QualityEtf, ValidationDocumentProvider, \
     EtfClient
-from quality.plugins.internal import QualityInternal
+from quality.plugins.internal import QualityInternal, QualityInternalBatch
 from service.models import Metadata
 from structure.AbortedException import AbortedException
 from structure.models import MrMapUser, MrMapGroup
@@ -64,6 +64,38 @@ def run_quality_check(self, config_id: int, metadata_id: int):
     return run.pk
 
 
+@shared_task(name='run_quality_check_batch', base=AbortableTask, bind=True)
+def run_quality_check_batch(self, config_id: int, metadata_ids: list = None):
+    """ Runs an internal check for many metadata objects at once.
+
+        Args:
+            config_id (int): The id of the internal
+            ConformityCheckConfiguration.
+        Keyword arguments:
+            metadata_ids (list): The ids of the metadata objects to check.
+            If not given, all active metadata objects of the config's
+            metadata types are checked.
+        Returns:
+            The number of created ConformityCheckRuns
+    """
+    config = ConformityCheckConfiguration.objects.get(pk=config_id)
+    if config.conformity_type != ConformityTypeEnum.INTERNAL.value:
+        raise Exception(
+            f"Could not check conformity. Batch checks are only available "
+            f"for internal checks, not for {config.conformity_type}.")
+
+    if metadata_ids is not None:
+        metadatas = Metadata.objects.filter(id__in=metadata_ids)
+    else:
+        metadatas = Metadata.objects.filter(
+            metadata_type__in=config.metadata_types,
+            is_active=True
+        )
+
+    checker = QualityInternalBatch(metadatas, config)
+    return checker.run()
+
+
 @shared_task(name="complete_validation_task", bind=True)
 def complete_validation(self, run_id: int, user_id: int = None,
                         group_id: int = None):
@@ -49,6 +49,10 @@ class DocumentAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'document_type', 'is_original', 'is_active', )
     search_fields = ['id', 'metadata__id', 'metadata__title', 'last_modified']
 
+    def get_queryset(self, request):
+        # the content is only loaded if it is accessed, so the change list does not fetch the whole documents
+        return super().get_queryset(request).defer("content")
+
     def metadata_link(self, obj):
         return mark_safe('<a href="%s">%s</a>' % (reverse("admin:service_metadata_change", args=(obj.metadata.id,)), escape(obj.metadata)))
 
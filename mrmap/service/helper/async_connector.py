@@ -0,0 +1,119 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import asyncio
+import weakref
+
+import httpx
+
+from MrMap.settings import HTTP_PROXY, VERIFY_SSL_CERTIFICATES
+from service.helper import xml_helper
+from service.settings import REQUEST_TIMEOUT, ASYNC_PROXY_MAX_CONNECTIONS, ASYNC_PROXY_MAX_KEEPALIVE_CONNECTIONS
+
+# Pooled connections can only be used by the event loop they have been opened in, so each loop gets its own client.
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """ Returns the pooled http client of the running event loop
+
+    Returns:
+         client (AsyncClient): The client
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop, None)
+    if client is None:
+        proxies = None
+        if HTTP_PROXY:
+            proxies = {
+                "all://": HTTP_PROXY,
+                # Local requests, like the ones to the mapserver, never go through the proxy
+                "all://127.0.0.1": None,
+                "all://localhost": None,
+            }
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ASYNC_PROXY_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_PROXY_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            timeout=REQUEST_TIMEOUT,
+            verify=VERIFY_SSL_CERTIFICATES,
+            proxies=proxies,
+        )
+        _clients[loop] = client
+    return client
+
+
+async def close_client():
+    """ Closes the pooled http client of the running event loop
+
+    Served by WSGI, each async view runs in its own event loop, which is dropped after the request. Its client would
+    never be used again, so it has to be closed before the loop finishes.
+
+    Returns:
+         nothing
+    """
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def get_auth(external_auth):
+    """ Returns the httpx authentication for an ExternalAuthentication
+
+    Args:
+        external_auth (ExternalAuthentication): The decrypted authentication or None
+    Returns:
+         auth (Auth): The authentication or None
+    """
+    if external_auth is None:
+        return None
+    if external_auth.auth_type == "http_basic":
+        return httpx.BasicAuth(external_auth.username, external_auth.password)
+    elif external_auth.auth_type == "http_digest":
+        return httpx.DigestAuth(external_auth.username, external_auth.password)
+    return None
+
+
+async def get(url: str, external_auth=None):
+    """ Performs an asynchronous GET request
+
+    Args:
+        url (str): The url
+        external_auth (ExternalAuthentication): The decrypted authentication or None
+    Returns:
+         response (Response): The response
+    """
+    return await get_client().get(url, auth=get_auth(external_auth))
+
+
+async def post(url: str, data, external_auth=None):
+    """ Performs an asynchronous POST request
+
+    Dicts are sent x-www-form-urlencoded, anything else as raw body. Like CommonConnector.post() the Content-Type is
+    set to xml, if the body is a xml document.
+
+    Args:
+        url (str): The url
+        data (dict|str|bytes): The post data
+        external_auth (ExternalAuthentication): The decrypted authentication or None
+    Returns:
+         response (Response): The response
+    """
+    client = get_client()
+    auth = get_auth(external_auth)
+    if isinstance(data, dict):
+        return await client.post(url, data=data, auth=auth)
+
+    headers = {}
+    try:
+        if xml_helper.parse_xml(data) is not None:
+            headers["Content-Type"] = "application/xml"
+    except ValueError:
+        # Not a xml document
+        pass
+    return await client.post(url, content=data, headers=headers, auth=auth)
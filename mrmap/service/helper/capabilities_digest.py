@@ -0,0 +1,136 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import hashlib
+
+from lxml.etree import QName
+
+from service.helper import xml_helper
+
+DOCUMENT_SECTION = "document"
+LAYER_SECTION_PREFIX = "layer:"
+FEATURE_TYPE_SECTION_PREFIX = "featuretype:"
+
+# Elements which are digested as sections of their own and are therefore skipped inside the digest of their parent
+SECTION_ELEMENTS = {"Layer", "FeatureType"}
+
+
+def _local_name(elem):
+    return QName(elem).localname
+
+
+def _element_digest(elem, skip: set = SECTION_ELEMENTS):
+    """ Returns the canonical digest of an element
+
+    Whitespace around texts, comments and the order of attributes do not influence the digest. Children whose local name
+    is in skip are left out.
+
+    Args:
+        elem (_Element): The xml element
+        skip (set): Local names of children, which shall be ignored
+    Returns:
+         digest (bytes): The sha256 digest
+    """
+    sha = hashlib.sha256()
+    sha.update(elem.tag.encode("UTF-8"))
+    for key, val in sorted(elem.attrib.items()):
+        sha.update(b"\x00@" + key.encode("UTF-8") + b"=" + val.encode("UTF-8"))
+    sha.update(b"\x00#" + (elem.text or "").strip().encode("UTF-8"))
+    for child in elem:
+        if isinstance(child.tag, str) and _local_name(child) not in skip:
+            sha.update(b"\x00<" + _element_digest(child, skip))
+        # The tail belongs to the parent's content, even if the child is a comment or a skipped section
+        tail = (child.tail or "").strip()
+        if tail:
+            sha.update(b"\x00#" + tail.encode("UTF-8"))
+    return sha.digest()
+
+
+def _section_name(elem):
+    """ Returns the identifying name of a layer or feature type
+
+    Args:
+        elem (_Element): The <Layer> or <FeatureType> element
+    Returns:
+         name (str): The name, the title if the element has no name, or an empty string
+    """
+    for child_name in ["Name", "Title"]:
+        for child in elem:
+            if isinstance(child.tag, str) and _local_name(child) == child_name and child.text:
+                return child.text.strip()
+    return ""
+
+
+def get_section_digests(xml) -> dict:
+    """ Returns the digests of all sections of a capabilities document
+
+    Sections are the direct children of the root element (e.g. Service, Capability, ServiceIdentification), each
+    Layer and each FeatureType. A layer's digest does not contain its sublayers, so a change is only reported for the
+    layer where it occurred. The digest of the whole document is stored under DOCUMENT_SECTION.
+
+    Args:
+        xml (str|bytes|_Element): The document
+    Returns:
+         digests (dict): Hex digests by section key or None if the document could not be parsed
+    """
+    if isinstance(xml, (str, bytes)):
+        xml = xml_helper.parse_xml(xml)
+    if xml is None:
+        return None
+    root = xml.getroot() if hasattr(xml, "getroot") else xml
+
+    digests = {}
+
+    def add(key, elem):
+        unique_key = key
+        i = 2
+        while unique_key in digests:
+            unique_key = "{}#{}".format(key, i)
+            i += 1
+        digests[unique_key] = _element_digest(elem).hex()
+
+    for child in root:
+        if isinstance(child.tag, str):
+            add(_local_name(child), child)
+
+    for elem in root.iter():
+        if not isinstance(elem.tag, str):
+            continue
+        local_name = _local_name(elem)
+        if local_name == "Layer":
+            add(LAYER_SECTION_PREFIX + _section_name(elem), elem)
+        elif local_name == "FeatureType":
+            add(FEATURE_TYPE_SECTION_PREFIX + _section_name(elem), elem)
+
+    document_digest = hashlib.sha256(_element_digest(root, skip=set()))
+    digests[DOCUMENT_SECTION] = document_digest.hexdigest()
+    return digests
+
+
+def get_change_set(old_digests: dict, new_digests: dict) -> dict:
+    """ Compares the section digests of two documents
+
+    Args:
+        old_digests (dict): The digests of the old document
+        new_digests (dict): The digests of the new document
+    Returns:
+         change_set (dict): The added, removed and changed sections or None if the documents are equal
+    """
+    if old_digests.get(DOCUMENT_SECTION) == new_digests.get(DOCUMENT_SECTION):
+        return None
+
+    old_keys = old_digests.keys() - {DOCUMENT_SECTION}
+    new_keys = new_digests.keys() - {DOCUMENT_SECTION}
+    change_set = {
+        "added": sorted(new_keys - old_keys),
+        "removed": sorted(old_keys - new_keys),
+        "changed": sorted(key for key in old_keys & new_keys if old_digests[key] != new_digests[key]),
+    }
+    if not any(change_set.values()):
+        # Only something outside of the sections changed, e.g. an attribute of the root element
+        change_set["changed"] = [DOCUMENT_SECTION]
+    return change_set
@@ -0,0 +1,96 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+from django.db import transaction
+from django.db.models import Q, F
+
+from service.models import Metadata, MetadataRelation, Document, GenericUrl, Keyword, Service
+
+
+def mark_deleted(root_md: Metadata):
+    """ Hides a service and all of its subelements until they are removed by async_remove_service
+
+    Args:
+        root_md (Metadata): The root metadata of the service
+    Returns:
+         nothing
+    """
+    root_md.get_subtree_metadatas(include_self=True).update(is_deleted=True, is_active=False)
+
+
+def get_deletion_order(root_md: Metadata):
+    """ Returns the ids of all metadata records, which are removed together with the given root metadata
+
+    Related metadata records, like datasets, which are not related to by any record outside of the service, come
+    first. Layers are ordered deepest first, so child layers are always removed before their parents. The root
+    metadata comes last.
+
+    Args:
+        root_md (Metadata): The root metadata of the service
+    Returns:
+         ids (list): The metadata ids in deletion order
+    """
+    subtree_mds = root_md.get_subtree_metadatas(include_self=True)
+    related_ids = MetadataRelation.objects.filter(
+        from_metadata__in=subtree_mds
+    ).exclude(
+        to_metadata__in=subtree_mds
+    ).values("to_metadata_id")
+    orphaned_ids = Metadata.objects.filter(
+        id__in=related_ids
+    ).exclude(
+        id__in=MetadataRelation.objects.filter(
+            to_metadata__in=related_ids
+        ).exclude(
+            from_metadata__in=subtree_mds
+        ).values("to_metadata_id")
+    ).values_list("id", flat=True)
+
+    element_ids = root_md.get_subtree_metadatas().order_by(
+        F("service__layer__level").desc(nulls_last=True)
+    ).values_list("id", flat=True)
+
+    return [*orphaned_ids, *element_ids, root_md.id]
+
+
+@transaction.atomic
+def delete_metadata_batch(md_ids: list):
+    """ Removes the given metadata records and all of their described elements with set based statements
+
+    Urls and keywords are removed as well, if they are not used by any other record. The elements of the records
+    are removed by the cascading delete of django, which works on the whole batch at once.
+
+    Args:
+        md_ids (list): The metadata ids
+    Returns:
+         nothing
+    """
+    url_ids = [
+        *Metadata.additional_urls.through.objects.filter(
+            metadata_id__in=md_ids
+        ).values_list("genericurl_id", flat=True),
+        *Service.operation_urls.through.objects.filter(
+            service__metadata_id__in=md_ids
+        ).values_list("serviceurl_id", flat=True),
+    ]
+    keyword_ids = list(Metadata.keywords.through.objects.filter(
+        metadata_id__in=md_ids
+    ).values_list("keyword_id", flat=True))
+
+    Document.objects.filter(metadata_id__in=md_ids).delete()
+    MetadataRelation.objects.filter(Q(from_metadata_id__in=md_ids) | Q(to_metadata_id__in=md_ids)).delete()
+    Metadata.objects.filter(id__in=md_ids).delete()
+
+    GenericUrl.objects.filter(
+        id__in=url_ids,
+        metadata__isnull=True,
+        serviceurl__service__isnull=True,
+    ).delete()
+    Keyword.objects.filter(
+        id__in=keyword_ids,
+        metadata__isnull=True,
+    ).delete()
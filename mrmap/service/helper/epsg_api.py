@@ -6,13 +6,108 @@ Created on: 29.04.19
 
 """
 import json
+import re
+from functools import lru_cache
 
 import requests
 
 from MrMap.cacher import EPSGCacher
-from MrMap.settings import PROXIES, XML_NAMESPACES
+from MrMap.settings import PROXIES, XML_NAMESPACES_GML_3_2
 from service.helper import xml_helper
 from service.helper.enums import OGCServiceEnum, OGCServiceVersionEnum
+from service.settings import EPSG_AXIS_ORDER_FILE_PATH, EPSG_AXIS_ORDER_LIVE_LOOKUP, \
+    EPSG_AXIS_ORDER_LIVE_LOOKUP_TIMEOUT, service_logger
+
+DEFAULT_AXIS_ORDER = {
+    "first_axis": "east",
+    "second_axis": "north",
+}
+
+# Identifiers of the OGC reference systems, like CRS:84 or urn:ogc:def:crs:OGC:1.3:CRS84. All of them are (east, north).
+OGC_CRS_IDENTIFIER_PATTERN = re.compile(r"(^|:)CRS:?(84|83|27)$", re.IGNORECASE)
+
+# Service types and versions, which respect the axis order of the spatial reference system
+SERVICE_TYPES_TO_BE_CHECKED = {
+    OGCServiceEnum.WMS.value: {
+        OGCServiceVersionEnum.V_1_3_0.value: True
+    },
+    OGCServiceEnum.WFS.value: {
+        OGCServiceVersionEnum.V_1_1_0.value: True,
+        OGCServiceVersionEnum.V_2_0_0.value: True,
+        OGCServiceVersionEnum.V_2_0_2.value: True,
+    },
+    "gml": {
+        "3.2.0": True
+    }
+}
+
+
+class AxisOrderRegistry:
+    """ Holds the axis orders of spatial reference systems by their numeral identifier
+
+    The axis orders are read from a json file, which contains ranges of identifiers per axis order, like
+
+        {"version": "10.003", "axis_orders": {"north,east": [[4326, 4326], [31466, 31469]], ...}}
+
+    """
+    def __init__(self, file_path: str):
+        self.version = None
+        self.axis_orders = {}
+        self._load(file_path)
+
+    def _load(self, file_path: str):
+        """ Reads the axis orders from the file
+
+        Args:
+            file_path (str): The path of the json file
+        Returns:
+
+        """
+        with open(file_path, "r") as file:
+            content = json.load(file)
+
+        self.version = content.get("version")
+        for order, id_ranges in content.get("axis_orders", {}).items():
+            first_axis, second_axis = order.split(",")
+            # All identifiers with the same order share one dict
+            axis_order = {
+                "first_axis": first_axis,
+                "second_axis": second_axis,
+            }
+            for first_id, last_id in id_ranges:
+                for id in range(first_id, last_id + 1):
+                    self.axis_orders[id] = axis_order
+
+    def get(self, id: int):
+        """ Returns the axis order of a spatial reference system
+
+        Args:
+            id (int): The numeral identifier
+        Returns:
+             axis_order (dict|None): The axis order or None if the system is unknown
+        """
+        return self.axis_orders.get(id)
+
+    def add(self, id: int, axis_order: dict):
+        """ Adds the axis order of a spatial reference system
+
+        Args:
+            id (int): The numeral identifier
+            axis_order (dict): The axis order
+        Returns:
+
+        """
+        self.axis_orders[id] = axis_order
+
+
+@lru_cache(maxsize=None)
+def get_axis_order_registry():
+    """ Returns the axis order registry, which is loaded only once per process
+
+    Returns:
+         registry (AxisOrderRegistry): The registry
+    """
+    return AxisOrderRegistry(EPSG_AXIS_ORDER_FILE_PATH)
 
 
 class EpsgApi:
@@ -20,6 +115,8 @@ class EpsgApi:
         self.registry_uri = "http://www.epsg-registry.org/export.htm?gml="
         self.id_prefix = "urn:ogc:def:crs:EPSG::"
 
+        self.registry = get_axis_order_registry()
+
         # Cacher
         self.cacher = EPSGCacher()
 
@@ -61,50 +158,83 @@ class EpsgApi:
     def _get_axis_order(self, identifier: str):
         """ Returns the axis order for a given spatial result system
 
+        The axis order is taken from the bundled registry. Only if the system is unknown and
+        EPSG_AXIS_ORDER_LIVE_LOOKUP is enabled, the epsg-registry.org is requested. Failed requests are remembered
+        as well, so an unknown system is requested at most once per process.
+
         Args:
-            identifier:
+            identifier (str): The identifier of the spatial reference system, e.g. 'EPSG:4326'
         Returns:
-
+             axis_order (dict): The first and second axis
         """
+        if OGC_CRS_IDENTIFIER_PATTERN.search(identifier.strip()):
+            # Not an EPSG code, although e.g. CRS:84 would be parsed as 84
+            return DEFAULT_AXIS_ORDER
+
         id = self.get_real_identifier(identifier)
+        if id < 0:
+            return DEFAULT_AXIS_ORDER
+
+        axis_order = self.registry.get(id)
+        if axis_order is not None:
+            return axis_order
+
+        if not EPSG_AXIS_ORDER_LIVE_LOOKUP:
+            return DEFAULT_AXIS_ORDER
 
         axis_order = self.cacher.get(str(id))
         if axis_order is not None:
             axis_order = json.loads(axis_order)
+            self.registry.add(id, axis_order)
             return axis_order
 
-        XML_NAMESPACES["gml"] = "http://www.opengis.net/gml/3.2"
+        try:
+            axis_order = self._request_axis_order(id)
+        except (requests.exceptions.RequestException, AttributeError, IndexError) as e:
+            service_logger.error("Axis order of {} could not be requested: {}".format(identifier, e))
+            # Otherwise each call would block on the epsg-registry.org again
+            self.registry.add(id, DEFAULT_AXIS_ORDER)
+            return DEFAULT_AXIS_ORDER
+
+        # Write this to cache, so it can be used on another request!
+        self.cacher.set(str(id), json.dumps(axis_order))
+        self.registry.add(id, axis_order)
+
+        return axis_order
 
+    def _request_axis_order(self, id: int):
+        """ Requests the axis order of a spatial reference system from the epsg-registry.org
+
+        Args:
+            id (int): The numeral identifier
+        Returns:
+             axis_order (dict): The first and second axis
+        """
         uri = self.registry_uri + self.id_prefix + str(id)
-        response = requests.request("Get", url=uri, proxies=PROXIES)
+        response = requests.request("Get", url=uri, proxies=PROXIES, timeout=EPSG_AXIS_ORDER_LIVE_LOOKUP_TIMEOUT)
         response = xml_helper.parse_xml(str(response.content.decode()))
         type = xml_helper.try_get_text_from_xml_element(xml_elem=response, elem="//epsg:type")
         if type == "projected":
-            cartes_elem = xml_helper.try_get_single_element_from_xml("//gml:cartesianCS", response)
+            cartes_elem = xml_helper.try_get_single_element_from_xml("//gml:cartesianCS", response, namespaces=XML_NAMESPACES_GML_3_2)
             second_level_srs_uri = xml_helper.get_href_attribute(xml_elem=cartes_elem)
         elif type == "geographic 2D":
-            geogr_elem = xml_helper.try_get_single_element_from_xml("//gml:ellipsoidalCS", response)
+            geogr_elem = xml_helper.try_get_single_element_from_xml("//gml:ellipsoidalCS", response, namespaces=XML_NAMESPACES_GML_3_2)
             second_level_srs_uri = xml_helper.get_href_attribute(xml_elem=geogr_elem)
         else:
             second_level_srs_uri = ""
 
         uri = self.registry_uri + second_level_srs_uri
-        response = requests.request("Get", url=uri, proxies=PROXIES)
+        response = requests.request("Get", url=uri, proxies=PROXIES, timeout=EPSG_AXIS_ORDER_LIVE_LOOKUP_TIMEOUT)
         response = xml_helper.parse_xml(str(response.content.decode()))
-        axis = xml_helper.try_get_element_from_xml("//gml:axisDirection", response)
+        axis = xml_helper.try_get_element_from_xml("//gml:axisDirection", response, namespaces=XML_NAMESPACES_GML_3_2)
         order = []
         for a in axis:
             order.append(a.text)
-        order = {
+        return {
             "first_axis": order[0],
             "second_axis": order[1],
         }
 
-        # Write this to cache, so it can be used on another request!
-        self.cacher.set(str(id), json.dumps(order))
-
-        return order
-
     def check_switch_axis_order(self, service_type: str, service_version: str, srs_identifier: str):
         """ Checks whether the axis have to be switched, regarding the given service type (like 'wms_1.3.0')
         and spatial reference system identifier
@@ -117,24 +247,7 @@ class EpsgApi:
         Returns:
              ret_val (bool): Whether the axis have to be switched or not
         """
-        service_type = service_type.lower()
-        service_version = service_version.lower()
-
-        service_types_to_be_checked = {
-            OGCServiceEnum.WMS.value: {
-                OGCServiceVersionEnum.V_1_3_0.value: True
-            },
-            OGCServiceEnum.WFS.value: {
-                OGCServiceVersionEnum.V_1_1_0.value: True,
-                OGCServiceVersionEnum.V_2_0_0.value: True,
-                OGCServiceVersionEnum.V_2_0_2.value: True,
-            },
-            "GML": {
-                "3.2.0": True
-            }
-        }
-
-        found = service_types_to_be_checked.get(service_type, {}).get(service_version, False)
+        found = SERVICE_TYPES_TO_BE_CHECKED.get(service_type.lower(), {}).get(service_version.lower(), False)
 
         if not found:
             return False
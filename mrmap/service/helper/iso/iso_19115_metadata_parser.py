@@ -17,7 +17,7 @@ from django.db import transaction
 from django.utils.timezone import utc
 from lxml.etree import _Element, Element
 
-from MrMap.settings import XML_NAMESPACES, GENERIC_NAMESPACE_TEMPLATE
+from MrMap.settings import GENERIC_NAMESPACE_TEMPLATE
 from service.settings import INSPIRE_LEGISLATION_FILE, HTML_METADATA_URI_TEMPLATE, SERVICE_METADATA_URI_TEMPLATE, \
     SERVICE_DATASET_URI_TEMPLATE
 from MrMap import utils
@@ -30,11 +30,11 @@ from structure.models import Organization, MrMapGroup
 
 
 class ISOMetadata:
-    def __init__(self, uri: str, origin: str = ResourceOriginEnum.CAPABILITIES.value):
+    def __init__(self, uri: str, origin: str = ResourceOriginEnum.CAPABILITIES.value, raw_metadata: str = None):
         self.section = "all" # serviceIdentification, serviceProvider, operationMetadata, contents, all
 
         self.uri = uri
-        self.raw_metadata = None
+        self.raw_metadata = raw_metadata
 
         self.character_set_code = None
         self.md_standard_name = None
@@ -114,17 +114,9 @@ class ISOMetadata:
 
         self.is_broken = False
 
-        XML_NAMESPACES["gmd"] = "http://www.isotc211.org/2005/gmd"
-        XML_NAMESPACES["gco"] = "http://www.isotc211.org/2005/gco"
-        XML_NAMESPACES["gml"] = "http://www.opengis.net/gml"
-        XML_NAMESPACES["srv"] = "http://www.isotc211.org/2005/srv"
-        XML_NAMESPACES["xlink"] = "http://www.w3.org/1999/xlink"
-        XML_NAMESPACES["xsi"] = "http://www.w3.org/2001/XMLSchema-instance"
-        XML_NAMESPACES["inspire_common"] = "http://inspire.ec.europa.eu/schemas/common/1.0"
-        XML_NAMESPACES["inspire_vs"] = "http://inspire.ec.europa.eu/schemas/inspire_vs/1.0"
-
-        # load uri and start parsing
-        self.get_metadata()
+        # load uri, if the document was not fetched already, and start parsing
+        if self.raw_metadata is None:
+            self.get_metadata()
         self.parse_xml()
 
         # check for validity
@@ -146,8 +138,19 @@ class ISOMetadata:
         Returns:
              nothing
         """
+        self.raw_metadata = self.fetch_raw_metadata(self.uri)
+
+    @staticmethod
+    def fetch_raw_metadata(uri: str):
+        """ Loads the metadata document from the given uri
+
+        Args:
+            uri (str): The metadata uri
+        Returns:
+             raw_metadata (str): The metadata document
+        """
         ows_connector = CommonConnector(
-            url=self.uri,
+            url=uri,
             external_auth=None,
             connection_type=ConnectionEnum.REQUESTS
         )
@@ -156,7 +159,7 @@ class ISOMetadata:
         if ows_connector.status_code != 200:
             raise ConnectionError(ows_connector.status_code)
 
-        self.raw_metadata = ows_connector.content.decode("UTF-8")
+        return ows_connector.content.decode("UTF-8")
 
     def _parse_xml_dataset_id(self, xml_obj: _Element, xpath_type: str):
         """ Parse the dataset id and it's code space from the metadata xml
@@ -599,8 +602,10 @@ class ISOMetadata:
                 document_type=DocumentEnum.METADATA.value,
                 is_original=True,
             )[0]
-            orig_document.content = self.raw_metadata
-            orig_document.save()
+            # Rewrite the document only if its content changed
+            if orig_document.content_hash != Document.get_content_hash(self.raw_metadata):
+                orig_document.content = self.raw_metadata
+                orig_document.save()
 
             if update:
                 metadata.keywords.clear()
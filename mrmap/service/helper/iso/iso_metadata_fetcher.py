@@ -0,0 +1,124 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
+
+from service.helper.enums import ResourceOriginEnum
+from service.helper.iso.iso_19115_metadata_parser import ISOMetadata
+from service.models import Document
+from service.settings import ISO_METADATA_FETCH_WORKERS, service_logger
+
+
+class ISOMetadataFetcher:
+    """ Fetches the iso metadata documents, which are linked in a capabilities document
+
+    All uris are collected first, so every document is downloaded only once and the downloads run in parallel. The raw
+    documents are stored by their content hash (the same hash as Document.content_hash). A document, which is linked
+    under different uris, is therefore parsed only once as well.
+
+    """
+    def __init__(self, max_workers: int = ISO_METADATA_FETCH_WORKERS):
+        self.max_workers = max_workers
+
+        # uri -> content hash
+        self.uri_hashes = {}
+        # content hash -> raw document
+        self.documents = {}
+        # uri -> exception, which occured while fetching or parsing
+        self.errors = {}
+        # content hash -> parsed ISOMetadata
+        self.parsed_documents = {}
+
+    def fetch(self, uris: list):
+        """ Fetches all given uris, which have not been fetched yet, in parallel
+
+        Args:
+            uris (list): The metadata uris
+        Returns:
+             nothing
+        """
+        uris = [
+            uri for uri in OrderedDict.fromkeys(uris)
+            if uri and uri not in self.uri_hashes and uri not in self.errors
+        ]
+        if not uris:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(uris))) as executor:
+            results = executor.map(self._fetch_single, uris)
+            for uri, (raw_metadata, error) in zip(uris, results):
+                if error is not None:
+                    self.errors[uri] = error
+                    continue
+                self._store(uri, raw_metadata)
+
+        service_logger.debug(
+            "Fetched {} iso metadata uris into {} documents".format(len(uris), len(self.documents))
+        )
+
+    @staticmethod
+    def _fetch_single(uri: str):
+        """ Fetches a single uri without raising
+
+        Args:
+            uri (str): The metadata uri
+        Returns:
+             raw_metadata, error (tuple): The document or the exception which occured
+        """
+        try:
+            return ISOMetadata.fetch_raw_metadata(uri), None
+        except Exception as e:
+            return None, e
+
+    def _store(self, uri: str, raw_metadata: str):
+        """ Stores a fetched document by its content hash
+
+        Args:
+            uri (str): The metadata uri
+            raw_metadata (str): The document
+        Returns:
+             nothing
+        """
+        content_hash = Document.get_content_hash(raw_metadata)
+        self.uri_hashes[uri] = content_hash
+        self.documents.setdefault(content_hash, raw_metadata)
+
+    def get(self, uri: str, origin: str = ResourceOriginEnum.CAPABILITIES.value):
+        """ Returns the parsed iso metadata of an uri
+
+        Uris which were not passed to fetch() before, are fetched now.
+
+        Args:
+            uri (str): The metadata uri
+            origin (str): The origin of the metadata
+        Returns:
+             iso_metadata (ISOMetadata): The parsed metadata
+        Raises:
+             Exception: The exception which occured while fetching or parsing the document
+        """
+        if uri not in self.uri_hashes and uri not in self.errors:
+            self.fetch([uri])
+        if uri in self.errors:
+            raise self.errors[uri]
+
+        content_hash = self.uri_hashes[uri]
+        iso_metadata = self.parsed_documents.get(content_hash)
+        if iso_metadata is None:
+            try:
+                iso_metadata = ISOMetadata(uri=uri, origin=origin, raw_metadata=self.documents[content_hash])
+            except Exception as e:
+                self.errors[uri] = e
+                raise
+            self.parsed_documents[content_hash] = iso_metadata
+        elif iso_metadata.uri != uri or iso_metadata.origin != origin:
+            # Same document, linked under another uri
+            iso_metadata = copy(iso_metadata)
+            iso_metadata.uri = uri
+            iso_metadata.origin = origin
+        return iso_metadata
@@ -0,0 +1,182 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import asyncio
+
+from PIL import Image
+from asgiref.sync import sync_to_async
+
+from service.helper import async_connector
+from service.helper.enums import OGCOperationEnum
+from service.helper.ogc.operation_request_handler import OGCOperationRequestHandler
+from service.helper.ogc.request_builder import OGCRequestPOSTBuilder
+from service.settings import service_logger
+
+
+class AsyncOGCOperationRequestHandler(OGCOperationRequestHandler):
+    """ Performs the upstream requests of the security proxy as coroutines
+
+    The parsing of the request and all database access stay synchronous. The handler has to be created and its
+    database related methods have to be called by using sync_to_async.
+
+    """
+    async def get_operation_response_async(self, uri: str = None, post_data: dict = None, post_xml_body: str = None):
+        """ Performs the request like get_operation_response(), but without blocking a thread
+
+        Args:
+            uri (str): The operation uri
+            post_data(dict): A key-value dict of the POST data
+            post_xml_body (str): A post xml body
+        Returns:
+             The response dict
+        """
+        if uri is None:
+            uri = self._create_GET_uri()
+
+        # Check if GET wouldn't work due to the length limitation of 2048 characters
+        force_post = len(uri) > 2048
+
+        if self.request_is_GET and not force_post:
+            response = await async_connector.get(uri, external_auth=self.external_auth)
+        else:
+            if post_xml_body is not None:
+                post_content = post_xml_body
+            elif post_data is None:
+                post_content = self._create_POST_data()
+            else:
+                post_content = post_data
+            response = await async_connector.post(self.post_uri, post_content, external_auth=self.external_auth)
+
+            # Some GIS servers can not handle x-www-form-urlencoded content, so we try again with a xml document
+            try_again_code_list = [500, 501, 502, 504, 510]
+            if response.status_code in try_again_code_list:
+                request_builder = OGCRequestPOSTBuilder(post_content, self.POST_raw_body)
+                post_xml = request_builder.build_POST_xml()
+                response = await async_connector.post(self.post_uri, post_xml, external_auth=self.external_auth)
+
+        if response.status_code != 200:
+            raise Exception(response.status_code)
+
+        return {
+            "response": response.content,
+            "response_type": response.headers.get("content-type", ""),
+            "response_headers": {
+                header: response.headers.get(header, None) for header in ("cache-control", "etag")
+            },
+        }
+
+    async def _create_secured_service_mask_async(self, sec_ops: list):
+        """ Fetches all single masks at once and combines them
+
+        Args:
+            sec_ops (list): The evaluated SecuredOperation objects
+        Returns:
+             mask (Image): The combined mask, an error mask or None if the operations are not restricted to an area
+        """
+        try:
+            mask_uris = self._get_mask_uris(sec_ops)
+            if mask_uris is None:
+                return None
+            responses = await asyncio.gather(*[async_connector.get(uri) for uri in mask_uris])
+            mask_contents = [response.content for response in responses]
+        except Exception as e:
+            service_logger.exception(e)
+            mask_contents = None
+        return await sync_to_async(self._combine_masks, thread_sensitive=False)(mask_contents)
+
+    async def _get_composited_map_response_async(self, groups: list):
+        """ Renders and masks all layer groups concurrently and composites them
+
+        Args:
+            groups (list): The layer groups, like returned by _get_layer_access_groups()
+        Returns:
+             response (dict): The response dict
+        """
+        group_requests = [self._get_map_group_request(layer_identifiers) for layer_identifiers, sec_ops in groups]
+        results = await asyncio.gather(
+            *[self.get_operation_response_async(uri=uri, post_data=post_data) for uri, post_data in group_requests],
+            *[self._create_secured_service_mask_async(sec_ops) for layer_identifiers, sec_ops in groups],
+        )
+        images = [response["response"] for response in results[:len(groups)]]
+        masks = results[len(groups):]
+
+        return {
+            "response": await sync_to_async(self._create_composited_map, thread_sensitive=False)(images, masks),
+            "response_type": Image.MIME.get(self._get_composited_map_format(), "image/png"),
+        }
+
+    def _list_allowed_operations(self):
+        """ Evaluates the allowed operations, so they can be used outside of the database thread
+
+        Returns:
+             sec_ops (list): The allowed operations or None if the user is not allowed to perform the operation at all
+        """
+        sec_ops = self._get_allowed_operations()
+        if sec_ops is None:
+            return None
+        return list(sec_ops)
+
+    async def get_allowed_operation_response_async(self):
+        """ Calls the operation of a secured service like get_allowed_operation_response()
+
+        The map image and its mask are fetched concurrently.
+
+        Returns:
+             The response dict
+        """
+        response = {
+            "response": None,
+            "response_type": ""
+        }
+
+        sec_ops = await sync_to_async(self._list_allowed_operations, thread_sensitive=True)()
+        if sec_ops is None:
+            return response
+
+        request_param = self.request_param.upper()
+
+        # WMS - Features
+        if request_param == OGCOperationEnum.GET_FEATURE_INFO.value.upper():
+            if await sync_to_async(self._is_get_feature_info_allowed, thread_sensitive=True)():
+                response = await self.get_operation_response_async()
+
+        # WMS - 'Map image'
+        elif request_param == OGCOperationEnum.GET_MAP.value.upper():
+            groups = await sync_to_async(self._get_layer_access_groups, thread_sensitive=True)()
+            if len(groups) > 1:
+                # The requested layers are restricted to different areas, so each group needs its own mask
+                return await self._get_composited_map_response_async(groups)
+            elif len(groups) == 1:
+                sec_ops = groups[0][1]
+
+            response, mask = await asyncio.gather(
+                self.get_operation_response_async(),
+                self._create_secured_service_mask_async(sec_ops),
+            )
+            response["response"] = await sync_to_async(self._create_masked_image, thread_sensitive=False)(
+                response.get("response", ""),
+                mask,
+                as_bytes=True
+            )
+
+        # WMS - 'Legend image', WFS - 'DescribeFeatureType'
+        elif request_param in [OGCOperationEnum.GET_LEGEND_GRAPHIC.value.upper(),
+                               OGCOperationEnum.DESCRIBE_FEATURE_TYPE.value.upper()]:
+            response = await self.get_operation_response_async()
+
+        # WFS - 'GetFeature'
+        elif request_param == OGCOperationEnum.GET_FEATURE.value.upper():
+            await sync_to_async(self._bbox_to_filter, thread_sensitive=True)()
+            await sync_to_async(self._extend_filter_by_spatial_restriction, thread_sensitive=True)(sec_ops)
+            response = await self.get_operation_response_async()
+
+        # WFS - 'Transaction'
+        elif request_param == OGCOperationEnum.TRANSACTION.value.upper():
+            await sync_to_async(self._filter_transaction_geometries, thread_sensitive=False)(sec_ops)
+            response = await self.get_operation_response_async(post_xml_body=self.POST_raw_body)
+
+        return response
@@ -0,0 +1,422 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import uuid
+
+from django.db import transaction
+from django.utils import timezone
+
+from MrMap.settings import HTTP_OR_SSL, HOST_NAME, ROOT_URL
+from service.helper import xml_helper
+from service.helper.enums import OGCServiceEnum, OGCServiceVersionEnum, OGCOperationEnum, HttpMethodEnum
+from service.models import Metadata, Document, Service, Style
+from service.settings import SERVICE_OPERATION_URI_TEMPLATE, SERVICE_DATASET_URI_TEMPLATE, \
+    SERVICE_LEGEND_URI_TEMPLATE
+
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+HTTP_METHODS = [HttpMethodEnum.GET.value, HttpMethodEnum.POST.value]
+
+# WMS 1.0.0 names its operations without the 'Get' prefix
+WMS_1_0_0_OPERATIONS = {
+    "Capabilities": OGCOperationEnum.GET_CAPABILITIES.value,
+    "Map": OGCOperationEnum.GET_MAP.value,
+    "FeatureInfo": OGCOperationEnum.GET_FEATURE_INFO.value,
+}
+
+
+def _local_name(xml_elem):
+    """ Returns the tag name of a xml element without the namespace
+
+    Args:
+        xml_elem: The xml element
+    Returns:
+         name (str): The local name or None for comments and processing instructions
+    """
+    tag = xml_elem.tag
+    if not isinstance(tag, str):
+        return None
+    return tag.rsplit("}", 1)[-1]
+
+
+class CapabilitiesRewriter:
+    """ Sets or unsets the proxy uris of capabilities documents in a single pass
+
+    All operation, legend and dataset metadata uris of a document are rewritten during one walk over the parsed xml tree.
+    The lookups, which are needed for this, are loaded once per rewriter and shared between all documents of a service,
+    so the rewriter should be reused for all documents of the same service.
+
+    """
+    def __init__(self, metadata: Metadata, use_proxy: bool, force_version=None):
+        """ Constructor
+
+        Args:
+            metadata (Metadata): The metadata of the service or one of its subelements
+            use_proxy (bool): Whether the proxy uris shall be set or the original ones restored
+            force_version (OGCServiceVersionEnum|str): Which version processing shall be forced
+        """
+        self.use_proxy = use_proxy
+        self.root_metadata = metadata.get_root_metadata()
+
+        service_type = metadata.service_type
+        self.is_wms = service_type == OGCServiceEnum.WMS
+        self.is_wfs = service_type == OGCServiceEnum.WFS
+
+        version = force_version or self.root_metadata.get_service_version()
+        # The version may be passed as enum or as plain string
+        self.version = getattr(version, "value", version)
+
+        # metadata id -> {(operation, method): url}
+        self._operation_urls = {}
+        # legend uri -> style id and vice versa
+        self._style_ids = None
+        self._legend_uris = None
+        # metadata url -> metadata id and vice versa
+        self._dataset_ids = {}
+        self._dataset_urls = {}
+
+    @property
+    def is_1_0_0(self):
+        return self.version == OGCServiceVersionEnum.V_1_0_0.value
+
+    def rewrite(self, document: Document):
+        """ Rewrites the content of a single document
+
+        The document is not saved.
+
+        Args:
+            document (Document): The capabilities document
+        Returns:
+             document (Document): The modified document
+        """
+        self._rewrite_all([document])
+        return document
+
+    def rewrite_documents(self, documents):
+        """ Rewrites and saves all given documents in one transaction
+
+        Args:
+            documents (iterable): The capabilities documents of a service's subelements
+        Returns:
+             documents (list): The modified documents
+        """
+        documents = [doc for doc in documents if doc.content is not None]
+        if not documents:
+            return documents
+
+        self._load_operation_urls([doc.metadata_id for doc in documents])
+        self._rewrite_all(documents)
+
+        now = timezone.now()
+        for doc in documents:
+            doc.last_modified = now
+            doc.content_hash = Document.get_content_hash(doc.content)
+
+        with transaction.atomic():
+            Document.objects.bulk_update(documents, ["content", "content_hash", "last_modified"], batch_size=500)
+        return documents
+
+    def _rewrite_all(self, documents: list):
+        """ Parses each document once, rewrites it and serializes it once
+
+        Dataset metadata uris are collected over all documents, so they can be resolved in a single query.
+
+        Args:
+            documents (list): The documents
+        Returns:
+             nothing
+        """
+        parsed = []
+        dataset_elements = []
+        for doc in documents:
+            if doc.content is None:
+                continue
+            xml_obj = xml_helper.parse_xml(doc.content)
+            if xml_obj is None:
+                continue
+            dataset_elements += self._walk(xml_obj, doc.metadata)
+            parsed.append((doc, xml_obj))
+
+        self._rewrite_dataset_uris(dataset_elements)
+
+        for doc, xml_obj in parsed:
+            doc.content = xml_helper.xml_to_string(xml_obj)
+
+    def _walk(self, xml_obj, metadata: Metadata):
+        """ Walks over the whole xml tree once and rewrites the operation and legend uris
+
+        Args:
+            xml_obj: The parsed document
+            metadata (Metadata): The metadata of the document
+        Returns:
+             dataset_elements (list): Tuples of (xml element, uri, is_text) for the found dataset metadata uris
+        """
+        operation_uri = SERVICE_OPERATION_URI_TEMPLATE.format(metadata.id)
+        dataset_elements = []
+
+        for xml_elem in xml_obj.iter():
+            name = _local_name(xml_elem)
+            if name is None:
+                continue
+
+            if name == "Request":
+                parent = xml_elem.getparent()
+                if parent is not None and _local_name(parent) == "Capability":
+                    self._rewrite_request_operations(xml_elem, metadata, operation_uri)
+            elif name == "Operation":
+                if self.is_wfs and not self.is_1_0_0:
+                    self._rewrite_wfs_operation(xml_elem, metadata, operation_uri)
+            elif name == "LegendURL":
+                self._rewrite_legend_uri(xml_elem, metadata)
+            elif name == "MetadataURL":
+                dataset_elem = self._get_dataset_element(xml_elem)
+                if dataset_elem is not None:
+                    dataset_elements.append(dataset_elem)
+
+        return dataset_elements
+
+    def _get_operation_url(self, metadata: Metadata, operation: str, method: str):
+        """ Returns the original url of an operation
+
+        Args:
+            metadata (Metadata): The metadata of the document
+            operation (str): The operation name
+            method (str): The http method
+        Returns:
+             url (str): The url or None
+        """
+        if self.is_wfs:
+            # FeatureTypes are no services - all of them use the operation urls of their parent service
+            metadata = self.root_metadata
+        if metadata.id not in self._operation_urls:
+            self._load_operation_urls([metadata.id])
+        return self._operation_urls[metadata.id].get((operation, method), None)
+
+    def _load_operation_urls(self, metadata_ids: list):
+        """ Loads the operation urls of the services, which are described by the given metadata ids, in one query
+
+        Args:
+            metadata_ids (list): The metadata ids
+        Returns:
+             nothing
+        """
+        if self.is_wfs:
+            metadata_ids = [self.root_metadata.id]
+        metadata_ids = [md_id for md_id in metadata_ids if md_id not in self._operation_urls]
+        if not metadata_ids:
+            return
+
+        for md_id in metadata_ids:
+            self._operation_urls[md_id] = {}
+        operation_urls = Service.operation_urls.through.objects.filter(
+            service__metadata__id__in=metadata_ids
+        ).values_list(
+            "service__metadata__id",
+            "serviceurl__operation",
+            "serviceurl__method",
+            "serviceurl__url",
+        )
+        for md_id, operation, method, url in operation_urls:
+            self._operation_urls[md_id].setdefault((operation, method), url)
+
+    def _rewrite_request_operations(self, request_elem, metadata: Metadata, operation_uri: str):
+        """ Rewrites the operations of a <Capability><Request> element (WMS and WFS 1.0.0)
+
+        Args:
+            request_elem: The <Request> element
+            metadata (Metadata): The metadata of the document
+            operation_uri (str): The proxy uri for all operations
+        Returns:
+             nothing
+        """
+        for op in request_elem:
+            op_name = _local_name(op)
+            if self.is_wms and self.is_1_0_0:
+                op_name = WMS_1_0_0_OPERATIONS.get(op_name, op_name)
+            # skip GetCapabilities - it is already set to another internal link
+            if op_name is None or op_name == OGCOperationEnum.GET_CAPABILITIES.value:
+                continue
+
+            for http_elem in op.iter():
+                method = _local_name(http_elem)
+                if method not in HTTP_METHODS:
+                    continue
+
+                if self.use_proxy:
+                    uri = operation_uri
+                else:
+                    uri = self._get_operation_url(metadata, op_name, method) or ""
+
+                if self.is_wms and not self.is_1_0_0:
+                    for res_elem in http_elem:
+                        if _local_name(res_elem) == "OnlineResource":
+                            res_elem.set(XLINK_HREF, uri)
+                else:
+                    http_elem.set("onlineResource", uri)
+
+    def _rewrite_wfs_operation(self, op_elem, metadata: Metadata, operation_uri: str):
+        """ Rewrites a WFS <Operation> element (WFS 1.1.0 and newer)
+
+        Args:
+            op_elem: The <Operation> element
+            metadata (Metadata): The metadata of the document
+            operation_uri (str): The proxy uri for all operations
+        Returns:
+             nothing
+        """
+        op_name = op_elem.get("name")
+        # skip GetCapabilities - it is already set to another internal link
+        if op_name is None or op_name == OGCOperationEnum.GET_CAPABILITIES.value:
+            return
+
+        for http_elem in op_elem.iter():
+            method = _local_name(http_elem)
+            if method not in HTTP_METHODS:
+                continue
+            parent = http_elem.getparent()
+            if _local_name(parent) != "HTTP":
+                continue
+
+            if self.use_proxy:
+                uri = operation_uri
+            else:
+                uri = self._get_operation_url(metadata, op_name, method) or self._get_operation_url(
+                    metadata,
+                    OGCOperationEnum.GET_FEATURE.value,
+                    HttpMethodEnum.GET.value
+                )
+            http_elem.set(XLINK_HREF, uri or "")
+
+    def _load_styles(self):
+        """ Loads the legend uris of all styles of the service in one query
+
+        Returns:
+             nothing
+        """
+        self._style_ids = {}
+        self._legend_uris = {}
+        styles = Style.objects.filter(
+            layer__parent_service__metadata=self.root_metadata
+        ).values_list("id", "legend_uri")
+        for style_id, legend_uri in styles:
+            self._legend_uris[str(style_id)] = legend_uri
+            if legend_uri is not None:
+                self._style_ids.setdefault(legend_uri, style_id)
+
+    def _rewrite_legend_uri(self, legend_elem, metadata: Metadata):
+        """ Rewrites the <OnlineResource> of a <LegendURL> element
+
+        Args:
+            legend_elem: The <LegendURL> element
+            metadata (Metadata): The metadata of the document
+        Returns:
+             nothing
+        """
+        for res_elem in legend_elem:
+            if _local_name(res_elem) != "OnlineResource":
+                continue
+            legend_uri = xml_helper.get_href_attribute(res_elem)
+            if legend_uri is None:
+                continue
+
+            if self._style_ids is None:
+                self._load_styles()
+
+            uri = None
+            if self.use_proxy and not legend_uri.startswith(ROOT_URL):
+                style_id = self._style_ids.get(legend_uri, None)
+                if style_id is not None:
+                    uri = SERVICE_LEGEND_URI_TEMPLATE.format(metadata.id, style_id)
+            elif not self.use_proxy and legend_uri.startswith(ROOT_URL):
+                # restore the original legend uri by using the style identifier
+                uri = self._legend_uris.get(legend_uri.split("/")[-1], None)
+
+            if uri is not None:
+                res_elem.set(XLINK_HREF, uri)
+
+    def _get_dataset_element(self, metadata_url_elem):
+        """ Returns the element, which holds the dataset metadata uri, and the uri itself
+
+        Args:
+            metadata_url_elem: The <MetadataURL> element
+        Returns:
+             (xml element, uri, is_text) or None
+        """
+        if self.is_wfs:
+            if self.version in [OGCServiceVersionEnum.V_1_0_0.value, OGCServiceVersionEnum.V_1_1_0.value]:
+                # WFS 1.0.0 and 1.1.0 hold the uri as element text
+                uri = metadata_url_elem.text
+                uri = uri.strip() if uri is not None else None
+                return (metadata_url_elem, uri, True) if uri else None
+            uri = xml_helper.get_href_attribute(metadata_url_elem)
+            return (metadata_url_elem, uri, False) if uri else None
+
+        for res_elem in metadata_url_elem:
+            if _local_name(res_elem) == "OnlineResource":
+                uri = xml_helper.get_href_attribute(res_elem)
+                return (res_elem, uri, False) if uri else None
+        return None
+
+    def _rewrite_dataset_uris(self, dataset_elements: list):
+        """ Rewrites the dataset metadata uris
+
+        All unknown uris are resolved in one query.
+
+        Args:
+            dataset_elements (list): Tuples of (xml element, uri, is_text)
+        Returns:
+             nothing
+        """
+        own_uri_prefix = "{}{}".format(HTTP_OR_SSL, HOST_NAME)
+
+        if self.use_proxy:
+            urls = {
+                uri for elem, uri, is_text in dataset_elements
+                if not uri.startswith(own_uri_prefix) and uri not in self._dataset_ids
+            }
+            if urls:
+                records = Metadata.objects.filter(metadata_url__in=urls).values_list("metadata_url", "id")
+                for metadata_url, md_id in records:
+                    self._dataset_ids.setdefault(metadata_url, md_id)
+        else:
+            ids = set()
+            for elem, uri, is_text in dataset_elements:
+                if not uri.startswith(own_uri_prefix):
+                    continue
+                md_id = uri.split("/")[-1]
+                try:
+                    uuid.UUID(md_id)
+                except ValueError:
+                    continue
+                if md_id not in self._dataset_urls:
+                    ids.add(md_id)
+            if ids:
+                records = Metadata.objects.filter(id__in=ids).values_list("id", "metadata_url")
+                for md_id, metadata_url in records:
+                    self._dataset_urls[str(md_id)] = metadata_url
+
+        for elem, uri, is_text in dataset_elements:
+            new_uri = None
+            if self.use_proxy and not uri.startswith(own_uri_prefix):
+                md_id = self._dataset_ids.get(uri, None)
+                if md_id is not None:
+                    new_uri = SERVICE_DATASET_URI_TEMPLATE.format(md_id)
+                else:
+                    # This is a bad situation... Only possible if the registered service has not been updated BUT the
+                    # original remote service changed and maybe has a new - for us - unknown MetadataURL object.
+                    # This is why we can't find it in our db. We simply have to set it to some placeholder, since the
+                    # user has to update the service.
+                    new_uri = "unknown"
+            elif not self.use_proxy and uri.startswith(own_uri_prefix):
+                # this means we have our own proxy uri in here and want to restore the original one
+                new_uri = self._dataset_urls.get(uri.split("/")[-1], None)
+
+            if new_uri is None:
+                continue
+            if is_text:
+                elem.text = new_uri
+            else:
+                elem.set(XLINK_HREF, new_uri)
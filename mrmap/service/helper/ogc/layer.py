@@ -9,6 +9,59 @@ from structure.models import MrMapGroup, MrMapUser
 
 
 class OGCLayer:
+    """ The in-memory representation of a parsed layer
+
+    Capabilities documents may contain ten thousands of layers, so the objects only hold slots instead of an
+    instance dict.
+
+    """
+    __slots__ = (
+        "identifier",
+        "parent",
+        "is_queryable",
+        "is_opaque",
+        "is_cascaded",
+        "title",
+        "abstract",
+        "capability_keywords",
+        "capability_online_resource",
+        "capability_projection_system",
+        "capability_scale_hint",
+        "capability_bbox_lat_lon",
+        "capability_bbox_srs",
+        "format_list",
+        "get_capabilities_uri_GET",
+        "get_capabilities_uri_POST",
+        "get_map_uri_GET",
+        "get_map_uri_POST",
+        "get_feature_info_uri_GET",
+        "get_feature_info_uri_POST",
+        "describe_layer_uri_GET",
+        "describe_layer_uri_POST",
+        "get_legend_graphic_uri_GET",
+        "get_legend_graphic_uri_POST",
+        "get_styles_uri_GET",
+        "get_styles_uri_POST",
+        "dimension_list",
+        "style",
+        "child_layers",
+        "iso_metadata",
+    )
+
+    # The same for all layers, so it is shared instead of being created per object
+    operation_urls = ((OGCOperationEnum.GET_CAPABILITIES.value, 'get_capabilities_uri_GET', 'Get'),
+                      (OGCOperationEnum.GET_CAPABILITIES.value, 'get_capabilities_uri_POST', 'Post'),
+                      (OGCOperationEnum.GET_MAP.value, 'get_map_uri_GET', 'Get'),
+                      (OGCOperationEnum.GET_MAP.value, 'get_map_uri_POST', 'Post'),
+                      (OGCOperationEnum.GET_FEATURE_INFO.value, 'get_feature_info_uri_GET', 'Get'),
+                      (OGCOperationEnum.GET_FEATURE_INFO.value, 'get_feature_info_uri_POST', 'Post'),
+                      (OGCOperationEnum.DESCRIBE_LAYER.value, 'describe_layer_uri_GET', 'Get'),
+                      (OGCOperationEnum.DESCRIBE_LAYER.value, 'describe_layer_uri_POST', 'Post'),
+                      (OGCOperationEnum.GET_LEGEND_GRAPHIC.value, 'get_legend_graphic_uri_GET', 'Get'),
+                      (OGCOperationEnum.GET_LEGEND_GRAPHIC.value, 'get_legend_graphic_uri_POST', 'Post'),
+                      (OGCOperationEnum.GET_STYLES.value, 'get_styles_uri_GET', 'Get'),
+                      (OGCOperationEnum.GET_STYLES.value, 'get_styles_uri_POST', 'Post'))
+
     def __init__(self, identifier=None, parent=None, title=None, queryable=False, opaque=False,
                  cascaded=False, abstract=None):
         self.identifier = identifier
@@ -50,19 +103,6 @@ class OGCLayer:
         self.get_styles_uri_GET = None
         self.get_styles_uri_POST = None
 
-        self.operation_urls = [(OGCOperationEnum.GET_CAPABILITIES.value, 'get_capabilities_uri_GET', 'Get'),
-                               (OGCOperationEnum.GET_CAPABILITIES.value, 'get_capabilities_uri_POST', 'Post'),
-                               (OGCOperationEnum.GET_MAP.value, 'get_map_uri_GET', 'Get'),
-                               (OGCOperationEnum.GET_MAP.value, 'get_map_uri_POST', 'Post'),
-                               (OGCOperationEnum.GET_FEATURE_INFO.value, 'get_feature_info_uri_GET', 'Get'),
-                               (OGCOperationEnum.GET_FEATURE_INFO.value, 'get_feature_info_uri_POST', 'Post'),
-                               (OGCOperationEnum.DESCRIBE_LAYER.value, 'describe_layer_uri_GET', 'Get'),
-                               (OGCOperationEnum.DESCRIBE_LAYER.value, 'describe_layer_uri_POST', 'Post'),
-                               (OGCOperationEnum.GET_LEGEND_GRAPHIC.value, 'get_legend_graphic_uri_GET', 'Get'),
-                               (OGCOperationEnum.GET_LEGEND_GRAPHIC.value, 'get_legend_graphic_uri_POST', 'Post'),
-                               (OGCOperationEnum.GET_STYLES.value, 'get_styles_uri_GET', 'Get'),
-                               (OGCOperationEnum.GET_STYLES.value, 'get_styles_uri_POST', 'Post')]
-
         self.dimension_list = []
         self.style = None
         self.child_layers = []
@@ -8,14 +8,16 @@ Created on: 05.12.19
 import time
 import urllib
 import io
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
 
 from queue import Queue
 from threading import Thread
 
-from PIL import Image, ImageFont, ImageDraw
+from PIL import Image, ImageFont, ImageDraw, ImageColor
 from cryptography.fernet import InvalidToken
+from django.contrib.auth.models import AnonymousUser
 from django.contrib.gis.gdal import SpatialReference
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import connection
@@ -42,7 +44,7 @@ from service.models import Metadata, FeatureType, Layer, ProxyLog, AllowedOperat
 from service.settings import ALLLOWED_FEATURE_TYPE_ELEMENT_GEOMETRY_IDENTIFIERS, DEFAULT_SRS, DEFAULT_SRS_STRING, \
     MAPSERVER_SECURITY_MASK_FILE_PATH, MAPSERVER_SECURITY_MASK_TABLE, MAPSERVER_SECURITY_MASK_KEY_COLUMN, \
     MAPSERVER_SECURITY_MASK_GEOMETRY_COLUMN, MAPSERVER_LOCAL_PATH, DEFAULT_SRS_FAMILY, MIN_FONT_SIZE, FONT_IMG_RATIO, \
-    RENDER_TEXT_ON_IMG, MAX_FONT_SIZE, ERROR_MASK_VAL, ERROR_MASK_TXT, service_logger
+    RENDER_TEXT_ON_IMG, MAX_FONT_SIZE, ERROR_MASK_VAL, ERROR_MASK_TXT, SECURED_GET_MAP_MAX_WORKERS, service_logger
 from users.helper import user_helper
 
 
@@ -51,13 +53,18 @@ class OGCOperationRequestHandler:
 
     """
 
-    def __init__(self, request: HttpRequest, metadata: Metadata, uri: str = None):
+    def __init__(self, request: HttpRequest, metadata: Metadata, uri: str = None, params: dict = None, user=None):
         """ Constructor for OGCOperationRequestHandler
 
+        Operations, which are not requested by a client, like the rendering of preview images, can be handled without
+        a request. In this case the parameters are given as params and handled like GET parameters.
+
         Args:
-            request (HttpRequest): An incoming request
+            request (HttpRequest): An incoming request or None
             metadata (Metadata): The metadata object related to the operation call
             uri (str): The uri of the requested operation (optional)
+            params (dict): The operation parameters, if no request is given
+            user: The performing user, if no request is given. Defaults to an anonymous user
         """
         self.metadata = metadata
         self.get_uri = uri
@@ -79,7 +86,7 @@ class OGCOperationRequestHandler:
             raise Exception(SECURITY_PROXY_ERROR_WRONG_EXT_AUTH_KEY)
 
         # check what type of request we are facing
-        self.request_is_GET = request.method == "GET"
+        self.request_is_GET = request is None or request.method == "GET"
         self.original_params_dict = OrderedDict()  # contains the original, unedited parameters
         self.new_params_dict = OrderedDict()  # contains the parameters, which could be still original or might have changed during method processing
 
@@ -103,7 +110,10 @@ class OGCOperationRequestHandler:
         self.transaction_geometries = None  # contains all geometries that shall be INSERTed or UPDATEd by a  Transaction operation
 
         self.intersected_allowed_geometry = None
-        self.user = user_helper.get_user(request)
+        if request is None:
+            self.user = user or AnonymousUser()
+        else:
+            self.user = user_helper.get_user(request)
 
         # If user is AnonymousUser, we need to get the public groups
         if self.user.is_authenticated:
@@ -113,7 +123,12 @@ class OGCOperationRequestHandler:
 
         self.access_denied_img = None  # if subelements are not accessible for the user, this PIL.Image object represents an overlay with information about the resources, which can not be accessed
 
-        if self.request_is_GET:
+        if request is None:
+            # Values are handled as strings, like the parameters of a request
+            self.original_params_dict = {key: str(val) for key, val in (params or {}).items()}
+            if len(self.original_params_dict) == 0:
+                return
+        elif self.request_is_GET:
             self.original_params_dict = request.GET.dict()
             if len(self.original_params_dict) == 0:
                 # There are no parameters and therefore no operations to handle...
@@ -131,7 +146,10 @@ class OGCOperationRequestHandler:
 
         self._parse_GET_params()
         self._check_for_srs_in_bbox_param()
-        self._resolve_original_operation_uri(request, metadata)
+        self._resolve_original_operation_uri(
+            self.original_params_dict if request is None else request.GET.dict(),
+            metadata
+        )
         self._process_bbox_param()
         self._process_x_y_param()
         self._preprocess_get_feature_params(metadata)
@@ -461,14 +479,14 @@ class OGCOperationRequestHandler:
         if self.x_y_param is not None and y_id is not None:
             self.new_params_dict[y_id] = self.x_y_param[1]
 
-    def _resolve_original_operation_uri(self, request: HttpRequest, metadata: Metadata):
+    def _resolve_original_operation_uri(self, get_query_params: dict, metadata: Metadata):
         """ Creates the intended operation uri, which is masked by the proxy.
 
         This is important, so we can perform this request internally.
         Result is written into self.full_operation_uri.
 
         Args:
-            request (HttpRequest): The incoming user request
+            get_query_params (dict): The GET query parameters of the incoming user request
             metadata (Metadata): The metadata, which holds the operation specification
         Returns:
              nothing
@@ -540,7 +558,6 @@ class OGCOperationRequestHandler:
 
         # add the request query parameter to the ones, which already exist in the persisted uri
         uri_get = list(urllib.parse.urlparse(uri_get))
-        get_query_params = request.GET.dict()
         uri_params = dict(urllib.parse.parse_qsl(uri_get[4]))
         uri_params.update(get_query_params)
         get_query_string = urllib.parse.urlencode(uri_params)
@@ -1272,45 +1289,74 @@ class OGCOperationRequestHandler:
         Returns:
              bytes
         """
-        masks = []
-        width = int(self.width_param)
-        height = int(self.height_param)
         try:
-            for op in sec_ops:
-                if op.allowed_area is None or op.allowed_area.empty:
-                    return None
-                request_dict = {
-                    "map": MAPSERVER_SECURITY_MASK_FILE_PATH,
-                    "version": "1.1.1",
-                    "request": "GetMap",
-                    "service": "WMS",
-                    "format": "image/png",
-                    "layers": "mask",
-                    "srs": self.srs_param,
-                    "bbox": self.axis_corrected_bbox_param,
-                    "width": width,
-                    "height": height,
-                    "keys": "'{}'".format(op.id),
-                    "table": MAPSERVER_SECURITY_MASK_TABLE,
-                    "key_column": MAPSERVER_SECURITY_MASK_KEY_COLUMN,
-                    "geom_column": MAPSERVER_SECURITY_MASK_GEOMETRY_COLUMN,
-                }
-                uri = "{}?{}".format(
-                    MAPSERVER_LOCAL_PATH,
-                    urllib.parse.urlencode(request_dict)
-                )
-
+            mask_uris = self._get_mask_uris(sec_ops)
+            if mask_uris is None:
+                return None
+            mask_contents = []
+            for uri in mask_uris:
                 c = CommonConnector(url=uri)
                 c.load()
-                mask = Image.open(io.BytesIO(c.content))
-                masks.append(mask)
+                mask_contents.append(c.content)
+        except Exception as e:
+            service_logger.exception(e)
+            mask_contents = None
+        return self._combine_masks(mask_contents)
+
+    def _get_mask_uris(self, sec_ops):
+        """ Returns the local mapserver uris of the masks of the given secured operations
+
+        Args:
+            sec_ops (QueryDict): SecuredOperation objects in a query dict
+        Returns:
+             uris (list): The mask uris or None if any operation is not restricted to an area
+        """
+        uris = []
+        for op in sec_ops:
+            if op.allowed_area is None or op.allowed_area.empty:
+                return None
+            request_dict = {
+                "map": MAPSERVER_SECURITY_MASK_FILE_PATH,
+                "version": "1.1.1",
+                "request": "GetMap",
+                "service": "WMS",
+                "format": "image/png",
+                "layers": "mask",
+                "srs": self.srs_param,
+                "bbox": self.axis_corrected_bbox_param,
+                "width": int(self.width_param),
+                "height": int(self.height_param),
+                "keys": "'{}'".format(op.id),
+                "table": MAPSERVER_SECURITY_MASK_TABLE,
+                "key_column": MAPSERVER_SECURITY_MASK_KEY_COLUMN,
+                "geom_column": MAPSERVER_SECURITY_MASK_GEOMETRY_COLUMN,
+            }
+            uris.append("{}?{}".format(
+                MAPSERVER_LOCAL_PATH,
+                urllib.parse.urlencode(request_dict)
+            ))
+        return uris
+
+    def _combine_masks(self, mask_contents):
+        """ Combines the single mask images into one mask
+
+        Args:
+            mask_contents (list): The mask images as bytes or None if they could not be fetched
+        Returns:
+             mask (Image): The combined mask on white background or an error mask
+        """
+        width = int(self.width_param)
+        height = int(self.height_param)
+        try:
+            if mask_contents is None:
+                raise ValueError("The mask images could not be fetched")
 
             # Create empty final mask object
             mask = Image.new("RGBA", (width, height), (255, 0, 0, 0))
 
             # Combine all single masks into one!
-            for m in masks:
-                mask = Image.alpha_composite(m, mask)
+            for content in mask_contents:
+                mask = Image.alpha_composite(Image.open(io.BytesIO(content)), mask)
 
             # Put combined mask on white background
             background = Image.new("RGB", (width, height), (255, 255, 255))
@@ -1324,6 +1370,144 @@ class OGCOperationRequestHandler:
 
         return background
 
+    def _get_layer_access_groups(self):
+        """ Groups the requested layers by the allowed operations, which apply to them
+
+        Consecutive layers with the same allowed operations share one group. This way each group can be rendered by
+        its own request, masked by its own allowed areas and the groups can be composited in the requested order.
+
+        Returns:
+             groups (list): Tuples of the layer identifiers and the allowed operations of each group
+        """
+        layer_identifiers = [
+            identifier for identifier in (self.new_params_dict.get("LAYERS", None) or "").split(",") if identifier
+        ]
+        if len(layer_identifiers) == 0:
+            return []
+
+        rows = AllowedOperation.secured_metadata.through.objects.filter(
+            metadata__identifier__in=layer_identifiers,
+            metadata__service__parent_service__metadata=self.metadata,
+            allowedoperation__allowed_groups__id__in=self.user_groups.values_list('id'),
+            allowedoperation__operations__operation__iexact=self.request_param,
+        ).values_list("metadata__identifier", "allowedoperation_id").distinct()
+        layer_op_ids = defaultdict(set)
+        for identifier, op_id in rows:
+            layer_op_ids[identifier].add(op_id)
+        sec_ops = AllowedOperation.objects.in_bulk({op_id for op_ids in layer_op_ids.values() for op_id in op_ids})
+
+        groups = []
+        last_scope = None
+        for identifier in layer_identifiers:
+            scope = frozenset(layer_op_ids.get(identifier, ()))
+            if len(scope) == 0:
+                # Restricted layers have already been removed by _filter_not_allowed_subelements()
+                continue
+            if scope == last_scope:
+                groups[-1][0].append(identifier)
+            else:
+                groups.append(([identifier], [sec_ops[op_id] for op_id in sorted(scope, key=str)]))
+                last_scope = scope
+        return groups
+
+    def _get_map_group_request(self, layer_identifiers: list):
+        """ Returns the GetMap request of a layer group
+
+        The group images are always requested as transparent png, so they can be composited.
+
+        Args:
+            layer_identifiers (list): The identifiers of the layers of the group
+        Returns:
+             uri (str): The GET uri
+             post_data (dict): The POST data
+        """
+        requested_layers = (self.new_params_dict.get("LAYERS", None) or "").split(",")
+        requested_styles = (self.new_params_dict.get("STYLES", None) or "").split(",")
+        styles = {}
+        if len(requested_styles) == len(requested_layers):
+            styles = dict(zip(requested_layers, requested_styles))
+
+        changed_params = {
+            "LAYERS": ",".join(layer_identifiers),
+            "STYLES": ",".join(styles.get(identifier, "") for identifier in layer_identifiers),
+            "FORMAT": "image/png",
+            "TRANSPARENT": "TRUE",
+        }
+        uri = self._create_GET_uri()
+        if self.request_is_GET:
+            for key, val in changed_params.items():
+                uri = utils.set_uri_GET_param(uri, key, val)
+        post_data = self._create_POST_data()
+        post_data.update(changed_params)
+        return uri, post_data
+
+    def _get_composited_map_format(self):
+        """ Returns the PIL image format for the requested format of a composited map
+
+        Returns:
+             img_format (str): The PIL image format, PNG if the requested format is not supported
+        """
+        Image.init()
+        img_format = (self.format_param or "").split("/")[-1].split(";")[0].strip().upper()
+        if img_format.startswith("PNG"):
+            return "PNG"
+        elif img_format == "JPG":
+            return "JPEG"
+        return img_format if img_format in Image.SAVE else "PNG"
+
+    def _create_composited_map(self, images: list, masks: list):
+        """ Masks the images of all layer groups by their own mask and composites them in order
+
+        Args:
+            images (list): The group images as bytes, bottom first
+            masks (list): The masks of the groups, like returned by _create_secured_service_mask()
+        Returns:
+             img (bytes): The composited image in the requested format
+        """
+        size = (int(self.width_param), int(self.height_param))
+        img = Image.new("RGBA", size, (255, 255, 255, 0))
+        for group_img, mask in zip(images, masks):
+            try:
+                group_img = Image.open(io.BytesIO(group_img)).convert("RGBA")
+            except OSError:
+                raise Exception("Could not create image! Content was:\n {}".format(group_img))
+            if group_img.size != size:
+                group_img = group_img.resize(size)
+            img = Image.alpha_composite(img, self._apply_mask(group_img, mask))
+
+        if (self.new_params_dict.get("TRANSPARENT", None) or "").upper() != "TRUE":
+            try:
+                bg_color = ImageColor.getrgb("#{}".format((self.new_params_dict.get("BGCOLOR", None) or "")[-6:]))
+            except ValueError:
+                bg_color = (255, 255, 255)
+            img = Image.alpha_composite(Image.new("RGBA", size, bg_color + (255,)), img)
+
+        img.format = self._get_composited_map_format()
+        return self._finish_masked_image(img, as_bytes=True)
+
+    def _get_composited_map_response(self, groups: list):
+        """ Renders and masks all layer groups in parallel and composites them
+
+        Args:
+            groups (list): The layer groups, like returned by _get_layer_access_groups()
+        Returns:
+             response (dict): The response dict
+        """
+        with ThreadPoolExecutor(max_workers=min(SECURED_GET_MAP_MAX_WORKERS, 2 * len(groups))) as executor:
+            image_futures = []
+            mask_futures = []
+            for layer_identifiers, sec_ops in groups:
+                uri, post_data = self._get_map_group_request(layer_identifiers)
+                image_futures.append(executor.submit(self.get_operation_response, uri=uri, post_data=post_data))
+                mask_futures.append(executor.submit(self._create_secured_service_mask, self.metadata, sec_ops))
+            images = [future.result()["response"] for future in image_futures]
+            masks = [future.result() for future in mask_futures]
+
+        return {
+            "response": self._create_composited_map(images, masks),
+            "response_type": Image.MIME.get(self._get_composited_map_format(), "image/png"),
+        }
+
     def _create_masked_image(self, img: bytes, mask: bytes, as_bytes: bool = False):
         """ Creates a masked image from two image byte object
 
@@ -1334,11 +1518,24 @@ class OGCOperationRequestHandler:
         Returns:
              img (Image): The masked image
         """
-        try:
-            # Transform byte-image to PIL-image object
-            img = Image.open(io.BytesIO(img))
-        except OSError:
-            raise Exception("Could not create image! Content was:\n {}".format(img))
+        img = self._apply_mask(img, mask)
+        return self._finish_masked_image(img, as_bytes=as_bytes)
+
+    def _apply_mask(self, img, mask):
+        """ Removes the masked areas from an image
+
+        Args:
+            img (bytes|Image): The image
+            mask (bytes|Image): The mask or None if nothing shall be masked
+        Returns:
+             img (Image): The masked image
+        """
+        if isinstance(img, bytes):
+            try:
+                # Transform byte-image to PIL-image object
+                img = Image.open(io.BytesIO(img))
+            except OSError:
+                raise Exception("Could not create image! Content was:\n {}".format(img))
         try:
             # Create an alpha layer, which is needed for the compositing of image and mask
             alpha_layer = Image.new("RGBA", img.size, (255, 0, 0, 0))
@@ -1370,7 +1567,17 @@ class OGCOperationRequestHandler:
         img_format = img.format
         img = Image.composite(alpha_layer, img, mask)
         img.format = img_format
+        return img
 
+    def _finish_masked_image(self, img, as_bytes: bool = False):
+        """ Adds the access denied overlay to a masked image
+
+        Args:
+            img (Image): The masked image
+            as_bytes (bool): Whether the image should be returned as Image object or as bytes
+        Returns:
+             img (Image): The final image
+        """
         # Add access_denied_img image
         # (contains info about which layers are restricted or if there was an error during mask creation)
         if self.access_denied_img is not None:
@@ -1518,26 +1725,27 @@ class OGCOperationRequestHandler:
         self.filter_param = _filter
         self.new_params_dict["FILTER"] = self.filter_param
 
-    def get_allowed_operation_response(self):
-        """ Calls the operation of a service if it is secured.
+    def _get_allowed_operations_filter(self):
+        """ Returns the filter for all allowed operations of the user for the requested operation on the metadata
+
+        Returns:
+             filter (Q): The filter
         """
-        response = {
-            "response": None,
-            "response_type": ""
-        }
+        return Q(secured_metadata__id__contains=self.metadata.id,
+                 allowed_groups__id__in=self.user_groups.values_list('id'),
+                 operations__operation__iexact=self.request_param)
 
-        # check_sec_ops = self.request_param in WMS_SECURED_OPERATIONS or self.request_param in WFS_SECURED_OPERATIONS
+    def _get_allowed_operations(self):
+        """ Returns the allowed operations of the user for the requested operation
 
+        Returns:
+             sec_ops (QuerySet): The allowed operations or None if the user is not allowed to perform the operation at all
+        """
         # todo: geom should be the requested geometry as GEOSGeometry or a string of GeoJSON, WKT or HEXEWKB
         #  maybe we could get it from the self.x_y_coord
         #  have also a look on the lookup expressions for the GEOSGeometry field here:
         #  https://docs.djangoproject.com/en/3.1/ref/contrib/gis/geoquerysets/#std:fieldlookup-gis-contains
-
-        all_sec_ops_for_user_by_operation = Q(secured_metadata__id__contains=self.metadata.id,
-                                              allowed_groups__id__in=self.user_groups.values_list('id'),
-                                              operations__operation__iexact=self.request_param)
-
-        allowed_area_coveres_bbox = Q(allowed_area__covers=self.bbox_param['geom'])
+        all_sec_ops_for_user_by_operation = self._get_allowed_operations_filter()
         allowed_area_intersects_bbox = Q(allowed_area__intersects=self.bbox_param['geom'])
         allowed_area_is_empty = Q(allowed_area=None)
 
@@ -1547,21 +1755,48 @@ class OGCOperationRequestHandler:
 
         if not is_allowed:
             # this means the service is secured and the group has no access!
-            return response
+            return None
+        return AllowedOperation.objects.filter(all_sec_ops_for_user_by_operation)
+
+    def _is_get_feature_info_allowed(self):
+        """ Checks whether the requested area of a GetFeatureInfo request is covered by the allowed areas
+
+        Returns:
+             True|False
+        """
+        allowed_area_coveres_bbox = Q(allowed_area__covers=self.bbox_param['geom'])
+        allowed_area_is_empty = Q(allowed_area=None)
+        return AllowedOperation.objects.filter(self._get_allowed_operations_filter() & allowed_area_coveres_bbox
+                                               | allowed_area_coveres_bbox & allowed_area_is_empty).exists()
+
+    def get_allowed_operation_response(self):
+        """ Calls the operation of a service if it is secured.
+        """
+        response = {
+            "response": None,
+            "response_type": ""
+        }
 
-        # todo: move to needed sub if/else trees which needs this queryset
-        sec_ops = AllowedOperation.objects.filter(all_sec_ops_for_user_by_operation)
+        # check_sec_ops = self.request_param in WMS_SECURED_OPERATIONS or self.request_param in WFS_SECURED_OPERATIONS
+
+        sec_ops = self._get_allowed_operations()
+        if sec_ops is None:
+            return response
 
         # WMS - Features
         if self.request_param.upper() == OGCOperationEnum.GET_FEATURE_INFO.value.upper():
-            is_allowed = AllowedOperation.objects.filter(all_sec_ops_for_user_by_operation & allowed_area_coveres_bbox
-                                                         | allowed_area_coveres_bbox & allowed_area_is_empty).exists()
-
-            if is_allowed:
+            if self._is_get_feature_info_allowed():
                 response = self.get_operation_response()
 
         # WMS - 'Map image'
         elif self.request_param.upper() == OGCOperationEnum.GET_MAP.value.upper():
+            groups = self._get_layer_access_groups()
+            if len(groups) > 1:
+                # The requested layers are restricted to different areas, so each group needs its own mask
+                return self._get_composited_map_response(groups)
+            elif len(groups) == 1:
+                sec_ops = groups[0][1]
+
             # We don't check any kind of is-allowed or not here.
             # Instead, we simply fetch the map image as it is and mask it, using our secured operations geometry.
             # To improve the performance here, we use a multithreaded approach, where the original map image and the
@@ -1685,7 +1920,10 @@ class OGCOperationRequestHandler:
 
         ret_val = {
             "response": c.content,
-            "response_type": c.http_external_headers.get("content-type", ("", ""))[1]
+            "response_type": c.http_external_headers.get("content-type", ("", ""))[1],
+            "response_headers": {
+                header: c.http_external_headers.get(header, ("", None))[1] for header in ("cache-control", "etag")
+            },
         }
 
         return ret_val
@@ -14,6 +14,7 @@ from service.helper.common_connector import CommonConnector
 from service.helper.crypto_handler import CryptoHandler
 from service.helper.enums import ConnectionEnum, OGCServiceVersionEnum, OGCServiceEnum, OGCOperationEnum
 from service.helper.iso.iso_19115_metadata_parser import ISOMetadata
+from service.helper.iso.iso_metadata_fetcher import ISOMetadataFetcher
 from service.models import RequestOperation, ExternalAuthentication, Metadata
 from service.settings import EXTERNAL_AUTHENTICATION_FILEPATH
 from structure.models import MrMapUser
@@ -23,6 +24,9 @@ class OGCWebService:
     """ The base class for all derived web services
 
     """
+    # The namespace map for prefixed names in xpath expressions
+    namespaces = XML_NAMESPACES
+
     def __init__(self, service_connect_url=None, service_type=OGCServiceEnum.WMS, service_version=OGCServiceVersionEnum.V_1_1_1, service_capabilities_xml=None, external_auth: ExternalAuthentication=None):
         self.service_connect_url = service_connect_url
         self.service_type = service_type  # wms, wfs, wcs, ...
@@ -72,6 +76,7 @@ class OGCWebService:
 
         # other
         self.linked_service_metadata = None
+        self.iso_metadata_fetcher = ISOMetadataFetcher()
 
         # ServiceUrls:
         self.get_capabilities_uri_GET = None
@@ -267,7 +272,7 @@ class OGCWebService:
         elem = "//inspire_common:URL"  # for wms by default
         if self.service_type is OGCServiceEnum.WFS:
             elem = "//wfs:MetadataURL"
-        service_md_link = xml_helper.try_get_text_from_xml_element(elem=elem, xml_elem=xml_obj)
+        service_md_link = xml_helper.try_get_text_from_xml_element(elem=elem, xml_elem=xml_obj, namespaces=self.namespaces)
         # get iso metadata xml object
         if service_md_link is None:
             # no iso metadata provided
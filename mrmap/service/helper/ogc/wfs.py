@@ -11,15 +11,14 @@ from django.db import IntegrityError
 from lxml.etree import _Element
 
 from service.settings import DEFAULT_SRS, service_logger
-from MrMap.settings import XML_NAMESPACES, EXEC_TIME_PRINT, \
-    MULTITHREADING_THRESHOLD, GENERIC_NAMESPACE_TEMPLATE
+from MrMap.settings import EXEC_TIME_PRINT, MULTITHREADING_THRESHOLD, GENERIC_NAMESPACE_TEMPLATE, \
+    XML_NAMESPACES_WFS_2_0
 from MrMap.messages import SERVICE_GENERIC_ERROR
 from MrMap.utils import execute_threads
 from service.helper.enums import OGCServiceVersionEnum, OGCServiceEnum, OGCOperationEnum, ResourceOriginEnum, \
     MetadataRelationEnum
 from service.helper.enums import MetadataEnum
 from service.helper.epsg_api import EpsgApi
-from service.helper.iso.iso_19115_metadata_parser import ISOMetadata
 from service.helper.ogc.wms import OGCWebService
 from service.helper import xml_helper
 from service.helper import service_helper
@@ -66,9 +65,6 @@ class OGCWebFeatureService(OGCWebService):
         self.service_mime_type_list = []
         self.service_mime_type_get_feature_list = []
 
-        # for wfs we need to overwrite the default namespace with 'wfs'
-        XML_NAMESPACES["default"] = XML_NAMESPACES.get("wfs", "")
-
     class Meta:
         abstract = True
 
@@ -98,6 +94,10 @@ class OGCWebFeatureService(OGCWebService):
             self.get_service_metadata(uri=service_metadata_uri)
 
         if not metadata_only:
+            start_time = time.time()
+            self.iso_metadata_fetcher.fetch(self.get_dataset_metadata_uris(xml_obj))
+            service_logger.debug(EXEC_TIME_PRINT % ("featuretype iso metadata fetching", time.time() - start_time))
+
             start_time = time.time()
             self.get_feature_type_metadata(xml_obj=xml_obj, external_auth=external_auth)
             service_logger.debug(EXEC_TIME_PRINT % ("featuretype metadata", time.time() - start_time))
@@ -544,7 +544,6 @@ class OGCWebFeatureService(OGCWebService):
         element_list = []
         ns_list = []
         if self.describe_feature_type_uri_GET is not None:
-            XML_NAMESPACES["default"] = XML_NAMESPACES["xsd"]
             descr_feat_root = xml_helper.get_feature_type_elements_xml(
                 title=feature_type.metadata.identifier,
                 service_type="wfs",
@@ -841,6 +840,34 @@ class OGCWebFeatureService(OGCWebService):
 
 
     ### DATASET METADATA ###
+    @staticmethod
+    def _get_dataset_metadata_uri(metadata_url_elem: _Element):
+        """ Returns the uri of a <MetadataURL> element
+
+        Depending on the service version, the uris can live inside a href attribute or inside the xml element as text
+
+        Args:
+            metadata_url_elem (_Element): The <MetadataURL> element
+        Returns:
+             uri (str): The uri or None
+        """
+        return xml_helper.try_get_text_from_xml_element(xml_elem=metadata_url_elem) or xml_helper.get_href_attribute(metadata_url_elem)
+
+    def get_dataset_metadata_uris(self, xml_obj):
+        """ Collects the dataset metadata uris of all feature types
+
+        Args:
+            xml_obj: The xml document object
+        Returns:
+             uris (list): The uris, in order of their occurrence
+        """
+        metadata_url_elems = xml_helper.try_get_element_from_xml(
+            xml_elem=xml_obj,
+            elem="//" + GENERIC_NAMESPACE_TEMPLATE.format("FeatureType") +
+                 "/" + GENERIC_NAMESPACE_TEMPLATE.format("MetadataURL")
+        )
+        return [self._get_dataset_metadata_uri(elem) for elem in metadata_url_elems]
+
     def _parse_dataset_md(self, feature_type, xml_feature_type_obj: _Element):
         """ Parses the dataset metadata from the element.
 
@@ -859,12 +886,11 @@ class OGCWebFeatureService(OGCWebService):
                 elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("MetadataURL")
             )
             for iso_xml in iso_metadata_xml_elements:
-                # Depending on the service version, the uris can live inside a href attribute or inside the xml element as text
-                iso_uri = xml_helper.try_get_text_from_xml_element(xml_elem=iso_xml) or xml_helper.get_href_attribute(iso_xml)
+                iso_uri = self._get_dataset_metadata_uri(iso_xml)
                 if iso_uri is None:
                     continue
                 try:
-                    iso_metadata = ISOMetadata(uri=iso_uri, origin=ResourceOriginEnum.CAPABILITIES.value)
+                    iso_metadata = self.iso_metadata_fetcher.get(iso_uri, ResourceOriginEnum.CAPABILITIES.value)
                 except Exception as e:
                     # there are iso metadatas that have been filled wrongly -> if so we will drop them
                     continue
@@ -899,10 +925,6 @@ class OGCWebFeatureService_1_0_0(OGCWebFeatureService):
             service_type=OGCServiceEnum.WFS,
             external_auth=external_auth
         )
-        XML_NAMESPACES["schemaLocation"] = "http://schemas.opengis.net/wfs/1.0.0/WFS-capabilities.xsd"
-        XML_NAMESPACES["xsi"] = "http://www.w3.org/2001/XMLSchema-instance"
-        XML_NAMESPACES["lvermgeo"] = "http://www.lvermgeo.rlp.de/lvermgeo"
-        XML_NAMESPACES["default"] = XML_NAMESPACES.get("wfs")
 
     def get_service_operations_and_formats(self, xml_obj):
         """ Creates table records from <Capability><Request></Request></Capability contents
@@ -1210,11 +1232,6 @@ class OGCWebFeatureService_1_1_0(OGCWebFeatureService):
             service_type=OGCServiceEnum.WFS,
             external_auth=external_auth
         )
-        XML_NAMESPACES["schemaLocation"] = "http://schemas.opengis.net/wfs/1.1.0/wfs.xsd"
-        XML_NAMESPACES["wfs"] = "http://www.opengis.net/wfs"
-        XML_NAMESPACES["ows"] = "http://www.opengis.net/ows"
-        XML_NAMESPACES["fes"] = "http://www.opengis.net/fes"
-        XML_NAMESPACES["default"] = XML_NAMESPACES["wfs"]
 
     def get_service_operations_and_formats(self, xml_obj):
         """ Creates table records from <Capability><Request></Request></Capability contents
@@ -1238,6 +1255,8 @@ class OGCWebFeatureService_2_0_0(OGCWebFeatureService):
     """
     Uses base implementation from OGCWebFeatureService class
     """
+    namespaces = XML_NAMESPACES_WFS_2_0
+
     def __init__(self, service_connect_url, external_auth: ExternalAuthentication):
         super().__init__(
             service_connect_url=service_connect_url,
@@ -1245,11 +1264,6 @@ class OGCWebFeatureService_2_0_0(OGCWebFeatureService):
             service_type=OGCServiceEnum.WFS,
             external_auth=external_auth
         )
-        XML_NAMESPACES["schemaLocation"] = "http://schemas.opengis.net/wfs/2.0/wfs.xsd"
-        XML_NAMESPACES["wfs"] = "http://www.opengis.net/wfs/2.0"
-        XML_NAMESPACES["ows"] = "http://www.opengis.net/ows/1.1"
-        XML_NAMESPACES["fes"] = "http://www.opengis.net/fes/2.0"
-        XML_NAMESPACES["default"] = XML_NAMESPACES["wfs"]
 
     def get_service_operations_and_formats(self, xml_obj):
         """ Creates table records from <Capability><Request></Request></Capability contents
@@ -1342,6 +1356,8 @@ class OGCWebFeatureService_2_0_2(OGCWebFeatureService):
     """
     Uses base implementation from OGCWebFeatureService class
     """
+    namespaces = XML_NAMESPACES_WFS_2_0
+
     def __init__(self, service_connect_url, external_auth: ExternalAuthentication):
         super().__init__(
             service_connect_url=service_connect_url,
@@ -1349,10 +1365,6 @@ class OGCWebFeatureService_2_0_2(OGCWebFeatureService):
             service_type=OGCServiceEnum.WFS,
             external_auth=external_auth
         )
-        XML_NAMESPACES["wfs"] = "http://www.opengis.net/wfs/2.0"
-        XML_NAMESPACES["ows"] = "http://www.opengis.net/ows/1.1"
-        XML_NAMESPACES["fes"] = "http://www.opengis.net/fes/2.0"
-        XML_NAMESPACES["default"] = XML_NAMESPACES["wfs"]
 
     def get_service_operations_and_formats(self, xml_obj):
         """ Creates table records from <Capability><Request></Request></Capability contents
@@ -1394,7 +1406,7 @@ class OGCWebFeatureService_2_0_2(OGCWebFeatureService):
                 raise BaseException(SERVICE_GENERIC_ERROR)
 
             # Feature type keywords
-            keywords = xml_helper.try_get_element_from_xml(xml_elem=feature_type_xml_elem, elem=".//ows:Keyword")
+            keywords = xml_helper.try_get_element_from_xml(xml_elem=feature_type_xml_elem, elem=".//ows:Keyword", namespaces=self.namespaces)
             keyword_list = []
             for keyword in keywords:
                 kw = xml_helper.try_get_text_from_xml_element(xml_elem=keyword)
@@ -5,6 +5,7 @@
 .. moduleauthor:: Armin Retterath <armin.retterath@gmail.com>
 
 """
+import io
 import uuid
 from abc import abstractmethod
 
@@ -16,17 +17,15 @@ from celery import current_task, states, Task
 from celery.result import AsyncResult
 from django.db import transaction, IntegrityError
 from django.utils import timezone
+from lxml import etree
 
 from MrMap.messages import SERVICE_NO_ROOT_LAYER
-from service.settings import PROGRESS_STATUS_AFTER_PARSING, service_logger
-from MrMap.settings import EXEC_TIME_PRINT, MULTITHREADING_THRESHOLD, \
-    XML_NAMESPACES, GENERIC_NAMESPACE_TEMPLATE
+from service.settings import PROGRESS_STATUS_AFTER_PARSING, WMS_STREAMING_LAYER_PARSING_MIN_SIZE, service_logger
+from MrMap.settings import EXEC_TIME_PRINT, MULTITHREADING_THRESHOLD, GENERIC_NAMESPACE_TEMPLATE
 from MrMap import utils
 from MrMap.utils import execute_threads
-from service.helper.enums import OGCServiceVersionEnum, MetadataEnum, OGCOperationEnum, ResourceOriginEnum, \
-    MetadataRelationEnum
+from service.helper.enums import OGCServiceVersionEnum, MetadataEnum, ResourceOriginEnum, MetadataRelationEnum
 from service.helper.epsg_api import EpsgApi
-from service.helper.iso.iso_19115_metadata_parser import ISOMetadata
 from service.helper.ogc.ows import OGCWebService
 from service.helper.ogc.layer import OGCLayer
 
@@ -37,6 +36,20 @@ from structure.models import Organization, MrMapGroup
 from structure.models import MrMapUser
 
 
+def _local_name(xml_elem):
+    """ Returns the tag of a xml element without its namespace
+
+    Args:
+        xml_elem: The xml element
+    Returns:
+         The local name or None for comments and processing instructions
+    """
+    tag = xml_elem.tag
+    if not isinstance(tag, str):
+        return None
+    return tag.rpartition("}")[2]
+
+
 class OGCWebMapServiceFactory:
     """ Creates the correct OGCWebMapService objects
 
@@ -90,6 +103,7 @@ class OGCWebMapService(OGCWebService):
             layer_xml = layer_xml[0]
         else:
             return None
+        self._layer_request_uris = self._parse_request_uris(self._get_request_element(layer_xml))
         return self._start_single_layer_parsing(layer_xml)
 
     @abstractmethod
@@ -126,7 +140,17 @@ class OGCWebMapService(OGCWebService):
 
         if not metadata_only:
             start_time = time.time()
-            self._parse_layers(xml_obj=xml_obj)
+            self.iso_metadata_fetcher.fetch(self.get_dataset_metadata_uris(xml_obj))
+            service_logger.debug(EXEC_TIME_PRINT % ("layer iso metadata fetching", time.time() - start_time))
+
+            start_time = time.time()
+            if len(self.service_capabilities_xml) > WMS_STREAMING_LAYER_PARSING_MIN_SIZE:
+                step_size = self._get_layer_step_size(xml_obj)
+                # The layers are read from the document again, so the tree can be released before
+                del xml_obj
+                self._parse_layers_streaming(self.service_capabilities_xml, step_size=step_size)
+            else:
+                self._parse_layers(xml_obj=xml_obj)
             service_logger.debug(EXEC_TIME_PRINT % ("layer metadata", time.time() - start_time))
 
     def get_service_operations_and_formats(self, xml_obj):
@@ -158,293 +182,275 @@ class OGCWebMapService(OGCWebService):
             self.operation_format_map[operation.tag] = formats
 
     ### DATASET METADATA ###
-    def parse_dataset_md(self, layer, layer_obj):
-        # check for possible dataset metadata
-        if self.has_dataset_metadata(layer):
-            iso_metadata_xml_elements = xml_helper.try_get_element_from_xml(
-                xml_elem=layer,
-                elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("MetadataURL") +
-                      "/" + GENERIC_NAMESPACE_TEMPLATE.format("OnlineResource")
-            )
-            for iso_xml in iso_metadata_xml_elements:
-                iso_uri = xml_helper.get_href_attribute(xml_elem=iso_xml)
-                try:
-                    iso_metadata = ISOMetadata(uri=iso_uri, origin=ResourceOriginEnum.CAPABILITIES.value)
-                except Exception as e:
-                    # there are iso metadatas that have been filled wrongly -> if so we will drop them
-                    continue
-                layer_obj.iso_metadata.append(iso_metadata)
-
-    ### IDENTIFIER ###
-    def parse_identifier(self, layer, layer_obj):
-        layer_obj.identifier = xml_helper.try_get_text_from_xml_element(
-            elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("Name"),
-            xml_elem=layer)
+    def get_dataset_metadata_uris(self, xml_obj):
+        """ Collects the dataset metadata uris of all layers
 
-    ### KEYWORDS ###
-    def parse_keywords(self, layer, layer_obj):
-        keywords = xml_helper.try_get_element_from_xml(
-            elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("KeywordList") +
-                 "/" + GENERIC_NAMESPACE_TEMPLATE.format("Keyword"),
-            xml_elem=layer
+        Args:
+            xml_obj: The xml document object
+        Returns:
+             uris (list): The uris, in order of their occurrence
+        """
+        online_resources = xml_helper.try_get_element_from_xml(
+            xml_elem=xml_obj,
+            elem="//" + GENERIC_NAMESPACE_TEMPLATE.format("Layer") +
+                 "/" + GENERIC_NAMESPACE_TEMPLATE.format("MetadataURL") +
+                 "/" + GENERIC_NAMESPACE_TEMPLATE.format("OnlineResource")
         )
-        for keyword in keywords:
-            layer_obj.capability_keywords.append(keyword.text)
+        return [xml_helper.get_href_attribute(xml_elem=online_resource) for online_resource in online_resources]
+
+    ### LAYERS ###
+    # Maps the local names of the <Layer> child elements to the methods, which parse them. Elements, which are not
+    # listed, are skipped.
+    LAYER_ELEMENT_PARSERS = {
+        "Name": "_parse_name_element",
+        "Title": "_parse_title_element",
+        "Abstract": "_parse_abstract_element",
+        "KeywordList": "_parse_keyword_list_element",
+        "SRS": "_parse_projection_system_element",
+        "LatLonBoundingBox": "_parse_lat_lon_bounding_box_element",
+        "BoundingBox": "_parse_bounding_box_element",
+        "ScaleHint": "_parse_scale_hint_element",
+        "Dimension": "_parse_dimension_element",
+        "Extent": "_parse_extent_element",
+        "Style": "_parse_style_element",
+        "MetadataURL": "_parse_metadata_url_element",
+    }
+    # Elements, of which only the first occurrence per layer is used
+    SINGLE_LAYER_ELEMENTS = frozenset([
+        "Name", "Title", "Abstract", "LatLonBoundingBox", "EX_GeographicBoundingBox", "ScaleHint",
+    ])
+    # The attribute of <BoundingBox>, which holds the reference system
+    BOUNDING_BOX_SRS_ATTRIBUTE = "SRS"
+
+    _layer_element_parsers = None
+    _layer_request_uris = None
+    _layer_progress = None
+    _mime_types = None
+
+    def _get_layer_element_parsers(self):
+        """ Returns the bound parsing methods of LAYER_ELEMENT_PARSERS
 
-    ### ABSTRACT ###
-    def parse_abstract(self, layer, layer_obj):
-        layer_obj.abstract = xml_helper.try_get_text_from_xml_element(
-            elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("Abstract"),
-            xml_elem=layer
-        )
+        Returns:
+             parsers (dict): The methods by the local names of the elements
+        """
+        if self._layer_element_parsers is None:
+            self._layer_element_parsers = {
+                name: getattr(self, method) for name, method in self.LAYER_ELEMENT_PARSERS.items()
+            }
+        return self._layer_element_parsers
 
-    ### TITLE ###
-    def parse_title(self, layer, layer_obj):
-        layer_obj.title = xml_helper.try_get_text_from_xml_element(
-            elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("Title"),
-            xml_elem=layer
-        )
+    def _get_mime_type(self, mime_type: str):
+        """ Returns the MimeType record of a mime type string
 
-    ### SRS/CRS     PROJECTION SYSTEM ###
-    def parse_projection_system(self, layer, layer_obj):
-        srs = xml_helper.try_get_element_from_xml(
-            elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("SRS"),
-            xml_elem=layer
-        )
-        for elem in srs:
-            layer_obj.capability_projection_system.append(elem.text)
+        Most layers share the same few legend formats, so each format is only looked up once per document.
 
-    ### BOUNDING BOX    LAT LON ###
-    def parse_lat_lon_bounding_box(self, layer, layer_obj):
-        try:
-            bbox = xml_helper.try_get_element_from_xml(
-                elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("LatLonBoundingBox"),
-                xml_elem=layer
-            )[0]
-            attrs = ["minx", "miny", "maxx", "maxy"]
-            for attr in attrs:
-                val = bbox.get(attr, 0)
-                if val is None:
-                    val = 0
-                layer_obj.capability_bbox_lat_lon[attr] = val
-        except IndexError:
-            pass
-
-    ### BOUNDING BOX ###
-    def parse_bounding_box_generic(self, layer, layer_obj, elem_name):
-        bboxs = xml_helper.try_get_element_from_xml(
-            elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("BoundingBox"),
-            xml_elem=layer
-        )
-        for bbox in bboxs:
-            srs = bbox.get(elem_name)
-            srs_dict = {
-                "minx": "",
-                "miny": "",
-                "maxx": "",
-                "maxy": "",
-            }
-            attrs = ["minx", "miny", "maxx", "maxy"]
-            for attr in attrs:
-                srs_dict[attr] = bbox.get(attr)
-            layer_obj.capability_bbox_srs[srs] = srs_dict
-
-    def parse_bounding_box(self, layer, layer_obj):
-        # switch depending on service version
-        elem_name = "SRS"
-        if self.service_version is OGCServiceVersionEnum.V_1_3_0:
-            elem_name = "CRS"
-        self.parse_bounding_box_generic(layer=layer, layer_obj=layer_obj, elem_name=elem_name)
-
-    ### SCALE HINT ###
-    def parse_scale_hint(self, layer, layer_obj):
-        try:
-            scales = xml_helper.try_get_element_from_xml(
-                elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("ScaleHint"),
-                xml_elem=layer
-            )[0]
-            attrs = ["min", "max"]
-            for attr in attrs:
-                layer_obj.capability_scale_hint[attr] = scales.get(attr)
-        except IndexError:
-            pass
-
-    ### IS QUERYABLE ###
-    def parse_queryable(self, layer, layer_obj):
-            try:
-                is_queryable = layer.get("queryable")
-                if is_queryable is None:
-                    is_queryable = False
-                else:
-                    is_queryable = utils.resolve_boolean_attribute_val(is_queryable)
-                layer_obj.is_queryable = is_queryable
-            except AttributeError:
-                pass
+        Args:
+            mime_type (str): The mime type string
+        Returns:
+             mime_type (MimeType): The record or None
+        """
+        if self._mime_types is None:
+            self._mime_types = {}
+        if mime_type not in self._mime_types:
+            self._mime_types[mime_type] = MimeType.objects.filter(mime_type=mime_type).first()
+        return self._mime_types[mime_type]
 
-    ### IS OPAQUE ###
-    def parse_opaque(self, layer, layer_obj):
-            try:
-                is_opaque = layer.get("opaque")
-                if is_opaque is None:
-                    is_opaque = False
-                else:
-                    is_opaque = utils.resolve_boolean_attribute_val(is_opaque)
-                layer_obj.is_opaque = is_opaque
-            except AttributeError:
-                pass
+    @staticmethod
+    def _get_request_element(xml_obj):
+        """ Returns the <Request> element of the <Capability> section
 
-    ### IS CASCADED ###
-    def parse_cascaded(self, layer, layer_obj):
-            try:
-                is_opaque = layer.get("cascaded")
-                if is_opaque is None:
-                    is_opaque = False
-                else:
-                    is_opaque = utils.resolve_boolean_attribute_val(is_opaque)
-                layer_obj.is_cascaded = is_opaque
-            except AttributeError:
-                pass
+        Args:
+            xml_obj: The xml document object
+        Returns:
+             The element or None
+        """
+        return xml_helper.try_get_single_element_from_xml(
+            elem="//" + GENERIC_NAMESPACE_TEMPLATE.format("Capability") +
+                 "/" + GENERIC_NAMESPACE_TEMPLATE.format("Request"),
+            xml_elem=xml_obj
+        )
 
-    ### REQUEST URIS ###
-    def parse_request_uris(self, layer, layer_obj):
-        suffix_get = GENERIC_NAMESPACE_TEMPLATE.format("DCPType") + \
-                     "/" + GENERIC_NAMESPACE_TEMPLATE.format("HTTP") + \
-                     "/" + GENERIC_NAMESPACE_TEMPLATE.format("Get") + \
-                     "/" + GENERIC_NAMESPACE_TEMPLATE.format("OnlineResource")
-        suffix_post = GENERIC_NAMESPACE_TEMPLATE.format("DCPType") + \
-                      "/" + GENERIC_NAMESPACE_TEMPLATE.format("HTTP") + \
-                      "/" + GENERIC_NAMESPACE_TEMPLATE.format("Post") + \
-                      "/" + GENERIC_NAMESPACE_TEMPLATE.format("OnlineResource")
-
-        # shortens the usage of our constant values
-        get_cap = OGCOperationEnum.GET_CAPABILITIES.value
-        get_map = OGCOperationEnum.GET_MAP.value
-        get_feat = OGCOperationEnum.GET_FEATURE_INFO.value
-        descr_lay = OGCOperationEnum.DESCRIBE_LAYER.value
-        get_leg = OGCOperationEnum.GET_LEGEND_GRAPHIC.value
-        get_sty = OGCOperationEnum.GET_STYLES.value
-
-        attributes = {
-            "cap_GET": "//" + GENERIC_NAMESPACE_TEMPLATE.format(get_cap) + "/" + suffix_get,
-            "cap_POST": "//" + GENERIC_NAMESPACE_TEMPLATE.format(get_cap) + "/" + suffix_post,
-            "map_GET": "//" + GENERIC_NAMESPACE_TEMPLATE.format(get_map) + "/" + suffix_get,
-            "map_POST": "//" + GENERIC_NAMESPACE_TEMPLATE.format(get_map) + "/" + suffix_post,
-            "feat_GET": "//" + GENERIC_NAMESPACE_TEMPLATE.format(get_feat) + "/" + suffix_get,
-            "feat_POST": "//" + GENERIC_NAMESPACE_TEMPLATE.format(get_feat) + "/" + suffix_post,
-            "desc_GET": "//" + GENERIC_NAMESPACE_TEMPLATE.format(descr_lay) + "/" + suffix_get,
-            "desc_POST": "//" + GENERIC_NAMESPACE_TEMPLATE.format(descr_lay) + "/" + suffix_post,
-            "leg_GET": "//" + GENERIC_NAMESPACE_TEMPLATE.format(get_leg) + "/" + suffix_get,
-            "leg_POST": "//" + GENERIC_NAMESPACE_TEMPLATE.format(get_leg) + "/" + suffix_post,
-            "style_GET": "//" + GENERIC_NAMESPACE_TEMPLATE.format(get_sty) + "/" + suffix_get,
-            "style_POST": "//" + GENERIC_NAMESPACE_TEMPLATE.format(get_sty) + "/" + suffix_post,
-        }
-        for key, val in attributes.items():
-            try:
-                tmp = layer.xpath(val)[0]
-                link = xml_helper.get_href_attribute(tmp)
-                attributes[key] = link
-            except (AttributeError, IndexError) as error:
-                attributes[key] = None
-
-        layer_obj.get_capabilities_uri_GET = attributes.get("cap_GET")
-        layer_obj.get_capabilities_uri_POST = attributes.get("cap_POST")
-        layer_obj.get_map_uri_GET = attributes.get("map_GET")
-        layer_obj.get_map_uri_POST = attributes.get("map_POST")
-        layer_obj.get_feature_info_uri_GET = attributes.get("feat_GET")
-        layer_obj.get_feature_info_uri_POST = attributes.get("feat_POST")
-        layer_obj.describe_layer_uri_GET = attributes.get("desc_GET")
-        layer_obj.describe_layer_uri_POST = attributes.get("desc_POST")
-        layer_obj.get_legend_graphic_uri_GET = attributes.get("leg_GET")
-        layer_obj.get_legend_graphic_uri_POST = attributes.get("leg_POST")
-        layer_obj.get_styles_uri_GET = attributes.get("style_GET")
-        layer_obj.get_styles_uri_POST = attributes.get("style_POST")
-
-    ### FORMATS ###
-    def parse_formats(self, layer, layer_obj):
-        actions = ["GetMap", "GetCapabilities", "GetFeatureInfo", "DescribeLayer", "GetLegendGraphic", "GetStyles"]
-        results = {}
-        for action in actions:
-            try:
-                results[action] = []
-                format_list = xml_helper.try_get_element_from_xml(
-                    elem="//" + GENERIC_NAMESPACE_TEMPLATE.format(action) +
-                         "/" + GENERIC_NAMESPACE_TEMPLATE.format("Format"),
-                    xml_elem=layer
-                )
-                for format in format_list:
-                    results[action].append(format.text)
-            except AttributeError:
-                pass
-        layer_obj.format_list = results
+    @staticmethod
+    def _parse_request_uris(request_xml):
+        """ Parses the operation uris, which are the same for all layers of the service
 
-    ### DIMENSIONS ###
-    def parse_dimension(self, layer, layer_obj):
-        dim_list = []
-        try:
-            dims = xml_helper.try_get_element_from_xml(
-                elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("Dimension"),
-                xml_elem=layer
+        Args:
+            request_xml: The <Request> element or None
+        Returns:
+             uris (dict): The uris by the OGCWebMapServiceLayer attribute names
+        """
+        uris = {attr: None for operation, attr, method in OGCWebMapServiceLayer.operation_urls}
+        if request_xml is None:
+            return uris
+        operations = {_local_name(operation_xml): operation_xml for operation_xml in request_xml}
+        for operation, attr, method in OGCWebMapServiceLayer.operation_urls:
+            operation_xml = operations.get(operation, None)
+            if operation_xml is None:
+                continue
+            online_resource = xml_helper.try_get_single_element_from_xml(
+                elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("DCPType") +
+                     "/" + GENERIC_NAMESPACE_TEMPLATE.format("HTTP") +
+                     "/" + GENERIC_NAMESPACE_TEMPLATE.format(method) +
+                     "/" + GENERIC_NAMESPACE_TEMPLATE.format("OnlineResource"),
+                xml_elem=operation_xml
             )
-            for dim in dims:
-                ext = xml_helper.try_get_single_element_from_xml(
-                    elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("Extent")+ '[@name="' + dim.get('name') + '"]',
-                    xml_elem=layer
-                )
-                dim_dict = {
-                    "type": dim.get("name"),
-                    "units": dim.get("units"),
-                    "extent": ext.text,
-                }
-                dim_list.append(dim_dict)
-        except (IndexError, AttributeError) as error:
-            pass
-        layer_obj.dimension_list = dim_list
-
-    ### STYLES ###
-    def parse_style(self, layer, layer_obj):
-        style_xml = xml_helper.try_get_single_element_from_xml(
-            "./" + GENERIC_NAMESPACE_TEMPLATE.format("Style"),
-            layer
-        )
+            uris[attr] = xml_helper.get_href_attribute(online_resource)
+        return uris
+
+    @staticmethod
+    def _parse_boolean_attribute(layer_xml, attribute: str):
+        """ Returns a boolean attribute of a <Layer> element, which is False if missing
+
+        Args:
+            layer_xml: The <Layer> element
+            attribute (str): The attribute name
+        Returns:
+             The resolved value
+        """
+        val = layer_xml.get(attribute)
+        if val is None:
+            return False
+        return utils.resolve_boolean_attribute_val(val)
+
+    def _parse_name_element(self, name_xml, layer_obj):
+        layer_obj.identifier = name_xml.text
 
-        if style_xml is None:
-            # no <Style> element found
+    def _parse_title_element(self, title_xml, layer_obj):
+        layer_obj.title = title_xml.text
+
+    def _parse_abstract_element(self, abstract_xml, layer_obj):
+        layer_obj.abstract = abstract_xml.text
+
+    def _parse_keyword_list_element(self, keyword_list_xml, layer_obj):
+        for keyword in keyword_list_xml:
+            if _local_name(keyword) == "Keyword":
+                layer_obj.capability_keywords.append(keyword.text)
+
+    def _parse_projection_system_element(self, srs_xml, layer_obj):
+        layer_obj.capability_projection_system.append(srs_xml.text)
+
+    def _parse_lat_lon_bounding_box_element(self, bbox_xml, layer_obj):
+        for attr in ["minx", "miny", "maxx", "maxy"]:
+            layer_obj.capability_bbox_lat_lon[attr] = bbox_xml.get(attr) or 0
+
+    def _parse_bounding_box_element(self, bbox_xml, layer_obj):
+        layer_obj.capability_bbox_srs[bbox_xml.get(self.BOUNDING_BOX_SRS_ATTRIBUTE)] = {
+            attr: bbox_xml.get(attr) for attr in ["minx", "miny", "maxx", "maxy"]
+        }
+
+    def _parse_scale_hint_element(self, scale_hint_xml, layer_obj):
+        for attr in ["min", "max"]:
+            layer_obj.capability_scale_hint[attr] = scale_hint_xml.get(attr)
+
+    def _parse_dimension_element(self, dimension_xml, layer_obj):
+        # Since 1.3.0 the extent is the text of the <Dimension> element itself
+        layer_obj.dimension_list.append({
+            "type": dimension_xml.get("name"),
+            "units": dimension_xml.get("units"),
+            "extent": dimension_xml.text,
+        })
+
+    def _parse_extent_element(self, extent_xml, layer_obj):
+        # Before 1.3.0 the extent is defined by a separate <Extent> element, which follows the <Dimension> elements
+        name = extent_xml.get("name")
+        for dimension in layer_obj.dimension_list:
+            if dimension["type"] == name:
+                dimension["extent"] = extent_xml.text
+
+    def _parse_style_element(self, style_xml, layer_obj):
+        if layer_obj.style is not None:
+            # Only the first style is used
             return
 
         style_obj = Style()
+        legend_xml = None
+        for child in style_xml:
+            name = _local_name(child)
+            if name == "Name":
+                style_obj.name = child.text
+            elif name == "Title":
+                style_obj.title = child.text
+            elif name == "LegendURL" and legend_xml is None:
+                legend_xml = child
+
+        style_obj.legend_uri = None
+        mime_type = None
+        if legend_xml is not None:
+            for child in legend_xml:
+                name = _local_name(child)
+                if name == "OnlineResource":
+                    style_obj.legend_uri = xml_helper.get_href_attribute(child)
+                elif name == "Format":
+                    mime_type = child.text
+            style_obj.width = int(legend_xml.get("width") or 0)
+            style_obj.height = int(legend_xml.get("height") or 0)
+        else:
+            style_obj.width = 0
+            style_obj.height = 0
+        style_obj.mime_type = self._get_mime_type(mime_type)
 
-        style_obj.name = xml_helper.try_get_text_from_xml_element(
-            style_xml,
-            "./" + GENERIC_NAMESPACE_TEMPLATE.format("Name")
-        )
-        style_obj.title = xml_helper.try_get_text_from_xml_element(
-            style_xml,
-            "./" + GENERIC_NAMESPACE_TEMPLATE.format("Title")
-        )
-        legend_elem = xml_helper.try_get_single_element_from_xml(
-            elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("LegendURL") +
-                 "/" + GENERIC_NAMESPACE_TEMPLATE.format("OnlineResource"),
-            xml_elem=style_xml
+        layer_obj.style = style_obj
+
+    def _parse_metadata_url_element(self, metadata_url_xml, layer_obj):
+        for child in metadata_url_xml:
+            if _local_name(child) != "OnlineResource":
+                continue
+            iso_uri = xml_helper.get_href_attribute(child)
+            try:
+                iso_metadata = self.iso_metadata_fetcher.get(iso_uri, ResourceOriginEnum.CAPABILITIES.value)
+            except Exception as e:
+                # there are iso metadatas that have been filled wrongly -> if so we will drop them
+                continue
+            layer_obj.iso_metadata.append(iso_metadata)
+
+    def _create_layer_object(self, layer_xml, parent=None):
+        """ Creates the layer object from the attributes of a <Layer> element
+
+        Args:
+            layer_xml: The xml element of the layer
+            parent: The parent OGCWebMapServiceLayer object
+        Returns:
+             layer_obj (OGCWebMapServiceLayer): The layer object without the content of the child elements
+        """
+        layer_obj = OGCWebMapServiceLayer(
+            parent=parent,
+            queryable=self._parse_boolean_attribute(layer_xml, "queryable"),
+            opaque=self._parse_boolean_attribute(layer_xml, "opaque"),
+            cascaded=self._parse_boolean_attribute(layer_xml, "cascaded"),
         )
-        style_obj.legend_uri = xml_helper.get_href_attribute(legend_elem)
-        style_obj.width = int(xml_helper.try_get_attribute_from_xml_element(
-            style_xml,
-            "width",
-            "./" + GENERIC_NAMESPACE_TEMPLATE.format("LegendURL")
-        ) or 0)
-        style_obj.height = int(xml_helper.try_get_attribute_from_xml_element(
-            style_xml,
-            "height",
-            "./" + GENERIC_NAMESPACE_TEMPLATE.format("LegendURL")
-        ) or 0)
-        style_obj.mime_type = MimeType.objects.filter(
-            mime_type=xml_helper.try_get_text_from_xml_element(
-                style_xml,
-                "./" + GENERIC_NAMESPACE_TEMPLATE.format("LegendURL") +
-                "/ " + GENERIC_NAMESPACE_TEMPLATE.format("Format"))
-        ).first()
+        if self._layer_request_uris:
+            for attr, uri in self._layer_request_uris.items():
+                setattr(layer_obj, attr, uri)
+        return layer_obj
 
-        layer_obj.style = style_obj
+    def _parse_layer_children(self, layer_xml, layer_obj):
+        """ Parses the child elements of a <Layer> element into the layer object
+
+        Each child is visited once and handed to its parsing method from LAYER_ELEMENT_PARSERS. Repeated
+        SINGLE_LAYER_ELEMENTS are skipped, like additional styles.
+
+        Args:
+            layer_xml: The xml element of the layer
+            layer_obj (OGCWebMapServiceLayer): The layer object
+        Returns:
+             sublayers (list): The nested <Layer> elements, which are not parsed here
+        """
+        parsers = self._get_layer_element_parsers()
+        sublayers = []
+        parsed_single_elements = set()
+        for child in layer_xml:
+            name = _local_name(child)
+            if name == "Layer":
+                sublayers.append(child)
+                continue
+            if name in self.SINGLE_LAYER_ELEMENTS:
+                if name in parsed_single_elements:
+                    continue
+                parsed_single_elements.add(name)
+            parser = parsers.get(name, None)
+            if parser is not None:
+                parser(child, layer_obj)
+        return sublayers
 
     def _start_single_layer_parsing(self, layer_xml):
         """ Runs the complete parsing process for a single layer
@@ -454,110 +460,161 @@ class OGCWebMapService(OGCWebService):
         Returns:
              layer_obj (OGCWebMapServiceLayer): The layer object containing all metadata information
         """
-        layer_obj = OGCWebMapServiceLayer()
-        # iterate over single parsing functions -> improves maintainability
-        parse_functions = [
-            self.parse_keywords,
-            self.parse_abstract,
-            self.parse_title,
-            self.parse_projection_system,
-            self.parse_lat_lon_bounding_box,
-            self.parse_bounding_box,
-            self.parse_scale_hint,
-            self.parse_queryable,
-            self.parse_opaque,
-            self.parse_cascaded,
-            self.parse_request_uris,
-            self.parse_dimension,
-            self.parse_style,
-            self.parse_identifier,
-            self.parse_dataset_md,
-        ]
-        for func in parse_functions:
-            func(layer=layer_xml, layer_obj=layer_obj)
-
+        layer_obj = self._create_layer_object(layer_xml)
+        self._parse_layer_children(layer_xml, layer_obj)
         return layer_obj
 
-    def _parse_single_layer(self, layer, parent, step_size: float = None):
-        """ Parses data from an xml <Layer> element into the OGCWebMapLayer object.
-
-        Runs recursive through own children for further parsing
+    def _add_layer(self, layer_obj):
+        """ Adds a layer object to the layers of the service and the children of its parent
 
         Args:
-            layer: The layer xml element
-            parent: The parent OGCWebMapLayer object
+            layer_obj (OGCWebMapServiceLayer): The layer object
         Returns:
             nothing
         """
-        # iterate over all top level layer and find their children
-        layer_obj = self._start_single_layer_parsing(layer)
-        if current_task:
-            current_task.update_state(
-                state=states.STARTED,
-                meta={
-                    'current': AsyncResult(current_task.request.id).info.get("current", 0) + step_size,
-                    'phase': "Parsing {}".format(layer_obj.title),
-                }
-            )
-
-        layer_obj.parent = parent
         if self.layers is None:
             self.layers = []
         self.layers.append(layer_obj)
-        sublayers = xml_helper.try_get_element_from_xml(
-            elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("Layer"),
-            xml_elem=layer
-        )
-        if parent is not None:
-            parent.child_layers.append(layer_obj)
+        if layer_obj.parent is not None:
+            layer_obj.parent.child_layers.append(layer_obj)
+
+    def _report_layer_progress(self, layer_obj, step_size: float = None):
+        """ Updates the state of the running task after a layer has been parsed
 
-        self._parse_layers_recursive(layers=sublayers, parent=layer_obj, step_size=step_size)
+        The progress of the task is only read once, since reading it for each layer would mean a request to the result
+        backend per layer.
 
-    def _parse_layers_recursive(self, layers, parent=None, step_size: float = None):
-        """ Recursive Iteration over all children and subchildren.
+        Args:
+            layer_obj (OGCWebMapServiceLayer): The parsed layer object
+            step_size (float): The progress of a single layer
+        Returns:
+            nothing
+        """
+        if not current_task or step_size is None:
+            return
+        if self._layer_progress is None:
+            self._layer_progress = AsyncResult(current_task.request.id).info.get("current", 0)
+        self._layer_progress += step_size
+        current_task.update_state(
+            state=states.STARTED,
+            meta={
+                'current': self._layer_progress,
+                'phase': "Parsing {}".format(layer_obj.title),
+            }
+        )
+
+    def _parse_single_layer(self, layer, parent, step_size: float = None):
+        """ Parses data from an xml <Layer> element into the OGCWebMapLayer object.
 
-        Creates OGCWebMapLayer objects for each xml layer and fills it with the layer content.
+        Runs recursive through own children for further parsing
 
         Args:
-            layers: An array of layers (In fact the children of the parent layer)
-            parent: The parent layer. If no parent exist it means we are in the root layer
+            layer: The layer xml element
+            parent: The parent OGCWebMapLayer object
+            step_size (float): The progress of a single layer
         Returns:
             nothing
         """
-        for layer in layers:
-            self._parse_single_layer(layer, parent, step_size=step_size)
+        layer_obj = self._create_layer_object(layer, parent)
+        self._add_layer(layer_obj)
+        sublayers = self._parse_layer_children(layer, layer_obj)
+        self._report_layer_progress(layer_obj, step_size)
 
-    def _parse_layers(self, xml_obj):
-        """ Parses all layers of a service and creates OGCWebMapLayer objects from each.
+        for sublayer in sublayers:
+            self._parse_single_layer(sublayer, layer_obj, step_size=step_size)
 
-        Uses recursion on the inside to get all children.
+    @staticmethod
+    def _get_layer_step_size(xml_obj):
+        """ Calculates the progress of a single layer
 
         Args:
             xml_obj: The iterable xml tree
         Returns:
-             nothing
+             step_size (float): The step size
         """
-        # get most upper parent layer, which normally lives directly in <Capability>
-        layers = xml_helper.try_get_element_from_xml(
-            elem="//" + GENERIC_NAMESPACE_TEMPLATE.format("Capability") +
-                 "/" + GENERIC_NAMESPACE_TEMPLATE.format("Layer"),
-            xml_elem=xml_obj
-        )
         total_layers = xml_helper.try_get_element_from_xml(
             elem="//" + GENERIC_NAMESPACE_TEMPLATE.format("Layer"),
             xml_elem=xml_obj
         )
 
         # calculate the step size for an async call
-        # 55 is the diff from the last process update (10) to the next static one (65)
         len_layers = len(total_layers)
         if len_layers == 0:
             # No division by zero!
             len_layers = 1
         step_size = float(PROGRESS_STATUS_AFTER_PARSING / len_layers)
         service_logger.debug("Total number of layers: {}. Step size: {}".format(len_layers, step_size))
+        return step_size
 
-        self._parse_layers_recursive(layers, step_size=step_size)
+    def _parse_layers(self, xml_obj):
+        """ Parses all layers of a service and creates OGCWebMapLayer objects from each.
+
+        Uses recursion on the inside to get all children.
+
+        Args:
+            xml_obj: The iterable xml tree
+        Returns:
+             nothing
+        """
+        # get most upper parent layer, which normally lives directly in <Capability>
+        layers = xml_helper.try_get_element_from_xml(
+            elem="//" + GENERIC_NAMESPACE_TEMPLATE.format("Capability") +
+                 "/" + GENERIC_NAMESPACE_TEMPLATE.format("Layer"),
+            xml_elem=xml_obj
+        )
+        step_size = self._get_layer_step_size(xml_obj)
+        self._layer_request_uris = self._parse_request_uris(self._get_request_element(xml_obj))
+        self._layer_progress = None
+
+        for layer in layers:
+            self._parse_single_layer(layer, None, step_size=step_size)
+
+    def _parse_layers_streaming(self, capabilities, step_size: float = None):
+        """ Parses all layers like _parse_layers(), but without building the tree of the whole document
+
+        A <Layer> element is parsed as soon as it has been read completely and is cleared afterwards. Therefore only
+        the content of the layers, which are still open, is held in memory.
+
+        Args:
+            capabilities (str|bytes): The capabilities document
+            step_size (float): The progress of a single layer
+        Returns:
+             nothing
+        """
+        encoding = None
+        if isinstance(capabilities, str):
+            # The declared encoding of the document does not apply anymore
+            capabilities = capabilities.encode("UTF-8")
+            encoding = "UTF-8"
+
+        self._layer_request_uris = None
+        self._layer_progress = None
+        open_layers = []
+        events = etree.iterparse(
+            io.BytesIO(capabilities),
+            events=("start", "end"),
+            tag=("{*}Layer", "{*}Request"),
+            encoding=encoding,
+            huge_tree=True,
+        )
+        for event, elem in events:
+            if _local_name(elem) == "Request":
+                # <Request> precedes the layers in <Capability>
+                if event == "end":
+                    self._layer_request_uris = self._parse_request_uris(elem)
+                continue
+
+            if event == "start":
+                # The attributes are already available, the children are not
+                layer_obj = self._create_layer_object(elem, open_layers[-1] if open_layers else None)
+                self._add_layer(layer_obj)
+                open_layers.append(layer_obj)
+            else:
+                # The nested layers have already been parsed and cleared
+                layer_obj = open_layers.pop()
+                self._parse_layer_children(elem, layer_obj)
+                self._report_layer_progress(layer_obj, step_size)
+                elem.clear()
 
     def get_service_metadata_from_capabilities(self, xml_obj):
         """ Parses all <Service> element information which can be found in every wms specification since 1.0.0
@@ -893,6 +950,7 @@ class OGCWebMapServiceLayer(OGCLayer):
     """ The OGCWebMapServiceLayer class
 
     """
+    __slots__ = ()
 
 
 class OGCWebMapService_1_0_0(OGCWebMapService):
@@ -902,24 +960,6 @@ class OGCWebMapService_1_0_0(OGCWebMapService):
     def __init__(self, service_connect_url, external_auth: ExternalAuthentication):
         super().__init__(service_connect_url=service_connect_url, external_auth=external_auth)
         self.service_version = OGCServiceVersionEnum.V_1_0_0
-        XML_NAMESPACES["schemaLocation"] = "http://schemas.opengis.net/wms/1.0.0/capabilities_1_0_0.xml"
-
-    def parse_formats(self, layer, layer_obj):
-        actions = ["Map", "Capabilities", "FeatureInfo"]
-        results = {}
-        for action in actions:
-            try:
-                results[action] = []
-                format_list = layer.xpath(
-                    "//" + GENERIC_NAMESPACE_TEMPLATE.format("Request") +
-                    "/" + GENERIC_NAMESPACE_TEMPLATE.format(action) +
-                    "/" + GENERIC_NAMESPACE_TEMPLATE.format("Format")
-                ).getchildren()
-                for format in format_list:
-                    results[action].append(format.text)
-            except AttributeError:
-                pass
-        layer_obj.format_list = results
 
     def get_version_specific_metadata(self, xml_obj):
         service_xml = xml_helper.try_get_single_element_from_xml(
@@ -958,7 +998,6 @@ class OGCWebMapService_1_1_0(OGCWebMapService):
     def __init__(self, service_connect_url, external_auth: ExternalAuthentication):
         super().__init__(service_connect_url=service_connect_url, external_auth=external_auth)
         self.service_version = OGCServiceVersionEnum.V_1_1_0
-        XML_NAMESPACES["schemaLocation"] = "http://schemas.opengis.net/wms/1.1.0/capabilities_1_1_0.xml"
 
     def get_version_specific_metadata(self, xml_obj):
         # No version specific implementation needed
@@ -972,8 +1011,6 @@ class OGCWebMapService_1_1_1(OGCWebMapService):
     def __init__(self, service_connect_url, external_auth: ExternalAuthentication):
         super().__init__(service_connect_url=service_connect_url, external_auth=external_auth)
         self.service_version = OGCServiceVersionEnum.V_1_1_1
-        XML_NAMESPACES["default"] = XML_NAMESPACES["wms"]
-        XML_NAMESPACES["schemaLocation"] = "http://schemas.opengis.net/wms/1.1.1/capabilities_1_1_1.xml"
 
     def get_version_specific_metadata(self, xml_obj):
         # No version specific implementation needed
@@ -985,6 +1022,17 @@ class OGCWebMapService_1_3_0(OGCWebMapService):
     """ The WMS class for standard version 1.3.0
 
     """
+    # <SRS>, <LatLonBoundingBox> and <Extent> have been replaced by <CRS>, <EX_GeographicBoundingBox> and the text
+    # of <Dimension>
+    LAYER_ELEMENT_PARSERS = {
+        name: method for name, method in OGCWebMapService.LAYER_ELEMENT_PARSERS.items()
+        if name not in ["SRS", "LatLonBoundingBox", "Extent"]
+    }
+    LAYER_ELEMENT_PARSERS.update({
+        "CRS": "_parse_projection_system_element",
+        "EX_GeographicBoundingBox": "_parse_geographic_bounding_box_element",
+    })
+    BOUNDING_BOX_SRS_ATTRIBUTE = "CRS"
 
     def __init__(self, service_connect_url, external_auth: ExternalAuthentication):
         super().__init__(service_connect_url=service_connect_url, external_auth=external_auth)
@@ -993,81 +1041,25 @@ class OGCWebMapService_1_3_0(OGCWebMapService):
         self.max_width = None
         self.max_height = None
 
-        XML_NAMESPACES["schemaLocation"] = "http://schemas.opengis.net/wms/1.3.0/capabilities_1_3_0.xsd"
-        XML_NAMESPACES["default"] = XML_NAMESPACES["wms"]
-
-    def parse_lat_lon_bounding_box(self, layer, layer_obj):
+    def _parse_geographic_bounding_box_element(self, bbox_xml, layer_obj):
         """ Version specific implementation of the bounding box parsing
 
         Args:
-            layer: The xml element which holds the layer info (parsing from)
-            layer_obj: The backend model which holds the layer data (parsing to)
-        Returns:
-             nothing
-        """
-        try:
-            bbox = xml_helper.try_get_element_from_xml(
-                "./" + GENERIC_NAMESPACE_TEMPLATE.format("EX_GeographicBoundingBox"),
-                layer)[0]
-            attrs = {
-                "westBoundLongitude": "minx",
-                "eastBoundLongitude": "maxx",
-                "southBoundLatitude": "miny",
-                "northBoundLatitude": "maxy",
-            }
-            for key, val in attrs.items():
-                tmp = xml_helper.try_get_text_from_xml_element(
-                    xml_elem=bbox,
-                    elem="./" + GENERIC_NAMESPACE_TEMPLATE.format(key)
-                )
-                if tmp is None:
-                    tmp = 0
-                layer_obj.capability_bbox_lat_lon[val] = tmp
-        except IndexError:
-            pass
-
-    def parse_projection_system(self, layer, layer_obj):
-        """ Version specific implementation of the projection system parsing
-
-        Args:
-            layer: The xml element which holds the layer info (parsing from)
-            layer_obj: The backend model which holds the layer data (parsing to)
-        Returns:
-             nothing
-        """
-        crs = xml_helper.try_get_element_from_xml(
-            "./" + GENERIC_NAMESPACE_TEMPLATE.format("CRS"),
-            layer
-        )
-        for elem in crs:
-            layer_obj.capability_projection_system.append(elem.text)
-
-    def parse_dimension(self, layer, layer_obj):
-        """ The version specific implementation of the dimension parsing
-
-        Args:
-            layer: The xml element which holds the layer info (parsing from)
+            bbox_xml: The <EX_GeographicBoundingBox> element (parsing from)
             layer_obj: The backend model which holds the layer data (parsing to)
         Returns:
              nothing
         """
-        dim_list = []
-        try:
-            dims = xml_helper.try_get_element_from_xml(
-                elem="./" + GENERIC_NAMESPACE_TEMPLATE.format("Dimension"),
-                xml_elem=layer
-            )
-            for dim in dims:
-                dim_dict = {
-                    "type": dim.get("name"),
-                    "units": dim.get("units"),
-                    "extent": dim.text,
-                }
-                dim_list.append(dim_dict)
-
-        except (IndexError, AttributeError) as error:
-            pass
-        layer_obj.dimension_list = dim_list
+        attrs = {
+            "westBoundLongitude": "minx",
+            "eastBoundLongitude": "maxx",
+            "southBoundLatitude": "miny",
+            "northBoundLatitude": "maxy",
+        }
+        for child in bbox_xml:
+            attr = attrs.get(_local_name(child), None)
+            if attr is not None:
+                layer_obj.capability_bbox_lat_lon[attr] = child.text or 0
 
     def get_version_specific_service_metadata(self, xml_obj):
         """ The version specific implementation of service metadata parsing
@@ -0,0 +1,224 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import hashlib
+import io
+import os
+import uuid
+
+from PIL import Image, UnidentifiedImageError
+from django.core.exceptions import ObjectDoesNotExist
+
+from MrMap.cacher import PreviewImageCacher
+from service.helper.enums import OGCOperationEnum, OGCServiceVersionEnum, OGCServiceEnum, MetadataEnum
+from service.helper.ogc.operation_request_handler import OGCOperationRequestHandler
+from service.models import Metadata, Layer, Service
+from service.settings import DEFAULT_SRS_STRING, PREVIEW_MIME_TYPE_DEFAULT, PLACEHOLDER_IMG_PATH, \
+    PREVIEW_IMG_WIDTH, PREVIEW_IMG_HEIGHT, PREVIEW_IMG_DIR, PREVIEW_IMG_CACHE_TIME, service_logger
+
+PREVIEW_CONTENT_TYPE = "image/{}".format(PREVIEW_MIME_TYPE_DEFAULT)
+
+
+def get_preview_metadata(md: Metadata):
+    """ Returns the layer metadata, which is rendered as preview for the given metadata
+
+    The preview of a whole wms is the preview of its root layer.
+
+    Args:
+        md (Metadata): The requested metadata
+    Returns:
+         layer_md (Metadata): The layer metadata or None if no preview can be rendered for the given metadata
+    """
+    if md.is_metadata_type(MetadataEnum.DATASET) or \
+            md.is_metadata_type(MetadataEnum.FEATURETYPE) or \
+            not md.service.is_service_type(OGCServiceEnum.WMS) or md.is_updatecandidate:
+        return None
+
+    if md.service.is_root:
+        # Fake the preview image for the whole service by using the root layer instead
+        try:
+            return Layer.objects.select_related("metadata").get(parent_service=md.service, parent=None).metadata
+        except ObjectDoesNotExist:
+            return None
+    return md
+
+
+def get_preview_metadata_ids(service: Service):
+    """ Returns the ids of all metadata records of a service, which provide a preview
+
+    Args:
+        service (Service): The root service
+    Returns:
+         ids (list): The metadata ids as strings, so they can be passed to celery tasks
+    """
+    if not service.is_service_type(OGCServiceEnum.WMS):
+        return []
+    layer_md_ids = Layer.objects.filter(parent_service=service).values_list("metadata_id", flat=True)
+    return [str(md_id) for md_id in [service.metadata.id, *layer_md_ids]]
+
+
+def render_preview(md: Metadata):
+    """ Requests a preview image for the given layer metadata and encodes it as PREVIEW_MIME_TYPE_DEFAULT
+
+    The GetMap request is performed with the permissions of an anonymous user, since the preview is shared by all
+    users. If no image can be fetched, the placeholder image is returned.
+
+    Args:
+        md (Metadata): The layer metadata
+    Returns:
+         content (bytes): The encoded preview image
+    """
+    if md.allowed_area.area == 0:
+        bbox = md.find_max_bounding_box()
+    else:
+        bbox = md.allowed_area
+    bbox = ",".join(str(coord) for coord in bbox.extent)
+
+    # Fetch a pixel based image mime type. We can not use vector types
+    png_format = md.get_formats().filter(
+        mime_type__icontains="image/"
+    ).exclude(
+        mime_type__icontains="svg"
+    ).first()
+    img_format = png_format.mime_type if png_format is not None else "image/png"
+
+    params = {
+        "request": OGCOperationEnum.GET_MAP.value,
+        "version": OGCServiceVersionEnum.V_1_1_1.value,
+        "layers": md.service.layer.identifier,
+        "srs": DEFAULT_SRS_STRING,
+        "bbox": bbox,
+        "format": img_format,
+        "width": PREVIEW_IMG_WIDTH,
+        "height": PREVIEW_IMG_HEIGHT,
+        "service": "wms",
+    }
+    operation_request_handler = OGCOperationRequestHandler(request=None, metadata=md, params=params)
+    img = operation_request_handler.get_operation_response()
+
+    try:
+        image_obj = Image.open(io.BytesIO(img.get("response", None)))
+    except (UnidentifiedImageError, TypeError):
+        # No preview image could be generated. We need to open a placeholder image!
+        image_obj = Image.open(PLACEHOLDER_IMG_PATH)
+        image_obj = image_obj.resize((PREVIEW_IMG_WIDTH, PREVIEW_IMG_HEIGHT))
+
+    out_bytes_stream = io.BytesIO()
+    image_obj.save(out_bytes_stream, PREVIEW_MIME_TYPE_DEFAULT, optimize=True, quality=80)
+    return out_bytes_stream.getvalue()
+
+
+def _get_preview_path(metadata_id):
+    """ Returns the path of the stored preview image of a metadata
+
+    Args:
+        metadata_id: The metadata id
+    Returns:
+         path (str): The file path
+    Raises:
+         ValueError: If the metadata id is not a valid uuid
+    """
+    # The id might come directly from the url, so it has to be validated before it is used as a file name
+    metadata_id = uuid.UUID(str(metadata_id))
+    return os.path.join(PREVIEW_IMG_DIR, "{}.{}".format(metadata_id, PREVIEW_MIME_TYPE_DEFAULT))
+
+
+def _create_preview(content: bytes):
+    """ Creates the preview dict, which is cached and served
+
+    Args:
+        content (bytes): The encoded preview image
+    Returns:
+         preview (dict): The encoded preview image and its etag
+    """
+    return {
+        "content": content,
+        "etag": '"{}"'.format(hashlib.sha256(content).hexdigest()),
+    }
+
+
+def store_preview(metadata_id, content: bytes):
+    """ Stores an encoded preview image in the image store and the cache
+
+    Args:
+        metadata_id: The metadata id
+        content (bytes): The encoded preview image
+    Returns:
+         preview (dict): The encoded preview image and its etag
+    """
+    os.makedirs(PREVIEW_IMG_DIR, exist_ok=True)
+    path = _get_preview_path(metadata_id)
+    # Write to a temporary file first, so no half written image can be served
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(tmp_path, "wb") as tmp_file:
+        tmp_file.write(content)
+    os.replace(tmp_path, path)
+
+    preview = _create_preview(content)
+    PreviewImageCacher(ttl=PREVIEW_IMG_CACHE_TIME).set(metadata_id, preview)
+    return preview
+
+
+def get_preview(metadata_id):
+    """ Returns a stored preview image from the cache or the image store
+
+    Args:
+        metadata_id: The metadata id
+    Returns:
+         preview (dict): The encoded preview image and its etag, None if no preview has been stored yet
+    """
+    cacher = PreviewImageCacher(ttl=PREVIEW_IMG_CACHE_TIME)
+    preview = cacher.get(metadata_id)
+    if preview is None:
+        try:
+            with open(_get_preview_path(metadata_id), "rb") as preview_file:
+                preview = _create_preview(preview_file.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        cacher.set(metadata_id, preview)
+    return preview
+
+
+def remove_previews(metadata_ids: list):
+    """ Removes stored preview images from the image store and the cache
+
+    Args:
+        metadata_ids (list): The metadata ids
+    Returns:
+         nothing
+    """
+    PreviewImageCacher().remove_many([str(metadata_id) for metadata_id in metadata_ids])
+    for metadata_id in metadata_ids:
+        try:
+            os.remove(_get_preview_path(metadata_id))
+        except (FileNotFoundError, ValueError):
+            pass
+
+
+def update_previews(metadata_ids: list):
+    """ Renders and stores the preview images of the given metadata records
+
+    Metadata records, which share the same rendered layer, like a service and its root layer, are rendered only once.
+
+    Args:
+        metadata_ids (list): The metadata ids
+    Returns:
+         nothing
+    """
+    rendered = {}
+    mds = Metadata.objects.filter(id__in=metadata_ids).select_related("service")
+    for md in mds:
+        try:
+            layer_md = get_preview_metadata(md)
+            if layer_md is None:
+                continue
+            if layer_md.id not in rendered:
+                rendered[layer_md.id] = render_preview(layer_md)
+            store_preview(md.id, rendered[layer_md.id])
+        except Exception as e:
+            # A single unreachable service shall not stop the rendering of all others
+            service_logger.error("Preview of metadata {} could not be rendered: {}".format(md.id, e))
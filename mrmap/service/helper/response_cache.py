@@ -0,0 +1,169 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import hashlib
+import json
+
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+
+from MrMap.cacher import OperationResponseCacher
+from service.models import Service
+from service.settings import OPERATION_RESPONSE_CACHE_TIMES, OPERATION_RESPONSE_CACHE_MAX_ENTRY_SIZE, \
+    OPERATION_RESPONSE_CACHE_SERVICE_BUDGET
+
+PUBLIC_ACCESS_SCOPE = "public"
+
+
+def get_cache_time(service: Service, operation: str):
+    """ Returns the time for which responses of an operation of the given service can be cached
+
+    Args:
+        service (Service): The root service
+        operation (str): The requested operation, e.g. 'GetLegendGraphic'
+    Returns:
+         cache_time (int): The cache time in seconds, 0 if the response shall not be cached
+    """
+    default_cache_time = {
+        key.upper(): val for key, val in OPERATION_RESPONSE_CACHE_TIMES.items()
+    }.get((operation or "").upper(), 0)
+    if default_cache_time == 0 or service.response_cache_time is None:
+        return default_cache_time
+    return service.response_cache_time
+
+
+def get_access_scope(groups):
+    """ Returns a key for the access scope of a caller of a secured service
+
+    Callers with the same groups get the same responses from a secured service, so they can share cached responses.
+
+    Args:
+        groups (QuerySet): The groups of the caller
+    Returns:
+         scope (str): The access scope key
+    """
+    group_ids = sorted(str(group_id) for group_id in groups.values_list("id", flat=True))
+    return hashlib.sha256(",".join(group_ids).encode("UTF-8")).hexdigest()
+
+
+def get_cache_key(metadata_id, params: dict, scope: str = PUBLIC_ACCESS_SCOPE):
+    """ Builds the cache key for a request
+
+    Parameter names are compared case insensitive and their order does not matter.
+
+    Args:
+        metadata_id: The id of the requested metadata
+        params (dict): The request parameters
+        scope (str): The access scope of the caller
+    Returns:
+         key (str): The cache key
+    """
+    normalized_params = sorted(
+        (str(key).upper(), str(val).strip()) for key, val in params.items()
+    )
+    content = json.dumps([str(metadata_id), scope, normalized_params])
+    return hashlib.sha256(content.encode("UTF-8")).hexdigest()
+
+
+def parse_cache_control(cache_control: str):
+    """ Parses the parts of an upstream Cache-Control header, which are relevant for a shared cache
+
+    Args:
+        cache_control (str): The header value
+    Returns:
+         storable (bool): Whether the response may be stored
+         max_age (int): The maximum age in seconds or None if not given
+    """
+    storable = True
+    ages = {}
+    for directive in (cache_control or "").lower().split(","):
+        name, _, value = directive.strip().partition("=")
+        if name in ("no-store", "no-cache", "private"):
+            storable = False
+        elif name in ("max-age", "s-maxage"):
+            try:
+                ages[name] = int(value.strip('" '))
+            except ValueError:
+                continue
+    # s-maxage overrides max-age for shared caches
+    max_age = ages.get("s-maxage", ages.get("max-age", None))
+    return storable, max_age
+
+
+def get_cached_response(key: str):
+    """ Returns a cached response
+
+    Args:
+        key (str): The cache key
+    Returns:
+         response (dict): The cached response, like returned by OGCOperationRequestHandler.get_operation_response() or None
+    """
+    return OperationResponseCacher().get(key)
+
+
+def cache_response(key: str, service: Service, response: dict, cache_time: int):
+    """ Caches a response, if the upstream server allows it
+
+    The cache time is limited by the upstream max-age. Responses which are too large or exceed the budget of the
+    service for this cache time are not cached, so a single service can not displace the cached responses of all others.
+
+    Args:
+        key (str): The cache key
+        service (Service): The root service
+        response (dict): The response, like returned by OGCOperationRequestHandler.get_operation_response()
+        cache_time (int): The configured cache time in seconds
+    Returns:
+         cached_response (dict): The cached response or None if the response has not been cached
+    """
+    content = response.get("response", None)
+    if cache_time <= 0 or not isinstance(content, bytes) or len(content) > OPERATION_RESPONSE_CACHE_MAX_ENTRY_SIZE:
+        return None
+
+    headers = response.get("response_headers", None) or {}
+    storable, max_age = parse_cache_control(headers.get("cache-control", None))
+    if not storable:
+        return None
+    if max_age is not None:
+        cache_time = min(cache_time, max_age)
+    if cache_time <= 0:
+        return None
+
+    cacher = OperationResponseCacher(ttl=cache_time)
+    # Each cache time has its own budget, which is reset when the entries of this cache time expire. Otherwise the
+    # first entry would fix the budget window for all operations, e.g. to a day for legends.
+    budget_key = "{}_{}".format(service.id, cache_time)
+    if not cacher.reserve(budget_key, len(content), OPERATION_RESPONSE_CACHE_SERVICE_BUDGET, cache_time):
+        return None
+
+    cached_response = {
+        "response": content,
+        "response_type": response.get("response_type", ""),
+        "response_headers": {
+            "etag": headers.get("etag", None) or '"{}"'.format(hashlib.sha256(content).hexdigest()),
+        },
+    }
+    cacher.set(key, cached_response)
+    return cached_response
+
+
+def get_http_response(request: HttpRequest, response: dict):
+    """ Creates the HttpResponse for a cached response
+
+    Conditional requests of clients are answered with 304 if the ETag still matches.
+
+    Args:
+        request (HttpRequest): The incoming request
+        response (dict): The cached response
+    Returns:
+         http_response (HttpResponse): The response
+    """
+    etag = response["response_headers"]["etag"]
+    if request.headers.get("If-None-Match", None) == etag:
+        http_response = HttpResponseNotModified()
+    else:
+        http_response = HttpResponse(response["response"], content_type=response["response_type"])
+    http_response["ETag"] = etag
+    return http_response
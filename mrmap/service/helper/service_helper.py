@@ -11,6 +11,7 @@ from django.conf import settings
 from django.db import transaction
 from django.http import HttpResponse, HttpRequest
 
+from MrMap.cacher import HitCacher
 from MrMap.messages import SERVICE_DISABLED, PARAMETER_ERROR
 from MrMap.utils import resolve_boolean_attribute_val
 from service import tasks
@@ -21,8 +22,11 @@ from service.helper.epsg_api import EpsgApi
 from service.helper.ogc.csw import OGCCatalogueService
 from service.helper.ogc.wfs import OGCWebFeatureServiceFactory
 from service.helper.ogc.wms import OGCWebMapServiceFactory
-from service.models import Service, ExternalAuthentication, Metadata, Document
+from service.models import Service, ExternalAuthentication, Metadata, Document, Layer, FeatureType
+from service.helper.capabilities_digest import get_section_digests, DOCUMENT_SECTION, LAYER_SECTION_PREFIX, \
+    FEATURE_TYPE_SECTION_PREFIX
 from service.helper.crypto_handler import CryptoHandler
+from service.helper.unit_of_work import deferred_side_effects
 from structure.models import MrMapUser
 
 
@@ -198,7 +202,7 @@ def create_service(service_type, version, base_uri, user, register_group, regist
     service.get_capabilities()
     service.create_from_capabilities(external_auth=external_auth)
 
-    with transaction.atomic():
+    with transaction.atomic(), deferred_side_effects():
         service = service.create_service_model_instance(
             user,
             register_group,
@@ -206,13 +210,55 @@ def create_service(service_type, version, base_uri, user, register_group, regist
             external_auth,
             is_update_candidate_for
         )
+        set_element_digests(service)
+        service.update_inherited_properties()
 
     return service
 
 
+def set_element_digests(service: Service):
+    """ Stores the digests of the service's capabilities document sections in the metadata of its elements
+
+    The service metadata gets the digest of the whole document, each layer or feature type the digest of its own section.
+    On updates, elements with an unchanged digest do not have to be touched.
+
+    Args:
+        service (Service): The registered service
+    Returns:
+         nothing
+    """
+    document = Document.objects.filter(
+        metadata=service.metadata,
+        is_original=True,
+        document_type=DocumentEnum.CAPABILITY.value
+    ).only("content").first()
+    if document is None or document.content is None:
+        return
+    digests = get_section_digests(document.content)
+    if digests is None:
+        return
+
+    metadatas = [Metadata(id=service.metadata.id, content_digest=digests.get(DOCUMENT_SECTION))]
+    if service.is_service_type(OGCServiceEnum.WMS):
+        layers = Layer.objects.filter(parent_service=service).values_list("metadata_id", "identifier", "metadata__title")
+        for md_id, identifier, title in layers:
+            digest = digests.get(LAYER_SECTION_PREFIX + (identifier or title or ""))
+            metadatas.append(Metadata(id=md_id, content_digest=digest))
+    elif service.is_service_type(OGCServiceEnum.WFS):
+        feature_types = FeatureType.objects.filter(parent_service=service).values_list("metadata_id", "metadata__identifier")
+        for md_id, identifier in feature_types:
+            digest = digests.get(FEATURE_TYPE_SECTION_PREFIX + (identifier or ""))
+            metadatas.append(Metadata(id=md_id, content_digest=digest))
+
+    # Bulk update without the side effects of Metadata.save()
+    Metadata.objects.bulk_update(metadatas, ["content_digest"], batch_size=500)
+
+
 def capabilities_are_different(cap_url_1, cap_url_2):
     """ Loads two capabilities documents using uris and checks if they differ
 
+    Whitespace and the order of attributes are ignored.
+
     Args:
         cap_url_1: First capabilities url
         cap_url_2: Second capabilities url
@@ -227,13 +273,13 @@ def capabilities_are_different(cap_url_1, cap_url_2):
     connector.load()
     xml_2 = connector.content
 
-    sec_handler = CryptoHandler()
-
-    # hash both and compare hashes
-    xml_1_hash = sec_handler.sha256(xml_1)
-    xml_2_hash = sec_handler.sha256(xml_2)
+    digests_1 = get_section_digests(xml_1)
+    digests_2 = get_section_digests(xml_2)
+    if digests_1 is None or digests_2 is None:
+        # No valid xml, so only the raw contents can be compared
+        return xml_1 != xml_2
 
-    return xml_1_hash != xml_2_hash
+    return digests_1[DOCUMENT_SECTION] != digests_2[DOCUMENT_SECTION]
 
 
 def create_new_service(form, user: MrMapUser):
@@ -281,11 +327,9 @@ def get_resource_capabilities(request: HttpRequest, md: Metadata):
     Returns:
 
     """
-    from service.tasks import async_increase_hits
     stored_version = md.get_service_version().value
-    # move increasing hits to background process to speed up response time!
-    # todo: after refactoring of md.increase_hits() maybe we don't need to start async tasks... test it!!!
-    async_increase_hits.delay(md.id)
+    # Hits are only counted in the cache here and written to the database periodically by async_flush_hits
+    HitCacher().increase(md.id)
 
     if not md.is_active:
         return HttpResponse(content=SERVICE_DISABLED, status=423)
@@ -0,0 +1,80 @@
+"""
+Author: Michel Peltriaux
+Organization: Spatial data infrastructure Rhineland-Palatinate, Germany
+Contact: michel.peltriaux@vermkv.rlp.de
+Created on: 19.10.26
+
+"""
+import threading
+from contextlib import contextmanager
+
+_state = threading.local()
+
+
+class MetadataUnitOfWork:
+    """ Collects the side effects of Metadata.save() during bulk operations
+
+    Instead of running them for each saved record, each kind of side effect is run once for all records when the
+    unit of work ends.
+
+    """
+    def __init__(self):
+        self.monitoring_ids = []
+        self.active_state_changes = {}
+
+    def add_to_monitoring(self, md_id):
+        self.monitoring_ids.append(md_id)
+
+    def add_active_state_change(self, md):
+        # Only the latest state of a record has to be propagated
+        self.active_state_changes[md.id] = md
+
+    def flush(self):
+        """ Runs all collected side effects
+
+        Returns:
+             nothing
+        """
+        from service.models import Metadata
+        if self.monitoring_ids:
+            # Records of rolled back savepoints do not exist anymore
+            Metadata.add_to_monitoring(list(
+                Metadata.objects.filter(id__in=self.monitoring_ids).values_list("id", flat=True)
+            ))
+        if self.active_state_changes:
+            Metadata.propagate_active_states(list(self.active_state_changes.values()))
+            Metadata.invalidate_page_caches()
+        self.monitoring_ids = []
+        self.active_state_changes = {}
+
+
+def get_unit_of_work():
+    """ Returns the unit of work of the current thread
+
+    Returns:
+         unit_of_work (MetadataUnitOfWork): The active unit of work or None
+    """
+    return getattr(_state, "unit_of_work", None)
+
+
+@contextmanager
+def deferred_side_effects():
+    """ Defers the side effects of Metadata.save() until the end of the block
+
+    Nested blocks join the outermost one. If the block raises an exception, the collected side effects are dropped.
+
+    Returns:
+         unit_of_work (MetadataUnitOfWork): The active unit of work
+    """
+    unit_of_work = get_unit_of_work()
+    if unit_of_work is not None:
+        yield unit_of_work
+        return
+
+    unit_of_work = MetadataUnitOfWork()
+    _state.unit_of_work = unit_of_work
+    try:
+        yield unit_of_work
+    finally:
+        _state.unit_of_work = None
+    unit_of_work.flush()
@@ -12,6 +12,7 @@ from django.db import transaction
 from django.utils import timezone
 
 from editor.forms import MetadataEditorForm
+from service.helper import preview_helper
 from service.helper.enums import DocumentEnum
 from service.models import Service, Layer, FeatureType, Metadata, ReferenceSystem, MimeType, Document
 
@@ -285,6 +286,20 @@ def update_single_layer(old: Layer, new: Layer, keep_custom_metadata: bool = Fal
     return old
 
 
+def _is_unchanged(old: Metadata, new: Metadata):
+    """ Checks whether the capabilities section of an element did not change between two versions of a service
+
+    Elements without a content digest, e.g. registered before digests were stored, are always treated as changed.
+
+    Args:
+        old (Metadata): The metadata of the existing element
+        new (Metadata): The metadata of the newly loaded element
+    Returns:
+         True if both digests exist and are equal, False otherwise
+    """
+    return old.content_digest is not None and old.content_digest == new.content_digest
+
+
 @transaction.atomic
 def update_wfs_elements(old: Service, new: Service, diff: dict, links: dict, keep_custom_metadata: bool = False):
     """ Updates the whole wfs service
@@ -304,7 +319,11 @@ def update_wfs_elements(old: Service, new: Service, diff: dict, links: dict, kee
     # update, add and remove feature types
     # feature types
     old_service_feature_types = FeatureType.objects.filter(parent_service=old)
-    new_service_feature_types = FeatureType.objects.filter(parent_service=new)
+    existing_feature_types = {
+        f_t.metadata.identifier: f_t for f_t in old_service_feature_types.select_related("metadata")
+    }
+    new_service_feature_types = FeatureType.objects.filter(parent_service=new).select_related("metadata")
+    changed_md_ids = []
     for feature_type in new_service_feature_types:
         id = None
         existing_f_t = None
@@ -315,17 +334,19 @@ def update_wfs_elements(old: Service, new: Service, diff: dict, links: dict, kee
                 # Get the id, from the FeatureType that already exist
                 id = links[feature_type.metadata.identifier]
             else:
-                existing_f_t = FeatureType.objects.get(
-                    parent_service=old,
-                    metadata__identifier=feature_type.metadata.identifier,
-                )
+                existing_f_t = existing_feature_types.get(feature_type.metadata.identifier)
+                if existing_f_t is not None and _is_unchanged(existing_f_t.metadata, feature_type.metadata):
+                    # Nothing changed in the capabilities section of this FeatureType
+                    continue
             if existing_f_t is None:
                 # Try to get this FeatureType (will fail for id=-1 -> indicates new FeatureType
                 # but no linking to old FeatureType)
                 existing_f_t = old_service_feature_types.get(metadata__id=id)
 
             existing_f_t = update_feature_type(existing_f_t, feature_type, keep_custom_metadata)
+            existing_f_t.metadata.save()
             existing_f_t.save()
+            changed_md_ids.append(existing_f_t.metadata.id)
 
         except ObjectDoesNotExist:
             # FeatureType could not be found with the given information.
@@ -343,6 +364,8 @@ def update_wfs_elements(old: Service, new: Service, diff: dict, links: dict, kee
             feature_type = transform_lists_to_m2m_collections(feature_type)
             feature_type.save()
 
+    Metadata.clear_cached_documents_of(changed_md_ids)
+
     # remove old featuretypes
     for removable in diff["feature_types"]["removed"]:
         try:
@@ -366,9 +389,13 @@ def _update_wms_layers(old: Service, root_layer: Layer, links: dict,
         root_layer (Layer): The root layer where we start searching for descendants
         keep_custom_metadata (bool): Whether the metadata should be overwritten or not
     Returns:
-         old (Service): The updated existing service
+         changed_md_ids (list): The metadata ids of all existing layers, which have been updated
     """
-    descendants = root_layer.get_descendants(include_self=True)
+    existing_layers = {
+        layer.identifier: layer for layer in Layer.objects.filter(parent_service=old).select_related("metadata")
+    }
+    descendants = root_layer.get_descendants(include_self=True).select_related("metadata")
+    changed_md_ids = []
     parent = None
     for new_layer in descendants:
         keys = links.keys()
@@ -382,10 +409,10 @@ def _update_wms_layers(old: Service, root_layer: Layer, links: dict,
                 id = links[new_layer.identifier]
             else:
                 # if the layer is not new, we just want to update it
-                existing_layer = Layer.objects.get(
-                    parent_service=old,
-                    identifier=new_layer.identifier
-                )
+                existing_layer = existing_layers.get(new_layer.identifier)
+                if existing_layer is not None and _is_unchanged(existing_layer.metadata, new_layer.metadata):
+                    # Nothing changed in the capabilities section of this layer
+                    continue
             # If no existing_layer could be found until now, we assume the id variable to be set. This means, that
             # the user knows, that an existing layer has been renamed to the new one. We fetch the "old" layer now...
             if existing_layer is None:
@@ -393,6 +420,7 @@ def _update_wms_layers(old: Service, root_layer: Layer, links: dict,
 
             # ... and perform the update on it.
             update_single_layer(existing_layer, new_layer, keep_custom_metadata)
+            changed_md_ids.append(existing_layer.metadata.id)
 
         except ObjectDoesNotExist:
             # Layer could not be found with the given information.
@@ -411,6 +439,7 @@ def _update_wms_layers(old: Service, root_layer: Layer, links: dict,
 
         finally:
             parent = new_layer
+    return changed_md_ids
 
 
 @transaction.atomic
@@ -489,9 +518,14 @@ def update_wms_elements(old: Service, new: Service, diff: dict, links: dict, kee
          old (Service): The updated existing service
     """
     # _update_wms_layers_recursive(old, new, [new.root_layer], links=links, keep_custom_metadata=keep_custom_metadata)
-    _update_wms_layers(old, new.root_layer, links=links, keep_custom_metadata=keep_custom_metadata)
+    changed_md_ids = _update_wms_layers(old, new.root_layer, links=links, keep_custom_metadata=keep_custom_metadata)
+    Metadata.clear_cached_documents_of(changed_md_ids)
 
     # remove unused layers
     identifieres = [layer.identifier for layer in diff["layers"]["removed"]]
-    Layer.objects.filter(parent_service=old, identifier__in=identifieres).delete()
+    removed_layers = Layer.objects.filter(parent_service=old, identifier__in=identifieres)
+    removed_md_ids = list(removed_layers.values_list("metadata_id", flat=True))
+    removed_layers.delete()
+    # The stored preview images are only removed, if the layers are removed for sure
+    transaction.on_commit(lambda: preview_helper.remove_previews(removed_md_ids))
     return old
@@ -5,13 +5,235 @@ Contact: michel.peltriaux@vermkv.rlp.de
 Created on: 31.07.19
 
 """
+import re
+import threading
+from types import MappingProxyType
+
 from lxml import etree
-from lxml.etree import XMLSyntaxError, _Element
+from lxml.etree import XMLSyntaxError, _Element, _ElementTree
 from requests.exceptions import ProxyError
 
-from MrMap.settings import XML_NAMESPACES
+from MrMap.settings import XML_NAMESPACES, XPATH_CACHE_SIZE
 from service.helper.enums import OGCServiceVersionEnum
 
+# Steps of an expression, which can be evaluated without the xpath engine
+_LOCAL_NAME_STEP = re.compile(r"\*\[local-name\(\)='([A-Za-z_][\w.-]*)'\]")
+_PREFIXED_STEP = re.compile(r"([A-Za-z_][\w.-]*):([A-Za-z_][\w.-]*)")
+
+_CHILD_AXIS = "./"
+_DESCENDANT_AXIS = ".//"
+_DOCUMENT_AXIS = "//"
+
+# id of a namespace map -> (namespace map, {expression: XPathExpression})
+_expression_registries = {}
+_expression_registries_lock = threading.Lock()
+
+
+def _get_local_name(xml_elem):
+    """ Returns the tag of a xml element without its namespace
+
+    Args:
+        xml_elem: The xml element
+    Returns:
+         The local name or None for comments and processing instructions
+    """
+    tag = xml_elem.tag
+    if not isinstance(tag, str):
+        return None
+    return tag.rpartition("}")[2]
+
+
+def _matches_tag(xml_elem, tag: str):
+    """ Checks whether a xml element matches a tag selector
+
+    Args:
+        xml_elem: The xml element
+        tag (str): The tag in clark notation, where '{*}' matches any or no namespace
+    Returns:
+         True if the element matches, False otherwise
+    """
+    if tag.startswith("{*}"):
+        return _get_local_name(xml_elem) == tag[3:]
+    return xml_elem.tag == tag
+
+
+def _translate_expression(expression: str, namespaces):
+    """ Translates simple location paths into tag selectors
+
+    Supported are paths of child steps ('./a/b'), relative descendant paths ('.//a/b') and document wide paths
+    ('//a/b'), whose steps are either *[local-name()='a'] or prefixed names of a known namespace.
+
+    Args:
+        expression (str): The xpath expression
+        namespaces: The namespace map
+    Returns:
+         axis, tags (tuple): The axis and the tags of the steps, or (None, None) if the expression is not supported
+    """
+    for axis in [_DOCUMENT_AXIS, _DESCENDANT_AXIS, _CHILD_AXIS]:
+        if expression.startswith(axis):
+            break
+    else:
+        return None, None
+
+    tags = []
+    for step in expression[len(axis):].split("/"):
+        match = _LOCAL_NAME_STEP.fullmatch(step)
+        if match is not None:
+            tags.append("{*}" + match.group(1))
+            continue
+        match = _PREFIXED_STEP.fullmatch(step)
+        if match is not None and match.group(1) in namespaces:
+            tags.append("{" + namespaces[match.group(1)] + "}" + match.group(2))
+            continue
+        return None, None
+    return axis, tuple(tags)
+
+
+def _iter_children(xml_elems, tag: str):
+    for xml_elem in xml_elems:
+        yield from xml_elem.iterchildren(tag)
+
+
+def _iter_descendants(anchor, tags: tuple, include_anchor: bool):
+    """ Yields the elements below anchor, which are reached by a descendant step followed by child steps
+
+    The candidates for the last step are found by lxml's tag selection. Their ancestors are checked against the
+    preceding steps, so the results keep the document order, like the results of the xpath engine.
+
+    Args:
+        anchor: The element, where the descendant step starts
+        tags (tuple): The tags of the steps
+        include_anchor (bool): Whether the first step may match the anchor itself
+    Returns:
+         A generator of the matching elements
+    """
+    if include_anchor:
+        candidates = anchor.iter(tags[-1])
+    else:
+        candidates = anchor.iterdescendants(tags[-1])
+    for candidate in candidates:
+        xml_elem = candidate
+        for tag in reversed(tags[:-1]):
+            if xml_elem is anchor:
+                # The path would start above the anchor
+                xml_elem = None
+                break
+            xml_elem = xml_elem.getparent()
+            if xml_elem is None or not _matches_tag(xml_elem, tag):
+                xml_elem = None
+                break
+        if xml_elem is not None and (include_anchor or xml_elem is not anchor):
+            yield candidate
+
+
+class XPathExpression:
+    """ A precompiled xpath expression
+
+    Simple location paths (see _translate_expression()) are evaluated by the tag selection of lxml, like ElementPath's
+    find() and iterfind() do, which does not need the xpath engine at all. Everything else is evaluated by the compiled
+    etree.XPath object. Both ways return the same elements in the same order.
+
+    Instances are shared between threads. etree.XPath locks itself during an evaluation.
+
+    """
+    __slots__ = ("expression", "xpath", "axis", "tags")
+
+    def __init__(self, expression: str, namespaces=XML_NAMESPACES):
+        self.expression = expression
+        self.xpath = etree.XPath(expression, namespaces=dict(namespaces))
+        self.axis, self.tags = _translate_expression(expression, namespaces)
+
+    def _iterate(self, xml_elem):
+        """ Evaluates the expression by tag selection
+
+        Args:
+            xml_elem: The xml element or tree
+        Returns:
+             A generator of the found elements
+        """
+        is_tree = isinstance(xml_elem, _ElementTree)
+        root = xml_elem.getroot() if is_tree else None
+
+        if self.axis == _CHILD_AXIS:
+            tags = self.tags
+            if is_tree:
+                # The context of a tree is the document node, whose only child is the root element
+                xml_elems = (root,) if _matches_tag(root, tags[0]) else ()
+                tags = tags[1:]
+            else:
+                xml_elems = (xml_elem,)
+            for tag in tags:
+                xml_elems = _iter_children(xml_elems, tag)
+            return iter(xml_elems)
+
+        if self.axis == _DOCUMENT_AXIS or is_tree:
+            if root is None:
+                root = xml_elem.getroottree().getroot()
+            return _iter_descendants(root, self.tags, include_anchor=True)
+        return _iter_descendants(xml_elem, self.tags, include_anchor=False)
+
+    def evaluate(self, xml_elem, **variables):
+        """ Returns the result of the expression
+
+        Args:
+            xml_elem: The xml element or tree
+            variables: Values of xpath variables ($name) of the expression
+        Returns:
+             The result, which is a list for location paths
+        """
+        if self.axis is None or variables:
+            return self.xpath(xml_elem, **variables)
+        return list(self._iterate(xml_elem))
+
+    def first(self, xml_elem, **variables):
+        """ Returns the first element of the result without evaluating the rest, if possible
+
+        Args:
+            xml_elem: The xml element or tree
+            variables: Values of xpath variables ($name) of the expression
+        Returns:
+             The first element or None
+        """
+        if self.axis is None or variables:
+            try:
+                return self.xpath(xml_elem, **variables)[0]
+            except (IndexError, TypeError):
+                return None
+        return next(self._iterate(xml_elem), None)
+
+
+def compile_xpath(expression: str, namespaces=XML_NAMESPACES):
+    """ Returns the precompiled expression from the registry
+
+    Expressions are registered per namespace map. Only immutable maps (MappingProxyType), like the ones from
+    MrMap.settings, are registered. Expressions for other maps are compiled on each call.
+
+    Args:
+        expression (str): The xpath expression
+        namespaces: The namespace map
+    Returns:
+         xpath_expression (XPathExpression): The compiled expression
+    """
+    if not isinstance(namespaces, MappingProxyType):
+        return XPathExpression(expression, namespaces)
+
+    registry = _expression_registries.get(id(namespaces), None)
+    if registry is not None:
+        xpath_expression = registry[1].get(expression, None)
+        if xpath_expression is not None:
+            return xpath_expression
+
+    xpath_expression = XPathExpression(expression, namespaces)
+    with _expression_registries_lock:
+        # The registry holds a reference on the map, so its id can not be reused
+        registry = _expression_registries.setdefault(id(namespaces), (namespaces, {}))
+        expressions = registry[1]
+        if len(expressions) >= XPATH_CACHE_SIZE:
+            # Drop the oldest expression. This only happens for expressions, which contain changing values.
+            del expressions[next(iter(expressions))]
+        expressions[expression] = xpath_expression
+    return xpath_expression
+
 
 def parse_xml(xml: str, encoding=None):
     """ Returns the xml as iterable object
@@ -34,10 +256,11 @@ def parse_xml(xml: str, encoding=None):
     try:
         parser = etree.XMLParser(huge_tree=len(xml_b) > 10000000)
         xml_obj = etree.ElementTree(etree.fromstring(text=xml_b, parser=parser))
-        if encoding != xml_obj.docinfo.encoding:
+        doc_encoding = xml_obj.docinfo.encoding
+        if doc_encoding is not None and (encoding or default_encoding).upper() != doc_encoding.upper():
             # there might be problems e.g. with german Umlaute ä,ö,ü, ...
             # try to parse again but with the correct encoding
-            return parse_xml(xml, xml_obj.docinfo.encoding)
+            return parse_xml(xml, doc_encoding)
     except XMLSyntaxError as e:
         xml_obj = None
     return xml_obj
@@ -119,60 +342,61 @@ def get_href_attribute(xml_elem):
     return xlink
 
 
-def try_get_single_element_from_xml(elem: str, xml_elem):
+def try_get_single_element_from_xml(elem: str, xml_elem, namespaces=XML_NAMESPACES):
     """ Wraps a try-except call to fetch a single element from an xml element
 
     Returns the first element of a result set. If the programmer knows what he/she does there should be only on element.
     Returns None if there are none
 
     Args:
-        elem:
-        xml_elem:
+        elem: The xpath expression
+        xml_elem: The xml element
+        namespaces: The namespace map for prefixed names of the expression
     Returns:
          ret_val: The found element(s), otherwise None
     """
-    tmp = try_get_element_from_xml(elem=elem, xml_elem=xml_elem)
     try:
-        return tmp[0]
-    except (IndexError, TypeError) as e:
+        return compile_xpath(elem, namespaces).first(xml_elem)
+    except (AttributeError, TypeError) as e:
+        # xml_elem is no xml element
         return None
 
 
-def try_get_element_from_xml(elem: str, xml_elem):
+def try_get_element_from_xml(elem: str, xml_elem, namespaces=XML_NAMESPACES):
     """ Wraps a try-except call to fetch elements from an xml element
 
     Args:
-        elem:
-        xml_elem:
+        elem: The xpath expression
+        xml_elem: The xml element
+        namespaces: The namespace map for prefixed names of the expression
     Returns:
          ret_val: The found element(s), otherwise None
     """
     ret_val = None
     try:
-        ret_val = xml_elem.xpath(elem, namespaces=XML_NAMESPACES)
-    except AttributeError:
+        ret_val = compile_xpath(elem, namespaces).evaluate(xml_elem)
+    except (AttributeError, TypeError):
         pass
     return ret_val
 
 
-def try_get_attribute_from_xml_element(xml_elem, attribute: str, elem: str = None):
+def try_get_attribute_from_xml_element(xml_elem, attribute: str, elem: str = None, namespaces=XML_NAMESPACES):
     """ Returns the requested attribute of an xml element
 
     Args:
         attribute:
         xml_elem:
         elem:
+        namespaces: The namespace map for prefixed names of elem
     Returns:
         A string if attribute was found, otherwise None
     """
 
-    if elem is None:
-        tmp = [xml_elem]
-    else:
-        tmp = try_get_element_from_xml(elem=elem, xml_elem=xml_elem)
+    if elem is not None:
+        xml_elem = try_get_single_element_from_xml(elem=elem, xml_elem=xml_elem, namespaces=namespaces)
     try:
-        return tmp[0].get(attribute)
-    except (IndexError, AttributeError) as e:
+        return xml_elem.get(attribute)
+    except AttributeError as e:
         return None
 
 def get_children_with_attribute(xml_elem, attribute: str, nearest_only: bool=False):
@@ -185,7 +409,7 @@ def get_children_with_attribute(xml_elem, attribute: str, nearest_only: bool=Fal
     Returns:
          children (list|_Element): The child or a list of children
     """
-    children = xml_elem.xpath(".//*[@" + attribute + "]")
+    children = compile_xpath(".//*[@" + attribute + "]").evaluate(xml_elem)
 
     if nearest_only and len(children) > 0:
         return children[0]
@@ -205,17 +429,18 @@ def set_attribute(xml_elem, attribute: str, value: str):
     xml_elem.set(attribute, value)
 
 
-def try_get_text_from_xml_element(xml_elem, elem: str=None):
+def try_get_text_from_xml_element(xml_elem, elem: str=None, namespaces=XML_NAMESPACES):
     """ Returns the text of an xml element
 
     Args:
         elem: The requested element tag name
         xml_elem: The current xml element
+        namespaces: The namespace map for prefixed names of elem
     Returns:
         A string if text was found, otherwise None
     """
     if elem is not None:
-        xml_elem = try_get_single_element_from_xml(elem=elem, xml_elem=xml_elem)
+        xml_elem = try_get_single_element_from_xml(elem=elem, xml_elem=xml_elem, namespaces=namespaces)
     try:
         return xml_elem.text
     except AttributeError:
@@ -231,7 +456,8 @@ def find_element_where_text(xml_obj, txt: str):
     Returns:
          The elements that contain the provided text
     """
-    return xml_obj.xpath("//*[text()='{}']/parent::*".format(txt), namespaces=XML_NAMESPACES)
+    # The text is passed as variable, so the expression is compiled once and may contain any quotes
+    return compile_xpath("//*[text()=$txt]/parent::*").evaluate(xml_obj, txt=txt)
 
 
 def find_element_where_attr(xml_obj, attr_name, attr_val):
@@ -244,7 +470,7 @@ def find_element_where_attr(xml_obj, attr_name, attr_val):
     Returns:
          The elements that contain the provided text
     """
-    return xml_obj.xpath("//*[@{}='{}']/parent::*".format(attr_name, attr_val), namespaces=XML_NAMESPACES)
+    return compile_xpath("//*[@{}=$attr_val]/parent::*".format(attr_name)).evaluate(xml_obj, attr_val=attr_val)
 
 
 def write_attribute(xml_elem, elem: str=None, attrib: str=None, txt: str=None):
@@ -299,7 +525,7 @@ def remove_element(xml_child):
     parent.remove(xml_child)
 
 
-def create_subelement(xml_elem: _Element, tag_name, after: str = None, attrib: dict = None, nsmap: dict = {}):
+def create_subelement(xml_elem: _Element, tag_name, after: str = None, attrib: dict = None, nsmap: dict = {}, namespaces=XML_NAMESPACES):
     """ Creates a new xml element as a child of xml_elem with the name tag_name
 
     Args:
@@ -307,12 +533,13 @@ def create_subelement(xml_elem: _Element, tag_name, after: str = None, attrib: d
         tag_name: The tag name for the new element
         after (str): The tag name of the element after which the new one should be inserted
         attrib: The attribute dict for the new element
+        namespaces: The namespace map for a prefixed name in after
     Returns:
          A new subelement of xml_elem
     """
     ret_element = etree.Element(tag_name, attrib=attrib, nsmap=nsmap)
     if after is not None:
-        after_element = try_get_single_element_from_xml("./{}".format(after), xml_elem)
+        after_element = try_get_single_element_from_xml("./{}".format(after), xml_elem, namespaces=namespaces)
         after_element_index = xml_elem.index(after_element) + 1
         xml_elem.insert(after_element_index, ret_element)
     else:
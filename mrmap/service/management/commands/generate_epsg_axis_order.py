@@ -0,0 +1,74 @@
+import json
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+
+from service.settings import EPSG_AXIS_ORDER_FILE_PATH
+
+AXIS_ORDER_QUERY = """
+    SELECT crs.code, axis.orientation
+    FROM (
+        SELECT code, coordinate_system_auth_name AS cs_auth_name, coordinate_system_code AS cs_code
+        FROM geodetic_crs
+        WHERE auth_name = 'EPSG' AND type IN ('geographic 2D', 'geographic 3D')
+        UNION ALL
+        SELECT code, coordinate_system_auth_name, coordinate_system_code
+        FROM projected_crs
+        WHERE auth_name = 'EPSG'
+    ) AS crs
+    JOIN axis ON axis.coordinate_system_auth_name = crs.cs_auth_name AND axis.coordinate_system_code = crs.cs_code
+    ORDER BY crs.code, axis.coordinate_system_order
+"""
+
+
+class Command(BaseCommand):
+    help = 'Generates the axis order file of all EPSG spatial reference systems from the proj.db of a PROJ installation'
+
+    def add_arguments(self, parser):
+        parser.add_argument('proj_db',
+                            type=str,
+                            help='Path of the proj.db, e.g. /usr/share/proj/proj.db')
+        parser.add_argument('-o', '--output',
+                            type=str,
+                            default=EPSG_AXIS_ORDER_FILE_PATH,
+                            help='Path of the generated file')
+
+    def handle(self, *args, **options):
+        try:
+            connection = sqlite3.connect("file:{}?mode=ro".format(options['proj_db']), uri=True)
+            version = connection.execute("SELECT value FROM metadata WHERE key = 'EPSG.VERSION'").fetchone()
+            rows = connection.execute(AXIS_ORDER_QUERY).fetchall()
+            connection.close()
+        except sqlite3.Error as e:
+            raise CommandError('{} could not be read: {}'.format(options['proj_db'], e))
+
+        # Only the first two axis are relevant
+        axis = {}
+        for code, orientation in rows:
+            try:
+                code = int(code)
+            except ValueError:
+                continue
+            axis.setdefault(code, [])
+            if len(axis[code]) < 2:
+                axis[code].append(orientation.lower())
+
+        # Consecutive identifiers with the same axis order are stored as one range
+        axis_orders = {}
+        for code in sorted(axis):
+            order = ",".join(axis[code])
+            id_ranges = axis_orders.setdefault(order, [])
+            if id_ranges and id_ranges[-1][1] == code - 1:
+                id_ranges[-1][1] = code
+            else:
+                id_ranges.append([code, code])
+
+        content = {
+            "source": "EPSG",
+            "version": version[0] if version else None,
+            "axis_orders": axis_orders,
+        }
+        with open(options['output'], 'w') as file:
+            json.dump(content, file)
+
+        self.stdout.write('Wrote axis orders of {} spatial reference systems to {}'.format(len(axis), options['output']))
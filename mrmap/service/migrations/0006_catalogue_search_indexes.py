@@ -0,0 +1,25 @@
+# Generated by Django 3.1.8 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0005_auto_20210415_1607'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='metadata',
+            index=models.Index(fields=['metadata_type', 'is_active'], name='service_met_metadat_1eb959_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dimension',
+            index=models.Index(fields=['type', 'time_extent_min', 'time_extent_max'], name='service_dim_type_ded8da_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dimension',
+            index=models.Index(fields=['type', 'elev_extent_min', 'elev_extent_max'], name='service_dim_type_f117f1_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.8 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0007_document_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='metadata',
+            name='content_digest',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
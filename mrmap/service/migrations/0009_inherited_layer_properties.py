@@ -0,0 +1,29 @@
+# Generated by Django 3.1.8 on 2026-10-19 12:00
+
+import django.contrib.gis.db.models.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0008_metadata_content_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='max_child_bbox',
+            field=django.contrib.gis.db.models.fields.PolygonField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='layer',
+            name='inherited_bounding_geometry',
+            field=django.contrib.gis.db.models.fields.PolygonField(blank=True, null=True, srid=4326),
+        ),
+        migrations.AddField(
+            model_name='layer',
+            name='inherited_reference_systems',
+            field=models.ManyToManyField(blank=True, related_name='inheriting_layers', to='service.ReferenceSystem'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.8 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0009_inherited_layer_properties'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='response_cache_time',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Response cache time'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 3.1.8 on 2026-10-19 12:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_metadata_status(apps, schema_editor):
+    """ Creates the status records from the latest existing health states, conformity check runs and harvest results
+
+    """
+    MetadataStatus = apps.get_model('service', 'MetadataStatus')
+    HealthState = apps.get_model('monitoring', 'HealthState')
+    HealthStateReason = apps.get_model('monitoring', 'HealthStateReason')
+    ConformityCheckRun = apps.get_model('quality', 'ConformityCheckRun')
+    HarvestResult = apps.get_model('csw', 'HarvestResult')
+
+    statuses = {}
+
+    def get_status(metadata_id):
+        if metadata_id not in statuses:
+            statuses[metadata_id] = MetadataStatus(metadata_id=metadata_id)
+        return statuses[metadata_id]
+
+    health_states = HealthState.objects.order_by('metadata_id', '-monitoring_run__end').distinct('metadata_id')
+    unauthorized = set(HealthStateReason.objects.filter(
+        health_state__in=health_states.values('uuid'),
+        health_state_code='unauthorized',
+    ).values_list('health_state_id', flat=True))
+    for health_state in health_states:
+        status = get_status(health_state.metadata_id)
+        status.health_state_id = health_state.uuid
+        status.health_state_code = health_state.health_state_code
+        status.health_message = health_state.health_message
+        status.health_unauthorized = health_state.uuid in unauthorized
+        status.reliability_1w = health_state.reliability_1w
+
+    check_runs = ConformityCheckRun.objects.order_by('metadata_id', '-time_start').distinct('metadata_id')
+    for check_run in check_runs:
+        status = get_status(check_run.metadata_id)
+        status.conformity_passed = check_run.passed
+        status.conformity_time_start = check_run.time_start
+
+    harvest_results = HarvestResult.objects.order_by('metadata_id', '-created').distinct('metadata_id')
+    for harvest_result in harvest_results:
+        status = get_status(harvest_result.metadata_id)
+        status.harvest_timestamp_start = harvest_result.timestamp_start
+        status.harvest_number_results = harvest_result.number_results
+
+    MetadataStatus.objects.bulk_create(statuses.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0010_service_response_cache_time'),
+        ('monitoring', '0003_monitoringresultdocument_changes'),
+        ('quality', '0002_auto_20210413_0935'),
+        ('csw', '0004_auto_20210415_1607'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetadataStatus',
+            fields=[
+                ('metadata', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='latest_status', serialize=False, to='service.metadata')),
+                ('health_state_code', models.CharField(blank=True, max_length=12, null=True)),
+                ('health_message', models.CharField(blank=True, max_length=512, null=True)),
+                ('health_unauthorized', models.BooleanField(default=False)),
+                ('reliability_1w', models.FloatField(blank=True, null=True)),
+                ('conformity_passed', models.BooleanField(blank=True, null=True)),
+                ('conformity_time_start', models.DateTimeField(blank=True, null=True)),
+                ('harvest_timestamp_start', models.DateTimeField(blank=True, null=True)),
+                ('harvest_number_results', models.IntegerField(blank=True, null=True)),
+                ('health_state', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='monitoring.healthstate')),
+            ],
+        ),
+        migrations.RunPython(fill_metadata_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.1.8 on 2026-10-19 12:00
+
+import MrMap.fields
+from django.db import migrations
+
+
+def compress_contents(apps, schema_editor):
+    """ Copies the plain document contents into the compressed field in batches
+
+    """
+    Document = apps.get_model('service', 'Document')
+    batch = []
+    documents = Document.objects.filter(content__isnull=False).only('id', 'content').order_by('id')
+    for document in documents.iterator(chunk_size=100):
+        document.compressed_content = document.content
+        batch.append(document)
+        if len(batch) >= 100:
+            Document.objects.bulk_update(batch, ['compressed_content'])
+            batch = []
+    if batch:
+        Document.objects.bulk_update(batch, ['compressed_content'])
+
+
+def decompress_contents(apps, schema_editor):
+    Document = apps.get_model('service', 'Document')
+    batch = []
+    documents = Document.objects.filter(compressed_content__isnull=False).only('id', 'compressed_content').order_by('id')
+    for document in documents.iterator(chunk_size=100):
+        document.content = document.compressed_content
+        batch.append(document)
+        if len(batch) >= 100:
+            Document.objects.bulk_update(batch, ['content'])
+            batch = []
+    if batch:
+        Document.objects.bulk_update(batch, ['content'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0011_metadatastatus'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='compressed_content',
+            field=MrMap.fields.CompressedTextField(blank=True, editable=True, null=True),
+        ),
+        migrations.RunPython(compress_contents, decompress_contents),
+        migrations.RemoveField(
+            model_name='document',
+            name='content',
+        ),
+        migrations.RenameField(
+            model_name='document',
+            old_name='compressed_content',
+            new_name='content',
+        ),
+    ]
@@ -1,4 +1,5 @@
 import csv
+import hashlib
 import io
 import json
 import uuid
@@ -14,7 +15,7 @@ from django.contrib.gis.geos import Polygon, GEOSGeometry
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import transaction, OperationalError
 from django.contrib.gis.db import models
-from django.db.models import Q, QuerySet, F, Count
+from django.db.models import Q, QuerySet, F, Count, ExpressionWrapper
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.functional import cached_property
@@ -28,9 +29,10 @@ from django.utils.translation import gettext_lazy as _
 from mptt.fields import TreeForeignKey
 from mptt.models import MPTTModel
 from MrMap.cacher import DocumentCacher, PageCacher
+from MrMap.fields import CompressedTextField, GZIP_MAGIC_NUMBER
 from MrMap.icons import IconEnum, get_icon
 from MrMap.messages import PARAMETER_ERROR, LOGGING_INVALID_OUTPUTFORMAT
-from MrMap.settings import HTTP_OR_SSL, HOST_NAME, GENERIC_NAMESPACE_TEMPLATE, ROOT_URL, EXEC_TIME_PRINT
+from MrMap.settings import GENERIC_NAMESPACE_TEMPLATE, ROOT_URL, EXEC_TIME_PRINT
 from MrMap import utils
 from MrMap.validators import not_uuid, geometry_is_empty
 from api.settings import API_CACHE_KEY_PREFIX
@@ -42,9 +44,11 @@ from service.helper.common_connector import CommonConnector
 from service.helper.enums import OGCServiceEnum, OGCServiceVersionEnum, MetadataEnum, OGCOperationEnum, DocumentEnum, \
     ResourceOriginEnum, CategoryOriginEnum, MetadataRelationEnum, HttpMethodEnum
 from service.helper.crypto_handler import CryptoHandler
+from service.helper.unit_of_work import get_unit_of_work
 from service.settings import DEFAULT_SERVICE_BOUNDING_BOX, EXTERNAL_AUTHENTICATION_FILEPATH, \
-    SERVICE_OPERATION_URI_TEMPLATE, SERVICE_LEGEND_URI_TEMPLATE, SERVICE_DATASET_URI_TEMPLATE, COUNT_DATA_PIXELS_ONLY, \
-    LOGABLE_FEATURE_RESPONSE_FORMATS, DIMENSION_TYPE_CHOICES, DEFAULT_MD_LANGUAGE, ISO_19115_LANG_CHOICES, DEFAULT_SRS, \
+    SERVICE_OPERATION_URI_TEMPLATE, COUNT_DATA_PIXELS_ONLY, \
+    LOGABLE_FEATURE_RESPONSE_FORMATS, DIMENSION_TYPE_CHOICES, DIMENSION_TYPE_TIME, DIMENSION_TYPE_ELEVATION, \
+    DIMENSION_TYPE_OTHER, DEFAULT_MD_LANGUAGE, ISO_19115_LANG_CHOICES, DEFAULT_SRS, \
     service_logger
 from structure.models import MrMapGroup, Organization, MrMapUser
 from service.helper import xml_helper
@@ -473,6 +477,78 @@ class ExternalAuthentication(models.Model):
         self.username = crypto_handler.message.decode("ascii")
 
 
+class MetadataQuerySet(models.QuerySet):
+    """ Custom queryset to provide lean projections of Metadata for hot paths
+
+    Large text and geometry columns are only fetched by the paths which really need them.
+
+    """
+    # Everything the security proxy reads from the requested metadata
+    PROXY_VIEW_FIELDS = (
+        "id",
+        "identifier",
+        "title",
+        "metadata_type",
+        "online_resource",
+        "is_active",
+        "is_secured",
+        "use_proxy_uri",
+        "log_proxy_access",
+    )
+    PROXY_VIEW_RELATED = (
+        "service__service_type",
+        "external_authentication",
+    )
+    # Everything a harvester needs to decide whether a record has to be updated at all
+    LOOKUP_VIEW_FIELDS = (
+        "id",
+        "identifier",
+        "title",
+        "metadata_type",
+        "is_active",
+        "last_remote_change",
+    )
+    # Columns, which are never rendered in list tables
+    LIST_VIEW_DEFERRED_FIELDS = (
+        "abstract",
+        "access_constraints",
+        "fees",
+        "bounding_geometry",
+        "capabilities_original_uri",
+        "service_metadata_original_uri",
+        "authority_url",
+        "metadata_url",
+        "content_digest",
+    )
+
+    def proxy_view(self):
+        """ Restricts the queryset to the columns, which are used by the security proxy
+
+        Returns:
+             queryset (MetadataQuerySet): The restricted queryset
+        """
+        return self.only(*self.PROXY_VIEW_FIELDS).select_related(*self.PROXY_VIEW_RELATED)
+
+    def lookup_view(self):
+        """ Restricts the queryset to the columns, which are used to look up existing records
+
+        Fields which are assigned on the fetched records are still saved, since django only skips deferred fields,
+        which have not been loaded or assigned.
+
+        Returns:
+             queryset (MetadataQuerySet): The restricted queryset
+        """
+        return self.only(*self.LOOKUP_VIEW_FIELDS)
+
+    def list_view(self):
+        """ Defers the columns, which are not rendered in list tables
+
+        Returns:
+             queryset (MetadataQuerySet): The restricted queryset
+        """
+        return self.defer(*self.LIST_VIEW_DEFERRED_FIELDS)
+
+
 class Metadata(Resource):
     from MrMap.validators import validate_metadata_enum_choices
     identifier = models.CharField(max_length=1000, null=True)
@@ -517,6 +593,8 @@ class Metadata(Resource):
     # capabilities
     authority_url = models.CharField(max_length=255, null=True, blank=True)
     metadata_url = models.CharField(max_length=255, null=True, blank=True)
+    # Canonical digest of the element's section in the capabilities document. Unchanged elements are skipped on updates.
+    content_digest = models.CharField(max_length=64, null=True, blank=True)
 
     # other
     keywords = models.ManyToManyField(Keyword)
@@ -540,6 +618,8 @@ class Metadata(Resource):
     has_dataset_metadatas = models.BooleanField(default=False)
     origin = None
 
+    objects = MetadataQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created']
         indexes = [
@@ -548,7 +628,14 @@ class Metadata(Resource):
                     "id",
                     "identifier"
                 ]
-            )
+            ),
+            # used by the catalogue search, which filters active records by type
+            models.Index(
+                fields=[
+                    "metadata_type",
+                    "is_active",
+                ]
+            ),
         ]
         permissions = [
             ("delete_dataset_metadata", "Can delete dataset metadata"),
@@ -811,21 +898,34 @@ class Metadata(Resource):
                              tooltip=_l('This resource has external authentication.')))
         return icons
 
+    def get_latest_status(self):
+        """ Returns the denormalized latest status of the metadata
+
+        Returns:
+             status (MetadataStatus): The status or None if no run has been finished for this metadata yet
+        """
+        try:
+            return self.latest_status
+        except ObjectDoesNotExist:
+            return None
+
     def get_health_icons(self):
         icons = []
         btn_color = ButtonColorEnum.SECONDARY_OUTLINE
-        health_state = self.get_health_state()
-        if health_state:
-            if health_state.health_state_code == HealthStateEnum.OK.value:
+        status = self.get_latest_status()
+        if status is not None and status.health_state_code is None:
+            status = None
+        if status:
+            if status.health_state_code == HealthStateEnum.OK.value:
                 # state is OK
                 btn_color = ButtonColorEnum.SUCCESS_OUTLINE
-            elif health_state.health_state_code == HealthStateEnum.WARNING.value:
+            elif status.health_state_code == HealthStateEnum.WARNING.value:
                 # state is WARNING
                 btn_color = ButtonColorEnum.WARNING_OUTLINE
-            elif health_state.health_state_code == HealthStateEnum.CRITICAL.value:
+            elif status.health_state_code == HealthStateEnum.CRITICAL.value:
                 # state is CRITICAL
                 btn_color = ButtonColorEnum.DANGER_OUTLINE
-            tooltip = health_state.health_message
+            tooltip = status.health_message
 
             icon = Tag(tag='i', attrs={"class": [IconEnum.HEARTBEAT.value, btn_color.value]},
                        tooltip=tooltip)
@@ -834,30 +934,28 @@ class Metadata(Resource):
             tooltip = DEFAULT_UNKNOWN_MESSAGE
             icon = Tag(tag='i', attrs={"class": [IconEnum.HEARTBEAT.value, TextColorEnum.SECONDARY.value]})
 
-        if health_state and not health_state.health_state_code == HealthStateEnum.UNKNOWN.value:
-            icon = LinkButton(url=self.health_state.last().get_absolute_url(),
+        if status and not status.health_state_code == HealthStateEnum.UNKNOWN.value and status.health_state_id:
+            icon = LinkButton(url=reverse('monitoring:health_state_details', args=[status.health_state_id]),
                               content=icon.render(),
                               color=btn_color,
                               tooltip=tooltip,
                               tooltip_placement=TooltipPlacementEnum.LEFT)
 
         icons.append(icon)
-        if health_state:
-            for reason in health_state.reasons.all():
-                if reason.health_state_code == HealthStateEnum.UNAUTHORIZED.value:
-                    icons.append(Tag(tag='i',
-                                     attrs={"class": [IconEnum.PASSWORD.value]},
-                                     tooltip=_l('Some checks can\'t get a result, cause the service needs an authentication for this request.')))
-                    break
+        if status:
+            if status.health_unauthorized:
+                icons.append(Tag(tag='i',
+                                 attrs={"class": [IconEnum.PASSWORD.value]},
+                                 tooltip=_l('Some checks can\'t get a result, cause the service needs an authentication for this request.')))
 
             badge_color = BadgeColorEnum.SUCCESS
-            if health_state.reliability_1w < CRITICAL_RELIABILITY:
+            if status.reliability_1w < CRITICAL_RELIABILITY:
                 badge_color = BadgeColorEnum.DANGER
-            elif health_state.reliability_1w < WARNING_RELIABILITY:
+            elif status.reliability_1w < WARNING_RELIABILITY:
                 badge_color = BadgeColorEnum.WARNING
             icons.append(Badge(badge_color=badge_color,
                                badge_pill=True,
-                               content=f'{round(health_state.reliability_1w, 2)} %',
+                               content=f'{round(status.reliability_1w, 2)} %',
                                tooltip=_l('Reliability statistic for one week.')))
         return icons
 
@@ -1070,7 +1168,7 @@ class Metadata(Resource):
         # Set document records value to None
         upper_elements_docs = Document.objects.filter(
             metadata__in=upper_elements_metadatas
-        )
+        ).defer("content")
         for doc in upper_elements_docs:
             doc.content = None
             doc.save()
@@ -1087,6 +1185,24 @@ class Metadata(Resource):
         self._clear_current_capability_document()
         self._clear_service_metadata_document()
 
+    @staticmethod
+    def clear_cached_documents_of(metadata_ids):
+        """ Removes the cached documents of many metadata records at once
+
+        Instead of one cache call per record and document, one call per document type is issued.
+
+        Args:
+            metadata_ids (iterable): The metadata ids
+        Returns:
+
+        """
+        keys = [str(md_id) for md_id in metadata_ids]
+        if not keys:
+            return
+        DocumentCacher("SERVICE_METADATA", "0").remove_many(keys)
+        for version in OGCServiceVersionEnum:
+            DocumentCacher(OGCOperationEnum.GET_CAPABILITIES.value, version.value).remove_many(keys)
+
     def _clear_service_metadata_document(self):
         """ Sets the service_metadata_document content to None
 
@@ -1370,19 +1486,67 @@ class Metadata(Resource):
         qs = Metadata.objects.filter(filter_query) if filter_query else Metadata.objects.none()
         return qs
 
-    @transaction.atomic
+    def get_subtree_metadatas(self, include_self=False) -> QuerySet:
+        """ Return all Metadata objects of the subelements of the described element.
+
+            In contrast to get_descendant_metadatas() FeatureTypes are covered as well, so settings which are inherited
+            by all subelements can be changed with a single UPDATE statement.
+
+            Returns:
+                qs (QuerySet): the QuerySet of all subelement metadata objects
+        """
+        filter_query = None
+        if self.is_service_metadata:
+            if self.service_type is OGCServiceEnum.WMS:
+                filter_query = Q(service__parent_service=self.service)
+            elif self.service_type is OGCServiceEnum.WFS:
+                filter_query = Q(featuretype__parent_service=self.service)
+        elif self.is_layer_metadata:
+            filter_query = Q(service__in=self.get_described_element().get_descendants())
+
+        if include_self:
+            filter_query = filter_query | Q(id=self.id) if filter_query else Q(id=self.id)
+
+        qs = Metadata.objects.filter(filter_query) if filter_query else Metadata.objects.none()
+        return qs
+
     def increase_hits(self):
-        """ Increases the hit counter of all metadata objects the service has
+        """ Increases the hit counter of this metadata and all metadata objects of its subelements
 
         Returns:
              Nothing
         """
-        # Only if whole service was called, increase the children hits as well
-        if self.is_metadata_type(MetadataEnum.SERVICE):
-            self.get_all_service_metadatas.update(hits=F('hits') + 1)
-        else:
-            # todo
-            pass
+        Metadata.add_hits({self.id: 1})
+
+    @staticmethod
+    @transaction.atomic
+    def add_hits(hits: dict):
+        """ Adds counted hits to the hit counters of many metadata records
+
+        A hit on a metadata record is a hit on all of its subelements as well, since their capabilities are part of
+        the requested document. Records with the same resulting delta are updated with a single UPDATE statement.
+
+        Args:
+            hits (dict): The number of hits per requested metadata id
+        Returns:
+             nothing
+        """
+        deltas = {}
+        requested_mds = Metadata.objects.filter(
+            id__in=hits.keys()
+        ).select_related(
+            "service__service_type", "featuretype"
+        )
+        for md in requested_mds:
+            md_hits = hits.get(md.id, hits.get(str(md.id), 0))
+            for md_id in md.get_subtree_metadatas(include_self=True).values_list("id", flat=True):
+                deltas[md_id] = deltas.get(md_id, 0) + md_hits
+
+        ids_per_delta = {}
+        for md_id, delta in deltas.items():
+            ids_per_delta.setdefault(delta, []).append(md_id)
+        for delta, md_ids in ids_per_delta.items():
+            Metadata.objects.filter(id__in=md_ids).update(hits=F('hits') + delta)
 
     def save(self, add_monitoring: bool = True, *args, **kwargs):
         """ Overwriting the regular save function
@@ -1398,37 +1562,82 @@ class Metadata(Resource):
         adding = self._state.adding
         super().save(*args, **kwargs)
 
+        # Within a bulk operation the side effects are collected and run once at its end
+        unit_of_work = get_unit_of_work()
         if not adding:
             if self.__is_active != self.is_active:
-                # the active sate of this and all descendant metadatas shall be changed to the new value. Bulk update
-                # is the most efficient way to do it.
-                if self.is_active:
-                    self.get_family_metadatas.prefetch_related('related_metadatas') \
-                        .update(is_active=self.is_active)
-                    self.get_family_related_metadatas() \
-                        .update(is_active=self.is_active)
+                if unit_of_work is not None:
+                    unit_of_work.add_active_state_change(self)
                 else:
-                    self.get_descendant_metadatas(include_self=True).prefetch_related('related_metadatas') \
-                        .update(is_active=self.is_active)
-                    # updating only related metadatas without dependencies
-                    self.get_descendant_related_metadatas(include_self=True) \
-                        .annotate(num_dependencies=Count('from_metadatas')) \
-                        .filter(num_dependencies__lte=1) \
-                        .update(is_active=self.is_active)
-
-                # clear page cacher for API and csw
-                page_cacher = PageCacher()
-                page_cacher.remove_pages(API_CACHE_KEY_PREFIX)
-                page_cacher.remove_pages(CSW_CACHE_PREFIX)
+                    Metadata.propagate_active_states([self])
+                    Metadata.invalidate_page_caches()
         else:
             # Add created/updated object to the MonitoringSettings.
-            # todo: NOTE: Since we do not have a clear handling for which setting to use, always use first (default)
-            #  setting.
             if add_monitoring:
-                monitoring_setting = MonitoringSetting.objects.first()
-                if monitoring_setting is not None:
-                    monitoring_setting.metadatas.add(self)
-                    monitoring_setting.save()
+                if unit_of_work is not None:
+                    unit_of_work.add_to_monitoring(self.id)
+                else:
+                    Metadata.add_to_monitoring([self.id])
+
+    @staticmethod
+    def add_to_monitoring(md_ids: list):
+        """ Adds many metadata records to the monitoring at once
+
+        Args:
+            md_ids (list): The metadata ids
+        Returns:
+             nothing
+        """
+        if not md_ids:
+            return
+        # todo: NOTE: Since we do not have a clear handling for which setting to use, always use first (default)
+        #  setting.
+        monitoring_setting = MonitoringSetting.objects.first()
+        if monitoring_setting is not None:
+            monitoring_setting.metadatas.add(*md_ids)
+            monitoring_setting.save()
+
+    @staticmethod
+    def propagate_active_states(mds: list):
+        """ Changes the active state of all descendant and related metadatas of the given records to their state
+
+        The records of all given metadatas are changed with one UPDATE statement per state.
+
+        Args:
+            mds (list): The metadatas, which active state has been changed
+        Returns:
+             nothing
+        """
+        activated_filter = Q()
+        deactivated_filter = Q()
+        for md in mds:
+            if md.is_active:
+                activated_filter |= Q(id__in=md.get_family_metadatas.values("id"))
+                activated_filter |= Q(id__in=md.get_family_related_metadatas().values("id"))
+            else:
+                deactivated_filter |= Q(id__in=md.get_descendant_metadatas(include_self=True).values("id"))
+                # updating only related metadatas without dependencies
+                deactivated_filter |= Q(id__in=md.get_descendant_related_metadatas(include_self=True)
+                                        .annotate(num_dependencies=Count('from_metadatas'))
+                                        .filter(num_dependencies__lte=1)
+                                        .values("id"))
+        if activated_filter:
+            Metadata.objects.filter(activated_filter).update(is_active=True)
+        if deactivated_filter:
+            Metadata.objects.filter(deactivated_filter).update(is_active=False)
+
+    @staticmethod
+    def invalidate_page_caches():
+        """ Invalidates the cached pages of the API and the csw
+
+        Returns:
+             nothing
+        """
+        def invalidate():
+            page_cacher = PageCacher()
+            page_cacher.invalidate_namespace(API_CACHE_KEY_PREFIX)
+            page_cacher.invalidate_namespace(CSW_CACHE_PREFIX)
+        transaction.on_commit(invalidate)
 
     def delete(self, using=None, keep_parents=False, force=False):
         """ Overwriting of the regular delete function
@@ -1510,6 +1719,26 @@ class Metadata(Resource):
     def find_max_bounding_box(self) -> GEOSGeometry:
         """ Returns the largest bounding box of all children
 
+        Returns:
+            bounding box with the greatest area (GEOSGeometry)
+        """
+        if self.metadata_type not in [MetadataEnum.SERVICE.value, MetadataEnum.LAYER.value]:
+            return DEFAULT_SERVICE_BOUNDING_BOX
+
+        max_box = self.service.max_child_bbox
+        if max_box is None:
+            # The service has not been materialized yet
+            max_box = self._find_max_child_bounding_box()
+
+        if max_box.area == 0:
+            # if this element and it's children does not provide a bounding geometry, we simply take the one from the
+            # whole service to avoid the map flipping somewhere else on the planet
+            return self.service.parent_service.metadata.find_max_bounding_box()
+        return max_box
+
+    def _find_max_child_bounding_box(self) -> GEOSGeometry:
+        """ Computes the largest bounding box of all children from the child elements
+
         Returns:
             bounding box with the greatest area (GEOSGeometry)
         """
@@ -1522,27 +1751,11 @@ class Metadata(Resource):
                 children = FeatureType.objects.filter(
                     parent_service__metadata=self
                 )
-        elif self.metadata_type == MetadataEnum.LAYER.value:
+        else:
             children = Layer.objects.filter(
                 parent__metadata=self
             )
-        else:
-            return DEFAULT_SERVICE_BOUNDING_BOX
-
-        try:
-            children_bboxes = {child.bbox_lat_lon.area: child.bbox_lat_lon for child in children}
-            max_box = children_bboxes.get(max(children_bboxes), None)
-        except ValueError:
-            # happens in max() on empty iterables
-            max_box = None
-
-        if max_box is None:
-            max_box = DEFAULT_SERVICE_BOUNDING_BOX
-        if max_box.area == 0:
-            # if this element and it's children does not provide a bounding geometry, we simply take the one from the
-            # whole service to avoid the map flipping somewhere else on the planet
-            return self.service.parent_service.metadata.find_max_bounding_box()
-        return max_box
+        return utils.get_max_area_geometry(children.values_list("bbox_lat_lon", flat=True), DEFAULT_SERVICE_BOUNDING_BOX)
 
     def is_root(self):
         """ Checks whether the metadata describes a root service or a layer/featuretype
@@ -1838,22 +2051,22 @@ class Metadata(Resource):
             links.append(md.metadata_url)
         return links
 
-    def _set_document_secured(self, is_secured: bool):
-        """ Fetches the metadata documents and sets the secured uris for all operations
+    def _set_documents_proxy(self, rewriter, include_self: bool = True):
+        """ Rewrites the capabilities documents of all subelements in one batch
 
         Args:
-            is_secured (bool): Whether the operations should be secured or not
+            rewriter (CapabilitiesRewriter): The rewriter, which holds the proxy setting
+            include_self (bool): Whether the document of this metadata shall be rewritten as well
         Returns:
             nothing
         """
-        try:
-            cap_doc = self.documents.get(
-                document_type=DocumentEnum.CAPABILITY.value,
-                is_original=False,
-            )
-            cap_doc.set_proxy(is_secured)
-        except ObjectDoesNotExist:
-            pass
+        docs = Document.objects.filter(
+            metadata__in=self.get_subtree_metadatas(include_self=include_self),
+            document_type=DocumentEnum.CAPABILITY.value,
+            is_original=False,
+            content__isnull=False,
+        ).select_related("metadata")
+        rewriter.rewrite_documents(docs)
 
     # todo: since all active state checks are based on the metadata object, we don't need document active state also
     #  So we can drop this function
@@ -1876,8 +2089,11 @@ class Metadata(Resource):
         """
         # Only change if the proxy setting is activated or the logging shall be deactivated anyway
         if self.use_proxy_uri or not logging:
-            # If the metadata shall be logged, all of it's subelements shall be logged as well!
-            self.get_descendant_metadatas().update(log_proxy_acces=F('log_proxy_access'))
+            self.log_proxy_access = logging
+            with transaction.atomic():
+                # If the metadata shall be logged, all of it's subelements shall be logged as well!
+                self.get_subtree_metadatas().update(log_proxy_access=logging, last_modified=timezone.now())
+                self.save()
 
     def set_proxy(self, use_proxy: bool):
         """ Set the metadata proxy to a new value.
@@ -1888,10 +2104,12 @@ class Metadata(Resource):
             use_proxy (bool): Whether to use a proxy or not
         Returns:
         """
+        from service.helper.ogc.capabilities_rewriter import CapabilitiesRewriter
         if not self.is_root():
             root_md = self.service.parent_service.metadata
         else:
             root_md = self
+        rewriter = CapabilitiesRewriter(root_md, use_proxy)
 
         # change capabilities document if there is one (subelements may not have any documents yet)
         try:
@@ -1912,7 +2130,8 @@ class Metadata(Resource):
                 root_md_doc.content = orig_doc.content
                 root_md_doc.is_active = orig_doc.is_active
 
-            root_md_doc.set_proxy(use_proxy)
+            rewriter.rewrite(root_md_doc)
+            root_md_doc.save()
         except ObjectDoesNotExist:
             pass
 
@@ -1922,26 +2141,20 @@ class Metadata(Resource):
         self.use_proxy_uri = use_proxy
 
         # If md uris shall be tunneled using the proxy, we need to make sure that all children are aware of this!
-        for subelement in self.service.get_subelements().select_related('metadata').prefetch_related('metadata__documents'):
-            subelement_md = subelement.metadata
-            subelement_md.use_proxy_uri = self.use_proxy_uri
-            try:
-                # If there exists already a capabilities document for a subelement, we need to change the links there as well
-                subelement_md_doc = subelement_md.documents.get(document_type=DocumentEnum.CAPABILITY.value,
-                                                                is_original=False)
-                if subelement_md_doc.content is not None:
-                    subelement_md_doc.set_proxy(use_proxy)
-            except ObjectDoesNotExist:
-                pass
-            subelement_md.save()
-            subelement_md.clear_cached_documents()
+        subelement_mds = self.get_subtree_metadatas()
+        with transaction.atomic():
+            # If there exist already capabilities documents for subelements, we need to change the links there as well
+            self._set_documents_proxy(rewriter, include_self=not self.is_root())
+            subelement_md_ids = list(subelement_mds.values_list("id", flat=True))
+            subelement_mds.update(use_proxy_uri=self.use_proxy_uri, last_modified=timezone.now())
+            self.save()
 
-        self.save()
+        Metadata.clear_cached_documents_of(subelement_md_ids)
 
     def set_secured(self, is_secured: bool):
         """ Set is_secured to a new value.
 
-        Iterates over all children for the same purpose.
+        Changes all subelements for the same purpose using a single UPDATE statement.
         Activates use_proxy automatically!
 
         Args:
@@ -1949,6 +2162,7 @@ class Metadata(Resource):
         Returns:
 
         """
+        from service.helper.ogc.capabilities_rewriter import CapabilitiesRewriter
         self.is_secured = is_secured
         if not is_secured and self.use_proxy_uri:
             # secured access shall be disabled, but use_proxy is still enabled
@@ -1956,30 +2170,20 @@ class Metadata(Resource):
             self.use_proxy_uri = True
         else:
             self.use_proxy_uri = is_secured
-        self._set_document_secured(self.use_proxy_uri)
-
-        children = []
-        if self.is_metadata_type(MetadataEnum.SERVICE) or self.is_metadata_type(MetadataEnum.LAYER):
-            if self.service.is_service_type(OGCServiceEnum.WMS):
-                parent_service = self.service
-                children = Metadata.objects.filter(
-                    service__parent_service=parent_service
-                )
-                for child in children:
-                    child._set_document_secured(self.use_proxy_uri)
-
-            elif self.service.is_service_type(OGCServiceEnum.WFS):
-                children = [ft.metadata for ft in self.service.featuretypes.all()]
 
-            for child in children:
-                child.is_secured = is_secured
-                child.use_proxy_uri = self.use_proxy_uri
-                child.save()
+        subelement_mds = self.get_subtree_metadatas()
+        with transaction.atomic():
+            self._set_documents_proxy(CapabilitiesRewriter(self, self.use_proxy_uri), include_self=True)
+            subelement_md_ids = list(subelement_mds.values_list("id", flat=True))
+            subelement_mds.update(
+                is_secured=is_secured,
+                use_proxy_uri=self.use_proxy_uri,
+                last_modified=timezone.now()
+            )
+            self.save()
 
-        elif self.is_metadata_type(MetadataEnum.FEATURETYPE):
-            # a featuretype does not have children - we can skip this case!
-            pass
-        self.save()
+        subelement_md_ids.append(self.id)
+        Metadata.clear_cached_documents_of(subelement_md_ids)
 
     def inform_subscriptors(self):
         """ Iterates over all related subscriptions and triggers the inform_subscriptor() method
@@ -2020,6 +2224,100 @@ class Metadata(Resource):
         return health_states
 
 
+class MetadataStatus(models.Model):
+    """ Denormalized latest status of a metadata record
+
+    Holds the latest health state, conformity check and harvest result of a metadata record, so list views can fetch
+    everything in one joined query. The record is maintained by the monitoring, quality and harvesting runs.
+
+    """
+    metadata = models.OneToOneField(Metadata, on_delete=models.CASCADE, primary_key=True, related_name="latest_status")
+    health_state = models.ForeignKey('monitoring.HealthState', on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    health_state_code = models.CharField(max_length=12, null=True, blank=True)
+    health_message = models.CharField(max_length=512, null=True, blank=True)
+    health_unauthorized = models.BooleanField(default=False)
+    reliability_1w = models.FloatField(null=True, blank=True)
+    conformity_passed = models.BooleanField(null=True, blank=True)
+    conformity_time_start = models.DateTimeField(null=True, blank=True)
+    harvest_timestamp_start = models.DateTimeField(null=True, blank=True)
+    harvest_number_results = models.IntegerField(null=True, blank=True)
+
+    HEALTH_FIELDS = ["health_state", "health_state_code", "health_message", "health_unauthorized", "reliability_1w"]
+    CONFORMITY_FIELDS = ["conformity_passed", "conformity_time_start"]
+    HARVEST_FIELDS = ["harvest_timestamp_start", "harvest_number_results"]
+
+    def __str__(self):
+        return str(self.metadata_id)
+
+    @classmethod
+    def update_many(cls, statuses: list, fields: list):
+        """ Writes the given fields of many status records at once, missing records are created
+
+        Args:
+            statuses (list): Unsaved MetadataStatus objects, which hold the new values
+            fields (list): The names of the fields that shall be written
+        Returns:
+             nothing
+        """
+        if not statuses:
+            return
+        cls.objects.bulk_create(
+            [cls(metadata_id=status.metadata_id) for status in statuses],
+            ignore_conflicts=True,
+            batch_size=1000
+        )
+        cls.objects.bulk_update(statuses, fields, batch_size=1000)
+
+    @classmethod
+    def set_health_state(cls, health_state):
+        """ Stores the given health state as the latest one of its metadata
+
+        Args:
+            health_state (HealthState): The calculated health state
+        Returns:
+             nothing
+        """
+        unauthorized = health_state.reasons.filter(health_state_code=HealthStateEnum.UNAUTHORIZED.value).exists()
+        cls.update_many([cls(
+            metadata_id=health_state.metadata_id,
+            health_state=health_state,
+            health_state_code=health_state.health_state_code,
+            health_message=health_state.health_message,
+            health_unauthorized=unauthorized,
+            reliability_1w=health_state.reliability_1w,
+        )], cls.HEALTH_FIELDS)
+
+    @classmethod
+    def set_conformity_check_runs(cls, check_runs: list):
+        """ Stores the given conformity check runs as the latest ones of their metadata
+
+        Args:
+            check_runs (list): The ConformityCheckRun objects
+        Returns:
+             nothing
+        """
+        cls.update_many([cls(
+            metadata_id=check_run.metadata_id,
+            conformity_passed=check_run.passed,
+            conformity_time_start=check_run.time_start,
+        ) for check_run in check_runs], cls.CONFORMITY_FIELDS)
+
+    @classmethod
+    def set_harvest_result(cls, harvest_result):
+        """ Stores the given harvest result as the latest one of its metadata
+
+        Args:
+            harvest_result (HarvestResult): The harvest result
+        Returns:
+             nothing
+        """
+        cls.update_many([cls(
+            metadata_id=harvest_result.metadata_id,
+            harvest_timestamp_start=harvest_result.timestamp_start,
+            harvest_number_results=harvest_result.number_results,
+        )], cls.HARVEST_FIELDS)
+
+
 class OGCOperation(models.Model):
     operation = models.CharField(primary_key=True, max_length=255, choices=OGCOperationEnum.as_choices())
 
@@ -2081,7 +2379,10 @@ class Document(Resource):
     # But one Metadata object can only have one Document which is original and a unique doc type.
     metadata = models.ForeignKey(Metadata, on_delete=models.CASCADE, related_name='documents')
     document_type = models.CharField(max_length=255, null=True, choices=DocumentEnum.as_choices(), validators=[validate_document_enum_choices])
-    content = models.TextField(null=True, blank=True)
+    # stored gzip compressed, use get_compressed_content() to fetch the compressed bytes directly
+    content = CompressedTextField(null=True, blank=True)
+    # sha256 of the content, which makes documents addressable by their content
+    content_hash = models.CharField(max_length=64, null=True, blank=True, db_index=True)
     is_original = models.BooleanField(default=False)
 
     """ todo: let the update_capability_document() function crash
@@ -2092,6 +2393,47 @@ class Document(Resource):
     def __str__(self):
         return self.metadata.title
 
+    def save(self, *args, **kwargs):
+        self.content_hash = self.get_content_hash(self.content)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def get_compressed_content(**filters):
+        """ Returns the content of a document as it is stored, without decompressing it
+
+        Args:
+            filters: The lookups which identify the document
+        Returns:
+             content (bytes): The gzip compressed content or None if there is no compressed content
+        """
+        content = Document.objects.filter(
+            **filters
+        ).annotate(
+            # The plain BinaryField skips the decompression of the CompressedTextField
+            compressed_content=ExpressionWrapper(F("content"), output_field=models.BinaryField())
+        ).values_list(
+            "compressed_content", flat=True
+        ).first()
+        if content is None:
+            return None
+        content = bytes(content)
+        return content if content.startswith(GZIP_MAGIC_NUMBER) else None
+
+    @staticmethod
+    def get_content_hash(content):
+        """ Returns the hash of a document content
+
+        Args:
+            content (str|bytes): The content
+        Returns:
+             content_hash (str): The sha256 hex digest or None if there is no content
+        """
+        if content is None:
+            return None
+        if isinstance(content, str):
+            content = content.encode("UTF-8")
+        return hashlib.sha256(content).hexdigest()
+
     def get_dataset_metadata_as_dict(self):
         """ Parses the persisted dataset_metadata_document into a dict
 
@@ -2232,279 +2574,24 @@ class Document(Resource):
     def set_proxy(self, use_proxy: bool, force_version: OGCServiceVersionEnum=None, auto_save: bool=True):
         """ Sets different elements inside the document on a secured level
 
+        Operation, legend and dataset metadata uris are rewritten in one pass over the document.
+
         Args:
             use_proxy (bool): Whether to use a proxy or not
+            force_version (OGCServiceVersionEnum): Which version processing shall be forced
             auto_save (bool): Whether to directly save the modified document or not
         Returns:
         """
-        self.set_dataset_metadata_secured(use_proxy, force_version=force_version, auto_save=auto_save)
-        self.set_legend_url_secured(use_proxy, force_version=force_version, auto_save=auto_save)
-        self.set_operations_secured(use_proxy, force_version=force_version, auto_save=auto_save)
-
-    def _set_wms_operations_secured(self, xml_obj, uri: str, is_secured: bool):
-        """ Change external links to internal for wms operations
-
-        Args:
-            xml_obj: The xml document object
-            uri: The new uri to be set, if secured
-            is_secured: Whether the document shall be secured or not
-        Returns:
-             Nothing, directly works on the xml_obj
-        """
-        request_objs = xml_helper.try_get_single_element_from_xml(
-            "//" + GENERIC_NAMESPACE_TEMPLATE.format("Capability") +
-            "/" + GENERIC_NAMESPACE_TEMPLATE.format("Request")
-            , xml_obj
-        )
-        request_objs = request_objs.getchildren()
-        service = self.metadata.service
-        operation_urls = service.operation_urls.all()
-        op_uri_dict = {
-            OGCOperationEnum.GET_MAP.value: {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_MAP.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_MAP.value, method="Post").first(),"url", None),
-            },
-            OGCOperationEnum.GET_FEATURE_INFO.value: {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_FEATURE_INFO.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_FEATURE_INFO.value, method="Post").first(),"url", None),
-            },
-            OGCOperationEnum.DESCRIBE_LAYER.value: {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_LAYER.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_LAYER.value, method="Post").first(),"url", None),
-            },
-            OGCOperationEnum.GET_LEGEND_GRAPHIC.value: {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_LEGEND_GRAPHIC.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_LEGEND_GRAPHIC.value, method="Post").first(),"url", None),
-            },
-            OGCOperationEnum.GET_STYLES.value: {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_STYLES.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_STYLES.value, method="Post").first(),"url", None),
-            },
-        }
-
-        for op in request_objs:
-
-            # skip GetCapabilities - it is already set to another internal link
-            if OGCOperationEnum.GET_CAPABILITIES.value in op.tag:
-                continue
-
-            uri_dict = op_uri_dict.get(op.tag, {})
-            http_operations = ["Get", "Post"]
-
-            for http_operation in http_operations:
-                res_objs = xml_helper.try_get_element_from_xml(
-                    ".//{}/".format(GENERIC_NAMESPACE_TEMPLATE.format(http_operation)) + GENERIC_NAMESPACE_TEMPLATE.format("OnlineResource")
-                    , op
-                )
-                # Load url attribute from ServiceUrl object
-                if not is_secured:
-                    # overwrite uri
-                    uri = uri_dict.get(http_operation, "")
-
-                for res_obj in res_objs:
-                    xml_helper.write_attribute(
-                        res_obj,
-                        attrib="{http://www.w3.org/1999/xlink}href",
-                        txt=uri
-                    )
-
-    def _set_wfs_1_0_0_operations_secured(self, xml_obj, uri: str, is_secured: bool):
-        """ Change external links to internal for wfs 1.0.0 operations
-
-        Args:
-            xml_obj: The xml document object
-            uri: The new uri to be set, if secured
-            is_secured: Whether the document shall be secured or not
-        Returns:
-             Nothing, directly works on the xml_obj
-        """
-        operation_objs = xml_helper.try_get_single_element_from_xml(
-            "//" + GENERIC_NAMESPACE_TEMPLATE.format("Capability") +
-            "/" + GENERIC_NAMESPACE_TEMPLATE.format("Request")
-            , xml_obj
-        )
-        try:
-            service = self.metadata.service
-        except ObjectDoesNotExist:
-            service = FeatureType.objects.get(
-                metadata=self.metadata
-            ).parent_service
-        operation_urls = service.operation_urls.all()
-        op_uri_dict = {
-            OGCOperationEnum.DESCRIBE_FEATURE_TYPE.value: {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_FEATURE_TYPE.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_FEATURE_TYPE.value, method="Post").first(),"url", None),
-            },
-            OGCOperationEnum.GET_FEATURE.value: {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_FEATURE.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_FEATURE.value, method="Post").first(),"url", None),
-            },
-            OGCOperationEnum.GET_PROPERTY_VALUE.value: {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_PROPERTY_VALUE.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_PROPERTY_VALUE.value, method="Post").first(),"url", None),
-            },
-            OGCOperationEnum.LIST_STORED_QUERIES.value: {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.LIST_STORED_QUERIES.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.LIST_STORED_QUERIES.value, method="Post").first(),"url", None),
-            },
-            OGCOperationEnum.DESCRIBE_STORED_QUERIES.value: {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_STORED_QUERIES.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_STORED_QUERIES.value, method="Post").first(),"url", None),
-            },
-        }
-
-        for op in operation_objs:
-            # skip GetCapabilities - it is already set to another internal link
-            name = op.tag
-
-            if OGCOperationEnum.GET_CAPABILITIES.value in name:
-                continue
-            if not is_secured:
-                uri = op_uri_dict.get(name, {"Get": None, "Post": None})
-            http_objs = xml_helper.try_get_element_from_xml(".//" + GENERIC_NAMESPACE_TEMPLATE.format("HTTP"), op)
-            for http_obj in http_objs:
-                requ_objs = http_obj.getchildren()
-                for requ_obj in requ_objs:
-                    xml_helper.write_attribute(
-                        requ_obj,
-                        attrib="onlineResource",
-                        txt=uri
-                    )
-
-    def _set_wfs_operations_secured(self, xml_obj, uri: str, is_secured: bool):
-        """ Change external links to internal for wfs operations
-
-        Args:
-            xml_obj: The xml document object
-            uri: The new uri to be set, if secured
-            is_secured: Whether the document shall be secured or not
-        Returns:
-             Nothing, directly works on the xml_obj
-        """
-        operation_objs = xml_helper.try_get_element_from_xml("//" + GENERIC_NAMESPACE_TEMPLATE.format("Operation"), xml_obj)
-
-        try:
-            service = self.metadata.service
-        except ObjectDoesNotExist:
-            service = FeatureType.objects.get(
-                metadata=self.metadata
-            ).parent_service
-
-        operation_urls = service.operation_urls.all()
-        op_uri_dict = {
-            "DescribeFeatureType": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_FEATURE_TYPE.value, method="Get").first(), "url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_FEATURE_TYPE.value, method="Post").first(), "url", None),
-            },
-            "GetFeature": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_FEATURE.value, method="Get").first(), "url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_FEATURE.value, method="Post").first(), "url", None),
-            },
-            "GetPropertyValue": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_PROPERTY_VALUE.value, method="Get").first(), "url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_PROPERTY_VALUE.value, method="Post").first(), "url", None),
-            },
-            "ListStoredQueries": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.LIST_STORED_QUERIES.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.LIST_STORED_QUERIES.value, method="Post").first(),"url", None),
-            },
-            "DescribeStoredQueries": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_STORED_QUERIES.value, method="Get").first(), "url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_STORED_QUERIES.value, method="Post").first(), "url", None),
-            },
-            "GetGmlObject": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_GML_OBJECT.value, method="Get").first(), "url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_GML_OBJECT.value, method="Post").first(), "url", None),
-            },
-        }
-
-        fallback_uri = getattr(operation_urls.filter(operation=OGCOperationEnum.GET_FEATURE.value, method="Get").first(), "url", None)
-
-        for op in operation_objs:
-            # skip GetCapabilities - it is already set to another internal link
-            name = xml_helper.try_get_attribute_from_xml_element(op, "name")
-            if name == OGCOperationEnum.GET_CAPABILITIES.value or name is None:
-                continue
-
-            http_operations = ["Get", "Post"]
-
-            for http_operation in http_operations:
-
-                if not is_secured:
-                    uri = op_uri_dict.get(name, {}).get(http_operation, None) or fallback_uri
-
-                http_objs = xml_helper.try_get_element_from_xml(".//" + GENERIC_NAMESPACE_TEMPLATE.format("HTTP") + "/" + GENERIC_NAMESPACE_TEMPLATE.format(http_operation), op)
-
-                for http_obj in http_objs:
-                    xml_helper.write_attribute(
-                        http_obj,
-                        attrib="{http://www.w3.org/1999/xlink}href",
-                        txt=uri
-                    )
+        from service.helper.ogc.capabilities_rewriter import CapabilitiesRewriter
+        if self.content is None:
+            # Nothing to do here!
+            return
 
-    def _set_wms_1_0_0_operation_secured(self, xml_obj, uri: str, is_secured: bool):
-        """ Change external links to internal for wms 1.0.0 operations
+        rewriter = CapabilitiesRewriter(self.metadata, use_proxy, force_version=force_version)
+        rewriter.rewrite(self)
 
-        Args:
-            xml_obj: The xml document object
-            uri: The new uri to be set, if secured
-            is_secured: Whether the document shall be secured or not
-        Returns:
-             Nothing, directly works on the xml_obj
-        """
-        request_objs = xml_helper.try_get_single_element_from_xml(
-            "//" + GENERIC_NAMESPACE_TEMPLATE.format("Capability") +
-            "/" + GENERIC_NAMESPACE_TEMPLATE.format("Request")
-            , xml_obj
-        )
-        request_objs = request_objs.getchildren()
-        service = self.metadata.service
-        operation_urls = service.operation_urls.all()
-        op_uri_dict = {
-            "GetMap": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_MAP.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_MAP.value, method="Post").first(),"url", None),
-            },
-            "GetFeatureInfo": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_FEATURE_INFO.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_FEATURE_INFO.value, method="Post").first(),"url", None),
-            },
-            "DescribeLayer": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_LAYER.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.DESCRIBE_LAYER.value, method="Post").first(),"url", None),
-            },
-            "GetLegendGraphic": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_LEGEND_GRAPHIC.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_LEGEND_GRAPHIC.value, method="Post").first(),"url", None),
-            },
-            "GetStyles": {
-                "Get": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_STYLES.value, method="Get").first(),"url", None),
-                "Post": getattr(operation_urls.filter(operation=OGCOperationEnum.GET_STYLES.value, method="Post").first(),"url", None),
-            },
-        }
-
-        for op in request_objs:
-
-            # skip GetCapabilities - it is already set to another internal link
-            if OGCOperationEnum.GET_CAPABILITIES.value in op.tag:
-                continue
-
-            uri_dict = op_uri_dict.get(op.tag, "")
-            http_operations = ["Get", "Post"]
-
-            for http_operation in http_operations:
-                res_objs = xml_helper.try_get_element_from_xml(".//{}".format(http_operation), op)
-
-                if not is_secured:
-                    # overwrite uri
-                    uri = uri_dict.get(http_operation, "")
-
-                for res_obj in res_objs:
-                    xml_helper.write_attribute(
-                        res_obj,
-                        attrib="onlineResource",
-                        txt=uri
-                    )
+        if auto_save:
+            self.save()
 
     def set_capabilities_secured(self, auto_save: bool=True):
         """ Change external links to internal for service capability document call
@@ -2628,167 +2715,6 @@ class Document(Resource):
         if auto_save:
             self.save()
 
-    def set_operations_secured(self, is_secured: bool, force_version: OGCServiceVersionEnum, auto_save: bool=True):
-        """ Change external links to internal for service operations
-
-        Args:
-            is_secured (bool): Whether the service is secured or not
-            force_version (OGCServiceVersionEnum): Which version processing shall be forced
-            auto_save (bool): Whether to directly save at the end of the function or not
-        Returns:
-
-        """
-        if self.content is None:
-            # Nothing to do here
-            return
-
-        xml_obj = xml_helper.parse_xml(self.content)
-        if is_secured:
-            uri = SERVICE_OPERATION_URI_TEMPLATE.format(self.metadata.id)
-        else:
-            uri = ""
-        _version = force_version or self.metadata.get_service_version()
-        if self.metadata.is_service_type(OGCServiceEnum.WMS):
-            if _version is OGCServiceVersionEnum.V_1_0_0:
-                self._set_wms_1_0_0_operation_secured(xml_obj, uri, is_secured)
-            else:
-                self._set_wms_operations_secured(xml_obj, uri, is_secured)
-        elif self.metadata.is_service_type(OGCServiceEnum.WFS):
-            if _version is OGCServiceVersionEnum.V_1_0_0:
-                self._set_wfs_1_0_0_operations_secured(xml_obj, uri, is_secured)
-            else:
-                self._set_wfs_operations_secured(xml_obj, uri, is_secured)
-
-        self.content = xml_helper.xml_to_string(xml_obj)
-
-        if auto_save:
-            self.save()
-
-    def set_dataset_metadata_secured(self, is_secured: bool, force_version: OGCServiceVersionEnum=None, auto_save: bool=True):
-        """ Set or unsets the proxy for the dataset metadata uris
-
-        Args:
-            is_secured (bool): Whether the proxy shall be activated or deactivated
-            force_version (OGCServiceVersionEnum): Which version processing shall be forced
-            auto_save (bool): Whether to directly save at the end of the function or not
-        Returns:
-             nothing
-        """
-        cap_doc_curr = self.content
-        if cap_doc_curr is None:
-            # Nothing to do here!
-            return
-
-        xml_obj = xml_helper.parse_xml(cap_doc_curr)
-        service_version = force_version or self.metadata.get_service_version()
-
-        is_wfs = self.metadata.is_service_type(OGCServiceEnum.WFS)
-        is_wfs_1_0_0 = is_wfs and service_version == OGCServiceVersionEnum.V_1_0_0.value
-        is_wfs_1_1_0 = is_wfs and service_version == OGCServiceVersionEnum.V_1_1_0.value
-
-        # get <MetadataURL> xml elements
-        if is_wfs:
-            xml_metadata_elements = xml_helper.try_get_element_from_xml("//" + GENERIC_NAMESPACE_TEMPLATE.format("MetadataURL"), xml_obj)
-        else:
-            xml_metadata_elements = xml_helper.try_get_element_from_xml("//" + GENERIC_NAMESPACE_TEMPLATE.format("MetadataURL") + "/" + GENERIC_NAMESPACE_TEMPLATE.format("OnlineResource"), xml_obj)
-
-        # iterate over elements and change the uris
-        for xml_metadata in xml_metadata_elements:
-            attr = "{http://www.w3.org/1999/xlink}href"
-
-            # get metadata url
-            if is_wfs_1_0_0 or is_wfs_1_1_0:
-                metadata_uri = xml_helper.try_get_text_from_xml_element(xml_metadata)
-            else:
-                metadata_uri = xml_helper.get_href_attribute(xml_metadata)
-            own_uri_prefix = "{}{}".format(HTTP_OR_SSL, HOST_NAME)
-
-            if not metadata_uri.startswith(own_uri_prefix):
-                # find metadata record which matches the metadata uri
-                try:
-                    dataset_md_record = Metadata.objects.get(
-                        metadata_url=metadata_uri,
-                    )
-                    uri = SERVICE_DATASET_URI_TEMPLATE.format(dataset_md_record.id)
-                except ObjectDoesNotExist:
-                    # This is a bad situation... Only possible if the registered service has not been updated BUT the
-                    # original remote service changed and maybe has a new - for us - unknown MetadataURL object.
-                    # This is why we can't find it in our db. We simply have to set it to some placeholder, since the
-                    # user has to update the service.
-                    uri = "unknown"
-            else:
-                # this means we have our own proxy uri in here and want to restore the original one
-                # metadata uri contains the proxy uri
-                # so we need to extract the id from the uri!
-                md_uri_list = metadata_uri.split("/")
-                md_id = md_uri_list[len(md_uri_list) - 1]
-                dataset_md_record = Metadata.objects.get(id=md_id)
-                uri = dataset_md_record.metadata_url
-            if is_wfs_1_0_0 or is_wfs_1_1_0:
-                xml_helper.write_text_to_element(xml_metadata, txt=uri)
-            else:
-                xml_helper.set_attribute(xml_metadata, attr, uri)
-        xml_obj_str = xml_helper.xml_to_string(xml_obj)
-        self.content = xml_obj_str
-
-        if auto_save:
-            self.save()
-
-    def set_legend_url_secured(self, is_secured: bool, force_version:OGCServiceVersionEnum=None, auto_save: bool=True):
-        """ Set or unsets the proxy for the style legend uris
-
-        Args:
-            is_secured (bool): Whether the proxy shall be activated or deactivated
-            force_version (OGCServiceVersionEnum): Which version processing shall be forced
-            auto_save (bool): Whether to directly save at the end of the function or not
-        Returns:
-             nothing
-        """
-        cap_doc_curr = self.content
-        if cap_doc_curr is None:
-            # Nothing to do here!
-            return
-
-        xml_doc = xml_helper.parse_xml(cap_doc_curr)
-
-        # get <LegendURL> elements
-        xml_legend_elements = xml_helper.try_get_element_from_xml(
-            "//" + GENERIC_NAMESPACE_TEMPLATE.format("LegendURL") +
-            "/" + GENERIC_NAMESPACE_TEMPLATE.format("OnlineResource"),
-            xml_doc
-        )
-        attr = "{http://www.w3.org/1999/xlink}href"
-        for xml_elem in xml_legend_elements:
-            legend_uri = xml_helper.get_href_attribute(xml_elem)
-
-            uri = None
-
-            if is_secured and not legend_uri.startswith(ROOT_URL):
-                parent_md = self.metadata
-
-                if not self.metadata.is_root():
-                    parent_md = self.metadata.service.parent_service.metadata
-
-                style_id = Style.objects.get(
-                    legend_uri=legend_uri,
-                    layer__parent_service__metadata=parent_md,
-                ).id
-                uri = SERVICE_LEGEND_URI_TEMPLATE.format(self.metadata.id, style_id)
-
-            elif not is_secured and legend_uri.startswith(ROOT_URL):
-                # restore the original legend uri by using the layer identifier
-                style_id = legend_uri.split("/")[-1]
-                uri = Style.objects.get(id=style_id).legend_uri
-
-            if uri is not None:
-                xml_helper.set_attribute(xml_elem, attr, uri)
-
-        xml_doc_str = xml_helper.xml_to_string(xml_doc)
-        self.content = xml_doc_str
-
-        if auto_save:
-            self.save()
-
     def restore(self):
         """ We overwrite the current metadata xml with the original
 
@@ -2944,6 +2870,10 @@ class Service(Resource):
     is_update_candidate_for = models.OneToOneField('self', on_delete=models.SET_NULL, related_name="has_update_candidate", null=True, default=None, blank=True)
     created_by_user = models.ForeignKey(MrMapUser, on_delete=models.SET_NULL, null=True, blank=True)
     keep_custom_md = models.BooleanField(default=True)
+    # Materialized bounding box with the largest area of all child elements. See update_inherited_properties()
+    max_child_bbox = models.PolygonField(null=True, blank=True)
+    # Cache time (seconds) for responses of cacheable operations. None uses the defaults, 0 disables caching
+    response_cache_time = models.PositiveIntegerField(null=True, blank=True, verbose_name=_l('Response cache time'))
 
     # used to store ows linked_service_metadata until parsing is finished
     # will not be part of the db
@@ -2970,6 +2900,79 @@ class Service(Resource):
             icon = get_icon(IconEnum.CSW)
         return icon
 
+    @transaction.atomic
+    def update_inherited_properties(self):
+        """ Materializes the inherited and aggregated properties of all elements of the service
+
+        Layers inherit reference systems and the bounding geometry of their ancestors, services and layers provide the
+        largest bounding box of their children. Instead of walking the tree on every read, these properties are computed
+        in one top-down pass and stored on the elements. Has to be called whenever the tree of the service changed.
+
+        Returns:
+             nothing
+        """
+        root_service = self.parent_service or self
+        if root_service.is_service_type(OGCServiceEnum.WMS):
+            root_service._update_inherited_layer_properties()
+        elif root_service.is_service_type(OGCServiceEnum.WFS):
+            bboxes = FeatureType.objects.filter(parent_service=root_service).values_list("bbox_lat_lon", flat=True)
+            max_bbox = utils.get_max_area_geometry(bboxes, DEFAULT_SERVICE_BOUNDING_BOX)
+            Service.objects.filter(id=root_service.id).update(max_child_bbox=max_bbox)
+
+    def _update_inherited_layer_properties(self):
+        """ Materializes the inherited properties of all layers of this wms root service
+
+        Returns:
+             nothing
+        """
+        layers = Layer.objects.filter(
+            parent_service=self
+        ).select_related(
+            "metadata"
+        ).prefetch_related(
+            "metadata__reference_system"
+        ).order_by(
+            "tree_id", "lft"
+        )
+
+        # Tree order guarantees, that each parent has been processed before its children
+        processed_layers = {}
+        reference_systems = {}
+        children_bboxes = {}
+        for layer in layers:
+            own_reference_systems = {srs.id for srs in layer.metadata.reference_system.all()}
+            parent = processed_layers.get(layer.parent_id)
+            if parent is None:
+                reference_systems[layer.id] = own_reference_systems
+                layer.inherited_bounding_geometry = layer.metadata.bounding_geometry
+            else:
+                reference_systems[layer.id] = own_reference_systems | reference_systems[parent.id]
+                layer.inherited_bounding_geometry = parent.inherited_bounding_geometry
+            processed_layers[layer.id] = layer
+            children_bboxes.setdefault(layer.parent_id, []).append(layer.bbox_lat_lon)
+
+        # Layers are services as well, so the max child bbox of the root service and all layers is stored in one go
+        all_bboxes = [layer.bbox_lat_lon for layer in processed_layers.values()]
+        services = [
+            Service(id=self.id, max_child_bbox=utils.get_max_area_geometry(all_bboxes, DEFAULT_SERVICE_BOUNDING_BOX))
+        ]
+        for layer_id in processed_layers.keys():
+            max_bbox = utils.get_max_area_geometry(children_bboxes.get(layer_id, []), DEFAULT_SERVICE_BOUNDING_BOX)
+            services.append(Service(id=layer_id, max_child_bbox=max_bbox))
+
+        Layer.objects.bulk_update(processed_layers.values(), ["inherited_bounding_geometry"], batch_size=500)
+        Service.objects.bulk_update(services, ["max_child_bbox"], batch_size=500)
+
+        through_model = Layer.inherited_reference_systems.through
+        through_model.objects.filter(layer_id__in=processed_layers.keys()).delete()
+        through_model.objects.bulk_create(
+            [
+                through_model(layer_id=layer_id, referencesystem_id=srs_id)
+                for layer_id, srs_ids in reference_systems.items() for srs_id in srs_ids
+            ],
+            batch_size=1000
+        )
+
     def get_subelements(self, include_self=False):
         """ Returns a queryset of Layer or Featuretype records.
 
@@ -3056,6 +3059,9 @@ class Service(Resource):
                 if not other_services_exists:
                     url.delete()
 
+            from service.helper import preview_helper
+            preview_helper.remove_previews(preview_helper.get_preview_metadata_ids(self))
+
             self.metadata.delete()
             return super().delete()
 
@@ -3096,6 +3102,9 @@ class Layer(Service, MPTTModel):
             (-90.0, -180.0),
         )
     ))
+    # Materialized inherited properties. See Service.update_inherited_properties()
+    inherited_bounding_geometry = models.PolygonField(null=True, blank=True)
+    inherited_reference_systems = models.ManyToManyField('ReferenceSystem', blank=True, related_name="inheriting_layers")
     iso_metadata = []
 
     def __init__(self, *args, **kwargs):
@@ -3117,6 +3126,10 @@ class Layer(Service, MPTTModel):
         Returns:
             reference_systems (Queryset): The QuerySet which contains all possible ReferenceSystems of the Layer
         """
+        if self.inherited_bounding_geometry is not None:
+            # Inherited properties are materialized
+            return self.inherited_reference_systems.all()
+
         ancestors = self.get_ancestors(ascending=True, include_self=True).select_related('metadata').prefetch_related('metadata__reference_system')
         reference_systems = ReferenceSystem.objects.none()
         for ancestor in ancestors:
@@ -3126,18 +3139,21 @@ class Layer(Service, MPTTModel):
     def get_inherited_bounding_geometry(self):
         """ Returns the biggest bounding geometry of the service.
 
-        Bounding geometries shall be inherited. We do not persist them directly into the layer objects, since we might
-        lose the geometry, that is specified by the single layer object.
-        This function walks all the way up to the root layer of the service and returns the biggest bounding geometry.
+        Bounding geometries shall be inherited. We do not persist them directly into the layer's metadata, since we
+        might lose the geometry, that is specified by the single layer object. The inherited geometry is materialized
+        in inherited_bounding_geometry instead. For layers, which have not been materialized yet, this function walks
+        all the way up to the root layer of the service and returns the biggest bounding geometry.
         Since upper layer geometries must cover the ones of their children, these big geometry includes the children ones.
 
         Returns:
              bounding_geometry (Polygon): A geometry object
         """
+        if self.inherited_bounding_geometry is not None:
+            return self.inherited_bounding_geometry
+
         bounding_geometry = self.metadata.bounding_geometry
 
         ancestors = self.get_ancestors(ascending=True).select_related('metadata')
-        # todo: maybe GEOS can get the object with the greatest geometry from the db directly?
         for ancestor in ancestors:
             ancestor_geometry = ancestor.metadata.bounding_geometry
             if bounding_geometry.area > 0 and ancestor_geometry.covers(bounding_geometry):
@@ -3325,6 +3341,26 @@ class Dimension(models.Model):
     elev_extent_min = models.FloatField(max_length=500, null=True, blank=True)
     elev_extent_max = models.FloatField(max_length=500, null=True, blank=True)
 
+    class Meta:
+        # The min/max extents are derived from the extent string on save. The catalogue search filters on these
+        # typed columns, so they are indexed together with the dimension type.
+        indexes = [
+            models.Index(
+                fields=[
+                    "type",
+                    "time_extent_min",
+                    "time_extent_max",
+                ]
+            ),
+            models.Index(
+                fields=[
+                    "type",
+                    "elev_extent_min",
+                    "elev_extent_max",
+                ]
+            ),
+        ]
+
     def __str__(self):
         return self.type
 
@@ -3482,19 +3518,19 @@ class Dimension(models.Model):
 
         """
         # Check whether the given type is an allowed type from the choices
-        if self.type != "time" and self.type != "elevation":
+        if self.type != DIMENSION_TYPE_TIME and self.type != DIMENSION_TYPE_ELEVATION:
             # If we could not find it, the type is a custom name and needs to be moved to the custom_name field
             # The type is set to 'other'
             self.custom_name = self.type
-            self.type = "other"
+            self.type = DIMENSION_TYPE_OTHER
 
         # Find min and max values of extent
         try:
             # Multiple values are given if they are comma separated
             values = self.extent.split(",")
-            if self.type == "time":
+            if self.type == DIMENSION_TYPE_TIME:
                 self._evaluate_time_dimension(values)
-            elif self.type == "elevation":
+            elif self.type == DIMENSION_TYPE_ELEVATION:
                 self._evaluate_elevation_dimension(values)
             else:
                 # In case of other - no way to understand automatically what the extent means
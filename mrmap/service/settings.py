@@ -12,7 +12,7 @@ from django.contrib.gis.geos import Polygon, GEOSGeometry
 from django.utils.translation import gettext_lazy as _
 
 from MrMap.settings import BASE_DIR, HTTP_OR_SSL, HOST_NAME, STATIC_ROOT
-from service.helper.enums import ConnectionEnum, OGCServiceVersionEnum
+from service.helper.enums import ConnectionEnum, OGCServiceVersionEnum, OGCOperationEnum
 import logging
 
 service_logger = logging.getLogger('MrMap.service')
@@ -41,12 +41,47 @@ SERVICE_LEGEND_URI_TEMPLATE = "{}{}/resource/metadata/".format(HTTP_OR_SSL, HOST
 
 REQUEST_TIMEOUT = 100  # seconds
 
+# Hits are counted in the cache and flushed to the database by the periodic async_flush_hits task
+# (see CELERYBEAT_SCHEDULE). The lock prevents overlapping flushes.
+HITS_FLUSH_LOCK_TIME = 5 * 60  # seconds
+
+# Number of metadata records, which are removed in one transaction by async_remove_service
+DELETION_BATCH_SIZE = 500
+# A failed removal is retried with an exponential backoff, which is capped by DELETION_RETRY_BACKOFF_MAX
+DELETION_MAX_RETRIES = 5
+DELETION_RETRY_BACKOFF_MAX = 10 * 60  # seconds
+
+# Maximum number of linked iso metadata documents, which are fetched in parallel during a registration
+ISO_METADATA_FETCH_WORKERS = 8
+
+# Capabilities documents of web map services, which are larger than this (characters), are parsed layer by layer
+# while they are read, instead of keeping the tree of the whole document in memory
+WMS_STREAMING_LAYER_PARSING_MIN_SIZE = 10 * 1024 * 1024
+
+# Axis orders of spatial reference systems, generated from the EPSG database of PROJ by generate_epsg_axis_order.
+# The setup and update scripts regenerate it from the proj.db of the installed PROJ.
+EPSG_AXIS_ORDER_FILE_PATH = os.path.join(os.path.dirname(__file__), "helper/epsg_axis_order.json")
+# Whether axis orders of systems, which are not part of the file, shall be requested from the epsg-registry.org.
+# Unknown systems are treated as (east, north) otherwise.
+EPSG_AXIS_ORDER_LIVE_LOOKUP = True
+EPSG_AXIS_ORDER_LIVE_LOOKUP_TIMEOUT = 10  # seconds
+
 # security proxy settings
 MAPSERVER_LOCAL_PATH = "http://127.0.0.1/cgi-bin/mapserv"
 MAPSERVER_SECURITY_MASK_FILE_PATH = os.path.join(os.path.dirname(__file__), "helper/mapserver/security_mask.map")
 MAPSERVER_SECURITY_MASK_TABLE = "service_allowedoperation"
 MAPSERVER_SECURITY_MASK_GEOMETRY_COLUMN = "allowed_area"
 MAPSERVER_SECURITY_MASK_KEY_COLUMN = "id"
+# Maximum number of parallel upstream and mask requests of a secured GetMap, which has to be composited from layer
+# groups with different allowed areas
+SECURED_GET_MAP_MAX_WORKERS = 8
+
+# Whether the operation proxy is served by the asynchronous view. It only pays off if the proxy urls are served by the
+# asgi application (see install/confs/mrmap_nginx). Deployments which serve everything by wsgi should disable it.
+ASYNC_SECURITY_PROXY = True
+# Connection pool of the asynchronous proxy per worker process
+ASYNC_PROXY_MAX_CONNECTIONS = 200
+ASYNC_PROXY_MAX_KEEPALIVE_CONNECTIONS = 50
 
 EXTERNAL_AUTHENTICATION_FILEPATH = "{}/../ext_auth_keys".format(BASE_DIR)
 
@@ -140,6 +175,20 @@ PREVIEW_MIME_TYPE_DEFAULT = "png"   # Specify a preferred default mime type (wit
 
 # PREVIEW IMAGE REQUESTING
 PLACEHOLDER_IMG_PATH = STATIC_ROOT + "images/mr_map_404.png"
+PREVIEW_IMG_WIDTH = 200
+PREVIEW_IMG_HEIGHT = 200
+PREVIEW_IMG_DIR = BASE_DIR + "/media/previews/"  # Rendered preview images are stored in here and shared by all workers
+PREVIEW_IMG_CACHE_TIME = 24 * 60 * 60  # Rendered preview images are additionally held in the cache for this time (seconds)
+
+# OPERATION RESPONSE CACHING
+# Responses of these operations are cached by the security proxy and the legend endpoint. Values are the default cache
+# times (seconds), which can be overwritten per service by Service.response_cache_time
+OPERATION_RESPONSE_CACHE_TIMES = {
+    OGCOperationEnum.GET_LEGEND_GRAPHIC.value: 24 * 60 * 60,
+    OGCOperationEnum.GET_FEATURE_INFO.value: 5 * 60,
+}
+OPERATION_RESPONSE_CACHE_MAX_ENTRY_SIZE = 1024 * 1024  # Larger responses are never cached (bytes)
+OPERATION_RESPONSE_CACHE_SERVICE_BUDGET = 50 * 1024 * 1024  # Bytes, which can be cached per service and cache time
 
 # PROXY LOG
 COUNT_DATA_PIXELS_ONLY = True  # If True, the response megapixel will be computed without transparent (alpha) pixel.
@@ -152,10 +201,13 @@ LOGABLE_FEATURE_RESPONSE_FORMATS = [
 ]
 
 # DIMENSION
+DIMENSION_TYPE_TIME = "time"
+DIMENSION_TYPE_ELEVATION = "elevation"
+DIMENSION_TYPE_OTHER = "other"
 DIMENSION_TYPE_CHOICES = [
-    ("time", "time"),
-    ("elevation", "elevation"),
-    ("other", "other"),
+    (DIMENSION_TYPE_TIME, "time"),
+    (DIMENSION_TYPE_ELEVATION, "elevation"),
+    (DIMENSION_TYPE_OTHER, "other"),
 ]
 
 NONE_UUID = "00000000-0000-0000-0000-000000000000"
@@ -13,13 +13,12 @@ from django_celery_results.models import TaskResult
 from MrMap.columns import MrMapColumn
 from MrMap.icons import IconEnum, get_all_icons, get_icon
 from MrMap.tables import MrMapTable
-from django.db.models import Count
+from django.db.models import Count, Case, When, Value, IntegerField, F
 from django.utils.translation import gettext_lazy as _
 
 from MrMap.templatecodes import PROGRESS_BAR, TOOLTIP
-from csw.models import HarvestResult
-from quality.models import ConformityCheckRun
 from service.helper.enums import MetadataEnum, OGCServiceEnum
+from monitoring.enums import HealthStateEnum
 from service.models import MetadataRelation, Metadata, FeatureTypeElement, ProxyLog
 from service.settings import service_logger
 from structure.template_codes import PENDING_TASK_ACTIONS
@@ -43,13 +42,13 @@ TOOLTIP_VALIDATION = _('Shows the validation status of the resource')
 class PendingTaskTable(tables.Table):
     bs4helper = None
     status = tables.Column(verbose_name=_('Status'),
-                           attrs={"th": {"class": "col-sm-1"}})
+                           attrs={"th": {"class": "col-sm-1"}, "td": {"data-column": "status"}})
     type = tables.Column(verbose_name=_('Type'),
                          accessor='task_name',
                          attrs={"th": {"class": "col-sm-2"}})
     phase = tables.Column(verbose_name=_('Phase'),
                           accessor='result',
-                          attrs={"th": {"class": "col-sm-3"}},
+                          attrs={"th": {"class": "col-sm-3"}, "td": {"data-column": "phase"}},
                           empty_values=[])
     date_created = tables.Column(verbose_name=_('Date Created:'),
                           accessor='date_created',
@@ -57,7 +56,7 @@ class PendingTaskTable(tables.Table):
                           empty_values=[])
     progress = tables.Column(verbose_name=_('Progress'),
                              accessor='result',
-                             attrs={"th": {"class": "col-sm-3"}},
+                             attrs={"th": {"class": "col-sm-3"}, "td": {"data-column": "progress"}},
                              empty_values=[])
     actions = tables.TemplateColumn(verbose_name=_('Actions'),
                                     template_code=PENDING_TASK_ACTIONS,
@@ -71,12 +70,18 @@ class PendingTaskTable(tables.Table):
         template_name = "skeletons/django_tables2_bootstrap4_custom.html"
         prefix = 'pending-task-table'
         orderable = False
+        # rows are identified by the task id, so the websocket deltas can be applied to them
+        row_attrs = {
+            "data-task-id": lambda record: record.task_id
+        }
 
     def before_render(self, request):
         self.render_helper = RenderHelper(user_permissions=list(filter(None, request.user.get_all_permissions())))
 
-    def render_status(self, value):
+    @staticmethod
+    def render_status(value):
         icon = ''
+        tooltip = ''
         if value == states.PENDING:
             icon = get_icon(IconEnum.PENDING, 'text-warning')
             tooltip = _('Task is pending')
@@ -105,7 +110,8 @@ class PendingTaskTable(tables.Table):
         elif value == 'async_harvest':
             return _('Harvest catalogue')
 
-    def render_phase(self, record, value):
+    @staticmethod
+    def render_phase(record, value):
         phase = ' '
         try:
             result = json.loads(value)
@@ -123,10 +129,8 @@ class PendingTaskTable(tables.Table):
         return format_html(phase)
 
     @staticmethod
-    def render_progress(record, value):
+    def get_progress(record, value):
         progress = 0
-        color = None
-        animated = True
         if record.status == states.STARTED and value:
             result = json.loads(value)
             try:
@@ -135,6 +139,14 @@ class PendingTaskTable(tables.Table):
                 pass
         if record.status == states.SUCCESS:
             progress = 100
+        return progress
+
+    @staticmethod
+    def render_progress(record, value):
+        progress = PendingTaskTable.get_progress(record, value)
+        color = None
+        animated = True
+        if record.status == states.SUCCESS:
             color = ProgressColorEnum.SUCCESS
             animated = False
         if record.status == states.FAILURE:
@@ -157,8 +169,11 @@ class OgcServiceTable(tables.Table):
                                    accessor='service__parent_service__metadata')
     status = tables.Column(verbose_name=_('Status'), empty_values=[], attrs={"td": {"style": "white-space:nowrap;"}})
     health = tables.Column(verbose_name=_('Health'), empty_values=[], )
-    harvest_results = tables.Column(verbose_name=_('Last harvest'), empty_values=[], )
-    collected_harvest_records = tables.Column(verbose_name=_('Collected harvest records'), empty_values=[], accessor='harvest_results')
+    harvest_results = tables.Column(verbose_name=_('Last harvest'), empty_values=[], accessor='latest_status',
+                                    order_by='latest_status__harvest_timestamp_start')
+    collected_harvest_records = tables.Column(verbose_name=_('Collected harvest records'), empty_values=[],
+                                              accessor='latest_status',
+                                              order_by='latest_status__harvest_number_results')
     actions = tables.Column(verbose_name=_('Actions'), empty_values=[], orderable=False,
                             attrs={"td": {"style": "white-space:nowrap;"}})
 
@@ -187,30 +202,22 @@ class OgcServiceTable(tables.Table):
     def render_title(self, record, value):
         return Link(url=record.detail_view_uri, content=value).render(safe=True)
 
-    def render_harvest_results(self, record, value):
-        last_harvest_result = value.filter(
-            metadata=record
-        ).order_by(
-            "-created"
-        ).first()
-        return last_harvest_result.timestamp_start if last_harvest_result is not None else _('Never')
-
-    def render_collected_harvest_records(self, record, value):
-        last_harvest_result = value.filter(
-            metadata=record
-        ).order_by(
-            "-created"
-        ).first()
-        return last_harvest_result.number_results if last_harvest_result is not None else '-'
+    def render_harvest_results(self, record):
+        status = record.get_latest_status()
+        if status is None or status.harvest_timestamp_start is None:
+            return _('Never')
+        return status.harvest_timestamp_start
+
+    def render_collected_harvest_records(self, record):
+        status = record.get_latest_status()
+        if status is None or status.harvest_number_results is None:
+            return '-'
+        return status.harvest_number_results
 
     # todo
     def render_wms_validation(self, record):
-        passed = None
-        try:
-            check_run = ConformityCheckRun.objects.get_latest_check(record)
-            passed = check_run.passed
-        except ConformityCheckRun.DoesNotExist:
-            pass
+        status = record.get_latest_status()
+        passed = status.conformity_passed if status is not None else None
         return self.get_validation_icons(passed=passed)
 
     def render_parent_service(self, value):
@@ -263,7 +270,22 @@ class OgcServiceTable(tables.Table):
         return queryset, True
 
     def order_health(self, queryset, is_descending):
-        # TODO:
+        # Order by severity first, resources without a known health state are treated as the most severe ones
+        queryset = queryset.annotate(
+            health_severity=Case(
+                When(latest_status__health_state_code=HealthStateEnum.OK.value, then=Value(0)),
+                When(latest_status__health_state_code=HealthStateEnum.WARNING.value, then=Value(1)),
+                When(latest_status__health_state_code=HealthStateEnum.CRITICAL.value, then=Value(2)),
+                default=Value(3),
+                output_field=IntegerField(),
+            )
+        )
+        if is_descending:
+            queryset = queryset.order_by(F("health_severity").desc(),
+                                         F("latest_status__reliability_1w").asc(nulls_first=True))
+        else:
+            queryset = queryset.order_by(F("health_severity").asc(),
+                                         F("latest_status__reliability_1w").desc(nulls_last=True))
         return queryset, True
 
 
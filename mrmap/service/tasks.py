@@ -11,27 +11,112 @@ import time
 
 import celery.states as states
 from celery import shared_task, current_task
+from django.db.models import Q
 from MrMap import utils
+from MrMap.cacher import HitCacher
 from MrMap.messages import SERVICE_REGISTERED
 from MrMap.settings import EXEC_TIME_PRINT
+from service.helper.enums import MetadataEnum
 from service.models import Metadata, ExternalAuthentication, ProxyLog
-from service.settings import service_logger, PROGRESS_STATUS_AFTER_PARSING
+from service.settings import service_logger, PROGRESS_STATUS_AFTER_PARSING, HITS_FLUSH_LOCK_TIME, \
+    DELETION_BATCH_SIZE, DELETION_MAX_RETRIES, DELETION_RETRY_BACKOFF_MAX
 from structure.models import MrMapUser, MrMapGroup, Organization
-from service.helper import service_helper
+from service.helper import service_helper, preview_helper, deletion_helper
 from users.helper import user_helper
 
 
-@shared_task(name="async_increase_hits")
-def async_increase_hits(metadata_id: int):
-    """ Async call for increasing the hit counter of a metadata record
+@shared_task(name="async_flush_hits")
+def async_flush_hits():
+    """ Periodic call for writing the hits, which have been counted in the cache, to the database
+
+    Returns:
+         nothing
+    """
+    hit_cacher = HitCacher()
+    if not hit_cacher.acquire_flush_lock(ttl=HITS_FLUSH_LOCK_TIME):
+        # Another flush is still running
+        return
+    try:
+        hits = hit_cacher.get_all()
+        if hits:
+            Metadata.add_hits(hits)
+            # Only reset the counters after the hits are stored, so no hits are lost if the database is not reachable
+            hit_cacher.decrease_many(hits)
+    finally:
+        hit_cacher.release_flush_lock()
+
+
+@shared_task(name="async_remove_service",
+             acks_late=True,
+             autoretry_for=(Exception,),
+             max_retries=DELETION_MAX_RETRIES,
+             retry_backoff=True,
+             retry_backoff_max=DELETION_RETRY_BACKOFF_MAX)
+def async_remove_service(metadata_id: str):
+    """ Async call for removing a service with all of its subelements
+
+    The records are removed in batches, each in its own short transaction. Since the remaining records are collected
+    again from the database, a failed run is retried with an exponential backoff. Services, which are still hidden
+    after all retries, are enqueued again by the periodic async_remove_deleted_services task.
+
+    Args:
+        metadata_id (str): The id of the root metadata of the service
+    Returns:
+         nothing
+    """
+    root_md = Metadata.objects.filter(id=metadata_id).first()
+    if root_md is None:
+        return {'msg': 'Done. Service already removed.'}
+    title = root_md.title
+
+    md_ids = deletion_helper.get_deletion_order(root_md)
+    preview_helper.remove_previews(md_ids)
+    Metadata.clear_cached_documents_of(md_ids)
+
+    for start in range(0, len(md_ids), DELETION_BATCH_SIZE):
+        deletion_helper.delete_metadata_batch(md_ids[start:start + DELETION_BATCH_SIZE])
+        if current_task:
+            current_task.update_state(
+                state=states.STARTED,
+                meta={
+                    'current': int(min(start + DELETION_BATCH_SIZE, len(md_ids)) / len(md_ids) * 100),
+                    'total': 100,
+                    'phase': 'Removing...',
+                    'service': title,
+                }
+            )
+
+    return {'msg': 'Done. Service removed.', 'service': title}
+
+
+@shared_task(name="async_remove_deleted_services")
+def async_remove_deleted_services():
+    """ Periodic call for removing services, which are hidden but have not been removed yet
+
+    This happens if async_remove_service failed on all of its retries or if its worker was lost. Removing a service
+    more than once at the same time does no harm, since each run only removes what is left.
+
+    Returns:
+         nothing
+    """
+    root_md_ids = Metadata.objects.filter(
+        Q(metadata_type=MetadataEnum.SERVICE.value) | Q(metadata_type=MetadataEnum.CATALOGUE.value),
+        is_deleted=True,
+    ).values_list("id", flat=True)
+    for md_id in root_md_ids:
+        async_remove_service.delay(str(md_id))
+
+
+@shared_task(name="async_update_previews")
+def async_update_previews(metadata_ids: list):
+    """ Async call for rendering and storing the preview images of metadata records
 
     Args:
-        metadata_id (int): The metadata record id
+        metadata_ids (list): The metadata record ids
     Returns:
          nothing
     """
-    md = Metadata.objects.get(id=metadata_id)
-    md.increase_hits()
+    preview_helper.update_previews(metadata_ids)
 
 
 @shared_task(name="async_new_service_task")
@@ -108,6 +193,7 @@ def async_new_service(url_dict: dict,
         service.metadata.set_proxy(True)
 
     service_logger.debug(EXEC_TIME_PRINT % ("total registration", time.time() - t_start))
+    async_update_previews.delay(preview_helper.get_preview_metadata_ids(service))
     user_helper.create_group_activity(service.metadata.created_by, user, SERVICE_REGISTERED, service.metadata.title)
 
     return {'msg': 'Done. New service registered.',
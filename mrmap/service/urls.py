@@ -4,6 +4,7 @@ from editor.views import EditMetadata, RestoreMetadata, DatasetDelete
 from editor.wizards import ACCESS_EDITOR_WIZARD_FORMS, AccessEditorWizard, EditDatasetWizard, DATASET_WIZARD_FORMS
 from service.autocompletes import MetadataAutocomplete, MetadataServiceAutocomplete, MetadataLayerAutocomplete, \
     MetadataFeaturetypeAutocomplete, MetadataCatalougeAutocomplete
+from service.settings import ASYNC_SECURITY_PROXY
 from service.views import *
 from service.wizards import NewResourceWizard, NEW_RESOURCE_WIZARD_FORMS
 
@@ -41,7 +42,9 @@ urlpatterns = [
     # todo: refactoring this as a generic view
     path('metadata/<metadata_id>', get_service_metadata, name='get-service-metadata'),
     path('metadata/dataset/<pk>', DatasetMetadataXmlView.as_view(), name='get-dataset-metadata'),
-    path('metadata/<metadata_id>/operation', get_operation_result, name='metadata-proxy-operation'),
+    path('metadata/<metadata_id>/operation',
+         async_get_operation_result if ASYNC_SECURITY_PROXY else get_operation_result,
+         name='metadata-proxy-operation'),
     path('metadata/<metadata_id>/legend/<int:style_id>', get_metadata_legend, name='metadata-proxy-legend'),
 
     # detail view
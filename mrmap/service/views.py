@@ -1,18 +1,22 @@
 import base64
-import io
 from io import BytesIO
 
-from PIL import Image, UnidentifiedImageError
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.contrib.messages.views import SuccessMessageMixin
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.handlers.asgi import ASGIRequest
 from django.db import transaction
 from django.db.models import QuerySet, Q
-from django.http import HttpRequest, HttpResponse, StreamingHttpResponse, QueryDict, HttpResponseRedirect
+from django.http import HttpRequest, HttpResponse, StreamingHttpResponse, HttpResponseRedirect, \
+    HttpResponseNotModified
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
 from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _l
 from django.utils.translation import gettext as _
@@ -28,7 +32,6 @@ from django_tables2.export import ExportMixin
 from redis import StrictRedis
 from requests.exceptions import ReadTimeout
 from django.utils import timezone
-from MrMap.cacher import PreviewImageCacher
 from MrMap.celery import app
 from MrMap.consts import *
 from MrMap.decorators import log_proxy
@@ -40,22 +43,23 @@ from MrMap.messages import SERVICE_UPDATED, \
     SUBSCRIPTION_ALREADY_EXISTS_TEMPLATE, SERVICE_SUCCESSFULLY_DELETED, SUBSCRIPTION_SUCCESSFULLY_CREATED, \
     SERVICE_ACTIVATED, SERVICE_DEACTIVATED, NO_PERMISSION
 from MrMap.settings import SEMANTIC_WEB_HTML_INFORMATION
+from MrMap.utils import accepts_gzip
 from MrMap.views import GenericViewContextMixin, InitFormMixin, CustomSingleTableMixin, \
     SuccessMessageDeleteMixin
 from service.filters import OgcWmsFilter, DatasetFilter, ProxyLogTableFilter, TaskResultFilter
 from service.forms import UpdateServiceCheckForm, UpdateOldToNewElementsForm
-from service.helper import update_helper
-from service.helper import service_helper
+from service.helper import update_helper, preview_helper, response_cache, deletion_helper
+from service.helper import service_helper, async_connector
 from service.helper.common_connector import CommonConnector
-from service.helper.enums import OGCServiceEnum, OGCOperationEnum, OGCServiceVersionEnum, MetadataEnum
+from service.helper.enums import OGCServiceEnum, OGCOperationEnum, MetadataEnum
+from service.helper.ogc.async_operation_request_handler import AsyncOGCOperationRequestHandler
 from service.helper.ogc.operation_request_handler import OGCOperationRequestHandler
 from service.helper.service_comparator import ServiceComparator
 from service.helper.service_helper import get_resource_capabilities
-from service.settings import DEFAULT_SRS_STRING, PREVIEW_MIME_TYPE_DEFAULT, PLACEHOLDER_IMG_PATH
 from service.tables import UpdateServiceElements, DatasetTable, OgcServiceTable, PendingTaskTable, ResourceDetailTable, \
     ProxyLogTable
-from service.tasks import async_log_response
-from service.models import Metadata, Layer, Service, Style, ProxyLog
+from service.tasks import async_log_response, async_update_previews, async_remove_service
+from service.models import Metadata, Layer, Service, Style, ProxyLog, Document
 from service.utils import collect_contact_data, collect_metadata_related_objects, collect_featuretype_data, \
     collect_layer_data, collect_wms_root_data, collect_wfs_root_data
 from structure.permissionEnums import PermissionEnum
@@ -65,7 +69,7 @@ from users.models import Subscription
 
 
 def get_queryset_filter_by_service_type(instance, service_type: OGCServiceEnum) -> QuerySet:
-    return Metadata.objects.filter(
+    return Metadata.objects.list_view().filter(
         service__service_type__name=service_type.value,
         created_by__in=instance.request.user.groups.all(),
         is_deleted=False,
@@ -79,6 +83,7 @@ def get_queryset_filter_by_service_type(instance, service_type: OGCServiceEnum)
         "service__parent_service__metadata__external_authentication",
         "contact",
         "external_authentication",
+        "latest_status",
     ).prefetch_related(
         "service__featuretypes",
         "service__child_services",
@@ -186,14 +191,15 @@ class DatasetIndexView(CustomSingleTableMixin, FilterView):
         return table
 
     def get_queryset(self):
-        return self.request.user.get_datasets_as_qs(user_groups=self.request.user.groups.all())
+        return self.request.user.get_datasets_as_qs(user_groups=self.request.user.groups.all()).list_view()
 
 
 @method_decorator(login_required, name='dispatch')
 class ResourceDeleteView(PermissionRequiredMixin, SuccessMessageDeleteMixin, DeleteView):
     model = Metadata
     queryset = Metadata.objects.filter(Q(metadata_type=MetadataEnum.SERVICE.value) |
-                                       Q(metadata_type=MetadataEnum.CATALOGUE.value))
+                                       Q(metadata_type=MetadataEnum.CATALOGUE.value),
+                                       is_deleted=False)
     success_url = reverse_lazy('home')
     template_name = "MrMap/detail_views/delete.html"
     success_message = SERVICE_SUCCESSFULLY_DELETED
@@ -204,6 +210,15 @@ class ResourceDeleteView(PermissionRequiredMixin, SuccessMessageDeleteMixin, Del
     def get_msg_dict(self):
         return {'name': self.get_object()}
 
+    def delete(self, request, *args, **kwargs):
+        # Removing a large service takes a while, so it is only hidden here and removed by a background task
+        self.object = self.get_object()
+        success_message = self.get_success_message()
+        deletion_helper.mark_deleted(self.object)
+        async_remove_service.apply_async((str(self.object.id), ), countdown=settings.CELERY_DEFAULT_COUNTDOWN)
+        messages.success(self.request, success_message)
+        return HttpResponseRedirect(self.get_success_url())
+
 
 @method_decorator(login_required, name='dispatch')
 class ResourceActivateDeactivateView(PermissionRequiredMixin, GenericViewContextMixin, InitFormMixin, SuccessMessageMixin, UpdateView):
@@ -275,15 +290,24 @@ def metadata_subscription_new(request: HttpRequest, metadata_id: str):
 class DatasetMetadataXmlView(BaseDetailView):
     model = Metadata
     # a dataset metadata without a document is broken
-    queryset = Metadata.objects.filter(metadata_type=OGCServiceEnum.DATASET.value, documents__isnull=False)\
-                               .prefetch_related('documents')
+    queryset = Metadata.objects.filter(metadata_type=OGCServiceEnum.DATASET.value, documents__isnull=False)
     content_type = 'application/xml'
     object = None
 
     def get(self, request, *args, **kwargs):
-        document = self.object.documents.get(is_original=False) if self.object.documents.filter(is_original=False).exists() else self.object.documents.get(
-            is_original=True)
-        return HttpResponse(document.content, content_type=self.content_type)
+        # The customized document is preferred over the original one
+        document = self.object.documents.defer("content").order_by("is_original").first()
+        if accepts_gzip(request):
+            # Serve the stored bytes directly, without decompressing and compressing them again
+            compressed_content = Document.get_compressed_content(id=document.id)
+            if compressed_content is not None:
+                response = HttpResponse(compressed_content, content_type=self.content_type)
+                response["Content-Encoding"] = "gzip"
+                patch_vary_headers(response, ("Accept-Encoding", ))
+                return response
+        response = HttpResponse(document.content, content_type=self.content_type)
+        patch_vary_headers(response, ("Accept-Encoding", ))
+        return response
 
     def dispatch(self, request, *args, **kwargs):
         self.object = self.get_object()
@@ -296,95 +320,30 @@ class DatasetMetadataXmlView(BaseDetailView):
 def get_service_preview(request: HttpRequest, metadata_id):
     """ Returns the service metadata preview as png for a given metadata id
 
+    Previews are rendered in the background and served from the cache or the preview image store. Only if no preview
+    has been rendered yet, it is rendered on the fly.
+
     Args:
         request (HttpRequest): The incoming request
         metadata_id: The metadata id
     Returns:
          A HttpResponse containing the png preview
     """
+    preview = preview_helper.get_preview(metadata_id)
 
-    md = get_object_or_404(Metadata, id=metadata_id)
-    if md.is_metadata_type(MetadataEnum.DATASET) or \
-            md.is_metadata_type(MetadataEnum.FEATURETYPE) or \
-            not md.service.is_service_type(OGCServiceEnum.WMS) or md.is_updatecandidate:
-        return HttpResponse(status=404, content=SERVICE_NOT_FOUND)
+    if preview is None:
+        md = get_object_or_404(Metadata, id=metadata_id)
+        layer_md = preview_helper.get_preview_metadata(md)
+        if layer_md is None:
+            return HttpResponse(status=404, content=SERVICE_NOT_FOUND)
+        preview = preview_helper.store_preview(md.id, preview_helper.render_preview(layer_md))
 
-    if md.service.is_service_type(OGCServiceEnum.WMS) and md.service.is_root:
-        service = get_object_or_404(Service, id=md.service.id)
-        layer = get_object_or_404(Layer, parent_service=service, parent=None, )
-        # Fake the preview image for the whole service by using the root layer instead
-        md = layer.metadata
-    elif md.service.is_service_type(OGCServiceEnum.WMS) and not md.service.is_root:
-        layer = md.service.layer
-
-    layer = layer.identifier
-    if md.allowed_area.area == 0:
-        bbox = md.find_max_bounding_box()
+    if request.headers.get("If-None-Match") == preview["etag"]:
+        response = HttpResponseNotModified()
     else:
-        bbox = md.allowed_area
-    bbox = str(bbox.extent).replace("(", "").replace(")", "")  # this is a little dumb, you may choose something better
-
-    img_width = 200
-    img_heigt = 200
-
-    try:
-        # Fetch a pixel based image mime type. We can not use vector types
-        png_format = md.get_formats().filter(
-            mime_type__icontains="image/"
-        ).exclude(
-            mime_type__icontains="svg"
-        ).first()
-        img_format = png_format.mime_type
-    except AttributeError:
-        # Act as fallback
-        img_format = "image/png"
-
-    data = {
-        "request": OGCOperationEnum.GET_MAP.value,
-        "version": OGCServiceVersionEnum.V_1_1_1.value,
-        "layers": layer,
-        "srs": DEFAULT_SRS_STRING,
-        "bbox": bbox,
-        "format": img_format,
-        "width": img_width,
-        "height": img_heigt,
-        "service": "wms",
-    }
-
-    query_data = QueryDict('', mutable=True)
-    query_data.update(data)
-
-    request.POST._mutable = True
-    request.POST = query_data
-    request.method = 'POST'
-    request.POST._mutable = False
-
-    # Check if this parameters already have been generated a preview image for this metadata record
-    cacher = PreviewImageCacher(metadata=md)
-    img = cacher.get(data)
-
-    if img is None:
-        # There is no cached image, so we create one and cache it!
-        operation_request_handler = OGCOperationRequestHandler(request=request, metadata=md)
-        img = operation_request_handler.get_operation_response(post_data=data)  # img is returned as a byte code
-        cacher.set(data, img)
-
-    response = img.get("response", None)
-    content_type = img.get("response_type", "")
-
-    try:
-        # Make sure the image is returned as PREVIEW_MIME_TYPE_DEFAULT filetype
-        image_obj = Image.open(io.BytesIO(response))
-    except UnidentifiedImageError:
-        # No preview image could be generated. We need to open a placeholder image!
-        image_obj = Image.open(PLACEHOLDER_IMG_PATH)
-        image_obj = image_obj.resize((img_width, img_heigt))
-
-    out_bytes_stream = io.BytesIO()
-    image_obj.save(out_bytes_stream, PREVIEW_MIME_TYPE_DEFAULT, optimize=True, quality=80)
-    response = out_bytes_stream.getvalue()
-
-    return HttpResponse(response, content_type=content_type)
+        response = HttpResponse(preview["content"], content_type=preview_helper.PREVIEW_CONTENT_TYPE)
+    response["ETag"] = preview["etag"]
+    return response
 
 
 def _get_capabilities(request: HttpRequest, metadata_id):
@@ -624,10 +583,10 @@ def dismiss_pending_update_service(request: HttpRequest, metadata_id):
 def run_update_service(request: HttpRequest, metadata_id):
     if request.method == 'POST':
         current_service = get_object_or_404(
-            Service.objects.select_related('metadata').prefetch_related('metadata__documents'),
+            Service.objects.select_related('metadata'),
             metadata__id=metadata_id)
         new_service = get_object_or_404(
-            Service.objects.select_related('metadata').prefetch_related('metadata__documents'),
+            Service.objects.select_related('metadata'),
             is_update_candidate_for=current_service)
 
         if not current_service.is_service_type(OGCServiceEnum.WFS):
@@ -690,6 +649,8 @@ def run_update_service(request: HttpRequest, metadata_id):
                 )
 
             current_service.save()
+            current_service.update_inherited_properties()
+            async_update_previews.delay(preview_helper.get_preview_metadata_ids(current_service))
 
             update_helper.update_capability_document(current_service, new_service)
 
@@ -818,6 +779,126 @@ class ResourceTreeView(DetailView):
         return context
 
 
+def _resolve_operation_request(request: HttpRequest, metadata_id,
+                               operation_handler_class=OGCOperationRequestHandler):
+    """ Runs all checks of the security proxy, which have to be done before the service is called
+
+    Args:
+        request (HttpRequest): The incoming request
+        metadata_id: The metadata id
+        operation_handler_class: The class of the operation request handler, which shall be created
+    Returns:
+         early_response (HttpResponse): A response, which has to be returned instead of calling the service, or None
+         operation (dict): The resolved operation request
+    """
+    get_query_string = request.META.get("QUERY_STRING", "")
+
+    metadata = Metadata.objects.proxy_view().get(id=metadata_id)
+    operation_handler = operation_handler_class(uri=get_query_string, request=request, metadata=metadata)
+
+    if not metadata.is_active:
+        return HttpResponse(status=423, content=SERVICE_DISABLED), None
+
+    elif operation_handler.request_param is None:
+        return HttpResponse(status=500, content=SECURITY_PROXY_ERROR_MISSING_REQUEST_TYPE), None
+
+    elif operation_handler.request_param.upper() == OGCOperationEnum.GET_CAPABILITIES.value.upper():
+        return _get_capabilities(request=request, metadata_id=metadata_id), None
+
+    elif not metadata.is_root():
+        # we do not allow the direct call of operations on child elements, such as layers!
+        # if the request tries that, we directly redirect it to the parent service!
+        parent_md = metadata.service.parent_service.metadata
+        return _resolve_operation_request(request=request, metadata_id=parent_md.id,
+                                          operation_handler_class=operation_handler_class)
+
+    # We need to check if at least one of the requested layers is secured.
+    md_secured = metadata.is_secured
+    if operation_handler.layers_param is not None:
+        layers = operation_handler.layers_param.split(",")
+        layers_md = Metadata.objects.filter(
+            identifier__in=layers,
+            service__parent_service__metadata=metadata
+        )
+        md_secured = layers_md.filter(is_secured=True).exists()
+
+        if layers_md.count() != len(layers):
+            # at least one requested layer could not be found in the database
+            return HttpResponse(status=404, content=SERVICE_LAYER_NOT_FOUND), None
+
+    # Responses of cacheable operations are shared between callers with the same access scope
+    cache_key = None
+    cached_response = None
+    cache_time = response_cache.get_cache_time(metadata.service, operation_handler.request_param)
+    if cache_time > 0:
+        if md_secured:
+            scope = response_cache.get_access_scope(operation_handler.user_groups)
+        else:
+            scope = response_cache.PUBLIC_ACCESS_SCOPE
+        cache_key = response_cache.get_cache_key(metadata.id, operation_handler.new_params_dict, scope)
+        cached_response = response_cache.get_cached_response(cache_key)
+
+    return None, {
+        "metadata": metadata,
+        "operation_handler": operation_handler,
+        "md_secured": md_secured,
+        "cache_key": cache_key,
+        "cache_time": cache_time,
+        "cached_response": cached_response,
+    }
+
+
+def _create_operation_response(request: HttpRequest, proxy_log: ProxyLog, operation: dict, response_dict: dict):
+    """ Logs and caches the response of a service and creates the response for the caller
+
+    Args:
+        request (HttpRequest): The incoming request
+        proxy_log (ProxyLog): The logging object
+        operation (dict): The resolved operation request, like returned by _resolve_operation_request()
+        response_dict (dict): The response of the service
+    Returns:
+         response (HttpResponse): The response
+    """
+    operation_handler = operation["operation_handler"]
+    cache_key = operation["cache_key"]
+    cached_response = operation["cached_response"]
+
+    response = response_dict.get("response", None)
+    content_type = response_dict.get("response_type", "")
+
+    if response is None:
+        # metadata is secured but user is not allowed
+        return HttpResponse(status=401, content=SECURITY_PROXY_NOT_ALLOWED)
+
+    # Log the response, if needed
+    if proxy_log is not None:
+        response_encoded = base64.b64encode(response).decode("UTF-8")
+        async_log_response.delay(
+            proxy_log.id,
+            response_encoded,
+            operation_handler.request_param,
+            operation_handler.format_param,
+        )
+
+    if cache_key is not None:
+        if cached_response is None:
+            cached_response = response_cache.cache_response(cache_key, operation["metadata"].service, response_dict,
+                                                            operation["cache_time"])
+        if cached_response is not None:
+            return response_cache.get_http_response(request, cached_response)
+
+    len_response = len(response)
+    if len_response <= 5000000:
+        return HttpResponse(response, content_type=content_type)
+    else:
+        # data too big - we should stream it!
+        # make sure the response is in bytes
+        if not isinstance(response, bytes):
+            response = bytes(response)
+        buffer = BytesIO(response)
+        return StreamingHttpResponse(buffer, content_type=content_type)
+
+
 @csrf_exempt
 @log_proxy
 def get_operation_result(request: HttpRequest, proxy_log: ProxyLog, metadata_id):
@@ -834,81 +915,81 @@ def get_operation_result(request: HttpRequest, proxy_log: ProxyLog, metadata_id)
     Returns:
          A redirect to the GetMap uri
     """
-    # get request type and requested layer
-    get_query_string = request.environ.get("QUERY_STRING", "")
-
     try:
-        # redirects request to parent service, if the given id is not the root of the service
-        metadata = Metadata.objects.get(id=metadata_id)
-        operation_handler = OGCOperationRequestHandler(uri=get_query_string, request=request, metadata=metadata)
-
-        if not metadata.is_active:
-            return HttpResponse(status=423, content=SERVICE_DISABLED)
-
-        elif operation_handler.request_param is None:
-            return HttpResponse(status=500, content=SECURITY_PROXY_ERROR_MISSING_REQUEST_TYPE)
-
-        elif operation_handler.request_param.upper() == OGCOperationEnum.GET_CAPABILITIES.value.upper():
-            return _get_capabilities(request=request, metadata_id=metadata_id)
-
-        elif not metadata.is_root():
-            # we do not allow the direct call of operations on child elements, such as layers!
-            # if the request tries that, we directly redirect it to the parent service!
-            parent_md = metadata.service.parent_service.metadata
-            return get_operation_result(request=request, id=parent_md.id)
-
-        # We need to check if at least one of the requested layers is secured.
-        md_secured = metadata.is_secured
-        if operation_handler.layers_param is not None:
-            layers = operation_handler.layers_param.split(",")
-            layers_md = Metadata.objects.filter(
-                identifier__in=layers,
-                service__parent_service__metadata=metadata
-            )
-            md_secured = layers_md.filter(is_secured=True).exists()
-
-            if layers_md.count() != len(layers):
-                # at least one requested layer could not be found in the database
-                return HttpResponse(status=404, content=SERVICE_LAYER_NOT_FOUND)
-        if md_secured:
+        early_response, operation = _resolve_operation_request(request, metadata_id)
+        if early_response is not None:
+            return early_response
+
+        operation_handler = operation["operation_handler"]
+        if operation["cached_response"] is not None:
+            response_dict = operation["cached_response"]
+        elif operation["md_secured"]:
             response_dict = operation_handler.get_allowed_operation_response()
         else:
             response_dict = operation_handler.get_operation_response(proxy_log=proxy_log)
 
-        response = response_dict.get("response", None)
-        content_type = response_dict.get("response_type", "")
-
-        if response is None:
-            # metadata is secured but user is not allowed
-            return HttpResponse(status=401, content=SECURITY_PROXY_NOT_ALLOWED)
-
-        # Log the response, if needed
-        if proxy_log is not None:
-            response_encoded = base64.b64encode(response).decode("UTF-8")
-            async_log_response.delay(
-                proxy_log.id,
-                response_encoded,
-                operation_handler.request_param,
-                operation_handler.format_param,
-            )
+        return _create_operation_response(request, proxy_log, operation, response_dict)
+
+    except ObjectDoesNotExist:
+        return HttpResponse(status=404, content=SERVICE_NOT_FOUND)
+    except ReadTimeout:
+        return HttpResponse(status=408, content=CONNECTION_TIMEOUT.format(request.build_absolute_uri()))
+    except Exception as e:
+        return HttpResponse(status=500, content=e)
+
 
-        len_response = len(response)
-        if len_response <= 5000000:
-            return HttpResponse(response, content_type=content_type)
+@log_proxy
+async def async_get_operation_result(request: HttpRequest, proxy_log: ProxyLog, metadata_id):
+    """ Like get_operation_result(), but the service is called without blocking a worker thread
+
+    The checks and the response handling run in the database thread, while the requests to the service and the
+    mapserver, which creates the security masks, are performed concurrently as coroutines.
+
+    Args:
+        request (HttpRequest): The incoming request
+        proxy_log (ProxyLog): The logging object
+        metadata_id: The metadata id
+    Returns:
+         The response of the service
+    """
+    try:
+        early_response, operation = await sync_to_async(_resolve_operation_request, thread_sensitive=True)(
+            request,
+            metadata_id,
+            operation_handler_class=AsyncOGCOperationRequestHandler
+        )
+        if early_response is not None:
+            return early_response
+
+        operation_handler = operation["operation_handler"]
+        if operation["cached_response"] is not None:
+            response_dict = operation["cached_response"]
+        elif operation["md_secured"]:
+            response_dict = await operation_handler.get_allowed_operation_response_async()
         else:
-            # data too big - we should stream it!
-            # make sure the response is in bytes
-            if not isinstance(response, bytes):
-                response = bytes(response)
-            buffer = BytesIO(response)
-            return StreamingHttpResponse(buffer, content_type=content_type)
+            response_dict = await operation_handler.get_operation_response_async()
+
+        return await sync_to_async(_create_operation_response, thread_sensitive=True)(
+            request,
+            proxy_log,
+            operation,
+            response_dict
+        )
 
     except ObjectDoesNotExist:
         return HttpResponse(status=404, content=SERVICE_NOT_FOUND)
-    except ReadTimeout:
+    except (ReadTimeout, httpx.TimeoutException):
         return HttpResponse(status=408, content=CONNECTION_TIMEOUT.format(request.build_absolute_uri()))
     except Exception as e:
         return HttpResponse(status=500, content=e)
+    finally:
+        if not isinstance(request, ASGIRequest):
+            # Only the event loop of an asgi server outlives the request and reuses the pooled connections
+            await async_connector.close_client()
+
+
+# csrf_exempt of django 3.1 wraps views by a regular function, which would hide the coroutine
+async_get_operation_result.csrf_exempt = True
 
 
 def get_metadata_legend(request: HttpRequest, metadata_id, style_id: int):
@@ -923,11 +1004,37 @@ def get_metadata_legend(request: HttpRequest, metadata_id, style_id: int):
     Returns:
         HttpResponse
     """
-    style = get_object_or_404(Style, id=style_id)
+    style = get_object_or_404(Style.objects.select_related("layer__parent_service"), id=style_id)
+    root_service = style.layer.parent_service
+
+    # Legend graphics are not secured, so all callers share the cached legends
+    cache_time = response_cache.get_cache_time(root_service, OGCOperationEnum.GET_LEGEND_GRAPHIC.value)
+    cache_key = response_cache.get_cache_key(style.layer.metadata_id, {"STYLE": style.id, "URI": style.legend_uri})
+    cached_response = response_cache.get_cached_response(cache_key) if cache_time > 0 else None
+    if cached_response is not None:
+        return response_cache.get_http_response(request, cached_response)
+
     uri = style.legend_uri
     con = CommonConnector(uri)
     con.load()
     response = con.content
+
+    if con.status_code == 200:
+        headers = con.http_external_headers or {}
+        cached_response = response_cache.cache_response(
+            cache_key,
+            root_service,
+            {
+                "response": response,
+                "response_type": headers.get("content-type", ("", ""))[1],
+                "response_headers": {
+                    header: headers.get(header, ("", None))[1] for header in ("cache-control", "etag")
+                },
+            },
+            cache_time
+        )
+        if cached_response is not None:
+            return response_cache.get_http_response(request, cached_response)
     return HttpResponse(response, content_type="")
 
 
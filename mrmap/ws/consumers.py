@@ -7,6 +7,7 @@ from django_tables2 import RequestConfig
 from service.filters import TaskResultFilter
 from service.tables import PendingTaskTable
 from ws.auth import NonAnonymousJsonWebsocketConsumer
+from ws.settings import PENDING_TASK_INSERTED
 from ws.utils import get_initial_app_view_model
 
 
@@ -26,36 +27,90 @@ class AppViewModelConsumer(NonAnonymousJsonWebsocketConsumer):
 class PendingTaskTableConsumer(NonAnonymousJsonWebsocketConsumer):
     groups = ['pending_task_table_observers']
 
-    def send_table_as_html(self, event):
+    def connect(self):
+        super().connect()
+        # the client gets the whole table once - afterwards only the changed rows are sent
+        self.send_table_as_html()
+
+    def receive_json(self, content, **kwargs):
         """
-        Call back function to send the changed rendered table to the client
+        The client requests the whole table again, e.g. after it has been reconnected
         """
-        # todo: for now we send all pending tasks serialized as json
-        #  further changes:
-        #   * filter by the user object based permissions to show only pending tasks for that the user
-        #     has permissions
-        #   * check if the self.user has permissions for the instance that is created/modified. If not skip sending
+        if isinstance(content, dict) and content.get('action') == 'refresh':
+            self.send_table_as_html()
 
-        # create dummy request to render table as html
+    def get_request(self):
+        """
+        Creates a dummy request with the query of the client, to filter and render the table like the client sees it
+        """
         url = self.scope['path']
         if self.scope['query_string']:
             url += f"?{self.scope['query_string'].decode('utf-8')}"
 
         request = RequestFactory().get(url)
         request.user = self.user
+        return request
 
-        all_task_results = TaskResult.objects.all()
+    def render_table(self, request, task_results):
+        """
+        Filters and renders the given task results like the table the client shows. Returns None if no task result
+        matches the filter of the client.
+        """
+        pending_tasks_filterset = TaskResultFilter(data=request.GET, queryset=task_results)
+        if not pending_tasks_filterset.qs:
+            return None
 
-        pending_tasks_filterset = TaskResultFilter(data=request.GET, queryset=all_task_results)
-        if pending_tasks_filterset.qs:
-            # render the table only if the filtered qs in not empty
-            pending_task_table = PendingTaskTable(data=pending_tasks_filterset.qs)
-            pending_task_table.context = Context()
-            pending_task_table.context.update({'filter': pending_tasks_filterset})
+        pending_task_table = PendingTaskTable(data=pending_tasks_filterset.qs)
+        pending_task_table.context = Context()
+        pending_task_table.context.update({'filter': pending_tasks_filterset})
+
+        RequestConfig(request=request).configure(table=pending_task_table)
+
+        return pending_task_table.as_html(request=request)
 
-            RequestConfig(request=request).configure(table=pending_task_table)
+    def render_inserted_row(self, task_id):
+        """
+        Renders a table, which only holds the row of the inserted task, if the client shows this row. New tasks are
+        the first rows of the table, so they are only shown on the first page.
+        """
+        request = self.get_request()
+        page_field = PendingTaskTable(data=TaskResult.objects.none()).prefixed_page_field
+        if request.GET.get(page_field, '1') != '1':
+            return None
+        return self.render_table(request, TaskResult.objects.filter(task_id=task_id))
+
+    def send_task_deltas(self, event):
+        """
+        Call back function to send the changed rows of the table to the client
 
-            rendered_table = pending_task_table.as_html(request=request)
+        Inserted rows are rendered for this client, since the rendering depends on its filter and permissions. Inserted
+        rows, which this client does not show, are skipped. Updated and removed rows are applied by the client only
+        to the rows it shows.
+        """
+        deltas = []
+        for delta in event['deltas']:
+            if delta['action'] == PENDING_TASK_INSERTED:
+                rendered_row = self.render_inserted_row(delta['task_id'])
+                if rendered_row is None:
+                    continue
+                delta = dict(delta, rendered_row=rendered_row)
+            deltas.append(delta)
+
+        if deltas:
+            self.send_json(content=json.dumps({'deltas': deltas}))
+
+    def send_table_as_html(self, event=None):
+        """
+        Call back function to send the whole rendered table to the client
+        """
+        # todo: for now we send all pending tasks serialized as json
+        #  further changes:
+        #   * filter by the user object based permissions to show only pending tasks for that the user
+        #     has permissions
+        #   * check if the self.user has permissions for the instance that is created/modified. If not skip sending
+        rendered_table = self.render_table(self.get_request(), TaskResult.objects.all())
+        if rendered_table is not None:
+            # render the table only if the filtered qs in not empty
             self.send_json(content=json.dumps({'rendered_table': rendered_table}))
 
 
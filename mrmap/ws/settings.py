@@ -0,0 +1,6 @@
+# Changes of pending tasks are collected for this amount of seconds and sent to the table observers as one message
+PENDING_TASK_NOTIFY_DELAY = 1
+
+PENDING_TASK_INSERTED = "inserted"
+PENDING_TASK_UPDATED = "updated"
+PENDING_TASK_REMOVED = "removed"
@@ -1,7 +1,8 @@
 from asgiref.sync import async_to_sync
 from celery import states
-from celery.signals import after_task_publish
+from celery.signals import after_task_publish, task_postrun, worker_process_shutdown
 from channels.layers import get_channel_layer
+from django.core.signals import request_finished
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.urls import reverse
@@ -12,6 +13,8 @@ from django.utils.translation import gettext_lazy as _
 from service.helper.enums import OGCServiceEnum
 from service.models import Metadata
 from ws.messages import Toast
+from ws.settings import PENDING_TASK_INSERTED, PENDING_TASK_UPDATED, PENDING_TASK_REMOVED
+from ws.utils import pending_task_notifier
 
 
 def update_count(channel_layer, instance):
@@ -58,19 +61,30 @@ def update_pending_task_listeners(**kwargs):
             # post_save signal --> new TaskResult object
             update_count(channel_layer, kwargs['instance'])
             send_task_toast(channel_layer, True, kwargs['instance'])
+            action = PENDING_TASK_INSERTED
         else:
             if kwargs['instance'].status in [states.SUCCESS, states.FAILURE]:
                 send_task_toast(channel_layer, False, kwargs['instance'])
+            action = PENDING_TASK_UPDATED
     else:
         # post_delete signal
         update_count(channel_layer, kwargs['instance'])
+        action = PENDING_TASK_REMOVED
+
+    # the table observers are notified debounced, since tasks update their state very often
+    pending_task_notifier.notify(kwargs['instance'], action)
+
+
+@task_postrun.connect
+@worker_process_shutdown.connect
+@receiver(request_finished, dispatch_uid='flush_pending_task_changes_on_request_finished')
+def flush_pending_task_changes(**kwargs):
+    """
+    Sends the changes of pending tasks, which are still collected by the debouncing notifier. The final state of a
+    task is stored before task_postrun is dispatched, so it is never held back until the next change.
+    """
+    pending_task_notifier.flush()
 
-    async_to_sync(channel_layer.group_send)(
-        "pending_task_table_observers",
-        {
-            "type": "send.table.as.html",
-        },
-    )
 
 @after_task_publish.connect
 def task_send_handler(sender=None, headers=None, body=None, **kwargs):
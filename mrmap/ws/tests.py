@@ -13,6 +13,7 @@ from tests.baker_recipes.db_setup import create_superadminuser
 from tests.baker_recipes.structure_app.baker_recipes import PASSWORD
 from channels.testing import WebsocketCommunicator
 from MrMap.asgi import application
+from ws.settings import PENDING_TASK_NOTIFY_DELAY, PENDING_TASK_INSERTED
 
 
 class PendingTaskConsumerTestCase(TransactionTestCase):
@@ -62,8 +63,18 @@ class PendingTaskConsumerTestCase(TransactionTestCase):
         connected, exit_code = await communicator.connect()
         self.assertTrue(connected)
 
-        # if a TaskResult is created/modified, we shall receive the updated pending task list as json and html
+        # if a TaskResult is created/modified, we shall receive only the changed rows
         pending_task = await self.create_pending_task()
+        response = await communicator.receive_json_from(timeout=PENDING_TASK_NOTIFY_DELAY + 1)
+        deltas = json.loads(response).get('deltas')
+        self.assertEqual(1, len(deltas))
+        self.assertEqual(pending_task.task_id, deltas[0]['task_id'])
+        self.assertEqual(PENDING_TASK_INSERTED, deltas[0]['action'])
+        # the inserted row is rendered for the client
+        self.assertIn(f'data-task-id="{pending_task.task_id}"', deltas[0]['rendered_row'])
+
+        # if the client requests a refresh, we shall receive the whole pending task table as html
+        await communicator.send_json_to({'action': 'refresh'})
         response = await communicator.receive_json_from()
         all_pending_tasks = await self.all_pending_tasks()
 
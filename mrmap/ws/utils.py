@@ -1,8 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import async_to_sync
 from celery import states
+from channels.layers import get_channel_layer
 from django_celery_results.models import TaskResult
 
+from service.tables import PendingTaskTable
+from ws.settings import PENDING_TASK_NOTIFY_DELAY, PENDING_TASK_INSERTED, PENDING_TASK_REMOVED
+
 
 def get_initial_app_view_model():
     tasks_count = TaskResult.objects.filter(status__in=[states.STARTED, states.PENDING]).count()
     response = {'pendingTaskCount': tasks_count}
     return response
+
+
+def get_task_delta(instance: TaskResult, action: str):
+    """ Serializes the changes of a TaskResult for the pending task table observers
+
+    Args:
+        instance (TaskResult): The changed TaskResult
+        action (str): One of inserted, updated or removed
+    Returns:
+         delta (dict): The row delta
+    """
+    delta = {
+        'task_id': instance.task_id,
+        'action': action,
+    }
+    if action != PENDING_TASK_REMOVED:
+        delta.update({
+            'status': instance.status,
+            'progress': PendingTaskTable.get_progress(instance, instance.result),
+            'status_html': str(PendingTaskTable.render_status(instance.status)),
+            'phase_html': str(PendingTaskTable.render_phase(instance, instance.result)),
+            'progress_html': str(PendingTaskTable.render_progress(instance, instance.result)),
+        })
+    return delta
+
+
+class PendingTaskNotifier:
+    """ Debounces the notifications for the pending task table observers
+
+    Tasks call update_state() very often, which results in a lot of TaskResult saves. Instead of notifying the
+    observers on each of them, the changes are coalesced per task and sent as one message of row deltas, at most once
+    per PENDING_TASK_NOTIFY_DELAY seconds.
+
+    The changes are sent by the process which registered them, without any background thread. Changes which are
+    still collected are sent by flush(), which is called when a celery task has finished, when a worker process shuts
+    down and when a request has finished (see ws/signals.py).
+
+    """
+    def __init__(self, delay: float = PENDING_TASK_NOTIFY_DELAY):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._changes = OrderedDict()
+        self._last_flush = 0
+
+    def notify(self, instance: TaskResult, action: str):
+        """ Registers a change of a TaskResult
+
+        The collected changes are sent right away, if the last message has been sent more than delay seconds ago.
+
+        Args:
+            instance (TaskResult): The changed TaskResult
+            action (str): One of inserted, updated or removed
+        Returns:
+
+        """
+        with self._lock:
+            previous = self._changes.pop(instance.task_id, None)
+            if previous is not None and previous[0] == PENDING_TASK_INSERTED:
+                if action == PENDING_TASK_REMOVED:
+                    # The observers have never seen this task - there is nothing to tell
+                    return
+                # An inserted row stays inserted, but with the current state
+                action = PENDING_TASK_INSERTED
+            self._changes[instance.task_id] = (action, instance)
+            is_due = time.monotonic() - self._last_flush >= self.delay
+
+        if is_due:
+            self.flush()
+
+    def flush(self):
+        """ Sends all collected changes as one message to the pending task table observers
+
+        Returns:
+
+        """
+        with self._lock:
+            changes = self._changes
+            self._changes = OrderedDict()
+            if changes:
+                self._last_flush = time.monotonic()
+
+        if not changes:
+            return
+
+        deltas = [get_task_delta(instance, action) for action, instance in changes.values()]
+        async_to_sync(get_channel_layer().group_send)(
+            "pending_task_table_observers",
+            {
+                "type": "send.task.deltas",
+                "deltas": deltas,
+            },
+        )
+
+
+pending_task_notifier = PendingTaskNotifier()
@@ -112,4 +112,34 @@ class ApiViewTestCase(TestCase):
             self.assertEqual(response.status_code, 200, msg=INVALID_STATUS_CODE_TEMPLATE.format(response.status_code))
 
             # Run all checks
-            self._run_checks(response_json, api_key=api)
\ No newline at end of file
+            self._run_checks(response_json, api_key=api)
+
+    def test_cursor_pagination(self):
+        """ Tests whether the cursor pagination returns all elements without duplicates
+
+        Returns:
+
+        """
+        api_key = "catalogue-list"
+        params = {
+            "format": "json",
+            "paging": "cursor",
+            "rpp": 4,
+        }
+        uri = reverse("api:{}".format(api_key))
+        ids = []
+        while uri is not None:
+            response = self.client.get(uri, data=params)
+            self.assertEqual(response.status_code, 200, msg=INVALID_STATUS_CODE_TEMPLATE.format(response.status_code))
+            try:
+                response_json = json.loads(response.content)
+            except JSONDecodeError as e:
+                self.fail(msg=JSON_LOADS_FAILED_TEMPLATE.format(e))
+            self._run_checks(response_json, api_key=api_key)
+            ids += [result["id"] for result in response_json["results"]]
+            # The next link already contains all parameters
+            uri = response_json["next"]
+            params = {}
+
+        self.assertEqual(len(ids), len(set(ids)), msg="Cursor pagination returned duplicated elements")
+        self.assertEqual(len(ids), self.available_apis[api_key].count())
@@ -7,10 +7,13 @@ Created on: 26.05.20
 """
 from copy import copy
 
+from dateutil.parser import parse
 from django.test import TestCase, Client
 from django.urls import reverse
+from django.utils import timezone
 
 from MrMap.settings import GENERIC_NAMESPACE_TEMPLATE
+from csw.utils.continuation import ContinuationToken
 from service.helper import xml_helper
 from service.models import Service
 from tests.baker_recipes.db_setup import create_superadminuser, create_wms_service
@@ -22,6 +25,19 @@ WRONG_STATUS_CODE_TEMPLATE = "CSW GetRecords returned with code {}"
 INVALID_XML_MSG = "Response contains invalid XML!"
 
 
+def get_response_content(response):
+    """ Returns the content of a regular or streamed response
+
+    Args:
+        response: The response
+    Returns:
+         content (bytes): The content
+    """
+    if response.streaming:
+        return b"".join(response.streaming_content)
+    return response.content
+
+
 class CswViewTestCase(TestCase):
     def setUp(self):
         self.user = create_superadminuser()
@@ -54,7 +70,7 @@ class CswViewTestCase(TestCase):
             data=get_records_param
         )
         status_code = response.status_code
-        content = response.content
+        content = get_response_content(response)
         content_xml = xml_helper.parse_xml(content)
 
         self.assertEqual(response.status_code, 200, WRONG_STATUS_CODE_TEMPLATE.format(status_code))
@@ -80,7 +96,7 @@ class CswViewTestCase(TestCase):
             data=get_records_param
         )
         status_code = response.status_code
-        content = response.content
+        content = get_response_content(response)
         content_xml = xml_helper.parse_xml(content)
 
         self.assertEqual(response.status_code, 200, WRONG_STATUS_CODE_TEMPLATE.format(status_code))
@@ -93,6 +109,92 @@ class CswViewTestCase(TestCase):
         titles.sort(reverse=True)  # Check the descending sorted way
         self.assertEqual(titles, titles_sorted)
 
+    def test_get_records_cursor(self):
+        """ Test whether the keyset pagination using the cursor parameter is working properly
+
+        Returns:
+
+        """
+        # Without sortBy the records are sorted by their creation date, descending
+        for sort_by in ["dc:title:A", "dc:date:A", "dc:date:D", "dc:modified:A", None]:
+            self._assert_cursor_paging(sort_by)
+
+    def _assert_cursor_paging(self, sort_by):
+        """ Pages through the records by cursor and compares them with the regular paging
+
+        Args:
+            sort_by (str): The sortBy parameter or None
+        Returns:
+
+        """
+        get_records_param = {
+            "service": "CSW",
+            "version": "2.0.2",
+            "request": "GetRecords",
+            "elementsetname": "brief",
+            "resulttype": "results",
+            "maxrecords": 3,
+        }
+        if sort_by is not None:
+            get_records_param["sortby"] = sort_by
+        identifiers = []
+        cursor = None
+        for i in range(3):
+            if cursor is not None:
+                get_records_param["cursor"] = cursor
+            response = self.client.get(
+                reverse(CSW_PATH),
+                data=get_records_param
+            )
+            self.assertEqual(response.status_code, 200, WRONG_STATUS_CODE_TEMPLATE.format(response.status_code))
+            content_xml = xml_helper.parse_xml(get_response_content(response))
+            self.assertIsNotNone(content_xml, INVALID_XML_MSG)
+
+            identifier_elems = xml_helper.try_get_element_from_xml("//" + GENERIC_NAMESPACE_TEMPLATE.format("identifier"), content_xml)
+            identifiers += [xml_helper.try_get_text_from_xml_element(id_elem) for id_elem in identifier_elems]
+            cursor = xml_helper.try_get_attribute_from_xml_element(xml_elem=content_xml, attribute="resultSetId", elem="//" + GENERIC_NAMESPACE_TEMPLATE.format("SearchResults"))
+            self.assertIsNotNone(cursor, "No continuation token was returned!")
+
+        # Compare with the regular paging, which uses startPosition
+        get_records_param.pop("cursor")
+        get_records_param["maxrecords"] = 9
+        response = self.client.get(
+            reverse(CSW_PATH),
+            data=get_records_param
+        )
+        content_xml = xml_helper.parse_xml(get_response_content(response))
+        identifier_elems = xml_helper.try_get_element_from_xml("//" + GENERIC_NAMESPACE_TEMPLATE.format("identifier"), content_xml)
+        expected_identifiers = [xml_helper.try_get_text_from_xml_element(id_elem) for id_elem in identifier_elems]
+        self.assertEqual(identifiers, expected_identifiers, sort_by)
+
+    def test_continuation_token_keeps_microseconds(self):
+        last_value = timezone.now().replace(microsecond=123456)
+        token = ContinuationToken("hash", 4, last_value, "id").encode()
+        decoded = ContinuationToken.decode(token, "hash")
+        self.assertEqual(parse(decoded.last_value), last_value)
+
+    def test_get_records_invalid_cursor(self):
+        """ Test whether an invalid cursor results in an ows:ExceptionReport
+
+        Returns:
+
+        """
+        get_records_param = {
+            "service": "CSW",
+            "version": "2.0.2",
+            "request": "GetRecords",
+            "elementsetname": "brief",
+            "resulttype": "results",
+            "cursor": "invalid",
+        }
+        response = self.client.get(
+            reverse(CSW_PATH),
+            data=get_records_param
+        )
+        content_xml = xml_helper.parse_xml(get_response_content(response))
+        exception_report_elem = xml_helper.try_get_single_element_from_xml("//" + GENERIC_NAMESPACE_TEMPLATE.format("ExceptionReport"), content_xml)
+        self.assertIsNotNone(exception_report_elem, "No ows:ExceptionReport was generated!")
+
     def test_get_records_constraint(self):
         """ Test whether the constraint parameter is working properly
 
@@ -114,7 +216,7 @@ class CswViewTestCase(TestCase):
             data=get_records_param
         )
         status_code = response.status_code
-        content = response.content
+        content = get_response_content(response)
         content_xml = xml_helper.parse_xml(content)
 
         self.assertEqual(response.status_code, 200, WRONG_STATUS_CODE_TEMPLATE.format(status_code))
@@ -145,7 +247,7 @@ class CswViewTestCase(TestCase):
             data=get_records_param
         )
         status_code = response.status_code
-        content = response.content
+        content = get_response_content(response)
         content_xml = xml_helper.parse_xml(content)
 
         self.assertEqual(response.status_code, 200, WRONG_STATUS_CODE_TEMPLATE.format(status_code))
@@ -162,6 +264,34 @@ class CswViewTestCase(TestCase):
         identifiers_identical = [identifier == self.test_id for identifier in identifiers]
         self.assertTrue(False not in identifiers_identical, "Elements with not matching identifier has been returned: {}".format(", ".join(identifiers)))
 
+    def test_get_records_by_id_changed_metadata(self):
+        """ Test whether a changed metadata is not returned from the serialized records of a previous request
+
+        Returns:
+
+        """
+        get_records_param = {
+            "service": "CSW",
+            "version": "2.0.2",
+            "request": "GetRecordById",
+            "id": self.test_id,
+            "elementsetname": "full",
+        }
+        response = self.client.get(reverse(CSW_PATH), data=get_records_param)
+        self.assertEqual(response.status_code, 200, WRONG_STATUS_CODE_TEMPLATE.format(response.status_code))
+        get_response_content(response)
+
+        metadata = Service.objects.get(metadata__identifier=self.test_id).metadata
+        metadata.title = "Changed title"
+        metadata.save()
+
+        # Change the parameters, so the response is not taken from the page cache
+        get_records_param["maxrecords"] = 1
+        response = self.client.get(reverse(CSW_PATH), data=get_records_param)
+        content_xml = xml_helper.parse_xml(get_response_content(response))
+        title = xml_helper.try_get_text_from_xml_element(content_xml, "//" + GENERIC_NAMESPACE_TEMPLATE.format("title"))
+        self.assertEqual(title, "Changed title", "Serialized record was not renewed after the metadata changed!")
+
     def test_get_records_md_metadata(self):
         """ Test for checking if the GetRecordsById is working fine or not.
 
@@ -183,7 +313,7 @@ class CswViewTestCase(TestCase):
             data=get_records_param
         )
         status_code = response.status_code
-        content = response.content
+        content = get_response_content(response)
         content_xml = xml_helper.parse_xml(content)
 
         self.assertEqual(response.status_code, 200, WRONG_STATUS_CODE_TEMPLATE.format(status_code))
@@ -212,7 +342,7 @@ class CswViewTestCase(TestCase):
             data=get_records_param
         )
         status_code = response.status_code
-        content = response.content
+        content = get_response_content(response)
         content_xml = xml_helper.parse_xml(content)
 
         self.assertEqual(response.status_code, 200, WRONG_STATUS_CODE_TEMPLATE.format(status_code))
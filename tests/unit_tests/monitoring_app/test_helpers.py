@@ -7,12 +7,14 @@ Created on: 26.02.2020
 """
 
 import os
+import threading
 
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import Permission
 from django.test import TestCase
 from django.utils import timezone
 
+from monitoring.helper.responseMemo import ResponseMemo
 from monitoring.helper.urlHelper import UrlHelper
 from monitoring.helper.wfsHelper import WfsHelper
 from monitoring.helper.wmsHelper import WmsHelper
@@ -207,3 +209,48 @@ class MonitoringTests(TestCase):
         url = url_helper.build(base_url, queries)
         expected_url = 'http://example.com?q1=foo&q2=baz'
         self.assertURLEqual(url, expected_url)
+
+    def test_url_normalize(self):
+        url = 'HTTP://Example.com/wms?SERVICE=WMS&request=GetCapabilities&Version=1.3.0#top'
+        other_url = 'http://example.com/wms?version=1.3.0&service=WMS&REQUEST=GetCapabilities'
+        self.assertEqual(UrlHelper.normalize(url), UrlHelper.normalize(other_url))
+        self.assertNotEqual(UrlHelper.normalize(url), UrlHelper.normalize(other_url.replace('WMS', 'wms')))
+
+    def test_response_memo_single_flight(self):
+        memo = ResponseMemo()
+        load_started = threading.Event()
+        release_load = threading.Event()
+        calls = []
+
+        def load():
+            calls.append(1)
+            load_started.set()
+            release_load.wait(5)
+            return 'response'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(memo.get_or_load('url', load))) for i in range(5)]
+        threads[0].start()
+        load_started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        release_load.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['response'] * 5)
+        self.assertEqual(memo.get_or_load('url', load), 'response')
+        self.assertEqual(len(calls), 1)
+
+    def test_response_memo_not_memoizable(self):
+        memo = ResponseMemo()
+        calls = []
+
+        def load():
+            calls.append(1)
+            return 'error'
+
+        self.assertEqual(memo.get_or_load('url', load, is_memoizable=lambda value: value != 'error'), 'error')
+        self.assertEqual(memo.get_or_load('url', load, is_memoizable=lambda value: value != 'error'), 'error')
+        self.assertEqual(len(calls), 2)
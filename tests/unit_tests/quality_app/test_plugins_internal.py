@@ -10,8 +10,8 @@ import json
 from django.test import TestCase
 
 from quality.enums import RuleFieldNameEnum, RulePropertyEnum, RuleOperatorEnum
-from quality.models import ConformityCheckConfigurationInternal, Rule, RuleSet
-from quality.plugins.internal import QualityInternal
+from quality.models import ConformityCheckConfigurationInternal, Rule, RuleSet, ConformityCheckRun
+from quality.plugins.internal import QualityInternal, QualityInternalBatch
 from service.models import Metadata
 
 
@@ -110,3 +110,44 @@ class PluginInternalTests(TestCase):
         run = internal.run()
 
         self.assertTrue(run.passed)
+
+    def test_batch_run(self):
+        # clone self.config
+        config = self.config
+        config.pk = None
+        config.save()
+
+        rule_count = Rule.objects.create(
+            name='Keyword Rule',
+            field_name=RuleFieldNameEnum.KEYWORDS.value,
+            property=RulePropertyEnum.COUNT.value,
+            operator=RuleOperatorEnum.GTE.value,
+            threshold=0
+        )
+        self.rule_set_pass.rules.add(rule_count)
+        config.mandatory_rule_sets.add(self.rule_set_pass)
+        config.optional_rule_sets.add(self.rule_set_fail)
+        config.save()
+
+        untitled_metadata = Metadata.objects.create(title='')
+        metadatas = Metadata.objects.filter(
+            id__in=[self.metadata.id, untitled_metadata.id])
+
+        num_runs = QualityInternalBatch(metadatas, config).run()
+
+        self.assertEqual(num_runs, 2)
+        run = ConformityCheckRun.objects.get(metadata=self.metadata,
+                                             conformity_check_configuration=config)
+        self.assertTrue(run.passed)
+        self.assertEqual(len(json.loads(run.result)["rule_sets"]), 2)
+        run = ConformityCheckRun.objects.get(metadata=untitled_metadata,
+                                             conformity_check_configuration=config)
+        self.assertFalse(run.passed)
+
+        # The batch results match the results of a single check
+        single_run = QualityInternal(self.metadata, config).run()
+        single_result = json.loads(single_run.result)
+        batch_result = json.loads(ConformityCheckRun.objects.get(
+            metadata=self.metadata, conformity_check_configuration=config,
+            pk__lt=single_run.pk).result)
+        self.assertEqual(batch_result["rule_sets"], single_result["rule_sets"])
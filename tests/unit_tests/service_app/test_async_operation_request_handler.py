@@ -0,0 +1,86 @@
+import asyncio
+import io
+import uuid
+from types import SimpleNamespace
+from unittest.mock import patch, AsyncMock
+
+import httpx
+from PIL import Image
+from django.test import SimpleTestCase
+
+from service.helper import async_connector
+from service.helper.ogc.async_operation_request_handler import AsyncOGCOperationRequestHandler
+
+
+def create_png(width: int, height: int):
+    out = io.BytesIO()
+    Image.new("RGBA", (width, height), (0, 0, 0, 255)).save(out, "png")
+    return out.getvalue()
+
+
+class AsyncConnectorTestCase(SimpleTestCase):
+
+    def test_get_client(self):
+        """ Each event loop shall get its own pooled client, which is reused by all requests of the loop """
+        async def get_clients():
+            return async_connector.get_client(), async_connector.get_client()
+
+        first, second = asyncio.run(get_clients())
+        self.assertIs(first, second)
+        other, _ = asyncio.run(get_clients())
+        self.assertIsNot(first, other)
+
+    def test_close_client(self):
+        """ A closed client is dropped, so the loop gets a new one on the next request """
+        async def close_and_get_client():
+            client = async_connector.get_client()
+            await async_connector.close_client()
+            return client, async_connector.get_client()
+
+        with patch.object(httpx.AsyncClient, "aclose", new_callable=AsyncMock) as aclose_mock:
+            closed, new = asyncio.run(close_and_get_client())
+        aclose_mock.assert_awaited_once()
+        self.assertIsNot(closed, new)
+
+    def test_get_auth(self):
+        self.assertIsNone(async_connector.get_auth(None))
+        basic = SimpleNamespace(auth_type="http_basic", username="user", password="secret")
+        self.assertIsInstance(async_connector.get_auth(basic), httpx.BasicAuth)
+        digest = SimpleNamespace(auth_type="http_digest", username="user", password="secret")
+        self.assertIsInstance(async_connector.get_auth(digest), httpx.DigestAuth)
+
+
+class AsyncOGCOperationRequestHandlerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        # The mask creation only depends on the parsed parameters, so no request has to be parsed
+        self.handler = AsyncOGCOperationRequestHandler.__new__(AsyncOGCOperationRequestHandler)
+        self.handler.width_param = "4"
+        self.handler.height_param = "3"
+        self.handler.srs_param = "EPSG:4326"
+        self.handler.axis_corrected_bbox_param = "0,0,1,1"
+        self.sec_ops = [
+            SimpleNamespace(id=uuid.uuid4(), allowed_area=SimpleNamespace(empty=False)) for i in range(3)
+        ]
+
+    def test_masks_are_fetched_concurrently(self):
+        """ All masks shall be requested at once and combined into one mask of the requested size """
+        in_flight = []
+        max_in_flight = []
+
+        async def get_mock(url, external_auth=None):
+            in_flight.append(url)
+            max_in_flight.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(url)
+            return SimpleNamespace(content=create_png(4, 3))
+
+        with patch.object(async_connector, "get", side_effect=get_mock):
+            mask = asyncio.run(self.handler._create_secured_service_mask_async(self.sec_ops))
+
+        self.assertEqual(max(max_in_flight), len(self.sec_ops))
+        self.assertEqual(mask.size, (4, 3))
+
+    def test_unrestricted_operations_have_no_mask(self):
+        self.sec_ops.append(SimpleNamespace(id=uuid.uuid4(), allowed_area=None))
+        self.assertIsNone(asyncio.run(self.handler._create_secured_service_mask_async(self.sec_ops)))
@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase
+
+from service.helper.capabilities_digest import get_section_digests, get_change_set
+
+CAPABILITIES = """<?xml version="1.0" encoding="UTF-8"?>
+<WMS_Capabilities version="1.3.0" xmlns="http://www.opengis.net/wms">
+    <Service><Name>WMS</Name><Title>Test service</Title></Service>
+    <Capability>
+        <Layer queryable="1" opaque="0">
+            <Name>root</Name>
+            <Title>Root layer</Title>
+            <Layer><Name>first</Name><Title>First layer</Title></Layer>
+            <Layer><Name>second</Name><Title>Second layer</Title></Layer>
+        </Layer>
+    </Capability>
+</WMS_Capabilities>"""
+
+
+class CapabilitiesDigestTestCase(SimpleTestCase):
+
+    def test_equal_documents(self):
+        reformatted = CAPABILITIES.replace('queryable="1" opaque="0"', 'opaque="0"   queryable="1"').replace("\n    ", "\n")
+        self.assertIsNone(get_change_set(get_section_digests(CAPABILITIES), get_section_digests(reformatted)))
+
+    def test_changed_layer(self):
+        changed = CAPABILITIES.replace("Second layer", "Changed layer").replace(
+            "</Layer>\n    </Capability>",
+            "<Layer><Name>third</Name><Title>Third layer</Title></Layer></Layer>\n    </Capability>"
+        )
+        change_set = get_change_set(get_section_digests(CAPABILITIES), get_section_digests(changed))
+        self.assertEqual(change_set, {
+            "added": ["layer:third"],
+            "removed": [],
+            "changed": ["layer:second"],
+        })
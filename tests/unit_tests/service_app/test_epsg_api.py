@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+import requests
+from django.test import SimpleTestCase
+
+from service.helper.enums import OGCServiceEnum, OGCServiceVersionEnum
+from service.helper.epsg_api import EpsgApi, DEFAULT_AXIS_ORDER
+
+
+class EpsgApiTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.epsg_api = EpsgApi()
+
+    def test_get_axis_order(self):
+        self.assertEqual(
+            self.epsg_api._get_axis_order("EPSG:4326"),
+            {"first_axis": "north", "second_axis": "east"}
+        )
+        self.assertEqual(
+            self.epsg_api._get_axis_order("urn:ogc:def:crs:EPSG::31467"),
+            {"first_axis": "north", "second_axis": "east"}
+        )
+        self.assertEqual(
+            self.epsg_api._get_axis_order("EPSG:25832"),
+            {"first_axis": "east", "second_axis": "north"}
+        )
+        # OGC reference systems are not looked up as EPSG codes
+        for identifier in ["CRS:84", "urn:ogc:def:crs:OGC:1.3:CRS84", "CRS:83"]:
+            self.assertEqual(self.epsg_api._get_axis_order(identifier), DEFAULT_AXIS_ORDER, identifier)
+
+    @patch("service.helper.epsg_api.EPSG_AXIS_ORDER_LIVE_LOOKUP", False)
+    @patch.object(EpsgApi, "_request_axis_order")
+    def test_get_axis_order_without_live_lookup(self, request_mock):
+        self.assertEqual(self.epsg_api._get_axis_order("EPSG:1"), DEFAULT_AXIS_ORDER)
+        request_mock.assert_not_called()
+
+    @patch("service.helper.epsg_api.EPSG_AXIS_ORDER_LIVE_LOOKUP", True)
+    @patch.object(EpsgApi, "_request_axis_order", side_effect=requests.exceptions.ConnectTimeout)
+    def test_get_axis_order_failed_live_lookup(self, request_mock):
+        with patch.object(self.epsg_api, "cacher") as cacher_mock:
+            cacher_mock.get.return_value = None
+            # A failed request falls back to the default order and is not repeated
+            self.assertEqual(self.epsg_api._get_axis_order("EPSG:2"), DEFAULT_AXIS_ORDER)
+            self.assertEqual(self.epsg_api._get_axis_order("EPSG:2"), DEFAULT_AXIS_ORDER)
+        request_mock.assert_called_once_with(2)
+
+    def test_check_switch_axis_order(self):
+        wms = OGCServiceEnum.WMS.value
+        self.assertTrue(self.epsg_api.check_switch_axis_order(wms, OGCServiceVersionEnum.V_1_3_0.value, "EPSG:4326"))
+        self.assertFalse(self.epsg_api.check_switch_axis_order(wms, OGCServiceVersionEnum.V_1_1_1.value, "EPSG:4326"))
+        self.assertFalse(self.epsg_api.check_switch_axis_order(wms, OGCServiceVersionEnum.V_1_3_0.value, "EPSG:3857"))
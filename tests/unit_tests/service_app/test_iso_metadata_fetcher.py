@@ -0,0 +1,46 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from service.helper.iso.iso_19115_metadata_parser import ISOMetadata
+from service.helper.iso.iso_metadata_fetcher import ISOMetadataFetcher
+from service.models import Document
+
+FIRST_URI = "http://example.com/csw?request=GetRecordById&id=1"
+SECOND_URI = "http://example.com/csw?request=GetRecordById&id=2"
+MIRROR_URI = "http://mirror.example.com/csw?request=GetRecordById&id=1"
+BROKEN_URI = "http://example.com/broken"
+
+DOCUMENTS = {
+    FIRST_URI: "<MD_Metadata>1</MD_Metadata>",
+    SECOND_URI: "<MD_Metadata>2</MD_Metadata>",
+    MIRROR_URI: "<MD_Metadata>1</MD_Metadata>",
+}
+
+
+def fetch_raw_metadata_mock(uri: str):
+    if uri not in DOCUMENTS:
+        raise ConnectionError(404)
+    return DOCUMENTS[uri]
+
+
+class ISOMetadataFetcherTestCase(SimpleTestCase):
+
+    @patch.object(ISOMetadata, "fetch_raw_metadata", side_effect=fetch_raw_metadata_mock)
+    def test_fetch(self, fetch_mock):
+        fetcher = ISOMetadataFetcher(max_workers=2)
+        fetcher.fetch([FIRST_URI, SECOND_URI, FIRST_URI, MIRROR_URI, BROKEN_URI, None])
+
+        # Every uri is fetched exactly once
+        self.assertEqual(fetch_mock.call_count, 4)
+        fetcher.fetch([FIRST_URI, SECOND_URI])
+        self.assertEqual(fetch_mock.call_count, 4)
+
+        # Identical documents are stored once
+        self.assertEqual(len(fetcher.documents), 2)
+        self.assertEqual(fetcher.uri_hashes[FIRST_URI], fetcher.uri_hashes[MIRROR_URI])
+        self.assertEqual(fetcher.uri_hashes[FIRST_URI], Document.get_content_hash(DOCUMENTS[FIRST_URI]))
+
+        self.assertIn(BROKEN_URI, fetcher.errors)
+        with self.assertRaises(ConnectionError):
+            fetcher.get(BROKEN_URI)
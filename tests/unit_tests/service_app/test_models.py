@@ -1,8 +1,15 @@
+import gzip
+
 from django.contrib.gis.geos import MultiPolygon, Polygon
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
 from django.test import TestCase
 
-from service.models import AllowedOperation, Metadata, Service, Layer, FeatureType
+from service.helper import xml_helper
+from service.helper.enums import DocumentEnum, OGCOperationEnum
+from service.helper.unit_of_work import deferred_side_effects
+from service.models import AllowedOperation, Metadata, Service, Layer, FeatureType, Document, ServiceUrl, \
+    MetadataStatus, MetadataQuerySet
+from service.settings import SERVICE_OPERATION_URI_TEMPLATE
 from tests.baker_recipes.db_setup import create_wms_service, create_superadminuser, create_wfs_service
 
 
@@ -139,3 +146,180 @@ class MetadataTestCase(TestCase):
                 raise AssertionError('FeatureType still exist')
             except ObjectDoesNotExist:
                 pass
+
+    def test_set_secured(self):
+        """ Securing a service shall secure all of its subelements """
+        for metadata in [self.wms_metadata[0], self.wfs_metadata[0]]:
+            metadata.set_secured(True)
+            subelement_mds = metadata.get_subtree_metadatas()
+
+            self.assertTrue(subelement_mds.exists())
+            self.assertFalse(subelement_mds.filter(is_secured=False).exists())
+            self.assertFalse(subelement_mds.filter(use_proxy_uri=False).exists())
+
+            metadata.set_secured(False)
+            # use_proxy stays activated
+            self.assertFalse(subelement_mds.filter(is_secured=True).exists())
+            self.assertFalse(subelement_mds.filter(use_proxy_uri=False).exists())
+
+    def test_set_logging(self):
+        """ Logging shall be activated for the service and all of its subelements """
+        metadata = self.wms_metadata[0]
+        metadata.set_proxy(True)
+        metadata.set_logging(True)
+
+        metadata.refresh_from_db()
+        self.assertTrue(metadata.log_proxy_access)
+        self.assertFalse(metadata.get_subtree_metadatas().filter(log_proxy_access=False).exists())
+
+    def test_update_inherited_properties(self):
+        """ The materialized properties shall be equal to the ones computed by walking the layer tree """
+        service = self.wms_metadata[0].service
+        layers = list(Layer.objects.filter(parent_service=service))
+        expected = {
+            layer.id: (
+                set(layer.get_inherited_reference_systems()),
+                layer.get_inherited_bounding_geometry(),
+                layer.metadata.find_max_bounding_box(),
+            ) for layer in layers
+        }
+        expected_service_bbox = service.metadata.find_max_bounding_box()
+
+        service.update_inherited_properties()
+
+        for layer in Layer.objects.filter(parent_service=service):
+            reference_systems, bounding_geometry, max_bbox = expected[layer.id]
+            self.assertIsNotNone(layer.inherited_bounding_geometry)
+            self.assertEqual(set(layer.get_inherited_reference_systems()), reference_systems)
+            self.assertTrue(layer.get_inherited_bounding_geometry().equals(bounding_geometry))
+            self.assertEqual(layer.metadata.find_max_bounding_box().area, max_bbox.area)
+        service.refresh_from_db()
+        self.assertEqual(service.metadata.find_max_bounding_box().area, expected_service_bbox.area)
+
+    def test_deferred_side_effects(self):
+        """ The active state shall be propagated once at the end of the unit of work """
+        md = Metadata.objects.get(id=self.wms_metadata[0].id)
+        descendants = md.get_descendant_metadatas()
+        self.assertTrue(descendants.exists())
+
+        with deferred_side_effects():
+            md.is_active = False
+            md.save()
+            self.assertTrue(descendants.filter(is_active=True).exists())
+
+        self.assertFalse(descendants.filter(is_active=True).exists())
+
+    def test_metadata_status_update_many(self):
+        """ Missing status records shall be created, existing ones shall only get the given fields updated """
+        md = self.wms_metadata[0]
+        self.assertIsNone(md.get_latest_status())
+
+        MetadataStatus.update_many([MetadataStatus(metadata_id=md.id, harvest_number_results=5)],
+                                   MetadataStatus.HARVEST_FIELDS)
+        MetadataStatus.update_many([MetadataStatus(metadata_id=md.id, conformity_passed=True)],
+                                   MetadataStatus.CONFORMITY_FIELDS)
+
+        status = Metadata.objects.get(id=md.id).get_latest_status()
+        self.assertEqual(status.harvest_number_results, 5)
+        self.assertTrue(status.conformity_passed)
+        self.assertIsNone(status.health_state_code)
+
+    def test_lean_projections(self):
+        """ The lean querysets shall only load their column sets and must not trigger further queries """
+        md_id = self.wms_metadata[0].id
+        all_fields = {field.attname for field in Metadata._meta.concrete_fields}
+
+        md = Metadata.objects.proxy_view().get(id=md_id)
+        self.assertEqual(all_fields - set(MetadataQuerySet.PROXY_VIEW_FIELDS), md.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.assertTrue(md.is_root())
+            self.assertEqual(md.service_type.value, md.service.service_type.name)
+            self.assertFalse(md.use_proxy_uri and md.log_proxy_access)
+
+        md = Metadata.objects.lookup_view().get(id=md_id)
+        self.assertEqual(all_fields - set(MetadataQuerySet.LOOKUP_VIEW_FIELDS), md.get_deferred_fields())
+
+        md = Metadata.objects.list_view().get(id=md_id)
+        self.assertEqual(set(MetadataQuerySet.LIST_VIEW_DEFERRED_FIELDS), md.get_deferred_fields())
+
+
+WMS_1_0_0_CAPABILITIES = """<?xml version="1.0" encoding="UTF-8"?>
+<WMT_MS_Capabilities version="1.0.0">
+    <Capability>
+        <Request>
+            <Map>
+                <Format><PNG/></Format>
+                <DCPType><HTTP><Get onlineResource="http://example.com/wms?"/></HTTP></DCPType>
+            </Map>
+        </Request>
+    </Capability>
+</WMT_MS_Capabilities>"""
+
+
+class DocumentTestCase(TestCase):
+
+    def setUp(self):
+        self.user = create_superadminuser()
+        self.metadata = create_wms_service(group=self.user.groups.first(),
+                                           how_much_sublayers=5,
+                                           how_much_services=1)[0]
+        self.metadata.service.operation_urls.add(
+            ServiceUrl.objects.create(
+                operation=OGCOperationEnum.GET_MAP.value,
+                method="Get",
+                url="http://example.com/wms?",
+            )
+        )
+
+    @staticmethod
+    def _get_map_uri(content: str):
+        xml_obj = xml_helper.parse_xml(content)
+        return xml_obj.find("Capability/Request/Map/DCPType/HTTP/Get").get("onlineResource")
+
+    def test_set_proxy(self):
+        """ Operation uris shall be replaced by the proxy uri and restored to the original ones afterwards """
+        doc = Document(
+            metadata=self.metadata,
+            content=WMS_1_0_0_CAPABILITIES,
+            document_type=DocumentEnum.CAPABILITY.value,
+            is_original=False,
+        )
+
+        doc.set_proxy(True, auto_save=False)
+        self.assertEqual(SERVICE_OPERATION_URI_TEMPLATE.format(self.metadata.id), self._get_map_uri(doc.content))
+
+        doc.set_proxy(False, auto_save=False)
+        self.assertEqual("http://example.com/wms?", self._get_map_uri(doc.content))
+
+    def test_set_proxy_subelement_documents(self):
+        """ All subelement documents shall be rewritten, if the proxy is set on the service metadata """
+        layer_mds = Metadata.objects.filter(service__parent_service=self.metadata.service)
+        for layer_md in layer_mds:
+            Document.objects.create(
+                metadata=layer_md,
+                content=WMS_1_0_0_CAPABILITIES,
+                document_type=DocumentEnum.CAPABILITY.value,
+                is_original=False,
+            )
+
+        self.metadata.set_proxy(True)
+
+        self.assertFalse(layer_mds.filter(use_proxy_uri=False).exists())
+        docs = Document.objects.filter(metadata__in=layer_mds, is_original=False).select_related("metadata")
+        self.assertEqual(layer_mds.count(), docs.count())
+        for doc in docs:
+            self.assertEqual(SERVICE_OPERATION_URI_TEMPLATE.format(doc.metadata.id), self._get_map_uri(doc.content))
+
+    def test_compressed_content(self):
+        """ The content shall be stored compressed and read as the original text """
+        doc = Document.objects.create(
+            metadata=self.metadata,
+            content=WMS_1_0_0_CAPABILITIES,
+            document_type=DocumentEnum.CAPABILITY.value,
+            is_original=True,
+        )
+
+        self.assertEqual(WMS_1_0_0_CAPABILITIES, Document.objects.get(id=doc.id).content)
+        compressed_content = Document.get_compressed_content(id=doc.id)
+        self.assertLess(len(compressed_content), len(WMS_1_0_0_CAPABILITIES.encode("UTF-8")))
+        self.assertEqual(WMS_1_0_0_CAPABILITIES, gzip.decompress(compressed_content).decode("UTF-8"))
@@ -0,0 +1,75 @@
+import io
+import urllib.parse
+from collections import OrderedDict
+
+from PIL import Image
+from django.test import SimpleTestCase
+
+from service.helper.ogc.operation_request_handler import OGCOperationRequestHandler
+
+RED = (255, 0, 0, 255)
+BLUE = (0, 0, 255, 255)
+
+
+def create_png(color: tuple, width: int = 4, height: int = 2):
+    out = io.BytesIO()
+    Image.new("RGBA", (width, height), color).save(out, "png")
+    return out.getvalue()
+
+
+class CompositedMapTestCase(SimpleTestCase):
+
+    def setUp(self):
+        # The compositing only depends on the parsed parameters, so no request has to be parsed
+        self.handler = OGCOperationRequestHandler.__new__(OGCOperationRequestHandler)
+        self.handler.width_param = "4"
+        self.handler.height_param = "2"
+        self.handler.format_param = "image/png"
+        self.handler.access_denied_img = None
+        self.handler.request_is_GET = True
+        self.handler.get_uri = "http://example.com/wms?REQUEST=GetMap&LAYERS=a,b,c&STYLES=s1,s2,s3"
+        self.handler.new_params_dict = OrderedDict([
+            ("REQUEST", "GetMap"),
+            ("LAYERS", "a,b,c"),
+            ("STYLES", "s1,s2,s3"),
+            ("FORMAT", "image/jpeg"),
+        ])
+
+    def test_get_map_group_request(self):
+        """ A group request shall only contain the layers of the group and their styles as transparent png """
+        uri, post_data = self.handler._get_map_group_request(["a", "c"])
+
+        params = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(uri).query))
+        for params_dict in [params, post_data]:
+            self.assertEqual(params_dict["LAYERS"], "a,c")
+            self.assertEqual(params_dict["STYLES"], "s1,s3")
+            self.assertEqual(params_dict["FORMAT"], "image/png")
+            self.assertEqual(params_dict["TRANSPARENT"], "TRUE")
+
+    def test_create_composited_map(self):
+        """ Each group shall be masked by its own mask and the groups shall be composited bottom first """
+        top_mask = Image.new("RGB", (4, 2), (0, 0, 0))
+        # Mask out the left half of the upper group
+        top_mask.paste((255, 255, 255), (0, 0, 2, 2))
+
+        content = self.handler._create_composited_map([create_png(RED), create_png(BLUE)], [None, top_mask])
+
+        img = Image.open(io.BytesIO(content)).convert("RGBA")
+        self.assertEqual(img.getpixel((0, 0)), RED)
+        self.assertEqual(img.getpixel((3, 1)), BLUE)
+
+    def test_create_composited_map_background(self):
+        """ Areas, which are masked in all groups, shall get the background color, if no transparency was requested """
+        mask = Image.new("RGB", (4, 2), (255, 255, 255))
+        self.handler.new_params_dict["BGCOLOR"] = "0x0000FF"
+
+        content = self.handler._create_composited_map([create_png(RED)], [mask])
+
+        img = Image.open(io.BytesIO(content)).convert("RGBA")
+        self.assertEqual(img.getpixel((0, 0)), BLUE)
+
+    def test_get_composited_map_format(self):
+        for requested_format, img_format in [("image/png", "PNG"), ("image/png; mode=8bit", "PNG"),
+                                             ("image/jpeg", "JPEG"), ("image/jpg", "JPEG"), ("image/unknown", "PNG")]:
+            self.handler.format_param = requested_format
+            self.assertEqual(self.handler._get_composited_map_format(), img_format)
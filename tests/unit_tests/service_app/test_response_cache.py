@@ -0,0 +1,63 @@
+import uuid
+
+from django.test import SimpleTestCase, override_settings
+
+from MrMap.cacher import OperationResponseCacher
+from service.helper import response_cache
+from service.helper.enums import OGCOperationEnum
+from service.models import Service
+from service.settings import OPERATION_RESPONSE_CACHE_TIMES
+
+
+class ResponseCacheTestCase(SimpleTestCase):
+
+    def test_get_cache_time(self):
+        service = Service()
+        self.assertEqual(
+            response_cache.get_cache_time(service, "getlegendgraphic"),
+            OPERATION_RESPONSE_CACHE_TIMES[OGCOperationEnum.GET_LEGEND_GRAPHIC.value]
+        )
+        self.assertEqual(response_cache.get_cache_time(service, OGCOperationEnum.GET_MAP.value), 0)
+
+        # The cache time of a service overwrites the default, but does not make other operations cacheable
+        service.response_cache_time = 60
+        self.assertEqual(response_cache.get_cache_time(service, OGCOperationEnum.GET_FEATURE_INFO.value), 60)
+        self.assertEqual(response_cache.get_cache_time(service, OGCOperationEnum.GET_MAP.value), 0)
+        service.response_cache_time = 0
+        self.assertEqual(response_cache.get_cache_time(service, OGCOperationEnum.GET_FEATURE_INFO.value), 0)
+
+    def test_get_cache_key(self):
+        md_id = uuid.uuid4()
+        key = response_cache.get_cache_key(md_id, {"REQUEST": "GetLegendGraphic", "LAYER": "a"})
+        self.assertEqual(key, response_cache.get_cache_key(md_id, {"layer": "a ", "request": "GetLegendGraphic"}))
+        self.assertNotEqual(key, response_cache.get_cache_key(md_id, {"REQUEST": "GetLegendGraphic", "LAYER": "b"}))
+        self.assertNotEqual(key, response_cache.get_cache_key(
+            md_id, {"REQUEST": "GetLegendGraphic", "LAYER": "a"}, scope="secured"
+        ))
+
+    def test_parse_cache_control(self):
+        self.assertEqual(response_cache.parse_cache_control(None), (True, None))
+        self.assertEqual(response_cache.parse_cache_control("public, max-age=600"), (True, 600))
+        self.assertEqual(response_cache.parse_cache_control("max-age=600, s-maxage=60"), (True, 60))
+        self.assertFalse(response_cache.parse_cache_control("private, max-age=600")[0])
+        self.assertFalse(response_cache.parse_cache_control("no-store")[0])
+
+    def test_cache_response_not_storable(self):
+        response = {
+            "response": b"legend",
+            "response_type": "image/png",
+            "response_headers": {"cache-control": "no-store", "etag": None},
+        }
+        self.assertIsNone(response_cache.cache_response(str(uuid.uuid4()), Service(), response, 60))
+
+    @override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_reserve(self):
+        cacher = OperationResponseCacher()
+        budget_key = str(uuid.uuid4())
+        self.assertTrue(cacher.reserve(budget_key, 60, 100, 60))
+        # A rejected reservation does not use up the budget
+        self.assertFalse(cacher.reserve(budget_key, 60, 100, 60))
+        self.assertTrue(cacher.reserve(budget_key, 40, 100, 60))
+        self.assertFalse(cacher.reserve(budget_key, 1, 100, 60))
+        # Other budgets are not affected
+        self.assertTrue(cacher.reserve(budget_key + "_300", 100, 100, 300))
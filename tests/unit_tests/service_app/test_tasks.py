@@ -5,13 +5,17 @@ Contact: michel.peltriaux@vermkv.rlp.de
 Created on: 04.05.20
 
 """
+from unittest.mock import patch
+
 from django.utils import timezone
 from django.test import TestCase
 
 from mrmap.service.helper import service_helper
+from service.helper import deletion_helper
 from service.helper.enums import OGCOperationEnum
-from service.models import Metadata, RequestOperation
-from service.tasks import async_increase_hits
+from service.models import Metadata, RequestOperation, Layer, Service
+from MrMap.cacher import HitCacher
+from service.tasks import async_flush_hits, async_remove_service, async_remove_deleted_services
 from structure.models import Organization
 from tests.baker_recipes.db_setup import create_superadminuser, create_wms_service, create_non_autogenerated_orgas, \
     create_operation
@@ -38,24 +42,58 @@ class ServiceTaskTestCase(TestCase):
         create_operation(OGCOperationEnum.GET_MAP.value)
         self.operation = RequestOperation.objects.all().first()
 
-    def test_async_increase_hits(self):
-        """ Tests the functionality of the asynchronous increasing of hits
+    def test_async_flush_hits(self):
+        """ Tests that hits counted in the cache are written to the metadata and all its subelements
 
         Returns:
 
         """
+        subelement_mds = self.metadata.get_subtree_metadatas()
+        pre_hit_counts = dict(subelement_mds.values_list("id", "hits"))
         pre_hit_count = self.metadata.hits
 
-        # Perform async hit increasing
-        async_increase_hits(self.metadata.id)
+        HitCacher().increase(self.metadata.id, 2)
+        async_flush_hits()
 
-        # Get fresh state from db
         self.metadata.refresh_from_db()
-        post_hit_count = self.metadata.hits
+        self.assertEqual(pre_hit_count + 2, self.metadata.hits)
+        for md_id, hits in subelement_mds.values_list("id", "hits"):
+            self.assertEqual(pre_hit_counts[md_id] + 2, hits)
+        self.assertNotIn(str(self.metadata.id), HitCacher().get_all())
+
+    def test_async_remove_service(self):
+        """ Tests that a service is removed with all of its subelements
+
+        Returns:
+
+        """
+        service = self.metadata.service
+        md_ids = list(self.metadata.get_subtree_metadatas(include_self=True).values_list("id", flat=True))
+        self.assertGreater(len(md_ids), 1)
+
+        async_remove_service(str(self.metadata.id))
+
+        self.assertFalse(Metadata.objects.filter(id__in=md_ids).exists())
+        self.assertFalse(Service.objects.filter(id=service.id).exists())
+        self.assertFalse(Layer.objects.filter(parent_service_id=service.id).exists())
+
+        # A second run finds nothing to do
+        async_remove_service(str(self.metadata.id))
+
+    @patch("service.tasks.async_remove_service.delay")
+    def test_async_remove_deleted_services(self, delay_mock):
+        """ Tests that services, which are hidden but not removed yet, are enqueued again
+
+        Returns:
+
+        """
+        async_remove_deleted_services()
+        delay_mock.assert_not_called()
 
-        fail_msg = "Asynchronous implemented increasing of hits did not work!"
-        self.assertNotEqual(pre_hit_count, post_hit_count, fail_msg)
-        self.assertEqual(pre_hit_count + 1, post_hit_count, fail_msg)
+        deletion_helper.mark_deleted(self.metadata)
+        async_remove_deleted_services()
+        # Only the root metadata is enqueued, not the hidden layers
+        delay_mock.assert_called_once_with(str(self.metadata.id))
 
     def test_async_new_service(self):
         """ Tests the functionality of the asynchronous new service implementation
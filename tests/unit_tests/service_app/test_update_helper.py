@@ -0,0 +1,14 @@
+from django.test import SimpleTestCase
+
+from service.helper.update_helper import _is_unchanged
+from service.models import Metadata
+
+
+class UpdateHelperTestCase(SimpleTestCase):
+
+    def test_is_unchanged(self):
+        digest = "a" * 64
+        self.assertTrue(_is_unchanged(Metadata(content_digest=digest), Metadata(content_digest=digest)))
+        self.assertFalse(_is_unchanged(Metadata(content_digest=digest), Metadata(content_digest="b" * 64)))
+        # Elements without a stored digest are always updated
+        self.assertFalse(_is_unchanged(Metadata(content_digest=None), Metadata(content_digest=None)))
@@ -1,16 +1,22 @@
 import logging
+import tempfile
 import uuid
+from unittest.mock import patch, AsyncMock
 
+import httpx
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import Permission
 from django.contrib.messages import get_messages
-from django.test import TestCase, Client
+from django.test import TestCase, Client, AsyncClient
 from django.urls import reverse
 
+from MrMap.cacher import PreviewImageCacher
 from MrMap.messages import NO_PERMISSION
 from service.forms import UpdateOldToNewElementsForm
+from service.helper import preview_helper
 from service.helper.enums import DocumentEnum
 from service.helper.service_comparator import ServiceComparator
-from service.models import FeatureType, Document
+from service.models import FeatureType, Document, Metadata, ProxyLog
 from service.settings import NONE_UUID
 from service.tables import PendingTaskTable, OgcServiceTable
 from structure.permissionEnums import PermissionEnum
@@ -437,6 +443,62 @@ class GetServicePreviewViewTestCase(TestCase):
         )
         self.assertEqual(response.status_code, 200)
 
+    def test_get_stored_preview_for_wms(self):
+        with tempfile.TemporaryDirectory() as preview_dir:
+            with patch("service.helper.preview_helper.PREVIEW_IMG_DIR", preview_dir):
+                preview = preview_helper.store_preview(self.wms_metadata.id, b"rendered preview")
+                url = reverse('resource:get-service-metadata-preview', args=(self.wms_metadata.id,))
+
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, b"rendered preview")
+                self.assertEqual(response["ETag"], preview["etag"])
+
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=preview["etag"])
+                self.assertEqual(response.status_code, 304)
+
+                # The image store is shared, so the preview is found even without the cache entry
+                PreviewImageCacher().remove(str(self.wms_metadata.id))
+                self.assertEqual(preview_helper.get_preview(self.wms_metadata.id), preview)
+
+                preview_helper.remove_previews([self.wms_metadata.id])
+                self.assertIsNone(preview_helper.get_preview(self.wms_metadata.id))
+
+    def test_get_preview_for_wfs(self):
+        response = self.client.get(
+            reverse('resource:get-service-metadata-preview', args=(self.wfs_metadata.id,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class AsyncOperationViewTestCase(TestCase):
+    def setUp(self):
+        self.user = create_superadminuser()
+        self.wms_metadata = create_wms_service(group=self.user.groups.first(), how_much_services=1)[0]
+        Metadata.objects.filter(id=self.wms_metadata.id).update(
+            online_resource="http://example.com/wms",
+            use_proxy_uri=True,
+            log_proxy_access=True,
+        )
+
+    @patch("service.views.async_log_response")
+    @patch("service.helper.async_connector.get", new_callable=AsyncMock)
+    async def test_get_operation_result_by_asgi(self, get_mock, log_response_mock):
+        """ The proxy shall work for requests of the asgi handler, which have no wsgi environ """
+        get_mock.return_value = httpx.Response(200, content=b"map", headers={"content-type": "image/png"})
+        query_string = "SERVICE=WMS&VERSION=1.1.1&REQUEST=GetMap&SRS=EPSG:4326&BBOX=6,48,9,51&WIDTH=10&HEIGHT=10" \
+                       "&FORMAT=image/png"
+
+        response = await AsyncClient().get(
+            reverse('resource:metadata-proxy-operation', args=(self.wms_metadata.id,)) + "?" + query_string
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"map")
+        get_mock.assert_called_once()
+        proxy_log = await sync_to_async(ProxyLog.objects.get)(metadata_id=self.wms_metadata.id)
+        self.assertTrue(proxy_log.uri.endswith("?" + query_string))
+
 
 class GetDatasetMetadataViewTestCase(TestCase):
     def setUp(self):
@@ -0,0 +1,158 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from service.helper import xml_helper
+from service.helper.ogc.wms import OGCWebMapService, OGCWebMapService_1_1_1, OGCWebMapService_1_3_0
+
+CAPABILITIES_1_1_1 = """<?xml version="1.0" encoding="UTF-8"?>
+<WMT_MS_Capabilities version="1.1.1" xmlns:xlink="http://www.w3.org/1999/xlink">
+  <Capability>
+    <Request>
+      <GetCapabilities>
+        <DCPType><HTTP><Get><OnlineResource xlink:href="http://example.com/cap?"/></Get></HTTP></DCPType>
+      </GetCapabilities>
+      <GetMap>
+        <Format>image/png</Format>
+        <DCPType><HTTP><Get><OnlineResource xlink:href="http://example.com/map?"/></Get></HTTP></DCPType>
+        <DCPType><HTTP><Post><OnlineResource xlink:href="http://example.com/map"/></Post></HTTP></DCPType>
+      </GetMap>
+    </Request>
+    <Layer queryable="0">
+      <Title>Root</Title>
+      <SRS>EPSG:4326</SRS>
+      <LatLonBoundingBox minx="6" miny="48" maxx="9" maxy="51"/>
+      <!-- Only the first bounding box is used -->
+      <LatLonBoundingBox minx="0" miny="0" maxx="1" maxy="1"/>
+      <Layer queryable="1" opaque="1">
+        <Name>roads</Name>
+        <Title>Roads</Title>
+        <Abstract>All roads</Abstract>
+        <KeywordList><Keyword>road</Keyword><Keyword>traffic</Keyword></KeywordList>
+        <SRS>EPSG:25832</SRS>
+        <BoundingBox SRS="EPSG:25832" minx="1" miny="2" maxx="3" maxy="4"/>
+        <ScaleHint min="10" max="1000"/>
+        <Dimension name="time" units="ISO8601"/>
+        <Extent name="time">2020/2021/P1Y</Extent>
+        <Style>
+          <Name>default</Name>
+          <Title>Default</Title>
+          <LegendURL width="20" height="10">
+            <Format>image/png</Format>
+            <OnlineResource xlink:href="http://example.com/legend"/>
+          </LegendURL>
+        </Style>
+      </Layer>
+      <Layer>
+        <Name>rivers</Name>
+        <Title>Rivers</Title>
+        <Layer><Name>lakes</Name><Title>Lakes</Title></Layer>
+      </Layer>
+    </Layer>
+  </Capability>
+</WMT_MS_Capabilities>"""
+
+CAPABILITIES_1_3_0 = """<?xml version="1.0" encoding="UTF-8"?>
+<WMS_Capabilities version="1.3.0" xmlns="http://www.opengis.net/wms" xmlns:xlink="http://www.w3.org/1999/xlink">
+  <Capability>
+    <Layer>
+      <Name>roads</Name>
+      <Title>Roads</Title>
+      <CRS>EPSG:4326</CRS>
+      <SRS>EPSG:31466</SRS>
+      <EX_GeographicBoundingBox>
+        <westBoundLongitude>6</westBoundLongitude>
+        <eastBoundLongitude>9</eastBoundLongitude>
+        <southBoundLatitude>48</southBoundLatitude>
+        <northBoundLatitude>51</northBoundLatitude>
+      </EX_GeographicBoundingBox>
+      <BoundingBox CRS="EPSG:4326" minx="48" miny="6" maxx="51" maxy="9"/>
+      <Dimension name="time" units="ISO8601">2020/2021/P1Y</Dimension>
+    </Layer>
+  </Capability>
+</WMS_Capabilities>"""
+
+
+def create_service(service_class):
+    # The layer parsing only depends on the capabilities document
+    service = service_class.__new__(service_class)
+    service.layers = None
+    return service
+
+
+@patch.object(OGCWebMapService, "_get_mime_type", return_value=None)
+class WebMapServiceLayerParsingTestCase(SimpleTestCase):
+
+    def parse_layers(self, service_class, capabilities, streaming: bool):
+        service = create_service(service_class)
+        if streaming:
+            service._parse_layers_streaming(capabilities)
+        else:
+            service._parse_layers(xml_helper.parse_xml(capabilities))
+        return service.layers
+
+    def assert_same_layers(self, layers, other_layers):
+        self.assertEqual(len(layers), len(other_layers))
+        for layer, other_layer in zip(layers, other_layers):
+            for attr in ["identifier", "title", "abstract", "is_queryable", "is_opaque", "capability_keywords",
+                         "capability_projection_system", "capability_bbox_lat_lon", "capability_bbox_srs",
+                         "capability_scale_hint", "dimension_list", "get_map_uri_GET", "get_map_uri_POST"]:
+                self.assertEqual(getattr(layer, attr), getattr(other_layer, attr), attr)
+            self.assertEqual(
+                [child.identifier for child in layer.child_layers],
+                [child.identifier for child in other_layer.child_layers]
+            )
+
+    def test_parse_layers(self, mime_type_mock):
+        layers = self.parse_layers(OGCWebMapService_1_1_1, CAPABILITIES_1_1_1, streaming=False)
+
+        self.assertEqual([layer.title for layer in layers], ["Root", "Roads", "Rivers", "Lakes"])
+        root, roads, rivers, lakes = layers
+        self.assertIsNone(root.parent)
+        self.assertEqual(root.child_layers, [roads, rivers])
+        self.assertIs(lakes.parent, rivers)
+
+        self.assertEqual(roads.identifier, "roads")
+        self.assertEqual(roads.abstract, "All roads")
+        self.assertTrue(roads.is_queryable)
+        self.assertTrue(roads.is_opaque)
+        self.assertFalse(root.is_queryable)
+        self.assertEqual(roads.capability_keywords, ["road", "traffic"])
+        self.assertEqual(roads.capability_projection_system, ["EPSG:25832"])
+        self.assertEqual(root.capability_bbox_lat_lon, {"minx": "6", "miny": "48", "maxx": "9", "maxy": "51"})
+        self.assertEqual(roads.capability_bbox_srs["EPSG:25832"], {"minx": "1", "miny": "2", "maxx": "3", "maxy": "4"})
+        self.assertEqual(roads.capability_scale_hint, {"min": "10", "max": "1000"})
+        self.assertEqual(roads.dimension_list, [{"type": "time", "units": "ISO8601", "extent": "2020/2021/P1Y"}])
+        self.assertEqual(roads.style.name, "default")
+        self.assertEqual(roads.style.legend_uri, "http://example.com/legend")
+        self.assertEqual((roads.style.width, roads.style.height), (20, 10))
+
+        # The operation uris are the same for all layers
+        for layer in layers:
+            self.assertEqual(layer.get_capabilities_uri_GET, "http://example.com/cap?")
+            self.assertEqual(layer.get_map_uri_GET, "http://example.com/map?")
+            self.assertEqual(layer.get_map_uri_POST, "http://example.com/map")
+            self.assertIsNone(layer.get_feature_info_uri_GET)
+
+    def test_parse_layers_1_3_0(self, mime_type_mock):
+        layer = self.parse_layers(OGCWebMapService_1_3_0, CAPABILITIES_1_3_0, streaming=False)[0]
+
+        self.assertEqual(layer.identifier, "roads")
+        # <SRS> is not part of 1.3.0
+        self.assertEqual(layer.capability_projection_system, ["EPSG:4326"])
+        self.assertEqual(layer.capability_bbox_lat_lon, {"minx": "6", "miny": "48", "maxx": "9", "maxy": "51"})
+        self.assertIn("EPSG:4326", layer.capability_bbox_srs)
+        self.assertEqual(layer.dimension_list, [{"type": "time", "units": "ISO8601", "extent": "2020/2021/P1Y"}])
+
+    def test_parse_layers_streaming(self, mime_type_mock):
+        """ The streaming mode shall produce the same layers as the parsing of the whole tree """
+        for service_class, capabilities in [(OGCWebMapService_1_1_1, CAPABILITIES_1_1_1),
+                                            (OGCWebMapService_1_3_0, CAPABILITIES_1_3_0)]:
+            self.assert_same_layers(
+                self.parse_layers(service_class, capabilities, streaming=False),
+                self.parse_layers(service_class, capabilities, streaming=True),
+            )
+
+    def test_layers_have_no_instance_dict(self, mime_type_mock):
+        layer = self.parse_layers(OGCWebMapService_1_3_0, CAPABILITIES_1_3_0, streaming=True)[0]
+        self.assertFalse(hasattr(layer, "__dict__"))
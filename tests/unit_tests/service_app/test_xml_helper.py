@@ -0,0 +1,94 @@
+from django.test import SimpleTestCase
+from lxml import etree
+
+from MrMap.settings import GENERIC_NAMESPACE_TEMPLATE, XML_NAMESPACES, XML_NAMESPACES_WFS_2_0
+from service.helper import xml_helper
+
+DOCUMENT = """<?xml version="1.0" encoding="UTF-8"?>
+<wfs:WFS_Capabilities xmlns:wfs="http://www.opengis.net/wfs/2.0" xmlns:ows="http://www.opengis.net/ows/1.1">
+  <ows:ServiceIdentification>
+    <ows:Title>Service</ows:Title>
+    <ows:Keywords><ows:Keyword>a</ows:Keyword><ows:Keyword>b</ows:Keyword></ows:Keywords>
+  </ows:ServiceIdentification>
+  <Layer>
+    <Name>outer</Name>
+    <!-- The inner layer comes before the second name of the outer layer -->
+    <Layer>
+      <Name>inner</Name>
+      <Title>It's quoted</Title>
+    </Layer>
+    <Name>outer-2</Name>
+  </Layer>
+</wfs:WFS_Capabilities>"""
+
+
+def generic(*tags):
+    return "/".join(GENERIC_NAMESPACE_TEMPLATE.format(tag) for tag in tags)
+
+
+class XPathExpressionTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.tree = xml_helper.parse_xml(DOCUMENT)
+        self.root = self.tree.getroot()
+        self.outer_layer = self.root[1]
+
+    def assert_same_result(self, expression: str, xml_elem, namespaces=XML_NAMESPACES):
+        compiled = xml_helper.compile_xpath(expression, namespaces)
+        expected = xml_elem.xpath(expression, namespaces=dict(namespaces))
+        self.assertIsNotNone(compiled.axis, expression)
+        self.assertEqual(compiled.evaluate(xml_elem), expected, expression)
+        self.assertEqual(compiled.first(xml_elem), expected[0] if expected else None, expression)
+
+    def test_fast_paths_match_xpath(self):
+        """ Evaluating by tag selection shall return the same elements in the same order as the xpath engine """
+        for xml_elem in [self.tree, self.root, self.outer_layer]:
+            for expression in [
+                "//" + generic("Name"),
+                "//" + generic("Layer", "Name"),
+                "//" + generic("WFS_Capabilities", "Layer"),
+                ".//" + generic("Name"),
+                ".//" + generic("Layer", "Name"),
+                "./" + generic("Name"),
+                "./" + generic("WFS_Capabilities", "Layer", "Name"),
+                "./" + generic("Layer", "Name"),
+                "./" + generic("Missing"),
+            ]:
+                self.assert_same_result(expression, xml_elem)
+
+        self.assert_same_result("//ows:Keyword", self.tree, XML_NAMESPACES_WFS_2_0)
+        self.assert_same_result("./ows:ServiceIdentification/ows:Keywords/ows:Keyword", self.root,
+                                XML_NAMESPACES_WFS_2_0)
+        # The default map holds the ows namespace of older versions
+        self.assertEqual(xml_helper.try_get_element_from_xml("//ows:Keyword", self.tree), [])
+
+    def test_unsupported_expressions_use_xpath(self):
+        for expression in ["//" + generic("Layer") + "[1]", "./" + generic("Layer") + "//" + generic("Name"),
+                           "//Name", "count(//" + generic("Name") + ")"]:
+            compiled = xml_helper.compile_xpath(expression)
+            self.assertIsNone(compiled.axis, expression)
+            self.assertEqual(compiled.evaluate(self.tree), self.tree.xpath(expression), expression)
+
+    def test_registry(self):
+        expression = "./" + generic("Name")
+        self.assertIs(xml_helper.compile_xpath(expression), xml_helper.compile_xpath(expression))
+        self.assertIsNot(xml_helper.compile_xpath(expression),
+                         xml_helper.compile_xpath(expression, XML_NAMESPACES_WFS_2_0))
+        # Mutable maps are not registered
+        self.assertIsNot(xml_helper.compile_xpath(expression, {}), xml_helper.compile_xpath(expression, {}))
+        with self.assertRaises(TypeError):
+            XML_NAMESPACES["wfs"] = "http://www.opengis.net/wfs/2.0"
+
+    def test_helpers(self):
+        self.assertEqual(xml_helper.try_get_text_from_xml_element(self.outer_layer, "./" + generic("Name")), "outer")
+        self.assertIsNone(xml_helper.try_get_text_from_xml_element(None, "./" + generic("Name")))
+        self.assertIsNone(xml_helper.try_get_element_from_xml("./" + generic("Name"), None))
+        self.assertEqual(
+            [elem.tag for elem in xml_helper.find_element_where_text(self.tree, "It's quoted")],
+            ["Layer"]
+        )
+
+    def test_element_without_tree(self):
+        """ Document wide paths shall start at the root of the element's own tree """
+        layer = etree.fromstring("<Layer><Name>a</Name><Layer><Name>b</Name></Layer></Layer>")
+        self.assert_same_result("//" + generic("Name"), layer[1])